@@ -0,0 +1,104 @@
+""" Benchmark the startup time of the command-line programs
+
+For each console entry point declared in ``setup.py``, measures (in new Python processes) the time to import the
+module of the entry point and the time to run the program with ``--version``. Optionally, exits with an error if any
+time exceeds a limit, so that regressions (e.g., eager imports of simulators) can be caught.
+
+Example::
+
+    python benchmarks/import_time.py --repeats 5 --max-time 1.5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+SETUP_FILENAME = os.path.join(os.path.dirname(__file__), '..', 'setup.py')
+
+ENTRY_POINT_PATTERN = re.compile(r"'(?P<name>[\w-]+) = (?P<module>[\w.]+):(?P<function>\w+)'")
+
+
+def get_console_entry_points(setup_filename=SETUP_FILENAME):
+    """ Get the console entry points declared in ``setup.py``
+
+    Args:
+        setup_filename (:obj:`str`, optional): path to ``setup.py``
+
+    Returns:
+        :obj:`list` of :obj:`tuple`: name, module, and function of each entry point
+    """
+    with open(setup_filename, 'r') as file:
+        setup = file.read()
+    console_scripts = setup[setup.index("'console_scripts'"):]
+    console_scripts = console_scripts[:console_scripts.index(']')]
+    return [
+        (match.group('name'), match.group('module'), match.group('function'))
+        for match in ENTRY_POINT_PATTERN.finditer(console_scripts)
+    ]
+
+
+def time_code(code, repeats):
+    """ Measure the median time to execute code in new Python processes
+
+    Args:
+        code (:obj:`str`): Python code
+        repeats (:obj:`int`): number of times to execute the code
+
+    Returns:
+        :obj:`float`: median duration in seconds
+    """
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main(repeats=3, max_time=None):
+    """ Run the benchmark and print its results
+
+    Args:
+        repeats (:obj:`int`, optional): number of times to measure each time
+        max_time (:obj:`float`, optional): maximum acceptable time in seconds
+
+    Returns:
+        :obj:`bool`: whether all times are acceptable
+    """
+    baseline = time_code('pass', repeats)
+    print('Python startup: {:.3f} s'.format(baseline))
+    print('{:<28} {:>12} {:>14}'.format('Program', 'Import (s)', '--version (s)'))
+
+    acceptable = True
+    for name, module, function in get_console_entry_points():
+        import_time = time_code('import {}'.format(module), repeats)
+        version_time = time_code((
+            'import sys\n'
+            'from {} import {}\n'
+            'sys.argv = [{!r}, "--version"]\n'
+            'try:\n'
+            '    {}()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+        ).format(module, function, name, function), repeats)
+        print('{:<28} {:>12.3f} {:>14.3f}'.format(name, import_time, version_time))
+
+        if max_time is not None and max(import_time, version_time) > max_time:
+            acceptable = False
+
+    if not acceptable:
+        print('The startup time of at least one program exceeded {} s.'.format(max_time), file=sys.stderr)
+    return acceptable
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the command-line programs')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of times to measure each time')
+    parser.add_argument('--max-time', type=float, default=None,
+                        help='Maximum acceptable time in seconds; if exceeded, the benchmark exits with an error')
+    args = parser.parse_args()
+    sys.exit(0 if main(repeats=args.repeats, max_time=args.max_time) else 1)
@@ -0,0 +1,110 @@
+""" Benchmark the scaling of NetPyNE simulations with the number of MPI ranks
+
+Executes a SED task for a synthetic network of Hodgkin-Huxley cells (see ``task_pipeline.py``) with NetPyNE with
+increasing numbers of MPI ranks, and reports the duration of the simulation (the ``simulate`` phase of the task), its
+speedup and parallel efficiency relative to the first number of ranks (e.g., one), and whether its results are
+identical to those of the first number of ranks. The number of ranks is limited to the number of cells of the network.
+
+Example::
+
+    python benchmarks/netpyne_mpi_scaling.py --cells 64 --ranks 1 2 4 8 --output scaling.json
+"""
+
+from biosimulators_pyneuroml import core
+from biosimulators_pyneuroml.data_model import Simulator
+from biosimulators_utils.config import get_config
+from task_pipeline import build_workload, get_metadata
+import argparse
+import json
+import numpy
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+
+def main(num_cells=64, ranks=(1, 2, 4, 8), duration=0.3, repeats=1, output_filename=None):
+    """ Run the benchmark and print its results
+
+    Args:
+        num_cells (:obj:`int`, optional): number of cells of the network
+        ranks (:obj:`list` of :obj:`int`, optional): numbers of MPI ranks
+        duration (:obj:`float`, optional): duration of the simulation in seconds
+        repeats (:obj:`int`, optional): number of times to execute the simulation with each number of ranks
+        output_filename (:obj:`str`, optional): path to save the results as JSON
+
+    Returns:
+        :obj:`dict`: results
+    """
+    # results must be simulated, rather than read from the result cache
+    os.environ.pop('RESULT_CACHE_DIR', None)
+
+    config = get_config()
+    config.LOG = True
+
+    results = {
+        'metadata': get_metadata([Simulator.netpyne]),
+        'cells': num_cells,
+        'duration': duration,
+        'runs': [],
+    }
+
+    dirname = tempfile.mkdtemp()
+    try:
+        task, variables = build_workload(dirname, num_cells, num_cells, duration)
+
+        print('{:>6} {:>14} {:>14} {:>10} {:>11} {:>10}'.format(
+            'Ranks', 'Simulate (s)', 'Task (s)', 'Speedup', 'Efficiency', 'Identical'))
+        baseline_results = None
+        baseline_duration = None
+        baseline_ranks = None
+        for num_ranks in ranks:
+            simulate_durations = []
+            task_durations = []
+            for _ in range(repeats):
+                variable_results, log = core.exec_sed_task(task, variables, config=config, simulator=Simulator.netpyne,
+                                                           num_processors=num_ranks)
+                simulate_durations.append(log.simulator_details['timings']['simulate']['wallTime'])
+                task_durations.append(log.simulator_details['timings']['total']['wallTime'])
+
+            simulate_duration = statistics.median(simulate_durations)
+            if baseline_results is None:
+                baseline_results = variable_results
+                baseline_duration = simulate_duration
+                baseline_ranks = num_ranks
+            identical = all(numpy.array_equal(variable_results[id], baseline_results[id]) for id in baseline_results)
+            speedup = baseline_duration / simulate_duration
+            efficiency = speedup * baseline_ranks / num_ranks
+
+            results['runs'].append({
+                'ranks': num_ranks,
+                'simulate': simulate_duration,
+                'task': statistics.median(task_durations),
+                'speedup': speedup,
+                'efficiency': efficiency,
+                'identical': identical,
+            })
+            print('{:>6} {:>14.3f} {:>14.3f} {:>10.2f} {:>11.2f} {:>10}'.format(
+                num_ranks, simulate_duration, statistics.median(task_durations), speedup, efficiency, str(identical)))
+    finally:
+        shutil.rmtree(dirname)
+
+    if output_filename:
+        with open(output_filename, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the scaling of NetPyNE simulations with the number of MPI ranks')
+    parser.add_argument('--cells', type=int, default=64, help='Number of cells of the network')
+    parser.add_argument('--ranks', type=int, nargs='+', default=[1, 2, 4, 8], help='Numbers of MPI ranks')
+    parser.add_argument('--duration', type=float, default=0.3, help='Duration of the simulation (s)')
+    parser.add_argument('--repeats', type=int, default=1, help='Number of times to execute the simulation with each number of ranks')
+    parser.add_argument('--output', default=None, help='Path to save the results as JSON')
+    args = parser.parse_args()
+
+    results = main(num_cells=args.cells, ranks=args.ranks, duration=args.duration, repeats=args.repeats, output_filename=args.output)
+    sys.exit(0 if all(run['identical'] for run in results['runs']) else 1)
@@ -0,0 +1,138 @@
+""" Benchmark the reading of the tails of large LEMS output files
+
+Compares :obj:`biosimulators_pyneuroml.utils.read_lems_output_files` with reading entire files with
+:obj:`pandas.read_csv` and then slicing their tails, which is how outputs were previously read. Each method is
+executed in a new process so that the memory used by each method (the increase in the maximum resident set size of
+the process) can be measured.
+
+Example::
+
+    python benchmarks/read_lems_output_files.py --size 2e9 --columns 10 --rows 10001
+"""
+
+from biosimulators_pyneuroml.data_model import SEDML_TIME_OUTPUT_COLUMN_ID
+from biosimulators_pyneuroml.utils import read_lems_output_files
+import argparse
+import multiprocessing
+import numpy
+import os
+import pandas
+import resource
+import tempfile
+import time
+
+
+def write_output_file(filename, size, num_columns, block_num_rows=100000):
+    """ Write a synthetic output file in the format of jLEMS
+
+    Args:
+        filename (:obj:`str`): path to the file
+        size (:obj:`int`): approximate size of the file in bytes
+        num_columns (:obj:`int`): number of columns, in addition to time
+        block_num_rows (:obj:`int`, optional): number of rows to generate at a time
+
+    Returns:
+        :obj:`int`: number of rows
+    """
+    num_rows = 0
+    with open(filename, 'w') as file:
+        while file.tell() < size:
+            times = (num_rows + numpy.arange(block_num_rows)) * 1e-5
+            values = numpy.random.rand(block_num_rows, num_columns)
+            block = numpy.column_stack((times, values))
+            file.write('\n'.join('\t'.join(repr(float(value)) for value in row) + '\t' for row in block) + '\n')
+            num_rows += block_num_rows
+    return num_rows
+
+
+def read_with_pandas(output_file_configs, dirname, column_ids, num_rows):
+    """ Read outputs by parsing entire files with :obj:`pandas.read_csv` and slicing their tails """
+    results = {}
+    for output_file_config in output_file_configs:
+        names = [SEDML_TIME_OUTPUT_COLUMN_ID] + [column['id'] for column in output_file_config['columns']] + ['__extra__']
+        data_frame = pandas.read_csv(os.path.join(dirname, output_file_config['file_name']),
+                                     sep='\t', names=names).drop(columns=['__extra__'])
+        results[output_file_config['id']] = {
+            column_id: data_frame.loc[:, column_id].to_numpy()[-num_rows:]
+            for column_id in column_ids
+        }
+    return results
+
+
+def read_with_tail_reader(output_file_configs, dirname, column_ids, num_rows, memory_map=False):
+    """ Read outputs with :obj:`read_lems_output_files` """
+    data_frames = read_lems_output_files(output_file_configs, dirname, columns=column_ids, num_rows=num_rows, memory_map=memory_map)
+    return {
+        id: {column_id: data_frame.loc[:, column_id].to_numpy() for column_id in column_ids}
+        for id, data_frame in data_frames.items()
+    }
+
+
+def run_method(method, output_file_configs, dirname, column_ids, num_rows, queue, **kwargs):
+    """ Execute a method for reading outputs, and send its duration and memory usage to a queue """
+    max_rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    results = method(output_file_configs, dirname, column_ids, num_rows, **kwargs)
+    duration = time.perf_counter() - start
+    num_values = sum(len(values) for file_results in results.values() for values in file_results.values())
+    queue.put({
+        'duration': duration,
+        'memory': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - max_rss_before) * 1024,
+        'num_values': num_values,
+    })
+
+
+def main(size=1e9, num_columns=10, num_rows=10001, num_read_columns=2, dirname=None):
+    """ Run the benchmark and print its results
+
+    Args:
+        size (:obj:`float`, optional): approximate size of the output file in bytes
+        num_columns (:obj:`int`, optional): number of columns of the output file, in addition to time
+        num_rows (:obj:`int`, optional): number of rows to read from the end of the file
+        num_read_columns (:obj:`int`, optional): number of columns to read, in addition to time
+        dirname (:obj:`str`, optional): directory for the output file
+    """
+    dirname = tempfile.mkdtemp(dir=dirname)
+    filename = os.path.join(dirname, 'output.tsv')
+    try:
+        file_num_rows = write_output_file(filename, int(size), num_columns)
+        output_file_configs = [{
+            'sim_id': 'sim',
+            'id': 'output',
+            'file_name': 'output.tsv',
+            'columns': [{'id': 'c{}'.format(i_column), 'quantity': 'c{}'.format(i_column)} for i_column in range(num_columns)],
+        }]
+        column_ids = [SEDML_TIME_OUTPUT_COLUMN_ID] + ['c{}'.format(i_column) for i_column in range(num_read_columns)]
+
+        print('File: {:.2f} GB, {} rows, {} columns; reading {} rows and {} columns'.format(
+            os.path.getsize(filename) / 1e9, file_num_rows, num_columns + 1, num_rows, len(column_ids)))
+        print('{:<20} {:>12} {:>16}'.format('Method', 'Time (s)', 'Memory (MB)'))
+
+        context = multiprocessing.get_context('spawn')
+        for name, method, kwargs in [
+            ('pandas.read_csv', read_with_pandas, {}),
+            ('tail reader', read_with_tail_reader, {}),
+            ('tail reader (mmap)', read_with_tail_reader, {'memory_map': True}),
+        ]:
+            queue = context.Queue()
+            process = context.Process(target=run_method, args=(method, output_file_configs, dirname, column_ids, num_rows, queue),
+                                      kwargs=kwargs)
+            process.start()
+            result = queue.get()
+            process.join()
+            print('{:<20} {:>12.3f} {:>16.1f}'.format(name, result['duration'], result['memory'] / 1e6))
+
+    finally:
+        os.remove(filename)
+        os.rmdir(dirname)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the reading of the tails of large LEMS output files')
+    parser.add_argument('--size', type=float, default=1e9, help='Approximate size of the output file in bytes')
+    parser.add_argument('--columns', type=int, default=10, help='Number of columns of the output file, in addition to time')
+    parser.add_argument('--rows', type=int, default=10001, help='Number of rows to read from the end of the file')
+    parser.add_argument('--read-columns', type=int, default=2, help='Number of columns to read, in addition to time')
+    parser.add_argument('--dir', default=None, help='Directory for the output file')
+    args = parser.parse_args()
+    main(size=args.size, num_columns=args.columns, num_rows=args.rows, num_read_columns=args.read_columns, dirname=args.dir)
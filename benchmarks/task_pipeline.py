@@ -0,0 +1,418 @@
+""" Benchmark the stages of the execution of SED tasks with each simulator
+
+Executes SED tasks for synthetic, scaled-up versions of the ``LEMS_NML2_Ex5_DetCell`` model (populations of many
+cells, many recorded columns, and long simulations) with each simulator, and measures the duration of each stage of the
+execution of each task:
+
+* ``preprocess_sed_task``: reading and validating the model and simulation
+* ``validate_task``: validating the task (part of ``preprocess_sed_task``)
+* ``set_sim_in_lems_xml``: configuring the simulation and outputs of the LEMS document
+* ``write_xml_file``: writing the LEMS document for the simulator
+* ``simulate``: executing the simulator (the LEMS run method called by ``run_lems_xml``)
+* ``read_lems_output_files``: reading the outputs of the simulator (not used by in-process NEURON simulations)
+* ``exec_sed_task``: executing the entire task, after preprocessing
+
+The results are printed and can be saved as JSON (``--output``), together with the commit, versions, and configuration
+they were measured with, and compared with results saved for another commit (``--compare``).
+
+Example::
+
+    python benchmarks/task_pipeline.py --simulators neuron brian2 --workloads baseline many_cells \\
+        --output results.json --compare baseline-results.json
+"""
+
+from biosimulators_pyneuroml import core
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml._version import __version__
+from biosimulators_pyneuroml.data_model import Simulator
+from biosimulators_utils.config import get_config
+from biosimulators_utils.sedml.data_model import (
+    Model, ModelLanguage, UniformTimeCourseSimulation, Algorithm, Task, Variable, Symbol)
+from unittest import mock
+import argparse
+import collections
+import datetime
+import importlib
+import json
+import lxml.etree
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures')
+LEMS_FILENAME = 'LEMS_NML2_Ex5_DetCell.xml'
+CELL_FILENAME = 'NML2_SingleCompHHCell.nml'
+
+# time step of the simulations (seconds)
+STEP = 1e-5
+
+# quantities of each cell which can be recorded
+CELL_QUANTITIES = [
+    'v',
+    'bioPhys1/membraneProperties/NaConductances/NaConductance/m/q',
+    'bioPhys1/membraneProperties/NaConductances/NaConductance/h/q',
+    'bioPhys1/membraneProperties/KConductances/KConductance/n/q',
+]
+
+# synthetic workloads: number of cells, number of recorded columns (in addition to time), and duration (seconds). The
+# Brian 2 code generated by jNeuroML requires simulations longer than the stimulus of the model (0.2 s).
+WORKLOADS = collections.OrderedDict([
+    ('baseline', {'cells': 1, 'columns': 4, 'duration': 0.3}),
+    ('many_cells', {'cells': 100, 'columns': 4, 'duration': 0.3}),
+    ('many_columns', {'cells': 25, 'columns': 100, 'duration': 0.3}),
+    ('long', {'cells': 1, 'columns': 4, 'duration': 3.}),
+])
+
+STAGES = [
+    'preprocess_sed_task',
+    'validate_task',
+    'set_sim_in_lems_xml',
+    'write_xml_file',
+    'simulate',
+    'read_lems_output_files',
+    'exec_sed_task',
+]
+
+# LEMS run methods which execute simulators
+SIMULATE_METHODS = [
+    ('biosimulators_pyneuroml.utils', 'run_lems_with_jneuroml_neuron'),
+    ('biosimulators_pyneuroml.utils', 'run_lems_with_jneuroml_neuron_in_process'),
+    ('biosimulators_pyneuroml.utils', 'run_lems_with_jneuroml_netpyne'),
+    ('biosimulators_pyneuroml.utils', 'run_lems_with_jneuroml_brian2'),
+    ('biosimulators_pyneuroml.utils', 'run_lems_with_jneuroml_in_jvm'),
+    ('pyneuroml.pynml', 'run_lems_with_jneuroml'),
+    ('pyneuroml.pynml', 'run_lems_with_jneuroml_neuron'),
+    ('pyneuroml.pynml', 'run_lems_with_jneuroml_netpyne'),
+]
+
+# environment variables which configure the execution of simulations
+CONFIGURATION_ENVIRONMENT_VARIABLES = [
+    'SIMULATE_IN_PROCESS',
+    'BINARY_OUTPUTS',
+    'TASK_WORKERS',
+    'NEURON_CODE_CACHE_DIR',
+    'MECHANISM_STORE_DIR',
+]
+
+
+def get_population_id(i_cell):
+    """ Get the id of the population of a cell of a synthetic workload
+
+    Args:
+        i_cell (:obj:`int`): index of the cell
+
+    Returns:
+        :obj:`str`: id of the population
+    """
+    return 'hhpop' if i_cell == 0 else 'hhpop{}'.format(i_cell)
+
+
+def build_workload(dirname, num_cells, num_columns, duration):
+    """ Create a synthetic SED task for a population of Hodgkin-Huxley cells
+
+    Args:
+        dirname (:obj:`str`): directory for the files of the model
+        num_cells (:obj:`int`): number of cells
+        num_columns (:obj:`int`): number of recorded variables, in addition to time
+        duration (:obj:`float`): duration of the simulation in seconds
+
+    Returns:
+        :obj:`tuple`: :obj:`Task` and :obj:`list` of :obj:`Variable`
+    """
+    for filename in os.listdir(FIXTURES_DIRNAME):
+        if os.path.splitext(filename)[1] in ['.xml', '.nml']:
+            shutil.copyfile(os.path.join(FIXTURES_DIRNAME, filename), os.path.join(dirname, filename))
+
+    # scale the network to many cells, each in a population (which jNeuroML can export to each simulator), and
+    # stimulate each cell
+    cell_filename = os.path.join(dirname, CELL_FILENAME)
+    cell_xml_root = utils.read_xml_file(cell_filename)
+    namespaces = {'nml': cell_xml_root.nsmap[None]}
+    network_xml = cell_xml_root.xpath('/nml:neuroml/nml:network', namespaces=namespaces)[0]
+    population_xml = network_xml.xpath('nml:population', namespaces=namespaces)[0]
+    input_xml = network_xml.xpath('nml:explicitInput', namespaces=namespaces)[0]
+    population_xml.attrib['id'] = get_population_id(0)
+    input_xml.attrib['target'] = '{}[0]'.format(get_population_id(0))
+    for i_cell in range(1, num_cells):
+        cell_population_xml = lxml.etree.Element(population_xml.tag, attrib=dict(population_xml.attrib))
+        cell_population_xml.attrib['id'] = get_population_id(i_cell)
+        population_xml.addnext(cell_population_xml)
+        population_xml = cell_population_xml
+
+        cell_input_xml = lxml.etree.Element(input_xml.tag, attrib=dict(input_xml.attrib))
+        cell_input_xml.attrib['target'] = '{}[0]'.format(get_population_id(i_cell))
+        input_xml.addnext(cell_input_xml)
+        input_xml = cell_input_xml
+    utils.write_xml_file(cell_xml_root, cell_filename)
+
+    task = Task(
+        id='task',
+        model=Model(id='net1', source=os.path.join(dirname, LEMS_FILENAME), language=ModelLanguage.LEMS.value),
+        simulation=UniformTimeCourseSimulation(
+            id='sim',
+            initial_time=0.,
+            output_start_time=0.,
+            output_end_time=duration,
+            number_of_steps=int(round(duration / STEP)),
+            algorithm=Algorithm(kisao_id='KISAO_0000030'),
+        ),
+    )
+    variables = [Variable(id='time', symbol=Symbol.time.value, task=task)]
+    for i_column in range(num_columns):
+        quantity = CELL_QUANTITIES[(i_column // num_cells) % len(CELL_QUANTITIES)]
+        target = '{}[0]/{}'.format(get_population_id(i_column % num_cells), quantity)
+        variables.append(Variable(id='var_{}'.format(i_column), target=target, task=task))
+    return task, variables
+
+
+class StageTimer(object):
+    """ Measures the durations of the stages of the execution of a task by wrapping the methods which implement them
+
+    Attributes:
+        durations (:obj:`dict`): dictionary that maps the name of each stage to its total duration in seconds
+    """
+
+    def __init__(self):
+        self.durations = collections.defaultdict(float)
+
+    def wrap(self, stage, method):
+        """ Wrap a method so that its duration is added to a stage
+
+        Args:
+            stage (:obj:`str`): name of the stage
+            method (:obj:`types.FunctionType`): method
+
+        Returns:
+            :obj:`types.FunctionType`: wrapped method
+        """
+        def wrapped_method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.durations[stage] += time.perf_counter() - start
+        return wrapped_method
+
+    def time(self, stage, method, *args, **kwargs):
+        """ Execute a method and add its duration to a stage
+
+        Args:
+            stage (:obj:`str`): name of the stage
+            method (:obj:`types.FunctionType`): method
+            *args: positional arguments for the method
+            **kwargs: keyword arguments for the method
+
+        Returns:
+            :obj:`object`: return value of the method
+        """
+        return self.wrap(stage, method)(*args, **kwargs)
+
+    def patches(self):
+        """ Get patches which wrap the methods called by :obj:`core.exec_sed_task` which implement stages
+
+        Returns:
+            :obj:`list` of :obj:`unittest.mock._patch`: patches
+        """
+        patches = [
+            mock.patch.object(core, 'validate_task', self.wrap('validate_task', core.validate_task)),
+            mock.patch.object(core, 'set_sim_in_lems_xml', self.wrap('set_sim_in_lems_xml', core.set_sim_in_lems_xml)),
+            mock.patch.object(utils, 'write_xml_file', self.wrap('write_xml_file', utils.write_xml_file)),
+            mock.patch.object(utils, 'read_lems_output_files', self.wrap('read_lems_output_files', utils.read_lems_output_files)),
+        ]
+        for module_name, method_name in SIMULATE_METHODS:
+            module = importlib.import_module(module_name)
+            patches.append(mock.patch.object(module, method_name, self.wrap('simulate', getattr(module, method_name))))
+        return patches
+
+
+def benchmark_task(task, variables, simulator, config):
+    """ Measure the durations of the stages of the execution of a task
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables
+        simulator (:obj:`Simulator`): simulator
+        config (:obj:`Config`): configuration
+
+    Returns:
+        :obj:`dict`: dictionary that maps the name of each stage to its duration in seconds
+    """
+    timer = StageTimer()
+    patches = timer.patches()
+    for patch in patches:
+        patch.start()
+    try:
+        preprocessed_task = timer.time('preprocess_sed_task', core.preprocess_sed_task, task, variables, config=config, simulator=simulator)
+        results, _ = timer.time('exec_sed_task', core.exec_sed_task, task, variables, preprocessed_task=preprocessed_task,
+                                config=config, simulator=simulator)
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+
+    if set(results.keys()) != set(variable.id for variable in variables):
+        raise ValueError('The task did not produce results for each variable.')
+
+    return {stage: timer.durations.get(stage, 0.) for stage in STAGES}
+
+
+def get_metadata(simulators):
+    """ Get metadata about the environment of the benchmark
+
+    Args:
+        simulators (:obj:`list` of :obj:`Simulator`): simulators
+
+    Returns:
+        :obj:`dict`: metadata
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        commit = None
+
+    simulator_versions = {}
+    for simulator in simulators:
+        api = importlib.import_module('biosimulators_pyneuroml.api.{}'.format(simulator.name))
+        simulator_versions[simulator.name] = api.get_simulator_version()
+
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processors': os.cpu_count(),
+        'simulators': simulator_versions,
+        'environment': {name: os.getenv(name) for name in CONFIGURATION_ENVIRONMENT_VARIABLES},
+    }
+
+
+def compare_results(results, baseline):
+    """ Print the ratios of the durations of the stages of two sets of results
+
+    Args:
+        results (:obj:`dict`): results
+        baseline (:obj:`dict`): baseline results
+    """
+    baseline_runs = {(run['simulator'], run['workload']): run for run in baseline['runs']}
+    print('\nComparison with commit {}:'.format(baseline['metadata'].get('commit')))
+    print('{:<10} {:<14} {:<24} {:>12} {:>12} {:>8}'.format('Simulator', 'Workload', 'Stage', 'Baseline (s)', 'Current (s)', 'Ratio'))
+    for run in results['runs']:
+        baseline_run = baseline_runs.get((run['simulator'], run['workload']))
+        if not baseline_run or not run['stages'] or not baseline_run['stages']:
+            continue
+        for stage in STAGES:
+            current = run['stages'][stage]['median']
+            previous = baseline_run['stages'].get(stage, {}).get('median')
+            if previous is None:
+                continue
+            ratio = '{:.2f}'.format(current / previous) if previous else '-'
+            print('{:<10} {:<14} {:<24} {:>12.4f} {:>12.4f} {:>8}'.format(
+                run['simulator'], run['workload'], stage, previous, current, ratio))
+
+
+def main(simulators, workloads, repeats=3, output_filename=None, baseline_filename=None):
+    """ Run the benchmark and print its results
+
+    Args:
+        simulators (:obj:`list` of :obj:`Simulator`): simulators
+        workloads (:obj:`dict`): dictionary that maps the name of each workload to its number of cells, number of
+            columns, and duration
+        repeats (:obj:`int`, optional): number of times to execute each task
+        output_filename (:obj:`str`, optional): path to save the results as JSON
+        baseline_filename (:obj:`str`, optional): path to results saved for another commit to compare with
+
+    Returns:
+        :obj:`dict`: results
+    """
+    # results must be simulated, rather than read from the result cache
+    os.environ.pop('RESULT_CACHE_DIR', None)
+
+    config = get_config()
+    results = {
+        'metadata': get_metadata(simulators),
+        'runs': [],
+    }
+
+    print('{:<10} {:<14} {:<24} {:>12} {:>12} {:>12}'.format('Simulator', 'Workload', 'Stage', 'Median (s)', 'Min (s)', 'Max (s)'))
+    for workload_name, workload in workloads.items():
+        dirname = tempfile.mkdtemp()
+        try:
+            for simulator in simulators:
+                run = {
+                    'simulator': simulator.name,
+                    'workload': workload_name,
+                    'cells': workload['cells'],
+                    'columns': workload['columns'],
+                    'duration': workload['duration'],
+                    'repeats': repeats,
+                    'stages': None,
+                    'error': None,
+                }
+                try:
+                    durations = collections.defaultdict(list)
+                    for _ in range(repeats):
+                        task, variables = build_workload(dirname, workload['cells'], workload['columns'], workload['duration'])
+                        for stage, duration in benchmark_task(task, variables, simulator, config).items():
+                            durations[stage].append(duration)
+                    run['stages'] = {
+                        stage: {
+                            'median': statistics.median(durations[stage]),
+                            'min': min(durations[stage]),
+                            'max': max(durations[stage]),
+                            'values': durations[stage],
+                        }
+                        for stage in STAGES
+                    }
+                    for stage in STAGES:
+                        print('{:<10} {:<14} {:<24} {:>12.4f} {:>12.4f} {:>12.4f}'.format(
+                            simulator.name, workload_name, stage,
+                            run['stages'][stage]['median'], run['stages'][stage]['min'], run['stages'][stage]['max']))
+                except Exception as exception:
+                    run['error'] = '{}: {}'.format(exception.__class__.__name__, str(exception))
+                    print('{:<10} {:<14} failed: {}'.format(simulator.name, workload_name, run['error'].split('\n')[0]))
+                results['runs'].append(run)
+        finally:
+            shutil.rmtree(dirname)
+
+    if output_filename:
+        with open(output_filename, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if baseline_filename:
+        with open(baseline_filename, 'r') as file:
+            compare_results(results, json.load(file))
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the execution of SED tasks with each simulator')
+    parser.add_argument('--simulators', nargs='+', choices=[simulator.name for simulator in Simulator],
+                        default=[simulator.name for simulator in Simulator], help='Simulators to benchmark')
+    parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS.keys()), default=list(WORKLOADS.keys()),
+                        help='Workloads to benchmark')
+    parser.add_argument('--cells', type=int, default=None, help='Number of cells of a custom workload')
+    parser.add_argument('--columns', type=int, default=None, help='Number of recorded columns of a custom workload')
+    parser.add_argument('--duration', type=float, default=None, help='Duration (s) of the simulation of a custom workload')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of times to execute each task')
+    parser.add_argument('--output', default=None, help='Path to save the results as JSON')
+    parser.add_argument('--compare', default=None, help='Path to results saved for another commit to compare with')
+    args = parser.parse_args()
+
+    workloads = collections.OrderedDict((name, WORKLOADS[name]) for name in args.workloads)
+    if args.cells is not None or args.columns is not None or args.duration is not None:
+        workloads = collections.OrderedDict([('custom', {
+            'cells': args.cells or WORKLOADS['baseline']['cells'],
+            'columns': args.columns or WORKLOADS['baseline']['columns'],
+            'duration': args.duration or WORKLOADS['baseline']['duration'],
+        })])
+
+    results = main([Simulator[name] for name in args.simulators], workloads, repeats=args.repeats,
+                   output_filename=args.output, baseline_filename=args.compare)
+    sys.exit(1 if any(run['error'] for run in results['runs']) else 0)
@@ -1,14 +1,36 @@
 from ._version import __version__  # noqa: F401
 # :obj:`str`: version
 
-from .core import exec_sed_task, preprocess_sed_task, exec_sed_doc, exec_sedml_docs_in_combine_archive  # noqa: F401
 from .data_model import Simulator  # noqa: F401
 
 __all__ = [
     '__version__',
     'exec_sed_task',
+    'exec_sed_task_sweep',
     'preprocess_sed_task',
     'exec_sed_doc',
     'exec_sedml_docs_in_combine_archive',
+    'exec_sed_task_async',
+    'exec_sedml_docs_in_combine_archive_async',
     'Simulator',
 ]
+
+
+def __getattr__(name):
+    """ Get the methods for executing SED tasks from :obj:`biosimulators_pyneuroml.core` and
+    :obj:`biosimulators_pyneuroml.async_exec`, which are only imported when they are first used so that the command-line
+    programs can start quickly
+
+    Args:
+        name (:obj:`str`): name of the method
+
+    Returns:
+        :obj:`types.FunctionType`: method
+    """
+    if name in ['exec_sed_task', 'exec_sed_task_sweep', 'preprocess_sed_task', 'exec_sed_doc', 'exec_sedml_docs_in_combine_archive']:
+        from . import core
+        return getattr(core, name)
+    if name in ['exec_sed_task_async', 'exec_sedml_docs_in_combine_archive_async']:
+        from . import async_exec
+        return getattr(async_exec, name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -1,8 +1,6 @@
-from .. import core
 from .._version import __version__  # noqa: F401
 from ..data_model import Simulator
-import functools
-import brian2
+from .utils import get_package_version, get_core_method
 
 __all__ = [
     '__version__',
@@ -15,15 +13,15 @@ __all__ = [
 
 
 def get_simulator_version():
-    """ Get the version of pyNeuroML
+    """ Get the version of Brian 2
 
     Returns:
         :obj:`str`: version
     """
-    return brian2.__version__
+    return get_package_version('Brian2', 'brian2')
 
 
-exec_sed_task = functools.partial(core.exec_sed_task, simulator=Simulator.brian2)
-preprocess_sed_task = functools.partial(core.preprocess_sed_task, simulator=Simulator.brian2)
-exec_sed_doc = functools.partial(core.exec_sed_doc, simulator=Simulator.brian2)
-exec_sedml_docs_in_combine_archive = functools.partial(core.exec_sedml_docs_in_combine_archive, simulator=Simulator.brian2)
+exec_sed_task = get_core_method('exec_sed_task', Simulator.brian2)
+preprocess_sed_task = get_core_method('preprocess_sed_task', Simulator.brian2)
+exec_sed_doc = get_core_method('exec_sed_doc', Simulator.brian2)
+exec_sedml_docs_in_combine_archive = get_core_method('exec_sedml_docs_in_combine_archive', Simulator.brian2)
@@ -1,8 +1,6 @@
-from .. import core
 from .._version import __version__  # noqa: F401
 from ..data_model import Simulator
-import functools
-import pyneuroml
+from .utils import get_package_version, get_core_method
 
 __all__ = [
     '__version__',
@@ -20,10 +18,10 @@ def get_simulator_version():
     Returns:
         :obj:`str`: version
     """
-    return pyneuroml.__version__
+    return get_package_version('pyNeuroML', 'pyneuroml')
 
 
-exec_sed_task = functools.partial(core.exec_sed_task, simulator=Simulator.pyneuroml)
-preprocess_sed_task = functools.partial(core.preprocess_sed_task, simulator=Simulator.pyneuroml)
-exec_sed_doc = functools.partial(core.exec_sed_doc, simulator=Simulator.pyneuroml)
-exec_sedml_docs_in_combine_archive = functools.partial(core.exec_sedml_docs_in_combine_archive, simulator=Simulator.pyneuroml)
+exec_sed_task = get_core_method('exec_sed_task', Simulator.pyneuroml)
+preprocess_sed_task = get_core_method('preprocess_sed_task', Simulator.pyneuroml)
+exec_sed_doc = get_core_method('exec_sed_doc', Simulator.pyneuroml)
+exec_sedml_docs_in_combine_archive = get_core_method('exec_sedml_docs_in_combine_archive', Simulator.pyneuroml)
@@ -0,0 +1,51 @@
+""" Utilities for the APIs for the simulators
+
+Importing simulators (e.g., NEURON, NetPyNE) and the methods for executing simulations (e.g., pyNeuroML, pandas) takes
+several seconds. So that the command-line programs can quickly report their versions and usage, the APIs only import
+these modules when they are first used.
+"""
+
+import importlib
+import importlib.metadata
+
+__all__ = [
+    'get_package_version',
+    'get_core_method',
+]
+
+
+def get_package_version(distribution_name, module_name):
+    """ Get the version of a package from its metadata, without importing it, or by importing it if it was installed
+    without metadata
+
+    Args:
+        distribution_name (:obj:`str`): name of the distribution of the package (e.g., ``NEURON``)
+        module_name (:obj:`str`): name of the module of the package (e.g., ``neuron``)
+
+    Returns:
+        :obj:`str`: version
+    """
+    try:
+        return importlib.metadata.version(distribution_name)
+    except importlib.metadata.PackageNotFoundError:
+        return importlib.import_module(module_name).__version__
+
+
+def get_core_method(name, simulator):
+    """ Get a method of :obj:`biosimulators_pyneuroml.core` for a simulator, which imports the module when the method is
+    first called
+
+    Args:
+        name (:obj:`str`): name of the method (e.g., ``exec_sed_task``)
+        simulator (:obj:`Simulator`): simulator
+
+    Returns:
+        :obj:`types.FunctionType`: method
+    """
+    def method(*args, **kwargs):
+        from .. import core
+        return getattr(core, name)(*args, simulator=simulator, **kwargs)
+
+    method.__name__ = method.__qualname__ = name
+    method.__doc__ = 'Execute :obj:`biosimulators_pyneuroml.core.{}` with the `{}` simulator'.format(name, simulator.value)
+    return method
@@ -0,0 +1,279 @@
+""" Methods for executing SED tasks and COMBINE/OMEX archives from :obj:`asyncio` event loops
+
+The synchronous methods of :obj:`biosimulators_pyneuroml.core` block for the full duration of simulations, and the
+state that they share (e.g., the in-process JVM and NEURON, and the caches of the process) isn't designed for the
+concurrent execution of many tasks by the threads of an event loop. Instead, :obj:`exec_sed_task_async` and
+:obj:`exec_sedml_docs_in_combine_archive_async` execute each task or archive in a worker Python process started with
+:obj:`asyncio.create_subprocess_exec`, which in turn starts the processes of the simulators (e.g., jNeuroML, NEURON).
+The standard output and error of the worker and the simulators are streamed into the log of the task (and to an optional
+handler) as they are written, without blocking the event loop. To this end, workers relay the output which they capture
+for logs (e.g., of tasks) as it is written, without changing the configuration (e.g., ``VERBOSE``) of their calls.
+
+The worker is the leader of its own session, and the temporary directory of the worker (``TMPDIR``), which contains
+the scratch directories of its simulations, is a directory which is removed after the worker exits. Cancelling a call
+kills the worker and all of its descendant processes, and removes its temporary files.
+"""
+
+from .data_model import Simulator
+import asyncio
+import codecs
+import functools
+import os
+import pickle
+import psutil
+import shutil
+import signal
+import sys
+import tempfile
+
+__all__ = [
+    'exec_sed_task_async',
+    'exec_sedml_docs_in_combine_archive_async',
+    'kill_process_tree',
+]
+
+# :obj:`int`: maximum number of bytes of the output of workers which is read at once
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+
+async def exec_sed_task_async(task, variables, log=None, config=None, simulator=Simulator.pyneuroml,
+                              num_processors=None, max_memory=None, output_handler=None):
+    """ Execute a task and get its results from an :obj:`asyncio` event loop, with the same semantics as
+    :obj:`biosimulators_pyneuroml.core.exec_sed_task`
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        log (:obj:`TaskLog`, optional): log for the task
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        simulator (:obj:`Simulator`, optional): simulator
+        num_processors (:obj:`int`, optional): number of processors to use (only used with NetPyNe)
+        max_memory (:obj:`int`, optional): maximum memory to use in bytes
+        output_handler (:obj:`types.FunctionType`, optional): function which is called with each chunk (:obj:`str`)
+            of the standard output and error of the simulation, as it is written
+
+    Returns:
+        :obj:`tuple`:
+
+            :obj:`VariableResults`: results of variables
+            :obj:`TaskLog`: log, whose ``output`` is the standard output and error of the simulation
+
+    Raises:
+        :obj:`ValueError`: if the task or an aspect of the task is not valid, or the requested output variables
+            could not be recorded
+        :obj:`NotImplementedError`: if the task is not of a supported type or involves an unsuported feature
+        :obj:`RuntimeError`: if the worker process failed (e.g., was killed)
+        :obj:`asyncio.CancelledError`: if the execution was cancelled
+    """
+    from biosimulators_utils.config import get_config
+    from biosimulators_utils.log.data_model import TaskLog
+
+    config = config or get_config()
+
+    if config.LOG and not log:
+        log = TaskLog()
+
+    def handle_output(text):
+        if log:
+            log.output = (log.output or '') + text
+        if output_handler:
+            output_handler(text)
+
+    results, worker_log = await _exec_in_worker('exec_sed_task', (task, variables), {
+        'config': config,
+        'simulator': simulator,
+        'num_processors': num_processors,
+        'max_memory': max_memory,
+    }, handle_output)
+
+    if log and worker_log:
+        log.algorithm = worker_log.algorithm
+        log.simulator_details = worker_log.simulator_details
+    return results, log
+
+
+async def exec_sedml_docs_in_combine_archive_async(archive_filename, out_dir, config=None, simulator=Simulator.pyneuroml,
+                                                   output_handler=None):
+    """ Execute the SED tasks defined in a COMBINE/OMEX archive and save their outputs from an :obj:`asyncio` event
+    loop, with the same semantics as :obj:`biosimulators_pyneuroml.core.exec_sedml_docs_in_combine_archive`
+
+    Args:
+        archive_filename (:obj:`str`): path to COMBINE/OMEX archive
+        out_dir (:obj:`str`): path to store the outputs of the archive
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        simulator (:obj:`Simulator`, optional): simulator
+        output_handler (:obj:`types.FunctionType`, optional): function which is called with each chunk (:obj:`str`)
+            of the standard output and error of the execution of the archive, as it is written
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`SedDocumentResults`: results
+            * :obj:`CombineArchiveLog`: log
+
+    Raises:
+        :obj:`RuntimeError`: if the worker process failed (e.g., was killed)
+        :obj:`asyncio.CancelledError`: if the execution was cancelled
+    """
+    return await _exec_in_worker('exec_sedml_docs_in_combine_archive', (os.path.abspath(archive_filename), os.path.abspath(out_dir)), {
+        'config': config,
+        'simulator': simulator,
+    }, output_handler)
+
+
+async def _exec_in_worker(method_name, args, kwargs, output_handler=None):
+    """ Execute a method of :obj:`biosimulators_pyneuroml.core` in a worker process
+
+    Args:
+        method_name (:obj:`str`): name of the method (e.g., ``exec_sed_task``)
+        args (:obj:`tuple`): positional arguments of the method
+        kwargs (:obj:`dict`): keyword arguments of the method
+        output_handler (:obj:`types.FunctionType`, optional): function which is called with each chunk (:obj:`str`)
+            of the standard output and error of the worker
+
+    Returns:
+        :obj:`object`: return value of the method
+
+    Raises:
+        :obj:`Exception`: the exception raised by the method, or a :obj:`RuntimeError` if the worker failed
+    """
+    temp_dirname = tempfile.mkdtemp(prefix='biosimulators-pyneuroml-async-')
+    try:
+        input_filename = os.path.join(temp_dirname, 'input.pkl')
+        output_filename = os.path.join(temp_dirname, 'output.pkl')
+        with open(input_filename, 'wb') as file:
+            pickle.dump((method_name, args, kwargs), file)
+
+        # the scratch directories of the simulations of the worker are created within the temporary directory
+        worker_temp_dirname = os.path.join(temp_dirname, 'tmp')
+        os.mkdir(worker_temp_dirname)
+        env = dict(os.environ, TMPDIR=worker_temp_dirname)
+        package_dirname = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([package_dirname] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', __name__, input_filename, output_filename,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=env,
+            start_new_session=True,
+        )
+
+        try:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            output = []
+            while True:
+                chunk = await process.stdout.read(OUTPUT_CHUNK_SIZE)
+                text = decoder.decode(chunk, final=not chunk)
+                if text:
+                    output.append(text)
+                    if output_handler:
+                        output_handler(text)
+                if not chunk:
+                    break
+            await process.wait()
+
+        except BaseException:
+            kill_process_tree(process.pid)
+            await asyncio.shield(process.wait())
+            raise
+
+        if process.returncode != 0 or not os.path.isfile(output_filename):
+            raise RuntimeError('The worker process for `{}` failed with exit code {}:\n  {}'.format(
+                method_name, process.returncode, ''.join(output)[-10000:].replace('\n', '\n  ')))
+
+        with open(output_filename, 'rb') as file:
+            value, exception = pickle.load(file)
+        if exception:
+            raise exception
+        return value
+
+    finally:
+        shutil.rmtree(temp_dirname, ignore_errors=True)
+
+
+def kill_process_tree(pid):
+    """ Kill a process and all of its descendants
+
+    Descendants which have left the session of the process (e.g., daemons) are killed if they are still children of the
+    tree when this method is called.
+
+    Args:
+        pid (:obj:`int`): id of the process
+    """
+    try:
+        process = psutil.Process(pid)
+        processes = process.children(recursive=True) + [process]
+    except psutil.NoSuchProcess:
+        processes = []
+
+    # the worker processes of :obj:`_exec_in_worker` lead their own sessions and process groups
+    try:
+        if os.getpgid(pid) == pid:
+            os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+def _relay_captured_output():
+    """ Relay the output which is captured for logs (e.g., of tasks) in a worker process, so that it is streamed as it
+    is written. Output which is always discarded (e.g., of the validation of models) isn't relayed.
+    """
+    from biosimulators_utils.log.utils import StandardOutputErrorCapturer
+
+    init = StandardOutputErrorCapturer.__init__
+
+    @functools.wraps(init)
+    def init_relay(self, *args, disabled=None, **kwargs):
+        # capturers for logs can be disabled (e.g., when logging is disabled)
+        if disabled is None:
+            init(self, *args, **kwargs)
+        else:
+            kwargs['relay'] = True
+            init(self, *args, disabled=disabled, **kwargs)
+
+    StandardOutputErrorCapturer.__init__ = init_relay
+
+
+def _main(input_filename, output_filename):
+    """ Execute a method of :obj:`biosimulators_pyneuroml.core` in a worker process of :obj:`_exec_in_worker`, and save
+    its return value or exception
+
+    Args:
+        input_filename (:obj:`str`): path to the pickled name and arguments of the method
+        output_filename (:obj:`str`): path to save the pickled return value and exception of the method
+    """
+    with open(input_filename, 'rb') as file:
+        method_name, args, kwargs = pickle.load(file)
+
+    _relay_captured_output()
+
+    from . import core
+    try:
+        result = (getattr(core, method_name)(*args, **kwargs), None)
+    except Exception as exception:
+        result = (None, exception)
+
+    # flush the output of the method so that it is streamed before the worker exits
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    try:
+        data = pickle.dumps(result)
+        pickle.loads(data)
+    except Exception as exception:
+        data = pickle.dumps((None, RuntimeError('The result of `{}` could not be returned: {}'.format(
+            method_name, result[1] or exception))))
+    with open(output_filename, 'wb') as file:
+        file.write(data)
+
+
+if __name__ == '__main__':
+    _main(*sys.argv[1:])
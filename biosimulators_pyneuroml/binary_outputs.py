@@ -0,0 +1,224 @@
+""" Utilities for saving the outputs of simulations as binary files, rather than as tab-separated text
+
+The NEURON, NetPyNE, and Brian 2 scripts generated by jNeuroML save each output file declared by a LEMS document
+by formatting each of its values as text. For simulations which record many quantities, formatting the outputs and
+then parsing them again can take longer than the simulation itself. The methods in this module rewrite the code of
+the generated scripts which saves each output file, so that the scripts instead save the values of each output file as
+a row-major matrix of little-endian, 64-bit floats (one row per time point, one column per column of the output file).
+The binary version of an output file is saved to the path of the text file with the extension
+:obj:`BINARY_OUTPUT_FILE_EXTENSION` appended. Output files which can't be rewritten are still saved as text.
+
+Binary outputs are disabled unless the ``BINARY_OUTPUTS`` environment variable is set to ``1``. By default, the outputs of
+simulations are saved and read as text.
+"""
+
+import numpy
+import os
+import re
+
+__all__ = [
+    'BINARY_OUTPUT_FILE_EXTENSION',
+    'is_binary_output_enabled',
+    'get_binary_output_filename',
+    'rewrite_script_to_save_binary_outputs',
+    'get_script_output_file_values',
+    'read_binary_output_file',
+]
+
+BINARY_OUTPUT_FILE_EXTENSION = '.f64'
+
+BINARY_OUTPUT_DTYPE = numpy.dtype('<f8')
+
+# loop which saves an output file one row at a time (NEURON, NetPyNE), e.g.,
+#
+#     f_of0_f2 = open('0.tsv', 'w')
+#     num_points = len(py_v_time)
+#
+#     for i in range(num_points):
+#         f_of0_f2.write('%e\t%e\t\n' % (py_v_time[i], py_v_v_of0[i], ))
+#     f_of0_f2.close()
+ROW_LOOP_PATTERN = re.compile(
+    r"^(?P<indent>[ \t]*)(?P<file>\w+) = open\('(?P<filename>[^']+)', 'w'\)\n"
+    r"(?P<preamble>(?:(?P=indent)\S.*\n|[ \t]*\n)*?)"
+    r"(?P=indent)for i in range\((?P<num_rows>.+)\):\n"
+    r"[ \t]+(?P=file)\.write\((?P<row>.*)\)\n"
+    r"(?P=indent)(?P=file)\.close\(\)\n",
+    re.MULTILINE)
+
+# row formatted with a tuple of values (NEURON), e.g., ``'%e\t%e\t\n' % (py_v_time[i], py_v_v_of0[i], )``
+TUPLE_ROW_PATTERN = re.compile(r"^\s*'[^']*'\s*%\s*\((?P<values>[^()]*)\)\s*$")
+
+# row formatted by concatenating values (NetPyNE), e.g., ``'%s\t'%(col_of0_t[i]/1000.0) +  '\n'``
+CONCATENATED_ROW_PATTERN = re.compile(r"^\s*(?:'%s\\t'\s*%\s*\([^()]*\)\s*\+\s*)+'\\n'\s*$")
+CONCATENATED_ROW_VALUE_PATTERN = re.compile(r"'%s\\t'\s*%\s*\((?P<value>[^()]*)\)")
+
+# loop which saves a matrix one row at a time (Brian 2), e.g.,
+#
+#     file_of0 = open("0.tsv", 'w')
+#     for l in all_of0:
+#         line = ''
+#         for c in l:
+#             line = line + ('\t%s'%c if len(line)>0 else '%s'%c)
+#         file_of0.write(line+'\n')
+#     file_of0.close()
+MATRIX_LOOP_PATTERN = re.compile(
+    r"^(?P<indent>[ \t]*)(?P<file>\w+) = open\(\"(?P<filename>[^\"]+)\", 'w'\)\n"
+    r"(?P=indent)for l in (?P<values>\w+):\n"
+    r"(?:(?P=indent)[ \t]+.*\n)+?"
+    r"(?P=indent)(?P=file)\.close\(\)\n",
+    re.MULTILINE)
+
+
+def is_binary_output_enabled():
+    """ Determine whether the outputs of simulations should be saved as binary files, as configured by the
+    ``BINARY_OUTPUTS`` environment variable
+
+    Returns:
+        :obj:`bool`: whether the outputs of simulations should be saved as binary files
+    """
+    return os.getenv('BINARY_OUTPUTS', '0').lower() not in ['0', 'false']
+
+
+def get_binary_output_filename(filename):
+    """ Get the path to the binary version of an output file
+
+    Args:
+        filename (:obj:`str`): path to the output file
+
+    Returns:
+        :obj:`str`: path to the binary version of the output file
+    """
+    return filename + BINARY_OUTPUT_FILE_EXTENSION
+
+
+def rewrite_script_to_save_binary_outputs(filename):
+    """ Rewrite a NEURON, NetPyNE, or Brian 2 script generated by jNeuroML so that it saves its output files as binary
+    files
+
+    Args:
+        filename (:obj:`str`): path to the script
+
+    Returns:
+        :obj:`list` of :obj:`str`: names of the output files which will be saved as binary files
+    """
+    with open(filename, 'r') as file:
+        script = file.read()
+
+    output_filenames = []
+
+    def rewrite_row_loop(match):
+        values = _get_row_loop_values(match.group('row'))
+        if not values:
+            return match.group(0)
+
+        num_rows = match.group('num_rows').strip()
+        columns = [
+            re.sub(r'\b(\w+)\[i\]', r'numpy.asarray(\1, dtype=numpy.float64)[:{}]'.format(num_rows), value)
+            for value in values
+        ]
+
+        output_filenames.append(match.group('filename'))
+        indent = match.group('indent')
+        return (
+            "{indent}{file} = open('{filename}', 'wb')\n"
+            "{preamble}"
+            "{indent}import numpy\n"
+            "{indent}numpy.column_stack([{columns}]).astype('{dtype}').tofile({file})\n"
+            "{indent}{file}.close()\n"
+        ).format(indent=indent, file=match.group('file'), filename=get_binary_output_filename(match.group('filename')),
+                 preamble=match.group('preamble'), columns=', '.join(columns), dtype=BINARY_OUTPUT_DTYPE.str)
+
+    def rewrite_matrix_loop(match):
+        output_filenames.append(match.group('filename'))
+        indent = match.group('indent')
+        return (
+            "{indent}{file} = open(\"{filename}\", 'wb')\n"
+            "{indent}import numpy\n"
+            "{indent}numpy.asarray({values}, dtype='{dtype}').tofile({file})\n"
+            "{indent}{file}.close()\n"
+        ).format(indent=indent, file=match.group('file'), filename=get_binary_output_filename(match.group('filename')),
+                 values=match.group('values'), dtype=BINARY_OUTPUT_DTYPE.str)
+
+    script = ROW_LOOP_PATTERN.sub(rewrite_row_loop, script)
+    script = MATRIX_LOOP_PATTERN.sub(rewrite_matrix_loop, script)
+
+    if output_filenames:
+        with open(filename, 'w') as file:
+            file.write(script)
+
+    return output_filenames
+
+
+def get_script_output_file_values(script):
+    """ Get the expressions for the values of the rows of the output files saved by a NEURON or NetPyNE script
+    generated by jNeuroML
+
+    Args:
+        script (:obj:`str`): code of the script
+
+    Returns:
+        :obj:`dict`: dictionary that maps the name of each output file whose code is recognized to a list of the
+            expressions for the values of its columns (e.g., ``py_v_v_of0[i]``), which are functions of the index
+            of the row (``i``)
+    """
+    output_file_values = {}
+    for match in ROW_LOOP_PATTERN.finditer(script):
+        values = _get_row_loop_values(match.group('row'))
+        if values:
+            output_file_values[match.group('filename')] = values
+    return output_file_values
+
+
+def _get_row_loop_values(row):
+    """ Get the expressions for the values of a row saved by a loop in a generated script
+
+    Args:
+        row (:obj:`str`): expression for a row of an output file
+
+    Returns:
+        :obj:`list` of :obj:`str`: expression for each value of the row, or :obj:`None` if the expression for the row
+            isn't recognized
+    """
+    match = TUPLE_ROW_PATTERN.match(row)
+    if match:
+        values = [value.strip() for value in match.group('values').split(',') if value.strip()]
+    elif CONCATENATED_ROW_PATTERN.match(row):
+        values = [value.strip() for value in CONCATENATED_ROW_VALUE_PATTERN.findall(row)]
+    else:
+        return None
+
+    if not values or any(not re.search(r'\b\w+\[i\]', value) for value in values):
+        return None
+    return values
+
+
+def read_binary_output_file(filename, num_columns, column_indices, num_rows=None, memory_map=False):
+    """ Read columns of the tail of a binary output file
+
+    Args:
+        filename (:obj:`str`): path to the binary output file
+        num_columns (:obj:`int`): number of columns of the output file
+        column_indices (:obj:`list` of :obj:`int`): indices of the columns which should be read
+        num_rows (:obj:`int`, optional): number of rows which should be read from the end of the file.
+            Default: all rows.
+        memory_map (:obj:`bool`, optional): whether to memory-map the file, rather than read it
+
+    Returns:
+        :obj:`numpy.ndarray`: values of the columns, with one row per row of the file and one column per
+            element of :obj:`column_indices`
+    """
+    file_num_rows = os.path.getsize(filename) // (num_columns * BINARY_OUTPUT_DTYPE.itemsize)
+    if num_rows is None or num_rows > file_num_rows:
+        num_rows = file_num_rows
+    first_row = file_num_rows - num_rows
+
+    if num_rows == 0:
+        return numpy.zeros((0, len(column_indices)))
+
+    if memory_map:
+        values = numpy.memmap(filename, dtype=BINARY_OUTPUT_DTYPE, mode='r', shape=(file_num_rows, num_columns))
+        return numpy.array(values[first_row:, column_indices], dtype=numpy.float64)
+
+    values = numpy.fromfile(filename, dtype=BINARY_OUTPUT_DTYPE, count=num_rows * num_columns,
+                            offset=first_row * num_columns * BINARY_OUTPUT_DTYPE.itemsize)
+    return values.reshape((num_rows, num_columns))[:, column_indices].astype(numpy.float64)
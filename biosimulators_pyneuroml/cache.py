@@ -0,0 +1,229 @@
+""" Content-addressed, on-disk cache of the results of SED tasks
+
+The cache is enabled by setting the ``RESULT_CACHE_DIR`` environment variable to the directory where results should
+be stored. The size of the cache is limited by the ``RESULT_CACHE_MAX_SIZE`` environment variable (bytes); once the
+cache exceeds this size, its least recently used entries are evicted.
+"""
+
+from .utils import get_lems_included_files, get_cache_key
+from biosimulators_utils.report.data_model import VariableResults
+import functools
+import importlib
+import numpy
+import os
+import tempfile
+import threading
+
+__all__ = [
+    'DEFAULT_RESULT_CACHE_MAX_SIZE',
+    'ResultCache',
+    'get_result_cache',
+    'get_task_result_cache_key',
+    'get_simulator_version',
+]
+
+DEFAULT_RESULT_CACHE_MAX_SIZE = 1000 * 1000000
+
+_result_caches = {}
+
+
+class ResultCache(object):
+    """ Content-addressed, on-disk cache of the results of SED tasks with least-recently-used (LRU) eviction
+
+    Each entry is stored as a NumPy ``.npz`` file whose name is the key of the entry. The modification time of each
+    file records when its entry was last used.
+
+    Attributes:
+        dirname (:obj:`str`): directory where the entries of the cache are stored
+        max_size (:obj:`int`): maximum size of the cache in bytes
+        hits (:obj:`int`): number of lookups which found an entry
+        misses (:obj:`int`): number of lookups which didn't find an entry
+        evictions (:obj:`int`): number of entries which have been evicted
+    """
+
+    EXTENSION = '.npz'
+
+    def __init__(self, dirname, max_size=DEFAULT_RESULT_CACHE_MAX_SIZE):
+        """
+        Args:
+            dirname (:obj:`str`): directory where the entries of the cache are stored
+            max_size (:obj:`int`, optional): maximum size of the cache in bytes
+        """
+        self.dirname = dirname
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname, exist_ok=True)
+
+    def get(self, key):
+        """ Get the results for a key, and mark them as recently used
+
+        Args:
+            key (:obj:`str`): key
+
+        Returns:
+            :obj:`VariableResults`: results, or :obj:`None` if the cache doesn't contain the key
+        """
+        filename = self._get_filename(key)
+        try:
+            with numpy.load(filename, allow_pickle=False) as data:
+                ids = data['arr_0']
+                results = VariableResults()
+                for i_variable, variable_id in enumerate(ids.tolist()):
+                    results[variable_id] = data['arr_{}'.format(i_variable + 1)]
+            os.utime(filename)
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return results
+
+    def set(self, key, results):
+        """ Store the results for a key, and evict the least recently used entries if the cache exceeds its maximum size
+
+        Args:
+            key (:obj:`str`): key
+            results (:obj:`VariableResults`): results
+        """
+        ids = list(results.keys())
+        fid, temp_filename = tempfile.mkstemp(dir=self.dirname, suffix='.tmp')
+        with os.fdopen(fid, 'wb') as file:
+            numpy.savez(file, numpy.array(ids, dtype=str), *[numpy.asarray(results[variable_id]) for variable_id in ids])
+        os.replace(temp_filename, self._get_filename(key))
+
+        self.evict()
+
+    def evict(self):
+        """ Evict the least recently used entries until the cache doesn't exceed its maximum size """
+        entries = []
+        size = 0
+        for entry in os.scandir(self.dirname):
+            if entry.name.endswith(self.EXTENSION):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                size += stat.st_size
+
+        entries.sort()
+        for _, entry_size, filename in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+                with self._lock:
+                    self.evictions += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        """ Remove all entries from the cache """
+        for entry in os.scandir(self.dirname):
+            if entry.name.endswith(self.EXTENSION):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def get_size(self):
+        """ Get the size of the cache
+
+        Returns:
+            :obj:`int`: size of the cache in bytes
+        """
+        return sum(entry.stat().st_size for entry in os.scandir(self.dirname) if entry.name.endswith(self.EXTENSION))
+
+    def get_stats(self):
+        """ Get statistics about the use of the cache by this process
+
+        Returns:
+            :obj:`dict`: number of hits, misses, and evictions
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _get_filename(self, key):
+        return os.path.join(self.dirname, key + self.EXTENSION)
+
+
+def get_result_cache():
+    """ Get the result cache configured by the ``RESULT_CACHE_DIR`` and ``RESULT_CACHE_MAX_SIZE`` environment variables
+
+    Returns:
+        :obj:`ResultCache`: cache, or :obj:`None` if caching is not enabled
+    """
+    dirname = os.getenv('RESULT_CACHE_DIR', None)
+    if not dirname:
+        return None
+
+    max_size = int(float(os.getenv('RESULT_CACHE_MAX_SIZE', DEFAULT_RESULT_CACHE_MAX_SIZE)))
+
+    key = (os.path.abspath(dirname), max_size)
+    if key not in _result_caches:
+        _result_caches[key] = ResultCache(key[0], max_size=max_size)
+    return _result_caches[key]
+
+
+def get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, simulator, in_process=False, binary_outputs=False):
+    """ Get a key which identifies the results of the execution of a task
+
+    The key is a hash of the canonicalized LEMS document (after model changes and the simulation have been applied to it),
+    the contents of the files that it includes, the parameters of the simulation, the variables, the simulator and its
+    version, the mode in which the simulator is executed (in process or in a child process) and in which its outputs are
+    saved (as binary files or as text, which has less precision), and the version of this package.
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+        working_dirname (:obj:`str`): working directory for the LEMS document
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        simulator (:obj:`Simulator`): simulator
+        in_process (:obj:`bool`, optional): whether the simulation is executed in the current process
+        binary_outputs (:obj:`bool`, optional): whether the outputs of the simulation are saved as binary files
+
+    Returns:
+        :obj:`str`: key
+    """
+    sim = task.simulation
+
+    return get_cache_key({
+        'simulator': simulator.value,
+        'simulatorVersion': get_simulator_version(simulator),
+        'inProcess': bool(in_process),
+        'binaryOutputs': bool(binary_outputs),
+        'simulation': {
+            'initialTime': sim.initial_time,
+            'outputStartTime': sim.output_start_time,
+            'outputEndTime': sim.output_end_time,
+            'numberOfSteps': sim.number_of_steps,
+            'algorithm': sim.algorithm.kisao_id,
+        },
+        'variables': [[variable.id, variable.target, variable.symbol] for variable in variables],
+    }, lems_xml_root=lems_xml_root, filenames=get_lems_included_files(lems_xml_root, working_dirname), dirname=working_dirname)
+
+
+@functools.lru_cache(maxsize=None)
+def get_simulator_version(simulator):
+    """ Get the version of a simulator (e.g., of NEURON), from the metadata of its package
+
+    Args:
+        simulator (:obj:`Simulator`): simulator
+
+    Returns:
+        :obj:`str`: version, or :obj:`None` if the simulator isn't installed
+    """
+    try:
+        return importlib.import_module('biosimulators_pyneuroml.api.' + simulator.name).get_simulator_version()
+    except ImportError:
+        return None
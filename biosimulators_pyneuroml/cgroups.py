@@ -0,0 +1,189 @@
+""" Utilities for determining the processors and memory available to containers from their control groups
+
+Within containers (e.g., Docker, Kubernetes pods), :obj:`os.cpu_count` and :obj:`psutil.virtual_memory` report the
+processors and memory of the host, rather than the quotas of the container, which are configured with control groups
+(cgroups). The methods in this module read the CPU and memory quotas of the control groups of the current process, for
+both cgroups v1 and v2. Because the quotas of the ancestors of a control group also apply to it, the quotas of the
+control group and of each of its ancestors which are visible to the process are considered.
+"""
+
+import os
+
+__all__ = [
+    'get_cgroup_dirnames',
+    'get_cgroup_cpu_limit',
+    'get_cgroup_available_memory',
+]
+
+# cgroups v1 reports the absence of a memory limit as a very large number (e.g., 9223372036854771712)
+UNLIMITED_MEMORY_THRESHOLD = 2 ** 60
+
+
+def get_cgroup_dirnames(controller, proc_dirname='/proc/self'):
+    """ Get the directories of the control group of a process for a controller, from the directory of the control group
+    of the process to the root of the mounted hierarchy of control groups
+
+    Args:
+        controller (:obj:`str`): controller (e.g., ``cpu``, ``memory``)
+        proc_dirname (:obj:`str`, optional): ``/proc`` directory of the process
+
+    Returns:
+        :obj:`tuple`:
+
+            * :obj:`int`: version of cgroups (``1`` or ``2``), or :obj:`None` if the process doesn't have a control
+              group for the controller
+            * :obj:`list` of :obj:`str`: directories, from the control group of the process to the root
+    """
+    try:
+        with open(os.path.join(proc_dirname, 'cgroup'), 'r') as file:
+            cgroup_lines = file.read().splitlines()
+        with open(os.path.join(proc_dirname, 'mountinfo'), 'r') as file:
+            mount_lines = file.read().splitlines()
+    except OSError:
+        return None, []
+
+    # get the path of the control group of the process for the controller within each hierarchy
+    v1_path = None
+    v2_path = None
+    for line in cgroup_lines:
+        hierarchy_id, controllers, path = line.split(':', 2)
+        if hierarchy_id == '0' and not controllers:
+            v2_path = path
+        elif controller in controllers.split(','):
+            v1_path = path
+
+    # get the mounts of the hierarchies
+    for line in mount_lines:
+        fields, _, fs_fields = line.partition(' - ')
+        fields = fields.split(' ')
+        fs_fields = fs_fields.split(' ')
+        if len(fields) < 5 or len(fs_fields) < 3:
+            continue
+        mount_root = fields[3]
+        mount_point = fields[4].replace('\\040', ' ')
+        fs_type = fs_fields[0]
+        super_options = fs_fields[2].split(',')
+
+        if fs_type == 'cgroup' and v1_path is not None and controller in super_options:
+            return 1, _get_cgroup_dirnames(mount_point, mount_root, v1_path)
+
+        if fs_type == 'cgroup2' and v2_path is not None and v1_path is None:
+            return 2, _get_cgroup_dirnames(mount_point, mount_root, v2_path)
+
+    return None, []
+
+
+def _get_cgroup_dirnames(mount_point, mount_root, path):
+    """ Get the directories of a control group and its ancestors within a mounted hierarchy of control groups
+
+    Args:
+        mount_point (:obj:`str`): directory where the hierarchy is mounted
+        mount_root (:obj:`str`): control group of the hierarchy which is mounted
+        path (:obj:`str`): control group
+
+    Returns:
+        :obj:`list` of :obj:`str`: directories of the control group and its ancestors which exist, from the control
+            group to the mount point
+    """
+    rel_path = os.path.relpath(path, mount_root) if (path + '/').startswith(mount_root.rstrip('/') + '/') else '.'
+    dirname = os.path.normpath(os.path.join(mount_point, rel_path))
+
+    dirnames = []
+    while True:
+        if os.path.isdir(dirname):
+            dirnames.append(dirname)
+        if dirname == mount_point or os.path.dirname(dirname) == dirname or not dirname.startswith(mount_point):
+            break
+        dirname = os.path.dirname(dirname)
+    return dirnames
+
+
+def _read_cgroup_file(dirname, filename):
+    """ Read a file of a control group
+
+    Args:
+        dirname (:obj:`str`): directory of the control group
+        filename (:obj:`str`): name of the file
+
+    Returns:
+        :obj:`str`: content of the file, or :obj:`None` if the file doesn't exist or can't be read
+    """
+    try:
+        with open(os.path.join(dirname, filename), 'r') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def get_cgroup_cpu_limit(proc_dirname='/proc/self'):
+    """ Get the CPU quota of the control groups of a process
+
+    Args:
+        proc_dirname (:obj:`str`, optional): ``/proc`` directory of the process
+
+    Returns:
+        :obj:`float`: number of processors that the process can use, or :obj:`None` if the CPU usage of the process
+            isn't limited
+    """
+    version, dirnames = get_cgroup_dirnames('cpu', proc_dirname=proc_dirname)
+
+    limit = None
+    for dirname in dirnames:
+        if version == 2:
+            value = _read_cgroup_file(dirname, 'cpu.max')
+            if not value:
+                continue
+            quota, _, period = value.partition(' ')
+        else:
+            quota = _read_cgroup_file(dirname, 'cpu.cfs_quota_us')
+            period = _read_cgroup_file(dirname, 'cpu.cfs_period_us')
+
+        if quota in [None, 'max', '-1'] or not period:
+            continue
+        dirname_limit = int(quota) / int(period)
+        if limit is None or dirname_limit < limit:
+            limit = dirname_limit
+
+    return limit
+
+
+def get_cgroup_available_memory(proc_dirname='/proc/self'):
+    """ Get the memory available to a process within the memory limits of its control groups
+
+    The memory used by each control group excludes inactive page cache, which the kernel reclaims before it enforces
+    the limit.
+
+    Args:
+        proc_dirname (:obj:`str`, optional): ``/proc`` directory of the process
+
+    Returns:
+        :obj:`int`: available memory (bytes), or :obj:`None` if the memory of the process isn't limited
+    """
+    version, dirnames = get_cgroup_dirnames('memory', proc_dirname=proc_dirname)
+    if version == 2:
+        limit_filename = 'memory.max'
+        usage_filename = 'memory.current'
+        inactive_file_key = 'inactive_file'
+    else:
+        limit_filename = 'memory.limit_in_bytes'
+        usage_filename = 'memory.usage_in_bytes'
+        inactive_file_key = 'total_inactive_file'
+
+    available = None
+    for dirname in dirnames:
+        limit = _read_cgroup_file(dirname, limit_filename)
+        if not limit or limit == 'max' or int(limit) >= UNLIMITED_MEMORY_THRESHOLD:
+            continue
+
+        usage = int(_read_cgroup_file(dirname, usage_filename) or 0)
+        for line in (_read_cgroup_file(dirname, 'memory.stat') or '').splitlines():
+            key, _, value = line.partition(' ')
+            if key == inactive_file_key:
+                usage -= int(value)
+                break
+
+        dirname_available = max(0, int(limit) - max(0, usage))
+        if available is None or dirname_available < available:
+            available = dirname_available
+
+    return available
@@ -0,0 +1,141 @@
+""" Coalescing of the tasks of SED documents which share models and simulations into single simulations
+
+SED documents often define multiple tasks of the same model and simulation which only differ in the variables that they
+record (e.g., one task for each report or plot). :obj:`biosimulators_pyneuroml.core.exec_sed_doc` groups such tasks into
+:obj:`CoalescedSedTask` objects, executes each group with a single simulation which records the union of the variables of
+its tasks (as the columns of a single ``OutputFile``), and splits the results of the simulation among its tasks.
+
+Tasks are coalesced when their models (sources, languages, and changes) and their simulations (times and algorithms) are
+structurally identical, as determined by :obj:`biosimulators_pyneuroml.utils.get_sedml_object_fingerprint`.
+
+Coalescing is enabled by setting the ``COALESCE_TASKS`` environment variable to ``1``. Because coalesced tasks are executed
+before the SED document is executed, their standard output/error is replayed into their logs, and the durations in
+their logs don't include their simulations.
+"""
+
+from .utils import get_sedml_object_fingerprint
+from biosimulators_utils.report.data_model import VariableResults
+from biosimulators_utils.sedml.data_model import Variable
+import collections
+import os
+
+__all__ = [
+    'is_task_coalescing_enabled',
+    'CoalescedSedTask',
+    'get_coalesced_sed_tasks',
+]
+
+
+def is_task_coalescing_enabled():
+    """ Determine whether the tasks of SED documents which share models and simulations should be executed with single
+    simulations, as configured by the ``COALESCE_TASKS`` environment variable
+
+    Returns:
+        :obj:`bool`: whether tasks should be coalesced
+    """
+    return os.getenv('COALESCE_TASKS', '0').lower() not in ['0', 'false']
+
+
+class CoalescedSedTask(object):
+    """ Group of tasks which share a model and a simulation, and which can be executed with a single simulation
+
+    Attributes:
+        tasks (:obj:`list` of :obj:`Task`): tasks
+        variables (:obj:`list` of :obj:`list` of :obj:`Variable`): variables of each task
+        merged_variables (:obj:`list` of :obj:`Variable`): variables of the simulation of the tasks, which record the
+            union of the variables of the tasks. For a single task, these are the variables of the task.
+        _merged_variable_ids (:obj:`list` of :obj:`list` of :obj:`str`): id of the merged variable which records each
+            variable of each task
+    """
+
+    def __init__(self, tasks, variables):
+        """
+        Args:
+            tasks (:obj:`list` of :obj:`Task`): tasks
+            variables (:obj:`list` of :obj:`list` of :obj:`Variable`): variables of each task
+        """
+        self.tasks = tasks
+        self.variables = variables
+
+        if len(tasks) == 1:
+            self.merged_variables = variables[0]
+            self._merged_variable_ids = [[variable.id for variable in variables[0]]]
+            return
+
+        # variables which record the same symbol or target share a merged variable
+        merged_variables = collections.OrderedDict()
+        self._merged_variable_ids = []
+        for task_variables in variables:
+            task_merged_variable_ids = []
+            for variable in task_variables:
+                if variable.symbol:
+                    key = ('symbol', variable.symbol)
+                else:
+                    key = ('target', variable.target, tuple(sorted((variable.target_namespaces or {}).items(),
+                                                                   key=lambda item: (item[0] or '', item[1]))))
+
+                merged_variable = merged_variables.get(key, None)
+                if merged_variable is None:
+                    merged_variable = merged_variables[key] = Variable(
+                        id='coalesced_variable_{}'.format(len(merged_variables)),
+                        symbol=variable.symbol,
+                        target=variable.target,
+                        target_namespaces=variable.target_namespaces,
+                        task=tasks[0],
+                    )
+                task_merged_variable_ids.append(merged_variable.id)
+            self._merged_variable_ids.append(task_merged_variable_ids)
+        self.merged_variables = list(merged_variables.values())
+
+    @property
+    def task(self):
+        """ Get the task which should be executed to simulate the tasks
+
+        Returns:
+            :obj:`Task`: task
+        """
+        return self.tasks[0]
+
+    def split_results(self, results):
+        """ Split the results of the simulation of the tasks among the tasks
+
+        Args:
+            results (:obj:`VariableResults`): results of the merged variables
+
+        Returns:
+            :obj:`list` of :obj:`VariableResults`: results of the variables of each task
+        """
+        task_results = []
+        for task_variables, task_merged_variable_ids in zip(self.variables, self._merged_variable_ids):
+            task_result = VariableResults()
+            for variable, merged_variable_id in zip(task_variables, task_merged_variable_ids):
+                task_result[variable.id] = results[merged_variable_id]
+            task_results.append(task_result)
+        return task_results
+
+
+def get_coalesced_sed_tasks(tasks):
+    """ Group tasks which share models and simulations
+
+    Args:
+        tasks (:obj:`list` of :obj:`tuple`): each task (:obj:`Task`) and its variables (:obj:`list` of :obj:`Variable`)
+
+    Returns:
+        :obj:`list` of :obj:`CoalescedSedTask`: groups of tasks, in the order of their first tasks. Tasks which can't be
+            coalesced with other tasks are returned in their own groups.
+    """
+    groups = collections.OrderedDict()
+    for i_task, (task, variables) in enumerate(tasks):
+        model_fingerprint = get_sedml_object_fingerprint(task.model)
+        simulation_fingerprint = get_sedml_object_fingerprint(task.simulation)
+        if model_fingerprint is None or simulation_fingerprint is None:
+            key = i_task
+        else:
+            key = (task.__class__, model_fingerprint, simulation_fingerprint)
+
+        groups.setdefault(key, []).append((task, variables))
+
+    return [
+        CoalescedSedTask([task for task, _ in group], [variables for _, variables in group])
+        for group in groups.values()
+    ]
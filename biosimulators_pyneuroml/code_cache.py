@@ -0,0 +1,229 @@
+""" Persistent cache of the NEURON code generated by jNeuroML
+
+jNeuroML generates a NEURON script, cell templates (``.hoc`` files), and mechanisms (``.mod`` files) for each
+simulation of a LEMS document. Generating this code requires starting a JVM and can take longer than simulating small
+models. Other than the instantiation of the simulation by the script, the generated code only depends on the model and
+its outputs, and not on the duration or time step of the simulation. This cache stores the code generated for each
+model, keyed by a hash of the model (the LEMS document without the duration and time step of its simulation, and the
+contents of the files which it includes). When the cache contains the code for a model, the code is copied from the
+cache, and the duration and time step of the simulation are set in the script, without starting jNeuroML.
+
+The parameters of models which can be set in the generated code at runtime (see
+:obj:`biosimulators_pyneuroml.neuron_parameters`) are also excluded from the keys, such that variants of a model which
+only differ in the values of these parameters (e.g., the points of a parameter sweep) share the same code.
+
+The cache is enabled by setting the ``NEURON_CODE_CACHE_DIR`` environment variable to the directory where code should
+be stored.
+"""
+
+from .neuron_parameters import clear_neuron_runtime_parameters
+from .nrn import set_neuron_simulation_arguments
+import copy
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+__all__ = [
+    'CodeCache',
+    'get_code_cache',
+    'get_neuron_code_cache_key',
+    'get_lems_simulation_time_settings',
+    'set_neuron_script_time_settings',
+]
+
+_code_caches = {}
+
+# factors for converting LEMS times to milliseconds, the units of NEURON
+TIME_UNITS = {
+    's': 1e3,
+    'ms': 1.,
+    'us': 1e-3,
+}
+
+TIME_PATTERN = re.compile(r"^\s*(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(?P<units>[a-z]+)\s*$")
+
+
+class CodeCache(object):
+    """ Persistent cache of the code generated by jNeuroML
+
+    Each entry is stored as a directory whose name is the key of the entry, and which contains the generated files.
+
+    Attributes:
+        dirname (:obj:`str`): directory where the entries of the cache are stored
+        hits (:obj:`int`): number of lookups which found an entry
+        misses (:obj:`int`): number of lookups which didn't find an entry
+    """
+
+    def __init__(self, dirname):
+        """
+        Args:
+            dirname (:obj:`str`): directory where the entries of the cache are stored
+        """
+        self.dirname = dirname
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname, exist_ok=True)
+
+    def get(self, key, dirname):
+        """ Copy the files for a key to a directory
+
+        Args:
+            key (:obj:`str`): key
+            dirname (:obj:`str`): directory to which the files should be copied
+
+        Returns:
+            :obj:`bool`: whether the cache contains the key
+        """
+        entry_dirname = self._get_dirname(key)
+        try:
+            filenames = os.listdir(entry_dirname)
+            for filename in filenames:
+                shutil.copyfile(os.path.join(entry_dirname, filename), os.path.join(dirname, filename))
+        except (FileNotFoundError, NotADirectoryError):
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def set(self, key, dirname, filenames):
+        """ Store files for a key
+
+        Args:
+            key (:obj:`str`): key
+            dirname (:obj:`str`): directory which contains the files
+            filenames (:obj:`list` of :obj:`str`): names of the files, relative to :obj:`dirname`
+        """
+        # copy the files to a temporary directory, and then rename the directory so that other processes never observe
+        # an incomplete entry
+        temp_dirname = tempfile.mkdtemp(dir=self.dirname, suffix='.tmp')
+        for filename in filenames:
+            shutil.copyfile(os.path.join(dirname, filename), os.path.join(temp_dirname, filename))
+        try:
+            os.rename(temp_dirname, self._get_dirname(key))
+        except OSError:
+            # another process already stored the files
+            shutil.rmtree(temp_dirname)
+
+    def clear(self):
+        """ Remove all entries from the cache """
+        for entry in os.scandir(self.dirname):
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def get_stats(self):
+        """ Get statistics about the use of the cache by this process
+
+        Returns:
+            :obj:`dict`: number of hits and misses
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _get_dirname(self, key):
+        return os.path.join(self.dirname, key)
+
+
+def get_code_cache():
+    """ Get the code cache configured by the ``NEURON_CODE_CACHE_DIR`` environment variable
+
+    Returns:
+        :obj:`CodeCache`: cache, or :obj:`None` if caching is not enabled
+    """
+    dirname = os.getenv('NEURON_CODE_CACHE_DIR', None)
+    if not dirname:
+        return None
+
+    dirname = os.path.abspath(dirname)
+    if dirname not in _code_caches:
+        _code_caches[dirname] = CodeCache(dirname)
+    return _code_caches[dirname]
+
+
+def get_neuron_code_cache_key(lems_xml_root, included_filenames, jneuroml_args=''):
+    """ Get a key which identifies the NEURON code generated by jNeuroML for a LEMS document
+
+    The key is a hash of the canonicalized LEMS document without the duration (``length``) and time step (``step``) of
+    its simulation and the values of the parameters which can be set at runtime (see
+    :obj:`biosimulators_pyneuroml.neuron_parameters.get_neuron_runtime_parameters`), the contents of the files that it
+    includes, the arguments for jNeuroML, and the versions of pyNeuroML and this package. Because the document's
+    inclusions of files are identified by the contents of the files, rather than their paths, the key doesn't depend on
+    the directory of the model.
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+        included_filenames (:obj:`list` of :obj:`str`): absolute paths to the files included, directly or indirectly, by
+            the document
+        jneuroml_args (:obj:`str`, optional): arguments for jNeuroML
+
+    Returns:
+        :obj:`str`: key
+    """
+    import pyneuroml
+    from .utils import hash_file, get_cache_key
+
+    lems_xml_root = copy.deepcopy(lems_xml_root)
+    for simulation_xml in lems_xml_root.xpath('/Lems/Simulation'):
+        simulation_xml.attrib.pop('length', None)
+        simulation_xml.attrib.pop('step', None)
+    clear_neuron_runtime_parameters(lems_xml_root)
+
+    file_hashes = {filename: hash_file(filename) for filename in included_filenames}
+    for include_xml in lems_xml_root.xpath("/Lems/Include[@file] | /Lems/*[local-name()='include'][@href]"):
+        attr_name = 'file' if 'file' in include_xml.attrib else 'href'
+        filename = include_xml.attrib[attr_name]
+        if filename in file_hashes:
+            include_xml.attrib[attr_name] = file_hashes[filename]
+
+    return get_cache_key({
+        'jneuromlArgs': jneuroml_args,
+        'pyneuromlVersion': pyneuroml.__version__,
+    }, lems_xml_root=lems_xml_root, filenames=file_hashes)
+
+
+def get_lems_simulation_time_settings(lems_xml_root):
+    """ Get the duration and time step of the simulation of a LEMS document in milliseconds
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+
+    Returns:
+        :obj:`tuple` of :obj:`float`: duration and time step of the simulation, or :obj:`None` if the document doesn't
+            have a single simulation, or its duration or time step can't be interpreted
+    """
+    simulation_xml = lems_xml_root.xpath('/Lems/Simulation')
+    if len(simulation_xml) != 1:
+        return None
+
+    times = []
+    for attr_name in ['length', 'step']:
+        match = TIME_PATTERN.match(simulation_xml[0].attrib.get(attr_name, ''))
+        if match is None or match.group('units') not in TIME_UNITS:
+            return None
+        times.append(float('{:.12g}'.format(float(match.group('value')) * TIME_UNITS[match.group('units')])))
+    return tuple(times)
+
+
+def set_neuron_script_time_settings(script_filename, tstop, dt):
+    """ Set the duration and time step of the simulation of a NEURON script generated by jNeuroML
+
+    Args:
+        script_filename (:obj:`str`): path to the script
+        tstop (:obj:`float`): duration of the simulation in milliseconds
+        dt (:obj:`float`): time step of the simulation in milliseconds
+    """
+    with open(script_filename, 'r') as file:
+        script = file.read()
+
+    script = set_neuron_simulation_arguments(script, tstop=tstop, dt=dt)
+
+    with open(script_filename, 'w') as file:
+        file.write(script)
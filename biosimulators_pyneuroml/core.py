@@ -6,27 +6,54 @@
 :License: MIT
 """
 
+from .binary_outputs import is_binary_output_enabled
+from .cache import get_result_cache, get_task_result_cache_key
+from .coalescing import is_task_coalescing_enabled, get_coalesced_sed_tasks, CoalescedSedTask
 from .data_model import Simulator, KISAO_ALGORITHM_MAP, SEDML_TIME_OUTPUT_COLUMN_ID, SEDML_OUTPUT_FILE_ID
-from .utils import validate_task, read_xml_file, set_sim_in_lems_xml, run_lems_xml, get_simulator_run_lems_method, validate_lems_document
+from .jvm import is_in_process_simulation_enabled
+from .model_cache import get_model_cache
+from .model_state import LemsModelState
+from .resource_usage import ChildProcessMonitor
+from .scheduler import get_resource_scheduler
+from .targets import get_lems_target_index, validate_variable_targets
+from .timing import PhaseTimings, record_phase_timings, time_phase
+from .utils import (validate_task, read_xml_file, set_sim_in_lems_xml, run_lems_xml, get_simulator_run_lems_method,
+                    validate_lems_document, get_available_processors, get_available_memory, get_num_task_workers)
 from biosimulators_utils.combine.exec import exec_sedml_docs_in_archive
-from biosimulators_utils.config import get_config, Config  # noqa: F401
+from biosimulators_utils.config import get_config, Config, Colors  # noqa: F401
 from biosimulators_utils.log.data_model import CombineArchiveLog, TaskLog, StandardOutputErrorCapturerLevel  # noqa: F401
 from biosimulators_utils.viz.data_model import VizFormat  # noqa: F401
 from biosimulators_utils.report.data_model import ReportFormat, VariableResults, SedDocumentResults  # noqa: F401
 from biosimulators_utils.sedml import validation
-from biosimulators_utils.sedml.data_model import (Task, ModelAttributeChange, UniformTimeCourseSimulation,  # noqa: F401
-                                                  Variable, Symbol)
+from biosimulators_utils.log.utils import StandardOutputErrorCapturer
+from biosimulators_utils.sedml.data_model import (SedDocument, Task, RepeatedTask, ModelAttributeChange,  # noqa: F401
+                                                  UniformTimeCourseSimulation, Variable, Symbol)
 from biosimulators_utils.sedml.exec import exec_sed_doc as base_exec_sed_doc
-from biosimulators_utils.sedml.utils import apply_changes_to_xml_model
+from biosimulators_utils.sedml.io import SedmlSimulationReader
+from biosimulators_utils.sedml.utils import get_variables_for_task
 from biosimulators_utils.utils.core import raise_errors_warnings
+from biosimulators_utils.warnings import BioSimulatorsWarning
+from concurrent.futures.process import BrokenProcessPool
+import concurrent.futures
+import contextlib
 import copy
 import functools
+import multiprocessing
+import numpy
 import os
+import pickle
+import sys
+import termcolor
+import warnings
 
 __all__ = [
-    'exec_sedml_docs_in_combine_archive', 'exec_sed_doc', 'exec_sed_task', 'preprocess_sed_task',
+    'exec_sedml_docs_in_combine_archive', 'exec_sed_doc', 'exec_sed_doc_tasks_in_parallel', 'exec_sed_doc_coalesced_tasks',
+    'exec_sed_task', 'exec_sed_task_sweep', 'preprocess_sed_task',
 ]
 
+# state of the worker processes of :obj:`exec_sed_task_sweep`
+_sweep_worker = {}
+
 
 def exec_sedml_docs_in_combine_archive(archive_filename, out_dir,
                                        config=None,
@@ -62,7 +89,8 @@ def exec_sed_doc(doc, working_dir, base_out_path, rel_out_path=None,
                  log=None, indent=0, pretty_print_modified_xml_models=False,
                  log_level=StandardOutputErrorCapturerLevel.c,
                  config=None,
-                 simulator=Simulator.pyneuroml):
+                 simulator=Simulator.pyneuroml,
+                 num_workers=None):
     """ Execute the tasks specified in a SED document and generate the specified outputs
 
     Args:
@@ -85,6 +113,9 @@ def exec_sed_doc(doc, working_dir, base_out_path, rel_out_path=None,
         log_level (:obj:`StandardOutputErrorCapturerLevel`, optional): level at which to log output
         config (:obj:`Config`, optional): BioSimulators common configuration
         simulator (:obj:`Simulator`, optional): simulator
+        num_workers (:obj:`int`, optional): number of processes to use to execute the basic tasks of the document
+            concurrently. The processors and memory available for simulation are divided among the processes.
+            Default: value of the ``TASK_WORKERS`` environment variable, or 1.
 
     Returns:
         :obj:`tuple`:
@@ -92,7 +123,29 @@ def exec_sed_doc(doc, working_dir, base_out_path, rel_out_path=None,
             * :obj:`ReportResults`: results of each report
             * :obj:`SedDocumentLog`: log of the document
     """
-    return base_exec_sed_doc(functools.partial(exec_sed_task, simulator=simulator), doc, working_dir, base_out_path,
+    config = config or get_config()
+
+    if num_workers is None:
+        num_workers = get_num_task_workers()
+
+    task_executer = functools.partial(exec_sed_task, simulator=simulator)
+
+    coalesce_tasks = is_task_coalescing_enabled()
+    if num_workers > 1 or coalesce_tasks:
+        if not isinstance(doc, SedDocument):
+            doc = SedmlSimulationReader().run(doc, config=config)
+
+        if num_workers > 1:
+            task_results = exec_sed_doc_tasks_in_parallel(doc, working_dir, num_workers, indent=indent, config=config,
+                                                          simulator=simulator, coalesce_tasks=coalesce_tasks)
+        else:
+            task_results = exec_sed_doc_coalesced_tasks(doc, working_dir, indent=indent, config=config, simulator=simulator)
+
+        if task_results:
+            task_executer = functools.partial(_exec_sed_task_with_precomputed_results,
+                                              task_results=task_results, task_executer=task_executer)
+
+    return base_exec_sed_doc(task_executer, doc, working_dir, base_out_path,
                              rel_out_path=rel_out_path,
                              apply_xml_model_changes=apply_xml_model_changes,
                              log=log,
@@ -102,7 +155,298 @@ def exec_sed_doc(doc, working_dir, base_out_path, rel_out_path=None,
                              config=config)
 
 
-def exec_sed_task(task, variables, preprocessed_task=None, log=None, config=None, simulator=Simulator.pyneuroml):
+def exec_sed_doc_tasks_in_parallel(doc, working_dir, num_workers, indent=0, config=None, simulator=Simulator.pyneuroml,
+                                   coalesce_tasks=None):
+    """ Concurrently execute the basic tasks of a SED document which don't depend on other tasks
+
+    Basic tasks (instances of :obj:`Task`) whose models are files and whose changes are all instances of
+    :obj:`ModelAttributeChange` are executed with a pool of processes. Tasks which are executed by repeated tasks,
+    repeated tasks, and tasks with other types of models or changes must be executed serially, and are ignored.
+
+    Args:
+        doc (:obj:`SedDocument`): SED document
+        working_dir (:obj:`str`): working directory of the SED document (path relative to which models are located)
+        num_workers (:obj:`int`): number of processes to use
+        indent (:obj:`int`, optional): degree to indent status messages
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        simulator (:obj:`Simulator`, optional): simulator
+        coalesce_tasks (:obj:`bool`, optional): whether to execute tasks which share models and simulations with single
+            simulations. Default: value of the ``COALESCE_TASKS`` environment variable.
+
+    Returns:
+        :obj:`dict`: dictionary that maps the id of each executed task to a tuple of its results (:obj:`VariableResults`),
+            the algorithm and details of the simulator used to execute it, the exception which it raised (:obj:`Exception`),
+            and its standard output/error (:obj:`str`)
+    """
+    config = config or get_config()
+
+    if coalesce_tasks is None:
+        coalesce_tasks = is_task_coalescing_enabled()
+
+    tasks = _get_independent_sed_tasks(doc, working_dir)
+    if not tasks:
+        return {}
+
+    if coalesce_tasks:
+        coalesced_tasks = get_coalesced_sed_tasks(tasks)
+    else:
+        coalesced_tasks = [CoalescedSedTask([task], [variables]) for task, variables in tasks]
+
+    num_workers = min(num_workers, len(coalesced_tasks))
+    num_processors, max_memory = _get_worker_resources(num_workers)
+
+    print('{}Executing {} tasks with {} processes ...'.format(' ' * 2 * indent, len(tasks), num_workers), end='')
+    sys.stdout.flush()
+
+    task_results = {}
+    failed_tasks = []
+    # workers are spawned, rather than forked, so that they don't inherit simulators (e.g., JVMs) which were
+    # initialized by this process
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_init_worker) as pool:
+        futures = {}
+        for coalesced_task in coalesced_tasks:
+            task = _get_sed_task_with_model_in_working_dir(coalesced_task.task, working_dir)
+            future = pool.submit(_exec_sed_task_in_worker, task, coalesced_task.merged_variables, config, simulator,
+                                 num_processors, max_memory)
+            futures[future] = coalesced_task
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                task_results.update(_split_coalesced_task_result(futures[future], future.result()))
+            except (BrokenProcessPool, pickle.PicklingError, pickle.UnpicklingError) as exception:
+                # tasks whose execution or results couldn't be communicated are executed again serially
+                failed_tasks.append((futures[future], exception))
+
+    if failed_tasks:
+        task_ids = [task.id for coalesced_task, _ in failed_tasks for task in coalesced_task.tasks]
+        _print_status('warned - {} tasks will be executed serially'.format(len(task_ids)))
+        warnings.warn('{} tasks could not be executed by the worker processes, and will be executed serially:\n  {}'.format(
+            len(task_ids), '\n  '.join(
+                '{}: {}'.format(', '.join('`{}`'.format(task.id) for task in coalesced_task.tasks), exception)
+                for coalesced_task, exception in failed_tasks)), BioSimulatorsWarning)
+    else:
+        _print_status('succeeded')
+
+    return task_results
+
+
+def exec_sed_doc_coalesced_tasks(doc, working_dir, indent=0, config=None, simulator=Simulator.pyneuroml):
+    """ Execute each group of basic tasks of a SED document which share a model and a simulation with a single simulation
+
+    Groups of tasks are executed serially by this process. Tasks which don't share their models and simulations with
+    other tasks are ignored, as are tasks which :obj:`exec_sed_doc_tasks_in_parallel` ignores.
+
+    Args:
+        doc (:obj:`SedDocument`): SED document
+        working_dir (:obj:`str`): working directory of the SED document (path relative to which models are located)
+        indent (:obj:`int`, optional): degree to indent status messages
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        simulator (:obj:`Simulator`, optional): simulator
+
+    Returns:
+        :obj:`dict`: dictionary that maps the id of each executed task to a tuple of its results (:obj:`VariableResults`),
+            the algorithm and details of the simulator used to execute it, the exception which it raised (:obj:`Exception`),
+            and its standard output/error (:obj:`str`)
+    """
+    config = config or get_config()
+
+    coalesced_tasks = [
+        coalesced_task
+        for coalesced_task in get_coalesced_sed_tasks(_get_independent_sed_tasks(doc, working_dir))
+        if len(coalesced_task.tasks) > 1
+    ]
+    if not coalesced_tasks:
+        return {}
+
+    print('{}Executing {} tasks with {} simulations ...'.format(
+        ' ' * 2 * indent, sum(len(coalesced_task.tasks) for coalesced_task in coalesced_tasks), len(coalesced_tasks)), end='')
+    sys.stdout.flush()
+
+    task_results = {}
+    for coalesced_task in coalesced_tasks:
+        task = _get_sed_task_with_model_in_working_dir(coalesced_task.task, working_dir)
+        task_result = _exec_sed_task_in_worker(task, coalesced_task.merged_variables, config, simulator, None, None)
+        task_results.update(_split_coalesced_task_result(coalesced_task, task_result))
+
+    _print_status('succeeded')
+    return task_results
+
+
+def _print_status(status):
+    """ Print the status of a step which was started by a message, in the format of :obj:`base_exec_sed_doc`
+
+    Args:
+        status (:obj:`str`): status (e.g., ``succeeded``), optionally followed by `` - `` and details
+    """
+    print(' ' + termcolor.colored(status, Colors[status.partition(' ')[0]].value))
+
+
+def _get_independent_sed_tasks(doc, working_dir):
+    """ Get the basic tasks of a SED document which don't depend on other tasks, and which can be executed before the
+    document (e.g., concurrently or together with other tasks)
+
+    Args:
+        doc (:obj:`SedDocument`): SED document
+        working_dir (:obj:`str`): working directory of the SED document (path relative to which models are located)
+
+    Returns:
+        :obj:`list` of :obj:`tuple`: each task (:obj:`Task`) and its variables (:obj:`list` of :obj:`Variable`)
+    """
+    sub_task_ids = set()
+    for task in doc.tasks:
+        if isinstance(task, RepeatedTask):
+            for sub_task in task.sub_tasks:
+                sub_task_ids.add(sub_task.task.id)
+
+    tasks = []
+    for task in doc.tasks:
+        if (
+            isinstance(task, Task)
+            and task.id not in sub_task_ids
+            and all(isinstance(change, ModelAttributeChange) for change in task.model.changes)
+            and os.path.isfile(os.path.join(working_dir, task.model.source))
+        ):
+            variables = get_variables_for_task(doc, task)
+            if variables:
+                tasks.append((task, variables))
+    return tasks
+
+
+def _get_sed_task_with_model_in_working_dir(task, working_dir):
+    """ Get a copy of a task whose model is located in the working directory of its SED document
+
+    Args:
+        task (:obj:`Task`): task
+        working_dir (:obj:`str`): working directory of the SED document of the task
+
+    Returns:
+        :obj:`Task`: task
+    """
+    task = copy.copy(task)
+    task.model = copy.copy(task.model)
+    task.model.source = os.path.join(working_dir, task.model.source)
+    return task
+
+
+def _split_coalesced_task_result(coalesced_task, task_result):
+    """ Split the result of the execution of a group of tasks among its tasks
+
+    Args:
+        coalesced_task (:obj:`CoalescedSedTask`): group of tasks
+        task_result (:obj:`tuple`): results (:obj:`VariableResults`), algorithm and details of the simulator (:obj:`tuple`),
+            exception (:obj:`Exception`), and standard output/error (:obj:`str`) of the execution of the group
+
+    Returns:
+        :obj:`dict`: dictionary that maps the id of each task of the group to a tuple of its results, the algorithm and
+            details of the simulator used to execute it, the exception which it raised, and its standard output/error
+    """
+    if len(coalesced_task.tasks) == 1:
+        return {coalesced_task.task.id: task_result}
+
+    results, log_details, exception, output = task_result
+    if exception:
+        # tasks whose group failed are executed again individually, so that their errors are attributed to them
+        return {}
+
+    task_ids = [task.id for task in coalesced_task.tasks]
+    task_results = {}
+    for i_task, (task, task_variable_results) in enumerate(zip(coalesced_task.tasks, coalesced_task.split_results(results))):
+        task_log_details = None
+        if log_details:
+            algorithm, simulator_details = log_details
+            task_log_details = (algorithm, dict(simulator_details, coalescedTasks=task_ids))
+        task_results[task.id] = (task_variable_results, task_log_details, None, output if i_task == 0 else None)
+    return task_results
+
+
+def _get_worker_resources(num_workers):
+    """ Divide the processors and memory available for simulation among worker processes
+
+    Args:
+        num_workers (:obj:`int`): number of worker processes
+
+    Returns:
+        :obj:`tuple`: number of processors (:obj:`int`) and maximum memory in bytes (:obj:`int`) for each worker
+    """
+    num_processors = max(1, (get_available_processors() - 1) // num_workers)
+    max_memory = (get_available_memory() - 100 * 1000000) // num_workers
+    return num_processors, max_memory
+
+
+def _init_worker():
+    """ Initialize a worker process of :obj:`exec_sed_doc_tasks_in_parallel` or :obj:`exec_sed_task_sweep` """
+    # the capture of standard output/error forks helper processes, which requires the `fork` start method
+    if 'fork' in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method('fork', force=True)
+
+
+def _exec_sed_task_in_worker(task, variables, config, simulator, num_processors, max_memory):
+    """ Execute a task in a worker process of :obj:`exec_sed_doc_tasks_in_parallel`, or a group of tasks for
+    :obj:`exec_sed_doc_coalesced_tasks`
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        config (:obj:`Config`): BioSimulators common configuration
+        simulator (:obj:`Simulator`): simulator
+        num_processors (:obj:`int`): number of processors to use for the simulation, or :obj:`None` for the default
+        max_memory (:obj:`int`): maximum memory to use for the simulation in bytes, or :obj:`None` for the default
+
+    Returns:
+        :obj:`tuple`: results (:obj:`VariableResults`), algorithm and details of the simulator (:obj:`tuple`), exception
+            (:obj:`Exception`), and standard output/error (:obj:`str`)
+    """
+    results = None
+    log_details = None
+    exception = None
+    with StandardOutputErrorCapturer(relay=False, disabled=not config.LOG) as captured:
+        try:
+            results, log = exec_sed_task(task, variables, log=TaskLog() if config.LOG else None, config=config, simulator=simulator,
+                                         num_processors=num_processors, max_memory=max_memory)
+            if log:
+                log_details = (log.algorithm, log.simulator_details)
+        except Exception as caught_exception:
+            exception = caught_exception
+    return results, log_details, exception, captured.get_text() if config.LOG else None
+
+
+def _exec_sed_task_with_precomputed_results(task, variables, preprocessed_task=None, log=None, config=None,
+                                            task_results=None, task_executer=None):
+    """ Get the results of a task which were precomputed by :obj:`exec_sed_doc_tasks_in_parallel`, or execute the task if
+    its results weren't precomputed
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        preprocessed_task (:obj:`dict`, optional): preprocessed information about the task
+        log (:obj:`TaskLog`, optional): log for the task
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        task_results (:obj:`dict`): precomputed results of tasks
+        task_executer (:obj:`types.FunctionType`): function for executing tasks whose results weren't precomputed
+
+    Returns:
+        :obj:`tuple`:
+
+            :obj:`VariableResults`: results of variables
+            :obj:`TaskLog`: log
+    """
+    task_result = task_results.pop(task.id, None)
+    if task_result is None:
+        return task_executer(task, variables, preprocessed_task=preprocessed_task, log=log, config=config)
+
+    results, log_details, exception, output = task_result
+    if output:
+        print(output, end='')
+    if exception:
+        raise exception
+    if log and log_details:
+        log.algorithm, log.simulator_details = log_details
+    return results, log
+
+
+def exec_sed_task(task, variables, preprocessed_task=None, log=None, config=None, simulator=Simulator.pyneuroml,
+                  num_processors=None, max_memory=None):
     ''' Execute a task and save its results
 
     Args:
@@ -114,6 +458,8 @@ def exec_sed_task(task, variables, preprocessed_task=None, log=None, config=None
         log (:obj:`TaskLog`, optional): log for the task
         config (:obj:`Config`, optional): BioSimulators common configuration
         simulator (:obj:`Simulator`, optional): simulator
+        num_processors (:obj:`int`, optional): number of processors to use (only used with NetPyNe)
+        max_memory (:obj:`int`, optional): maximum memory to use in bytes
 
     Returns:
         :obj:`tuple`:
@@ -131,46 +477,119 @@ def exec_sed_task(task, variables, preprocessed_task=None, log=None, config=None
     if config.LOG and not log:
         log = TaskLog()
 
+    # measure the durations of the phases of the execution of the task, including its preprocessing if it wasn't
+    # preprocessed by the caller (e.g., once for multiple executions)
+    timings = PhaseTimings() if config.LOG else None
     if preprocessed_task is None:
         preprocessed_task = preprocess_sed_task(task, variables, config=config, simulator=simulator)
-
-    lems_root = preprocessed_task['model']
-
-    if task.model.changes:
-        raise_errors_warnings(validation.validate_model_change_types(task.model.changes, (ModelAttributeChange,)),
-                              error_summary='Changes for model `{}` are not supported.'.format(task.model.id))
-
-        model = copy.deepcopy(task.model)
-        for change in model.changes:
-            change.new_value = str(change.new_value)
-
-        apply_changes_to_xml_model(model, lems_root, sed_doc=None, working_dir=None)
-
-    lems_simulation = preprocessed_task['simulation']
-    sim = task.simulation
-    sim.algorithm = copy.deepcopy(sim.algorithm)
-    sim.algorithm.kisao_id = preprocessed_task['algorithm_kisao_id']
-
-    set_sim_in_lems_xml(lems_simulation, task, variables, simulator=simulator)
-    lems_results = run_lems_xml(
-        lems_root,
-        working_dirname=os.path.dirname(task.model.source),
-        lems_filename=task.model.source,
-        simulator=simulator,
-        verbose=config.VERBOSE,
-        config=config,
-    )[SEDML_OUTPUT_FILE_ID]
-
-    # transform the results to an instance of :obj:`VariableResults`
-    variable_results = VariableResults()
-    for variable in variables:
-        if variable.symbol:
-            lems_result = lems_results.loc[:, SEDML_TIME_OUTPUT_COLUMN_ID]
-
-        elif variable.target:
-            lems_result = lems_results.loc[:, variable.id]
-
-        variable_results[variable.id] = lems_result.to_numpy()[-(sim.number_of_points + 1):]
+        if timings and preprocessed_task.get('timings'):
+            timings.update(preprocessed_task['timings'])
+
+    # the changes of the model are applied to the preprocessed model, and reverted once the model has been written for
+    # the simulation, so that other executions can use the model while the simulation runs. If the caller got a private
+    # copy of a model from the model cache (e.g., to modify it), the copy is executed.
+    model = preprocessed_task.get('model_state', None)
+    if model is None or ('model' in preprocessed_task and preprocessed_task['model'] is not model.root):
+        model = LemsModelState(preprocessed_task['model'], preprocessed_task['simulation'])
+
+    with record_phase_timings(timings, 'execute'), contextlib.ExitStack() as model_context:
+        model_state = model_context.enter_context(model.use())
+        lems_root = model_state.root
+
+        if task.model.changes:
+            with time_phase('applyModelChanges'):
+                raise_errors_warnings(validation.validate_model_change_types(task.model.changes, (ModelAttributeChange,)),
+                                      error_summary='Changes for model `{}` are not supported.'.format(task.model.id))
+                model_state.apply_changes(task.model.changes)
+
+        lems_simulation = model_state.simulation
+        sim = task.simulation
+        sim.algorithm = copy.deepcopy(sim.algorithm)
+        sim.algorithm.kisao_id = preprocessed_task['algorithm_kisao_id']
+
+        with time_phase('setSimulation'):
+            set_sim_in_lems_xml(lems_simulation, task, variables, simulator=simulator)
+
+        # get the results of the simulation from the cache, if available
+        result_cache = get_result_cache()
+        if result_cache:
+            with time_phase('resultCache'):
+                result_cache_key = get_task_result_cache_key(lems_root, os.path.dirname(task.model.source), task, variables, simulator,
+                                                             in_process=preprocessed_task['in_process'],
+                                                             binary_outputs=preprocessed_task['binary_outputs'])
+                variable_results = result_cache.get(result_cache_key)
+        else:
+            variable_results = None
+
+        reservation = None
+        child_process_monitor = ChildProcessMonitor(enabled=config.LOG)
+        if variable_results is None:
+            # reserve processors and memory for the simulation, waiting for concurrent simulations if necessary
+            resource_scheduler = get_resource_scheduler()
+            if resource_scheduler:
+                estimated_processors, estimated_memory = resource_scheduler.estimate(
+                    simulator, task.model.source, lems_xml_root=lems_root, working_dirname=os.path.dirname(task.model.source))
+                # memory is only enforced if it was requested or estimated from previous simulations of the model, rather
+                # than estimated from the simulator
+                limit_memory = bool(max_memory or resource_scheduler.get_measured_memory(simulator, task.model.source))
+                reservation_context = resource_scheduler.reserve(num_processors or estimated_processors,
+                                                                 max_memory or estimated_memory,
+                                                                 limit_memory=limit_memory)
+            else:
+                reservation_context = contextlib.nullcontext()
+
+            with reservation_context as reservation:
+                if reservation:
+                    num_processors = reservation.processors
+                    max_memory = reservation.get_jvm_max_memory()
+                    child_process_monitor = ChildProcessMonitor(enabled=config.LOG or reservation.memory_limit is not None,
+                                                                max_memory=reservation.memory_limit)
+
+                # measure the resources used by the child processes which execute the simulation
+                try:
+                    with child_process_monitor:
+                        lems_results = run_lems_xml(
+                            lems_root,
+                            working_dirname=os.path.dirname(task.model.source),
+                            lems_filename=task.model.source,
+                            simulator=simulator,
+                            num_processors=num_processors,
+                            max_memory=max_memory,
+                            verbose=config.VERBOSE,
+                            in_process=preprocessed_task['in_process'],
+                            binary_outputs=preprocessed_task['binary_outputs'],
+                            num_output_rows=sim.number_of_points + 1,
+                            config=config,
+                            model_written=model_context.close,
+                        )[SEDML_OUTPUT_FILE_ID]
+                except Exception as exception:
+                    if child_process_monitor.memory_exceeded:
+                        raise MemoryError('The simulation was terminated because it exceeded its memory limit of {} bytes.'.format(
+                            child_process_monitor.max_memory)) from exception
+                    raise
+
+            if resource_scheduler and child_process_monitor.usage:
+                resource_scheduler.record(simulator, task.model.source, child_process_monitor.usage['peakMemory'])
+
+            # transform the results to an instance of :obj:`VariableResults`
+            with time_phase('transformResults'):
+                variable_results = VariableResults()
+                for variable in variables:
+                    if variable.symbol:
+                        lems_result = lems_results.loc[:, SEDML_TIME_OUTPUT_COLUMN_ID]
+
+                    elif variable.target:
+                        lems_result = lems_results.loc[:, variable.id]
+
+                    variable_results[variable.id] = lems_result.to_numpy()[-(sim.number_of_points + 1):]
+
+            if result_cache:
+                with time_phase('resultCache'):
+                    result_cache.set(result_cache_key, variable_results)
+            result_cache_status = 'miss'
+
+        else:
+            result_cache_status = 'hit'
 
     # log action
     if config.LOG:
@@ -183,11 +602,173 @@ def exec_sed_task(task, variables, preprocessed_task=None, log=None, config=None
                 'method': preprocessed_task['algorithm_method'],
             },
         }
+        if result_cache:
+            log.simulator_details['resultCache'] = result_cache_status
+        log.simulator_details['timings'] = timings.to_dict()
+        if child_process_monitor.usage:
+            log.simulator_details['childProcesses'] = child_process_monitor.usage
+        if reservation:
+            log.simulator_details['resources'] = reservation.to_dict()
 
     # return results and log
     return variable_results, log
 
 
+def exec_sed_task_sweep(task, variables, change_sets, config=None, simulator=Simulator.pyneuroml, num_workers=None):
+    """ Execute variants of a task which differ in the values of attributes of its model (e.g., a parameter sweep)
+
+    The task is preprocessed (validated, and its model read and validated) once, rather than once per variant, and the
+    changes of each variant are applied to the preprocessed model in place, and then reverted (see
+    :obj:`LemsModelState`). Variants can be executed concurrently by a pool of processes, each of which preprocesses the
+    task once, and then executes variants until all have been executed. This enables the workers to reuse the simulators
+    that they initialize (e.g., JVMs and NEURON for in-process simulation).
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        change_sets (:obj:`list` of :obj:`list` of :obj:`ModelAttributeChange`): changes to the model of each variant,
+            in addition to the changes of the model of the task
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        simulator (:obj:`Simulator`, optional): simulator
+        num_workers (:obj:`int`, optional): number of processes to use to execute the variants concurrently. The
+            processors and memory available for simulation are divided among the processes. Default: value of the
+            ``TASK_WORKERS`` environment variable, or 1.
+
+    Returns:
+        :obj:`tuple`:
+
+            :obj:`VariableResults`: results of variables, with one row for each variant
+            :obj:`list` of :obj:`TaskLog`: log of each variant
+
+    Raises:
+        :obj:`Exception`: the exception raised by the first variant which failed
+    """
+    config = config or get_config()
+
+    if num_workers is None:
+        num_workers = get_num_task_workers()
+    num_workers = max(1, min(num_workers, len(change_sets)))
+
+    variant_results = []
+    variant_logs = []
+    if num_workers == 1:
+        preprocessed_task = preprocess_sed_task(task, variables, config=config, simulator=simulator)
+        for changes in change_sets:
+            results, log = _exec_sed_task_variant(task, variables, changes, preprocessed_task,
+                                                  log=TaskLog() if config.LOG else None, config=config, simulator=simulator)
+            variant_results.append(results)
+            variant_logs.append(log)
+
+    else:
+        num_processors, max_memory = _get_worker_resources(num_workers)
+
+        # workers are spawned, rather than forked, so that they don't inherit simulators (e.g., JVMs) which were
+        # initialized by this process
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn'),
+                                                    initializer=_init_sweep_worker,
+                                                    initargs=(task, variables, config, simulator)) as pool:
+            futures = [
+                pool.submit(_exec_sed_task_variant_in_worker, changes, num_processors, max_memory)
+                for changes in change_sets
+            ]
+            variant_outputs = [future.result() for future in futures]
+
+        for results, log_details, exception, output in variant_outputs:
+            if output:
+                print(output, end='')
+            if exception:
+                raise exception
+            log = None
+            if log_details:
+                log = TaskLog()
+                log.algorithm, log.simulator_details = log_details
+            variant_results.append(results)
+            variant_logs.append(log)
+
+    # stack the results of the variants
+    results = VariableResults()
+    for variable in variables:
+        results[variable.id] = numpy.stack([variant_result[variable.id] for variant_result in variant_results])
+
+    return results, variant_logs
+
+
+def _exec_sed_task_variant(task, variables, changes, preprocessed_task, log=None, config=None, simulator=Simulator.pyneuroml,
+                           num_processors=None, max_memory=None):
+    """ Execute a variant of a preprocessed task with additional changes to its model
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        changes (:obj:`list` of :obj:`ModelAttributeChange`): additional changes to the model of the task
+        preprocessed_task (:obj:`dict`): preprocessed information about the task, whose model is restored after the
+            variant is executed
+        log (:obj:`TaskLog`, optional): log for the variant
+        config (:obj:`Config`, optional): BioSimulators common configuration
+        simulator (:obj:`Simulator`, optional): simulator
+        num_processors (:obj:`int`, optional): number of processors to use (only used with NetPyNe)
+        max_memory (:obj:`int`, optional): maximum memory to use in bytes
+
+    Returns:
+        :obj:`tuple`:
+
+            :obj:`VariableResults`: results of variables
+            :obj:`TaskLog`: log
+    """
+    variant_task = copy.copy(task)
+    variant_task.model = copy.copy(task.model)
+    variant_task.model.changes = list(task.model.changes) + list(changes)
+
+    return exec_sed_task(variant_task, variables, preprocessed_task=preprocessed_task, log=log, config=config,
+                         simulator=simulator, num_processors=num_processors, max_memory=max_memory)
+
+
+def _init_sweep_worker(task, variables, config, simulator):
+    """ Initialize a worker process of :obj:`exec_sed_task_sweep` by preprocessing its task
+
+    Args:
+        task (:obj:`Task`): task
+        variables (:obj:`list` of :obj:`Variable`): variables that should be recorded
+        config (:obj:`Config`): BioSimulators common configuration
+        simulator (:obj:`Simulator`): simulator
+    """
+    _init_worker()
+    _sweep_worker['task'] = task
+    _sweep_worker['variables'] = variables
+    _sweep_worker['config'] = config
+    _sweep_worker['simulator'] = simulator
+    _sweep_worker['preprocessed_task'] = preprocess_sed_task(task, variables, config=config, simulator=simulator)
+
+
+def _exec_sed_task_variant_in_worker(changes, num_processors, max_memory):
+    """ Execute a variant of the task of :obj:`exec_sed_task_sweep` in a worker process
+
+    Args:
+        changes (:obj:`list` of :obj:`ModelAttributeChange`): additional changes to the model of the task
+        num_processors (:obj:`int`): number of processors to use for the simulation, or :obj:`None` for the default
+        max_memory (:obj:`int`): maximum memory to use for the simulation in bytes, or :obj:`None` for the default
+
+    Returns:
+        :obj:`tuple`: results (:obj:`VariableResults`), algorithm and details of the simulator (:obj:`tuple`), exception
+            (:obj:`Exception`), and standard output/error (:obj:`str`)
+    """
+    config = _sweep_worker['config']
+    results = None
+    log_details = None
+    exception = None
+    with StandardOutputErrorCapturer(relay=False, disabled=not config.LOG) as captured:
+        try:
+            results, log = _exec_sed_task_variant(_sweep_worker['task'], _sweep_worker['variables'], changes,
+                                                  _sweep_worker['preprocessed_task'], log=TaskLog() if config.LOG else None,
+                                                  config=config, simulator=_sweep_worker['simulator'],
+                                                  num_processors=num_processors, max_memory=max_memory)
+            if log:
+                log_details = (log.algorithm, log.simulator_details)
+        except Exception as caught_exception:
+            exception = caught_exception
+    return results, log_details, exception, captured.get_text() if config.LOG else None
+
+
 def preprocess_sed_task(task, variables, config=None, simulator=Simulator.pyneuroml):
     """ Preprocess a SED task, including its possible model changes and variables. This is useful for avoiding
     repeatedly initializing tasks on repeated calls of :obj:`exec_sed_task`.
@@ -199,22 +780,87 @@ def preprocess_sed_task(task, variables, config=None, simulator=Simulator.pyneur
         simulator (:obj:`Simulator`, optional): simulator
 
     Returns:
-        :obj:`dict`: preprocessed information about the task
+        :obj:`dict`: preprocessed information about the task. Its ``model`` and ``simulation`` are private to the
+            task, and can be modified by the caller. If the model was read from the model cache, they are copied from the
+            cache when they are first used.
     """
     config = config or get_config()
 
-    algorithm_kisao_id = validate_task(task, variables, simulator, config=config)
+    timings = PhaseTimings() if config.LOG else None
+    with record_phase_timings(timings, 'preprocess'):
+        with time_phase('validateTask'):
+            algorithm_kisao_id = validate_task(task, variables, simulator, config=config)
+
+        # read the model from the model cache, which shares it among the tasks which use it, or from its file
+        model_cache = get_model_cache()
+        if model_cache:
+            with time_phase('readModel'):
+                model = model_cache.get(task.model.source)
+
+        else:
+            with time_phase('readModel'):
+                lems_root = read_xml_file(task.model.source)
+
+            with time_phase('validateModel'):
+                validate_lems_document(lems_root)
+
+            model = LemsModelState(lems_root)
+
+        # check the targets of the variables before the model is simulated
+        if config.VALIDATE_SEDML:
+            with time_phase('validateTargets'):
+                target_index = get_lems_target_index(model, os.path.dirname(task.model.source), task.model.changes,
+                                                     model_filename=task.model.source)
+                validate_variable_targets(target_index, task.model.id, variables)
+
+        in_process = is_in_process_simulation_enabled()
+        binary_outputs = is_binary_output_enabled()
+        run_lems_method = get_simulator_run_lems_method(simulator, in_process=in_process, binary_outputs=binary_outputs,
+                                                        num_processors=max(1, get_available_processors() - 1))
+        if run_lems_method.__module__.startswith('biosimulators_pyneuroml.'):
+            simulation_method = run_lems_method.__module__ + '.' + run_lems_method.__name__
+        else:
+            simulation_method = 'pyneuroml.pynml.' + run_lems_method.__name__
+
+    # return preprocessed information. Models from the model cache are shared with other tasks, so callers get private
+    # copies of them.
+    preprocessed_task = _PreprocessedSedTask({
+        'model_state': model,
+        'algorithm_kisao_id': algorithm_kisao_id,
+        'in_process': in_process,
+        'binary_outputs': binary_outputs,
+        'simulation_method': simulation_method,
+        'algorithm_method': KISAO_ALGORITHM_MAP[algorithm_kisao_id]['id'],
+        'timings': timings,
+    })
+    if not model_cache:
+        preprocessed_task['model'] = model.root
+        preprocessed_task['simulation'] = model.simulation
+    return preprocessed_task
 
-    lems_root = read_xml_file(task.model.source)
-    lems_simulation = lems_root.xpath('/Lems/Simulation')[0]
 
-    validate_lems_document(lems_root)
+class _PreprocessedSedTask(dict):
+    """ Preprocessed information about a task, whose model (``model`` and ``simulation``) is a private copy of its model
+    from the model cache, which is only made if it is used
+    """
 
-    # return preprocessed information
-    return {
-        'model': lems_root,
-        'simulation': lems_simulation,
-        'algorithm_kisao_id': algorithm_kisao_id,
-        'simulation_method': 'pyneuroml.pynml.' + get_simulator_run_lems_method(simulator).__name__,
-        'algorithm_method': KISAO_ALGORITHM_MAP[algorithm_kisao_id]['id'],
-    }
+    def __missing__(self, key):
+        """ Copy the model of the task from the model cache
+
+        Args:
+            key (:obj:`str`): key
+
+        Returns:
+            :obj:`lxml.etree._Element`: LEMS document (``model``) or its simulation (``simulation``)
+
+        Raises:
+            :obj:`KeyError`: if the key isn't ``model`` or ``simulation``
+        """
+        if key not in ['model', 'simulation']:
+            raise KeyError(key)
+
+        with self['model_state'].use() as view:
+            model = LemsModelState(copy.deepcopy(view.root))
+        self['model'] = model.root
+        self['simulation'] = model.simulation
+        return self[key]
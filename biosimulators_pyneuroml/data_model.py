@@ -102,6 +102,9 @@ class RunLemsOptions(object):
         only_generate_scripts (:obj:`bool`)
         compile_mods (:obj:`bool`)
         realtime_output (:obj:`bool`)
+        in_process (:obj:`bool`): whether to execute simulations in the current process, rather than in child processes
+        binary_outputs (:obj:`bool`): whether to save the outputs of simulations as binary files, rather than as text
+            (only used with NEURON, NetPyNE, and Brian 2)
     """
 
     def __init__(self,
@@ -121,6 +124,8 @@ class RunLemsOptions(object):
                  only_generate_scripts=False,
                  compile_mods=True,
                  realtime_output=False,
+                 in_process=False,
+                 binary_outputs=False,
                  ):
         """
         Args:
@@ -140,6 +145,10 @@ class RunLemsOptions(object):
             only_generate_scripts (:obj:`bool`, optional)
             compile_mods (:obj:`bool`, optional)
             realtime_output (:obj:`bool`, optional)
+            in_process (:obj:`bool`, optional): whether to execute simulations in the current process, rather than in
+                child processes
+            binary_outputs (:obj:`bool`, optional): whether to save the outputs of simulations as binary files, rather
+                than as text (only used with NEURON, NetPyNE, and Brian 2)
         """
         self.paths_to_include = paths_to_include or []
         self.num_processors = num_processors
@@ -157,6 +166,8 @@ class RunLemsOptions(object):
         self.only_generate_scripts = only_generate_scripts
         self.compile_mods = compile_mods
         self.realtime_output = realtime_output
+        self.in_process = in_process
+        self.binary_outputs = binary_outputs
 
     def to_kw_args(self, simulator):
         """ Format options as keyword arguments for a LEMS run method
@@ -190,6 +201,9 @@ class RunLemsOptions(object):
             options['compile_mods'] = self.compile_mods
             options['realtime_output'] = self.realtime_output
 
+        if self.binary_outputs and simulator in [Simulator.neuron, Simulator.netpyne, Simulator.brian2]:
+            options['binary_outputs'] = True
+
         return options
 
 
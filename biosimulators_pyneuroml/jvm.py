@@ -0,0 +1,358 @@
+""" Utilities for executing LEMS documents with jLEMS in a persistent, in-process Java virtual machine
+
+jNeuroML normally runs each simulation in a new ``java`` process. For small models, starting the JVM and loading
+jNeuroML's classes can take longer than the simulation itself. The methods in this module instead start a single JVM
+inside the Python process (via `JPype <https://jpype.readthedocs.io>`_) the first time that they are used and reuse it
+for all subsequent simulations executed by the process. Because a JVM cannot be restarted within a process, the JVM's
+options (e.g., its maximum heap size) are determined by the first simulation.
+
+Alternatively, the startup of the ``java`` processes of jNeuroML can be reduced with class-data sharing (CDS). When the
+``JVM_CDS_DIR`` environment variable is set, the first execution of jNeuroML for each simulator records the classes
+that it loads, and then an archive of these classes is generated in this directory. Subsequent executions of jNeuroML
+map the archive, rather than loading and verifying the classes from the jNeuroML jar. Archives are specific to the
+version of jNeuroML and of Java. Because the JVMs of some Java runtimes don't include the default CDS archive which is
+required for dynamic archives (``-XX:ArchiveClassesAtExit``), static archives are generated. Because pyNeuroML doesn't
+accept options for the JVMs of jNeuroML other than their maximum heap size, executions of jNeuroML which use archives
+are started by :obj:`run_jneuroml`, which passes the options for the archives to the ``java`` command of each execution.
+"""
+
+from .timing import time_phase
+import contextlib
+import functools
+import hashlib
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+
+__all__ = [
+    'is_in_process_simulation_enabled',
+    'start_jvm',
+    'is_jvm_started',
+    'run_lems_with_jneuroml_in_jvm',
+    'get_jvm_cds_dirname',
+    'use_jvm_cds_archive',
+    'run_jneuroml',
+    'run_lems_with_jneuroml',
+]
+
+# earliest version of Java which can generate archives of the classes of applications
+JVM_CDS_MIN_JAVA_VERSION = 11
+
+_jvm_lock = threading.RLock()
+_jlems_classes = {}
+_failed_jvm_cds_archive_filenames = set()
+
+
+def is_in_process_simulation_enabled():
+    """ Determine whether simulations should be executed in the process of the caller rather than in child processes,
+    as configured by the ``SIMULATE_IN_PROCESS`` environment variable
+
+    Returns:
+        :obj:`bool`: whether simulations should be executed in the process of the caller
+    """
+    return os.getenv('SIMULATE_IN_PROCESS', '0').lower() in ['1', 'true']
+
+
+def is_jvm_started():
+    """ Determine whether the JVM has been started in this process
+
+    Returns:
+        :obj:`bool`: whether the JVM has been started
+    """
+    try:
+        import jpype
+    except ModuleNotFoundError:
+        return False
+    return jpype.isJVMStarted()
+
+
+def start_jvm(max_memory=None):
+    """ Start a JVM with jNeuroML on its class path, if a JVM hasn't already been started in this process
+
+    Args:
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM (e.g., ``1000M``). This is only used
+            the first time this method is called within a process.
+    """
+    with _jvm_lock:
+        if _jlems_classes:
+            return
+
+        try:
+            import jpype
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError('JPype must be installed to execute simulations in-process. '
+                                      'Please run `pip install biosimulators-pyneuroml[jvm]`.')
+        from pyneuroml import pynml
+
+        with time_phase('startJvm'):
+            if not jpype.isJVMStarted():
+                jvm_args = ['-Djava.awt.headless=true']
+                if max_memory:
+                    jvm_args.append('-Xmx' + max_memory)
+                jpype.startJVM(*jvm_args, classpath=[pynml.get_path_to_jnml_jar()], convertStrings=False)
+
+            _jlems_classes['File'] = jpype.JClass('java.io.File')
+            _jlems_classes['Utils'] = jpype.JClass('org.neuroml.export.utils.Utils')
+            jpype.JClass('org.lemsml.jlems.io.out.FileResultWriterFactory').initialize()
+
+
+def run_lems_with_jneuroml_in_jvm(lems_file_name, paths_to_include=None, max_memory=None, skip_run=False,
+                                  exec_in_dir='.', verbose=False, exit_on_fail=False, **kwargs):
+    """ Execute a LEMS document with jLEMS in the persistent JVM of this process
+
+    This method mirrors the signature of :obj:`pyneuroml.pynml.run_lems_with_jneuroml` so that it can be used
+    interchangeably with it. Because the current directory of the JVM cannot be changed, relative paths to
+    output files are resolved relative to the current directory of the Python process, rather than
+    :obj:`exec_in_dir`. Consequently, the paths to output files should be absolute. Because jLEMS can't search
+    additional directories for included files, documents with additional include paths are executed in a new ``java``
+    process with :obj:`pyneuroml.pynml.run_lems_with_jneuroml`.
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM (e.g., ``1000M``); only used to start the JVM
+        skip_run (:obj:`bool`, optional): if :obj:`True`, only read and build the model
+        exec_in_dir (:obj:`str`, optional): directory relative to which :obj:`lems_file_name` is resolved
+        verbose (:obj:`bool`, optional): whether to display extra information about the simulation
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the simulation fails
+        **kwargs: additional options for :obj:`pyneuroml.pynml.run_lems_with_jneuroml` which don't apply to
+            in-process execution (e.g., ``nogui``, ``plot``)
+
+    Returns:
+        :obj:`bool`: whether the simulation succeeded
+    """
+    if paths_to_include:
+        from pyneuroml import pynml
+        if max_memory:
+            kwargs['max_memory'] = max_memory
+        return pynml.run_lems_with_jneuroml(lems_file_name, paths_to_include=paths_to_include, skip_run=skip_run,
+                                            exec_in_dir=exec_in_dir, verbose=verbose, exit_on_fail=exit_on_fail, **kwargs)
+
+    start_jvm(max_memory=max_memory)
+
+    lems_file_name = os.path.abspath(os.path.join(exec_in_dir, lems_file_name))
+    if verbose:
+        print('Running {} with jLEMS in the JVM of process {}'.format(lems_file_name, os.getpid()))
+
+    # jLEMS keeps global state (e.g., the factory for result writers); therefore, simulations are serialized
+    with _jvm_lock:
+        try:
+            sim = _jlems_classes['Utils'].readLemsNeuroMLFile(_jlems_classes['File'](lems_file_name))
+            sim.build()
+            if not skip_run:
+                sim.run()
+        except Exception as exception:
+            print('jLEMS was not able to execute {}: {}'.format(lems_file_name, str(exception)), file=sys.stderr)
+            if exit_on_fail:
+                sys.exit(-1)
+            return False
+
+    return True
+
+
+def get_jvm_cds_dirname():
+    """ Get the directory for class-data sharing archives of jNeuroML, as configured by the ``JVM_CDS_DIR`` environment
+    variable
+
+    Returns:
+        :obj:`str`: directory, or :obj:`None` if class-data sharing archives shouldn't be used
+    """
+    return os.getenv('JVM_CDS_DIR', None) or None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_java_version():
+    """ Get the version of the ``java`` program which executes jNeuroML
+
+    Returns:
+        :obj:`str`: version (e.g., ``17.0.2``), or :obj:`None` if Java isn't installed
+    """
+    try:
+        process = subprocess.run(['java', '-version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+    except FileNotFoundError:
+        return None
+    match = re.search(r'version "([^"]+)"', process.stdout.decode(errors='replace'))
+    return match.group(1) if match else None
+
+
+def _get_java_major_version(version):
+    """ Get the major version of Java (e.g., ``8`` for ``1.8.0_292``, ``17`` for ``17.0.2``)
+
+    Args:
+        version (:obj:`str`): version
+
+    Returns:
+        :obj:`int`: major version
+    """
+    parts = re.split(r'[._+-]', version)
+    if parts[0] == '1' and len(parts) > 1:
+        return int(parts[1])
+    return int(parts[0])
+
+
+def _get_jvm_cds_archive_filename(dirname, name):
+    """ Get the path to the class-data sharing archive for an execution of jNeuroML
+
+    Args:
+        dirname (:obj:`str`): directory for archives
+        name (:obj:`str`): name of the type of execution (e.g., the simulator for which jNeuroML is executed)
+
+    Returns:
+        :obj:`str`: path to the archive, or :obj:`None` if the version of Java can't generate archives
+    """
+    from pyneuroml import pynml
+
+    java_version = _get_java_version()
+    if not java_version or _get_java_major_version(java_version) < JVM_CDS_MIN_JAVA_VERSION:
+        return None
+
+    jar_filename = os.path.realpath(pynml.get_path_to_jnml_jar())
+    jar_stat = os.stat(jar_filename)
+    key = hashlib.sha256('\n'.join([
+        java_version, jar_filename, str(jar_stat.st_size), str(jar_stat.st_mtime_ns),
+    ]).encode()).hexdigest()[0:16]
+    return os.path.join(dirname, '{}-{}.jsa'.format(name, key))
+
+
+@contextlib.contextmanager
+def use_jvm_cds_archive(name):
+    """ Get options for the JVMs of the executions of jNeuroML within a context which use the class-data sharing
+    archive for a type of execution of jNeuroML, or which record the classes that they load if the archive doesn't
+    exist. In the latter case, the archive is generated once the context exits.
+
+    Args:
+        name (:obj:`str`): name of the type of execution (e.g., the simulator for which jNeuroML is executed)
+
+    Yields:
+        :obj:`list` of :obj:`str`: options for the JVM
+    """
+    dirname = get_jvm_cds_dirname()
+    archive_filename = _get_jvm_cds_archive_filename(dirname, name) if dirname else None
+    if not archive_filename or archive_filename in _failed_jvm_cds_archive_filenames:
+        yield []
+        return
+
+    if os.path.isfile(archive_filename):
+        yield ['-XX:SharedArchiveFile=' + archive_filename]
+        return
+
+    os.makedirs(dirname, exist_ok=True)
+    file, class_list_filename = tempfile.mkstemp(dir=dirname, prefix='.' + name + '-', suffix='.classlist')
+    os.close(file)
+    try:
+        yield ['-XX:DumpLoadedClassList=' + class_list_filename]
+
+        if os.path.getsize(class_list_filename):
+            with time_phase('generateJvmArchive'):
+                if not _generate_jvm_cds_archive(class_list_filename, archive_filename):
+                    # don't repeatedly try to generate archives with Java runtimes which can't generate them
+                    _failed_jvm_cds_archive_filenames.add(archive_filename)
+    finally:
+        os.remove(class_list_filename)
+
+
+def _generate_jvm_cds_archive(class_list_filename, archive_filename):
+    """ Generate a class-data sharing archive for jNeuroML
+
+    Args:
+        class_list_filename (:obj:`str`): path to a list of the classes to archive
+        archive_filename (:obj:`str`): path to save the archive
+
+    Returns:
+        :obj:`bool`: whether the archive was generated
+    """
+    from pyneuroml import pynml
+
+    # generate the archive in a temporary file so that concurrent executions of jNeuroML never map partial archives
+    file, temp_archive_filename = tempfile.mkstemp(dir=os.path.dirname(archive_filename), suffix='.jsa')
+    os.close(file)
+    try:
+        process = subprocess.run(['java', '-Xshare:dump',
+                                  '-XX:SharedClassListFile=' + class_list_filename,
+                                  '-XX:SharedArchiveFile=' + temp_archive_filename,
+                                  '-cp', pynml.get_path_to_jnml_jar()],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        if process.returncode != 0 or not os.path.getsize(temp_archive_filename):
+            return False
+        os.replace(temp_archive_filename, archive_filename)
+        return True
+    finally:
+        if os.path.isfile(temp_archive_filename):
+            os.remove(temp_archive_filename)
+
+
+def run_jneuroml(pre_args, target_file, post_args, max_memory=None, exec_in_dir='.', verbose=False, exit_on_fail=False,
+                 cds_name=None):
+    """ Execute jNeuroML in a new ``java`` process
+
+    This method mirrors :obj:`pyneuroml.pynml.run_jneuroml`, and additionally uses the class-data sharing archive for
+    a type of execution of jNeuroML (see :obj:`use_jvm_cds_archive`), if archives are enabled.
+
+    Args:
+        pre_args (:obj:`str`): arguments for jNeuroML before the path to the target file
+        target_file (:obj:`str`): path to the target file (e.g., LEMS document), relative to :obj:`exec_in_dir`
+        post_args (:obj:`str`): arguments for jNeuroML after the path to the target file (e.g., `` -neuron``)
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM (e.g., ``1000M``)
+        exec_in_dir (:obj:`str`, optional): directory in which jNeuroML should be executed
+        verbose (:obj:`bool`, optional): whether to display extra information
+        exit_on_fail (:obj:`bool`, optional): whether to exit if jNeuroML fails
+        cds_name (:obj:`str`, optional): name of the type of execution (e.g., the simulator for which jNeuroML is
+            executed) whose class-data sharing archive should be used
+
+    Returns:
+        :obj:`bool`: whether jNeuroML succeeded
+    """
+    from pyneuroml import pynml
+
+    jvm_cds_archive = use_jvm_cds_archive(cds_name) if cds_name else contextlib.nullcontext([])
+    with jvm_cds_archive as jvm_options:
+        args = ['java', '-Xmx' + (max_memory or pynml.DEFAULTS['default_java_max_memory'])]
+        args += [shlex.quote(option) for option in jvm_options]
+        if post_args and 'nogui' in post_args and os.name != 'nt':
+            args.append('-Djava.awt.headless=true')
+        args += ['-jar', '"{}"'.format(pynml.get_path_to_jnml_jar()), pre_args, target_file, post_args]
+        command = ' '.join(arg.strip() for arg in args if arg.strip())
+        return_code, _ = pynml.execute_command_in_dir(command, exec_in_dir, verbose=verbose, prefix=' jNeuroML >>  ')
+
+    if return_code != 0:
+        if exit_on_fail:
+            sys.exit(return_code)
+        return False
+    return True
+
+
+def run_lems_with_jneuroml(lems_file_name, paths_to_include=None, max_memory=None, skip_run=False, nogui=True,
+                           exec_in_dir='.', verbose=False, exit_on_fail=False, **kwargs):
+    """ Execute a LEMS document with jLEMS in a new ``java`` process which uses the class-data sharing archive for
+    jLEMS (see :obj:`use_jvm_cds_archive`)
+
+    This method mirrors the signature of :obj:`pyneuroml.pynml.run_lems_with_jneuroml` so that it can be used
+    interchangeably with it.
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM (e.g., ``1000M``)
+        skip_run (:obj:`bool`, optional): if :obj:`True`, don't execute the document
+        nogui (:obj:`bool`, optional): whether to suppress the display of the results of the simulation
+        exec_in_dir (:obj:`str`, optional): directory in which jNeuroML should be executed
+        verbose (:obj:`bool`, optional): whether to display extra information about the simulation
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the simulation fails
+        **kwargs: additional options for :obj:`pyneuroml.pynml.run_lems_with_jneuroml` which don't apply (e.g.,
+            ``plot``)
+
+    Returns:
+        :obj:`bool`: whether the simulation succeeded
+    """
+    if skip_run:
+        return True
+
+    post_args = ' -nogui' if nogui else ''
+    if paths_to_include:
+        post_args += " -I '{}'".format(':'.join(paths_to_include))
+    return run_jneuroml('', lems_file_name, post_args, max_memory=max_memory, exec_in_dir=exec_in_dir, verbose=verbose,
+                        exit_on_fail=exit_on_fail, cds_name='pyneuroml')
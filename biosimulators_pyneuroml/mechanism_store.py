@@ -0,0 +1,189 @@
+""" Shared, content-addressed store of compiled NEURON mechanisms
+
+NEURON and NetPyNE simulations require the mechanisms (``.mod`` files) of their models to be compiled with
+``nrnivmodl``. Many models share identical mechanisms (e.g., the ion channels generated from the same NeuroML files).
+This store keeps the output of ``nrnivmodl`` for each set of mechanisms, keyed by a hash of their sources, the version
+of NEURON, and the compiler flags. Rather than compiling mechanisms again, simulations link to the compiled mechanisms
+in the store. Multiple processes can safely use the same store concurrently; file locks ensure that each set of
+mechanisms is only compiled once.
+
+The store is enabled by setting the ``MECHANISM_STORE_DIR`` environment variable to the directory where compiled
+mechanisms should be stored.
+"""
+
+import fcntl
+import os
+import platform
+import shutil
+import tempfile
+import threading
+
+__all__ = [
+    'MECHANISM_SOURCE_EXTENSIONS',
+    'COMPILER_ENVIRONMENT_VARIABLES',
+    'MechanismStore',
+    'get_mechanism_store',
+    'get_mechanism_store_key',
+]
+
+# extensions of the files which are compiled by ``nrnivmodl``
+MECHANISM_SOURCE_EXTENSIONS = ('.mod', '.inc')
+
+# environment variables which control how ``nrnivmodl`` compiles mechanisms
+COMPILER_ENVIRONMENT_VARIABLES = ('CC', 'CXX', 'CFLAGS', 'CXXFLAGS', 'CPPFLAGS', 'LDFLAGS')
+
+_mechanism_stores = {}
+
+
+class MechanismStore(object):
+    """ Shared, content-addressed store of compiled NEURON mechanisms
+
+    Each entry is stored as a directory whose name is the key of the entry, and which contains the output of
+    ``nrnivmodl`` (e.g., ``x86_64/``). Entries are compiled in temporary directories and then renamed, so that entries
+    are never observed in an incomplete state.
+
+    Attributes:
+        dirname (:obj:`str`): directory where the entries of the store are kept
+        hits (:obj:`int`): number of lookups which found an entry
+        misses (:obj:`int`): number of lookups which didn't find an entry
+    """
+
+    LOCK_EXTENSION = '.lock'
+
+    def __init__(self, dirname):
+        """
+        Args:
+            dirname (:obj:`str`): directory where the entries of the store are kept
+        """
+        self.dirname = dirname
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname, exist_ok=True)
+
+    def get(self, key, dirname):
+        """ Link the compiled mechanisms for a key into a directory
+
+        Args:
+            key (:obj:`str`): key
+            dirname (:obj:`str`): directory into which the compiled mechanisms should be linked (e.g., a directory which
+                contains a script generated by jNeuroML)
+
+        Returns:
+            :obj:`bool`: whether the store contains the key
+        """
+        entry_dirname = self._get_dirname(key)
+        try:
+            names = os.listdir(entry_dirname)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        for name in names:
+            if os.path.isdir(os.path.join(entry_dirname, name)):
+                link_name = os.path.join(dirname, name)
+                if os.path.islink(link_name) or os.path.isfile(link_name):
+                    os.remove(link_name)
+                elif os.path.isdir(link_name):
+                    shutil.rmtree(link_name)
+                os.symlink(os.path.join(entry_dirname, name), link_name)
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def add(self, key, filenames, compile):
+        """ Compile mechanisms and store them for a key, unless the store already contains the key
+
+        Args:
+            key (:obj:`str`): key
+            filenames (:obj:`list` of :obj:`str`): paths to the sources of the mechanisms
+            compile (:obj:`types.FunctionType`): function which compiles the mechanisms in the directory passed to it,
+                and returns whether the mechanisms were compiled
+
+        Returns:
+            :obj:`bool`: whether the store contains the key
+        """
+        entry_dirname = self._get_dirname(key)
+        with open(entry_dirname + self.LOCK_EXTENSION, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.isdir(entry_dirname):
+                    return True
+
+                temp_dirname = tempfile.mkdtemp(dir=self.dirname, suffix='.tmp')
+                try:
+                    for filename in filenames:
+                        shutil.copyfile(filename, os.path.join(temp_dirname, os.path.basename(filename)))
+                    if not compile(temp_dirname):
+                        return False
+                    os.rename(temp_dirname, entry_dirname)
+                finally:
+                    shutil.rmtree(temp_dirname, ignore_errors=True)
+                return True
+
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def clear(self):
+        """ Remove all entries from the store """
+        for entry in os.scandir(self.dirname):
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name.endswith(self.LOCK_EXTENSION):
+                os.remove(entry.path)
+
+    def get_stats(self):
+        """ Get statistics about the use of the store by this process
+
+        Returns:
+            :obj:`dict`: number of hits and misses
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _get_dirname(self, key):
+        return os.path.join(self.dirname, key)
+
+
+def get_mechanism_store():
+    """ Get the mechanism store configured by the ``MECHANISM_STORE_DIR`` environment variable
+
+    Returns:
+        :obj:`MechanismStore`: store, or :obj:`None` if the store is not enabled
+    """
+    dirname = os.getenv('MECHANISM_STORE_DIR', None)
+    if not dirname:
+        return None
+
+    dirname = os.path.abspath(dirname)
+    if dirname not in _mechanism_stores:
+        _mechanism_stores[dirname] = MechanismStore(dirname)
+    return _mechanism_stores[dirname]
+
+
+def get_mechanism_store_key(filenames, neuron_version):
+    """ Get a key which identifies the compilation of a set of mechanisms
+
+    The key is a hash of the names and contents of the sources of the mechanisms, the version of NEURON, the
+    architecture of the machine, the compiler flags (:obj:`COMPILER_ENVIRONMENT_VARIABLES`), and the version of this
+    package (see :obj:`biosimulators_pyneuroml.utils.get_cache_key`).
+
+    Args:
+        filenames (:obj:`list` of :obj:`str`): paths to the sources of the mechanisms
+        neuron_version (:obj:`str`): version of NEURON
+
+    Returns:
+        :obj:`str`: key
+    """
+    from .utils import get_cache_key
+
+    return get_cache_key({
+        'neuronVersion': neuron_version,
+        'machine': platform.machine(),
+        'environment': {name: os.getenv(name, '') for name in COMPILER_ENVIRONMENT_VARIABLES},
+    }, filenames=sorted(filenames, key=os.path.basename))
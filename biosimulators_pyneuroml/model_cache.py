@@ -0,0 +1,253 @@
+""" Cache of the parsed and validated LEMS documents of the models of tasks, which is shared by the tasks executed by a
+process
+
+:obj:`biosimulators_pyneuroml.core.preprocess_sed_task` reads and validates the LEMS document of each task. When multiple
+tasks (e.g., of the same SED document, of multiple SED documents, or of multiple COMBINE archives) use the same document,
+this cache enables the document to be parsed and validated once per process, rather than once per task.
+
+* Documents are identified by their paths. Cached documents are reused while the modification time and size of their
+  files are unchanged, or while their contents (SHA-256 hashes) are unchanged.
+* The tasks which use a document share its parsed views (:obj:`LemsModelState`), to which the changes of each execution
+  are applied and then reverted. A view is only parsed again (from the cached contents of the file, rather than from
+  the file) when all of the views of the document are in use by concurrent executions.
+* The size of the cache is capped by evicting the least recently used documents.
+
+The cache is disabled unless the ``MODEL_CACHE_MAX_SIZE`` environment variable is set to its maximum size (bytes,
+estimated from the sizes of the files of the documents).
+"""
+
+from .model_state import LemsModelState
+from .utils import validate_lems_document, hash_file
+import collections
+import contextlib
+import lxml.etree
+import os
+import threading
+
+__all__ = [
+    'CachedLemsModel',
+    'ModelCache',
+    'get_model_cache',
+]
+
+# default maximum size of the cache (bytes; the cache is disabled by default)
+DEFAULT_MODEL_CACHE_MAX_SIZE = 0
+
+# estimated ratio of the memory of a parsed view of a document to the size of its file
+PARSED_MODEL_SIZE_FACTOR = 5
+
+_model_caches = {}
+
+
+class CachedLemsModel(object):
+    """ LEMS document in the model cache, whose parsed views are shared by the tasks which use the document
+
+    Attributes:
+        filename (:obj:`str`): absolute path to the document
+        mtime (:obj:`int`): modification time of the file of the document (nanoseconds)
+        size (:obj:`int`): size of the file of the document (bytes)
+        hash (:obj:`str`): SHA-256 hash of the contents of the file
+        content (:obj:`bytes`): contents of the file
+        _views (:obj:`list` of :obj:`LemsModelState`): parsed views of the document
+        _free_views (:obj:`list` of :obj:`LemsModelState`): views which aren't in use
+        _lock (:obj:`threading.Lock`): lock for the views
+    """
+
+    def __init__(self, filename, mtime, size, hash, content):
+        """
+        Args:
+            filename (:obj:`str`): absolute path to the document
+            mtime (:obj:`int`): modification time of the file of the document (nanoseconds)
+            size (:obj:`int`): size of the file of the document (bytes)
+            hash (:obj:`str`): SHA-256 hash of the contents of the file
+            content (:obj:`bytes`): contents of the file
+
+        Raises:
+            :obj:`ValueError`: if the document is invalid
+        """
+        self.filename = filename
+        self.mtime = mtime
+        self.size = size
+        self.hash = hash
+        self.content = content
+        self._lock = threading.Lock()
+
+        root = self._parse()
+        validate_lems_document(root)
+        self._views = [LemsModelState(root)]
+        self._free_views = list(self._views)
+
+    @property
+    def root(self):
+        """ Get the primary parsed view of the document
+
+        Returns:
+            :obj:`lxml.etree._Element`: LEMS document
+        """
+        return self._views[0].root
+
+    @property
+    def simulation(self):
+        """ Get the simulation of the primary parsed view of the document
+
+        Returns:
+            :obj:`lxml.etree._Element`: simulation
+        """
+        return self._views[0].simulation
+
+    @contextlib.contextmanager
+    def use(self):
+        """ Use a parsed view of the document within a context, such as an execution of a task. When the context exits,
+        the changes applied to the view are reverted, and the view can be used by other contexts.
+
+        Yields:
+            :obj:`LemsModelState`: view
+        """
+        with self._lock:
+            if self._free_views:
+                view = self._free_views.pop()
+            else:
+                view = LemsModelState(self._parse())
+                self._views.append(view)
+
+        try:
+            with view.use():
+                yield view
+        finally:
+            with self._lock:
+                self._free_views.append(view)
+
+    def get_memory(self):
+        """ Estimate the memory used by the document
+
+        Returns:
+            :obj:`int`: estimated memory (bytes)
+        """
+        return len(self.content) * (1 + PARSED_MODEL_SIZE_FACTOR * len(self._views))
+
+    def _parse(self):
+        """ Parse the cached contents of the file of the document
+
+        Returns:
+            :obj:`lxml.etree._Element`: LEMS document
+        """
+        parser = lxml.etree.XMLParser(remove_blank_text=True)
+        return lxml.etree.fromstring(self.content, parser, base_url=self.filename)
+
+
+class ModelCache(object):
+    """ Cache of parsed and validated LEMS documents, with least recently used eviction
+
+    Attributes:
+        max_size (:obj:`int`): maximum estimated memory of the cached documents (bytes)
+        hits (:obj:`int`): number of lookups which found a document
+        misses (:obj:`int`): number of lookups which parsed a document
+        _models (:obj:`collections.OrderedDict`): dictionary that maps the path of each cached document to the document,
+            from the least to the most recently used
+        _lock (:obj:`threading.Lock`): lock for the cache
+    """
+
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size (:obj:`int`): maximum estimated memory of the cached documents (bytes)
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._models = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        """ Get a LEMS document, parsing and validating it if the cache doesn't contain the current version of the document
+
+        Args:
+            filename (:obj:`str`): path to the document
+
+        Returns:
+            :obj:`CachedLemsModel`: document
+
+        Raises:
+            :obj:`ValueError`: if the document is invalid
+        """
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+
+        with self._lock:
+            model = self._models.get(filename, None)
+            if model is not None and model.mtime == stat.st_mtime_ns and model.size == stat.st_size:
+                return self._hit(model)
+
+        with open(filename, 'rb') as file:
+            content = file.read()
+        hash = hash_file(filename, content=content)
+
+        with self._lock:
+            model = self._models.get(filename, None)
+            if model is not None and model.hash == hash:
+                model.mtime = stat.st_mtime_ns
+                model.size = stat.st_size
+                return self._hit(model)
+
+        model = CachedLemsModel(filename, stat.st_mtime_ns, stat.st_size, hash, content)
+
+        with self._lock:
+            self.misses += 1
+            self._models[filename] = model
+            self._models.move_to_end(filename)
+            self._evict()
+        return model
+
+    def clear(self):
+        """ Remove all documents from the cache """
+        with self._lock:
+            self._models.clear()
+
+    def get_stats(self):
+        """ Get statistics about the use of the cache
+
+        Returns:
+            :obj:`dict`: number of hits, misses, and cached documents, and estimated memory of the cached documents
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'models': len(self._models),
+                'memory': sum(model.get_memory() for model in self._models.values()),
+            }
+
+    def _hit(self, model):
+        """ Record a lookup which found a document
+
+        Args:
+            model (:obj:`CachedLemsModel`): document
+
+        Returns:
+            :obj:`CachedLemsModel`: document
+        """
+        self.hits += 1
+        self._models.move_to_end(model.filename)
+        return model
+
+    def _evict(self):
+        """ Evict the least recently used documents until the estimated memory of the cache is within its maximum size """
+        memory = sum(model.get_memory() for model in self._models.values())
+        while self._models and memory > self.max_size:
+            _, model = self._models.popitem(last=False)
+            memory -= model.get_memory()
+
+
+def get_model_cache():
+    """ Get the model cache configured by the ``MODEL_CACHE_MAX_SIZE`` environment variable
+
+    Returns:
+        :obj:`ModelCache`: cache, or :obj:`None` if caching is disabled
+    """
+    max_size = int(float(os.getenv('MODEL_CACHE_MAX_SIZE', DEFAULT_MODEL_CACHE_MAX_SIZE)))
+    if max_size <= 0:
+        return None
+
+    if max_size not in _model_caches:
+        _model_caches[max_size] = ModelCache(max_size)
+    return _model_caches[max_size]
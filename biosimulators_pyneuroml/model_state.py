@@ -0,0 +1,141 @@
+""" State of the parsed LEMS document of a preprocessed task, to which the changes of executions of the task are applied
+and from which they are reverted in place
+
+:obj:`biosimulators_pyneuroml.core.preprocess_sed_task` reads the LEMS document of a task once so that it can be reused
+by repeated executions of the task (e.g., the iterations of repeated tasks, or the variants of a parameter sweep). Each
+execution modifies the document: it applies the changes of its model, and configures the simulation and outputs of the
+document. :obj:`LemsModelState` keeps the document pristine between executions without copying it:
+
+* The XPaths of the targets of changes are compiled and evaluated once, and the targeted attributes are cached.
+* The changes of an execution are applied to the targeted attributes in place, and the original values of the attributes
+  are recorded, so that they can be restored after the execution.
+* The attributes and children (e.g., outputs) of the simulation of the document are restored after each execution.
+
+Because the document is shared, the uses of the same state are serialized. Executions of tasks only use the state until
+the changed document has been written for their simulations, so the simulations themselves run concurrently.
+"""
+
+from biosimulators_utils.xml.utils import get_namespaces_with_prefixes
+import contextlib
+import lxml.etree
+import threading
+
+__all__ = [
+    'LemsModelState',
+]
+
+
+class LemsModelState(object):
+    """ Parsed LEMS document, to which the changes of executions of a task are applied and from which they are reverted
+
+    Attributes:
+        root (:obj:`lxml.etree._Element`): LEMS document
+        simulation (:obj:`lxml.etree._Element`): simulation of the document
+        _targets (:obj:`dict`): dictionary that maps the target and namespaces of each change that has been applied to
+            the targeted element and the name of the targeted attribute
+        _original_values (:obj:`list` of :obj:`tuple`): element, name, and original value (:obj:`None` if the element
+            didn't have the attribute) of each attribute which has been changed, in the order in which the attributes
+            were changed
+        _lock (:obj:`threading.RLock`): lock for serializing the executions which use the state
+    """
+
+    def __init__(self, root, simulation=None):
+        """
+        Args:
+            root (:obj:`lxml.etree._Element`): LEMS document
+            simulation (:obj:`lxml.etree._Element`, optional): simulation of the document. Default: the first
+                ``Simulation`` element of the document.
+        """
+        self.root = root
+        self.simulation = simulation if simulation is not None else root.xpath('/Lems/Simulation')[0]
+        self._targets = {}
+        self._original_values = []
+        self._lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def use(self):
+        """ Use the document within a context, such as an execution of a task. Other contexts wait until the context
+        exits. When it exits, the changes applied within the context are reverted, and the attributes and children of the
+        simulation of the document are restored.
+
+        Yields:
+            :obj:`LemsModelState`: state
+        """
+        with self._lock:
+            simulation_attrib = dict(self.simulation.attrib)
+            simulation_children = list(self.simulation)
+            try:
+                yield self
+            finally:
+                self.revert_changes()
+
+                self.simulation.attrib.clear()
+                self.simulation.attrib.update(simulation_attrib)
+                for child in list(self.simulation):
+                    self.simulation.remove(child)
+                for child in simulation_children:
+                    self.simulation.append(child)
+
+    def apply_changes(self, changes):
+        """ Apply changes to the values of attributes of the document
+
+        Args:
+            changes (:obj:`list` of :obj:`ModelAttributeChange`): changes
+
+        Raises:
+            :obj:`NotImplementedError`: if the target of a change isn't an attribute of an element
+            :obj:`ValueError`: if the target of a change doesn't match a single element
+        """
+        with self._lock:
+            for change in changes:
+                element, attr_name = self._get_target(change)
+                self._original_values.append((element, attr_name, element.get(attr_name)))
+                element.set(attr_name, str(change.new_value))
+
+    def revert_changes(self):
+        """ Restore the original values of the attributes which have been changed """
+        with self._lock:
+            while self._original_values:
+                element, attr_name, value = self._original_values.pop()
+                if value is None:
+                    element.attrib.pop(attr_name, None)
+                else:
+                    element.set(attr_name, value)
+
+    def _get_target(self, change):
+        """ Get the element and the attribute targeted by a change
+
+        Args:
+            change (:obj:`ModelAttributeChange`): change
+
+        Returns:
+            :obj:`tuple`: targeted element (:obj:`lxml.etree._Element`) and the name of the targeted attribute
+                (:obj:`str`)
+
+        Raises:
+            :obj:`NotImplementedError`: if the target of the change isn't an attribute of an element
+            :obj:`ValueError`: if the target of the change doesn't match a single element
+        """
+        namespaces = change.target_namespaces or {}
+        key = (change.target, tuple(sorted(namespaces.items(), key=lambda item: (item[0] or '', item[1]))))
+        target = self._targets.get(key, None)
+        if target is None:
+            obj_xpath, sep, attr_name = change.target.rpartition('/@')
+            if sep != '/@':
+                raise NotImplementedError(
+                    'target ' + change.target + ' cannot be changed by XML manipulation, as the target '
+                                                'is not an attribute of a model element')
+
+            ns_prefix, _, attr_name = attr_name.rpartition(':')
+            if ns_prefix:
+                ns = namespaces.get(ns_prefix, None)
+                if ns is None:
+                    raise ValueError('No namespace is defined with prefix `{}`'.format(ns_prefix))
+                attr_name = '{{{}}}{}'.format(ns, attr_name)
+
+            elements = lxml.etree.XPath(obj_xpath, namespaces=get_namespaces_with_prefixes(namespaces))(self.root)
+            if len(elements) != 1:
+                raise ValueError('xpath {} must match a single object'.format(obj_xpath))
+
+            target = self._targets[key] = (elements[0], attr_name)
+        return target
@@ -0,0 +1,168 @@
+""" Utilities for executing NetPyNE simulations in parallel with MPI
+
+NetPyNE distributes the cells of a network across the ranks of an MPI job, and gathers the recorded data of all ranks
+to the first rank, which saves the outputs of the simulation. The methods in this module launch NetPyNE scripts with
+``mpiexec``:
+
+* On the local node, with one rank per processor, unless the network has fewer cells than processors.
+* On multiple nodes, with one rank per slot of the hostfile configured by the ``MPI_HOSTFILE`` environment variable.
+  The scratch directories of simulations (the temporary directory of Python, e.g., configured by ``TMPDIR``) must be
+  on a file system shared by the nodes.
+
+Additional arguments for ``mpiexec`` (e.g., ``--bind-to core``) can be configured with the ``MPIEXEC_ARGS``
+environment variable.
+
+Each rank checks that NEURON was initialized with the expected number of ranks, so that simulations fail, rather than
+silently execute the entire network in each rank, if NEURON wasn't built with MPI or ``mpiexec`` doesn't match
+NEURON's MPI library.
+"""
+
+import functools
+import os
+import re
+import shlex
+import subprocess
+
+__all__ = [
+    'get_mpi_hostfile',
+    'get_mpi_hostfile_slots',
+    'get_mpi_num_ranks',
+    'get_mpiexec_args',
+    'write_mpi_launcher',
+]
+
+MPI_LAUNCHER_FILENAME = '_mpi_launcher.py'
+
+MPI_LAUNCHER_TEMPLATE = '''import runpy
+import sys
+from neuron import h
+
+pc = h.ParallelContext()
+num_ranks = int(pc.nhost())
+if num_ranks != {num_ranks}:
+    sys.exit('NEURON was initialized with {{}} MPI ranks rather than {num_ranks}. '
+             'Please check that NEURON was built with MPI and that `mpiexec` matches its MPI library.'.format(num_ranks))
+
+sys.argv = [{script_filename!r}] + sys.argv[1:]
+try:
+    runpy.run_path({script_filename!r}, run_name='__main__')
+except SystemExit as exception:
+    if exception.code not in [None, 0]:
+        raise
+
+# NetPyNE scripts exit without finalizing MPI, which mpiexec treats as a failure
+pc.barrier()
+pc.done()
+h.quit()
+'''
+
+HOSTFILE_SLOTS_PATTERN = re.compile(r'(?:\sslots\s*=\s*(\d+)|:(\d+)$)')
+
+
+def get_mpi_hostfile():
+    """ Get the hostfile for executing NetPyNE simulations on multiple nodes, as configured by the ``MPI_HOSTFILE``
+    environment variable
+
+    Returns:
+        :obj:`str`: path to the hostfile, or :obj:`None` if simulations should be executed on the local node
+    """
+    return os.getenv('MPI_HOSTFILE', None) or None
+
+
+def get_mpi_hostfile_slots(filename):
+    """ Get the number of slots of an MPI hostfile (e.g., ``node1 slots=4`` for Open MPI or ``node1:4`` for MPICH;
+    hosts without a number of slots have one slot)
+
+    Args:
+        filename (:obj:`str`): path to the hostfile
+
+    Returns:
+        :obj:`int`: number of slots
+    """
+    num_slots = 0
+    with open(filename, 'r') as file:
+        for line in file:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            match = HOSTFILE_SLOTS_PATTERN.search(line)
+            num_slots += int(match.group(1) or match.group(2)) if match else 1
+    return num_slots
+
+
+def get_mpi_num_ranks(num_processors, num_cells=None, hostfile=None):
+    """ Get the number of MPI ranks for a NetPyNE simulation
+
+    Args:
+        num_processors (:obj:`int`): number of processors of the local node which are available for the simulation
+        num_cells (:obj:`int`, optional): number of cells of the network; ranks beyond the number of cells would have
+            no cells to simulate
+        hostfile (:obj:`str`, optional): path to a hostfile; if provided, the simulation uses each slot of the hostfile
+
+    Returns:
+        :obj:`int`: number of ranks
+    """
+    if hostfile:
+        num_ranks = get_mpi_hostfile_slots(hostfile)
+    else:
+        num_ranks = num_processors or 1
+    if num_cells is not None:
+        num_ranks = min(num_ranks, num_cells)
+    return max(1, num_ranks)
+
+
+def get_mpiexec_args(num_ranks, hostfile=None):
+    """ Get the command for launching a program with ``mpiexec``
+
+    Args:
+        num_ranks (:obj:`int`): number of ranks
+        hostfile (:obj:`str`, optional): path to a hostfile
+
+    Returns:
+        :obj:`list` of :obj:`str`: command, without the program
+    """
+    args = ['mpiexec', '-n', str(num_ranks)]
+    if hostfile:
+        args.extend(['--hostfile', hostfile])
+
+    if _is_open_mpi():
+        # Open MPI only launches as many local ranks as physical cores, and refuses to run as root (e.g., in containers)
+        if not hostfile:
+            args.append('--oversubscribe')
+        if os.geteuid() == 0:
+            args.append('--allow-run-as-root')
+
+    args.extend(shlex.split(os.getenv('MPIEXEC_ARGS', '')))
+    return args
+
+
+@functools.lru_cache(maxsize=None)
+def _is_open_mpi():
+    """ Determine whether ``mpiexec`` is Open MPI's launcher
+
+    Returns:
+        :obj:`bool`: whether ``mpiexec`` is Open MPI's launcher
+    """
+    try:
+        process = subprocess.run(['mpiexec', '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+    except FileNotFoundError:
+        return False
+    version = process.stdout.decode(errors='replace')
+    return 'Open MPI' in version or 'OpenRTE' in version
+
+
+def write_mpi_launcher(dirname, script_filename, num_ranks):
+    """ Write a script which checks that NEURON was initialized with the expected number of MPI ranks, and then executes
+    a NetPyNE script
+
+    Args:
+        dirname (:obj:`str`): directory for the launcher
+        script_filename (:obj:`str`): path to the NetPyNE script, relative to :obj:`dirname`
+        num_ranks (:obj:`int`): expected number of ranks
+
+    Returns:
+        :obj:`str`: path to the launcher, relative to :obj:`dirname`
+    """
+    with open(os.path.join(dirname, MPI_LAUNCHER_FILENAME), 'w') as file:
+        file.write(MPI_LAUNCHER_TEMPLATE.format(num_ranks=num_ranks, script_filename=script_filename))
+    return MPI_LAUNCHER_FILENAME
@@ -0,0 +1,260 @@
+""" Utilities for setting the values of parameters of models in the NEURON code generated by jNeuroML at runtime
+
+jNeuroML writes the values of the parameters of models into the NEURON code that it generates: the parameters of
+point processes (e.g., the amplitudes of pulse generators, the conductances of synapses) are written into the
+``PARAMETER`` blocks of mechanisms (``.mod`` files), channel densities are written into cell templates (``.hoc``
+files), and the weights of connections and the temperature are written into the script. Consequently, simulating a
+model with another value of one of these parameters (e.g., the next point of a parameter sweep) would require
+generating and compiling the code again.
+
+Instead, the values of the parameters listed below, when they are defined by elements of the LEMS document (rather than
+by included files), can be set by the script after it instantiates the model, by assigning them to the attributes of
+point processes, segments, and ``NetCon`` objects, and to NEURON's globals. These parameters are excluded from the keys of
+the code cache (see :obj:`biosimulators_pyneuroml.code_cache.get_neuron_code_cache_key`), such that variants of a model
+which only differ in their values share the same generated code and compiled mechanisms.
+
+* ``pulseGenerator``: ``delay``, ``duration``, ``amplitude``
+* ``expOneSynapse``, ``expTwoSynapse``, ``alphaSynapse``: ``gbase``, ``erev`` (the time constants of synapses can't be
+  set at runtime because jNeuroML derives other constants of the mechanisms from them)
+* ``channelDensity`` of a ``cell``: ``condDensity``, if the cell has no other channel density for the same ion channel
+* ``connectionWD`` of a ``projection`` of a ``network``: ``weight``
+* ``network``: ``temperature``
+"""
+
+import re
+
+__all__ = [
+    'RuntimeParameter',
+    'get_neuron_runtime_parameters',
+    'clear_neuron_runtime_parameters',
+    'set_neuron_script_runtime_parameters',
+]
+
+# factors and offsets for converting the units of NeuroML to those of NEURON
+UNITS = {
+    'time': {
+        's': (1e3, 0.),
+        'ms': (1., 0.),
+        'us': (1e-3, 0.),
+    },
+    'current': {
+        'A': (1e9, 0.),
+        'mA': (1e6, 0.),
+        'uA': (1e3, 0.),
+        'nA': (1., 0.),
+        'pA': (1e-3, 0.),
+    },
+    'conductance': {
+        'S': (1e6, 0.),
+        'mS': (1e3, 0.),
+        'uS': (1., 0.),
+        'nS': (1e-3, 0.),
+        'pS': (1e-6, 0.),
+    },
+    'conductanceDensity': {
+        'S_per_m2': (1e-4, 0.),
+        'mS_per_cm2': (1e-3, 0.),
+        'S_per_cm2': (1., 0.),
+    },
+    'voltage': {
+        'V': (1e3, 0.),
+        'mV': (1., 0.),
+    },
+    'temperature': {
+        'degC': (1., 0.),
+        'K': (1., -273.15),
+    },
+    'none': {
+        '': (1., 0.),
+    },
+}
+
+# dimensions of the parameters of point processes which can be set at runtime
+POINT_PROCESS_PARAMETERS = {
+    'pulseGenerator': {
+        'delay': 'time',
+        'duration': 'time',
+        'amplitude': 'current',
+    },
+    'expOneSynapse': {
+        'gbase': 'conductance',
+        'erev': 'voltage',
+    },
+    'expTwoSynapse': {
+        'gbase': 'conductance',
+        'erev': 'voltage',
+    },
+    'alphaSynapse': {
+        'gbase': 'conductance',
+        'erev': 'voltage',
+    },
+}
+
+QUANTITY_PATTERN = re.compile(r"^\s*(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(?P<units>[A-Za-z_0-9]*)\s*$")
+
+SCRIPT_RUN_PATTERN = re.compile(r"^    def run\(self\):", re.MULTILINE)
+
+SCRIPT_INDENT = ' ' * 8
+
+
+class RuntimeParameter(object):
+    """ Parameter of a model whose value can be set in the NEURON code generated by jNeuroML at runtime
+
+    Attributes:
+        xml_element (:obj:`lxml.etree._Element`): element of the LEMS document which defines the parameter
+        attr_name (:obj:`str`): attribute of :obj:`xml_element` which defines the value of the parameter
+        value (:obj:`float`): value of the parameter in the units of NEURON
+        statements (:obj:`list` of :obj:`str`): Python statements which set the value of the parameter in a NEURON
+            simulation (``h`` is NEURON's interpreter, and ``_netcons`` is a dictionary that maps the names of the
+            targets of the ``NetCon`` objects of the simulation to the objects)
+    """
+
+    def __init__(self, xml_element, attr_name, value, statements):
+        """
+        Args:
+            xml_element (:obj:`lxml.etree._Element`): element of the LEMS document which defines the parameter
+            attr_name (:obj:`str`): attribute of :obj:`xml_element` which defines the value of the parameter
+            value (:obj:`float`): value of the parameter in the units of NEURON
+            statements (:obj:`list` of :obj:`str`): Python statements which set the value of the parameter
+        """
+        self.xml_element = xml_element
+        self.attr_name = attr_name
+        self.value = value
+        self.statements = statements
+
+
+def get_neuron_runtime_parameters(lems_xml_root):
+    """ Get the parameters of a LEMS document whose values can be set in the NEURON code generated by jNeuroML at
+    runtime
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+
+    Returns:
+        :obj:`list` of :obj:`RuntimeParameter`: parameters
+    """
+    parameters = []
+
+    # parameters of point processes, whose mechanisms are named after the ids of their components
+    for type, attr_dimensions in POINT_PROCESS_PARAMETERS.items():
+        for xml_element in lems_xml_root.xpath('/Lems/{}[@id]'.format(type)):
+            for attr_name, dimension in attr_dimensions.items():
+                value = _get_value(xml_element, attr_name, dimension)
+                if value is not None:
+                    parameters.append(RuntimeParameter(xml_element, attr_name, value, [
+                        'for _point_process in h.List({!r}):'.format(xml_element.attrib['id']),
+                        '    _point_process.{} = {!r}'.format(attr_name, value),
+                    ]))
+
+    # densities of ion channels, which are set in the sections of the templates of cells where the channels are inserted
+    for cell_xml in lems_xml_root.xpath('/Lems/cell[@id]'):
+        densities_xml = cell_xml.xpath('biophysicalProperties/membraneProperties/*[@ionChannel]')
+        for xml_element in densities_xml:
+            if xml_element.tag != 'channelDensity':
+                continue
+            ion_channel = xml_element.attrib['ionChannel']
+            if sum(density_xml.attrib['ionChannel'] == ion_channel for density_xml in densities_xml) > 1:
+                continue
+            value = _get_value(xml_element, 'condDensity', 'conductanceDensity')
+            if value is not None:
+                parameters.append(RuntimeParameter(xml_element, 'condDensity', value, [
+                    'for _sec in h.allsec():',
+                    '    if (_sec.cell() is not None and _sec.cell().hname().partition("[")[0] == {!r}'.format(cell_xml.attrib['id']),
+                    '            and h.ismembrane({!r}, sec=_sec)):'.format(ion_channel),
+                    '        for _seg in _sec:',
+                    '            _seg.gmax_{} = {!r}'.format(ion_channel, value),
+                ]))
+
+    # weights of connections, which jNeuroML assigns to the synapses named after their projections and their
+    # positions within their projections
+    for projection_xml in lems_xml_root.xpath('/Lems/network/projection[@id][@synapse]'):
+        connections_xml = projection_xml.xpath('connection | connectionWD')
+        for i_connection, xml_element in enumerate(connections_xml):
+            if xml_element.tag != 'connectionWD' or xml_element.attrib.get('id', None) != str(i_connection):
+                continue
+            value = _get_value(xml_element, 'weight', 'none')
+            if value is not None:
+                parameters.append(RuntimeParameter(xml_element, 'weight', value, [
+                    '_netcons[h.syn_{}_{}[{}].hname()].weight[0] = {!r}'.format(
+                        projection_xml.attrib['id'], projection_xml.attrib['synapse'], i_connection, value),
+                ]))
+
+    # temperatures of networks
+    for xml_element in lems_xml_root.xpath('/Lems/network[@temperature]'):
+        value = _get_value(xml_element, 'temperature', 'temperature')
+        if value is not None:
+            parameters.append(RuntimeParameter(xml_element, 'temperature', value, [
+                'h.celsius = {!r}'.format(value),
+            ]))
+
+    return parameters
+
+
+def clear_neuron_runtime_parameters(lems_xml_root):
+    """ Clear the values of the parameters of a LEMS document which can be set in the NEURON code generated by jNeuroML
+    at runtime (e.g., to identify the code generated for a model independently of the values of these parameters)
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document, which is modified in place
+    """
+    for parameter in get_neuron_runtime_parameters(lems_xml_root):
+        parameter.xml_element.attrib[parameter.attr_name] = ''
+
+
+def set_neuron_script_runtime_parameters(script_filename, lems_xml_root):
+    """ Set the values of the parameters of a LEMS document which can be set at runtime (see
+    :obj:`get_neuron_runtime_parameters`) in a NEURON script generated by jNeuroML for the document, or for another
+    variant of the document which only differs in the values of these parameters
+
+    The values are set at the end of the instantiation of the model by the script (the constructor of its
+    ``NeuronSimulation`` class).
+
+    Args:
+        script_filename (:obj:`str`): path to the script
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+
+    Raises:
+        :obj:`ValueError`: if the script doesn't have the structure of the NEURON scripts generated by jNeuroML
+    """
+    parameters = get_neuron_runtime_parameters(lems_xml_root)
+    if not parameters:
+        return
+
+    statements = ['# set the values of the parameters of the model which can be set at runtime']
+    if any(parameter.xml_element.tag == 'connectionWD' for parameter in parameters):
+        statements.append('_netcons = {_netcon.syn().hname(): _netcon for _netcon in h.List("NetCon") if _netcon.syn() is not None}')
+    for parameter in parameters:
+        statements.extend(parameter.statements)
+
+    with open(script_filename, 'r') as file:
+        script = file.read()
+
+    match = SCRIPT_RUN_PATTERN.search(script)
+    if match is None:
+        raise ValueError('The parameters of the model cannot be set in `{}` because it does not define a simulation.'.format(
+            script_filename))
+
+    block = ''.join(SCRIPT_INDENT + statement + '\n' for statement in statements) + '\n'
+    script = script[:match.start()] + block + script[match.start():]
+
+    with open(script_filename, 'w') as file:
+        file.write(script)
+
+
+def _get_value(xml_element, attr_name, dimension):
+    """ Get the value of an attribute of an element of a LEMS document in the units of NEURON
+
+    Args:
+        xml_element (:obj:`lxml.etree._Element`): element
+        attr_name (:obj:`str`): attribute
+        dimension (:obj:`str`): dimension of the attribute (key of :obj:`UNITS`)
+
+    Returns:
+        :obj:`float`: value, or :obj:`None` if the element doesn't have the attribute, or its value can't be
+            interpreted
+    """
+    match = QUANTITY_PATTERN.match(xml_element.attrib.get(attr_name, ''))
+    if match is None or match.group('units') not in UNITS[dimension]:
+        return None
+    factor, offset = UNITS[dimension][match.group('units')]
+    return float('{:.12g}'.format(float(match.group('value')) * factor + offset))
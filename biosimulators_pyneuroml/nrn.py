@@ -0,0 +1,339 @@
+""" Utilities for executing the NEURON scripts generated by jNeuroML in the current process
+
+jNeuroML normally executes each NEURON simulation in a new Python process, which must import NEURON, load the model's
+mechanisms, execute the simulation, and then format its results as text so that they can be parsed again by this
+package. The methods in this module instead execute the scripts generated by jNeuroML inside the current process (which
+already imports the ``neuron`` module), and read the results of simulations directly from the ``h.Vector`` objects which
+record them through the buffer protocol (:obj:`neuron.hoc.HocObject.as_numpy`), without writing or parsing any files.
+The results are views of the vectors, which are kept alive by the results, except for the values which are converted to
+other units.
+
+Because NEURON has a single, global interpreter per process, mechanisms and cell templates cannot be unloaded or
+redefined once they have been loaded. Consequently, a simulation is only executed in the current process if its
+mechanisms and templates are either new or identical to those which have already been loaded. Otherwise, the
+simulation must be executed in a child process. The sections, and the recordings and playbacks of vectors, of the
+previous model are removed before each simulation.
+"""
+
+from .binary_outputs import get_script_output_file_values
+from .timing import time_phase
+import glob
+import numpy
+import os
+import re
+import threading
+
+__all__ = [
+    'can_run_neuron_script_in_process',
+    'run_neuron_script_in_process',
+    'get_neuron_simulation_arguments',
+    'set_neuron_simulation_arguments',
+]
+
+_neuron_lock = threading.RLock()
+
+# dictionaries which map the names of the mechanisms and templates loaded into this process to the hashes of the
+# files which defined them
+_loaded_mechanisms = {}
+_loaded_templates = {}
+
+# instantiation of the simulation by the ``__main__`` block of a script, e.g.,
+# ``ns = NeuronSimulation(tstop=10, dt=0.01, seed=123456789, abs_tol=None, rel_tol=None)``
+SIMULATION_PATTERN = re.compile(r"^[ \t]*ns = NeuronSimulation\((?P<args>.*)\)[ \t]*$", re.MULTILINE)
+
+# loading of a file, e.g., ``h.load_file("hhcell.hoc")``
+LOAD_FILE_PATTERN = re.compile(r"^(?P<indent>[ \t]*)h\.load_file\(\"(?P<filename>[^\"]+)\"\)[ \t]*$", re.MULTILINE)
+
+# conversion of a recorded ``h.Vector`` to a list, e.g.,
+# ``py_v_v_of0 = [ float(x  / 1000.0) for x in h.v_v_of0.to_python() ]``
+VECTOR_PATTERN = re.compile(
+    r"^[ \t]*(?P<name>\w+) = \[\s*(?P<value>.+?)\s+for (?P<var>\w+) in h\.(?P<vector>\w+)\.to_python\(\)\s*\]",
+    re.MULTILINE)
+
+TEMPLATE_PATTERN = re.compile(r"^[ \t]*begintemplate[ \t]+(?P<name>\w+)", re.MULTILINE)
+
+
+def can_run_neuron_script_in_process(dirname):
+    """ Determine whether the NEURON script generated by jNeuroML in a directory can be executed in the current process
+
+    Args:
+        dirname (:obj:`str`): directory which contains the script, its cell templates (``.hoc`` files), and its
+            mechanisms (``.mod`` files)
+
+    Returns:
+        :obj:`bool`: whether the script can be executed in the current process
+    """
+    with _neuron_lock:
+        return _get_conflicts(dirname) is None
+
+
+def run_neuron_script_in_process(script_filename, num_rows=None):
+    """ Execute a NEURON script generated by jNeuroML in the current process, and get the results of its output files
+    directly from the vectors which recorded them
+
+    The mechanisms of the script must have been compiled (e.g., with the ``-compile`` option of jNeuroML).
+
+    Args:
+        script_filename (:obj:`str`): path to the script
+        num_rows (:obj:`int`, optional): number of rows which should be returned from the end of each output file.
+            Default: all rows.
+
+    Returns:
+        :obj:`dict` of :obj:`str` => :obj:`list` of :obj:`numpy.ndarray`: dictionary that maps the name of each output
+            file of the script to a list of the values of its columns (one element per time point), or :obj:`None` if
+            the script can't be executed in the current process because its mechanisms or templates conflict with those
+            which have already been loaded
+
+    Raises:
+        :obj:`RuntimeError`: if the script or its simulation fails
+    """
+    from neuron import h
+
+    script_filename = os.path.abspath(script_filename)
+    dirname = os.path.dirname(script_filename)
+    with open(script_filename, 'r') as file:
+        script = file.read()
+
+    output_file_values = get_script_output_file_values(script)
+    match = SIMULATION_PATTERN.search(script)
+    if match is None or not output_file_values:
+        raise RuntimeError('`{}` is not a NEURON script generated by jNeuroML.'.format(script_filename))
+    simulation_args = get_neuron_simulation_arguments(script)
+
+    with _neuron_lock:
+        conflicts = _get_conflicts(dirname)
+        if conflicts is None:
+            return None
+        mechanisms, templates = conflicts
+
+        # remove the previous model, so that its cells aren't simulated again, and its vectors (which may still be viewed
+        # by its results) aren't modified
+        _clear_model(h)
+
+        # load the mechanisms of the script, unless they have already been loaded
+        if mechanisms and not set(mechanisms).issubset(_loaded_mechanisms):
+            libraries = (glob.glob(os.path.join(dirname, '*', '.libs', 'libnrnmech.*'))
+                         or glob.glob(os.path.join(dirname, '*', 'libnrnmech.*')))
+            if not libraries or not h.nrn_load_dll(libraries[0]):
+                raise RuntimeError('The mechanisms of `{}` could not be loaded.'.format(script_filename))
+            _loaded_mechanisms.update(mechanisms)
+
+        # load the templates of the script from its directory, unless they have already been loaded
+        def load_file(match):
+            filename = os.path.join(dirname, match.group('filename'))
+            if not os.path.isfile(filename):
+                return match.group(0)
+
+            file_templates = {name: hash for name, hash in templates.items() if templates_by_file[name] == filename}
+            if file_templates and set(file_templates).issubset(_loaded_templates):
+                return '{}pass'.format(match.group('indent'))
+            _loaded_templates.update(file_templates)
+            return '{}h.load_file({!r})'.format(match.group('indent'), filename)
+
+        templates_by_file = _get_template_files(dirname)
+        script = LOAD_FILE_PATTERN.sub(load_file, script)
+
+        # define the simulation class of the script, with files opened relative to the directory of the script
+        namespace = {
+            '__name__': '__neuron_script__',
+            '__file__': script_filename,
+            'open': lambda filename, *args, **kwargs: open(os.path.join(dirname, filename), *args, **kwargs),
+        }
+        exec(compile(script, script_filename, 'exec'), namespace)
+
+        # execute the simulation, without saving its results to files
+        h.CVode().active(0)
+        try:
+            simulation = namespace['NeuronSimulation'](**simulation_args)
+            simulation.save_results = lambda: _close_report_file(simulation)
+            simulation.run()
+        except SystemExit:
+            raise RuntimeError('The simulation of `{}` failed.'.format(script_filename))
+
+        with time_phase('readOutputs'):
+            return _get_results(h, script, output_file_values, num_rows)
+
+
+def get_neuron_simulation_arguments(script):
+    """ Get the arguments with which a NEURON script generated by jNeuroML instantiates its simulation
+
+    Args:
+        script (:obj:`str`): code of the script
+
+    Returns:
+        :obj:`dict`: arguments of the simulation (e.g., ``tstop``, ``dt``)
+    """
+    match = SIMULATION_PATTERN.search(script)
+    if match is None:
+        raise ValueError('The script does not instantiate a `NeuronSimulation`.')
+    return eval('dict({})'.format(match.group('args')), {'__builtins__': {'dict': dict}})
+
+
+def set_neuron_simulation_arguments(script, **args):
+    """ Set arguments with which a NEURON script generated by jNeuroML instantiates its simulation
+
+    Args:
+        script (:obj:`str`): code of the script
+        **args: values of arguments of the simulation (e.g., ``tstop``, ``dt``)
+
+    Returns:
+        :obj:`str`: code of the script with the new arguments
+    """
+    simulation_args = get_neuron_simulation_arguments(script)
+    simulation_args.update(args)
+
+    def set_args(match):
+        return match.group(0).replace(match.group('args'), ', '.join(
+            '{}={!r}'.format(name, value) for name, value in simulation_args.items()))
+    return SIMULATION_PATTERN.sub(set_args, script, count=1)
+
+
+def _get_conflicts(dirname):
+    """ Get the mechanisms and templates in a directory, if none of them conflict with those which have already been
+    loaded
+
+    Args:
+        dirname (:obj:`str`): directory
+
+    Returns:
+        :obj:`tuple`: :obj:`dict` which maps the names of the mechanisms to the hashes of their definitions, and
+            :obj:`dict` which maps the names of the templates to the hashes of their definitions; or :obj:`None` if
+            they conflict with the mechanisms or templates which have already been loaded
+    """
+    from .utils import hash_file
+
+    mechanisms = {
+        os.path.splitext(os.path.basename(filename))[0]: hash_file(filename)
+        for filename in glob.glob(os.path.join(dirname, '*.mod'))
+    }
+    templates = {
+        name: hash_file(filename)
+        for name, filename in _get_template_files(dirname).items()
+    }
+
+    # a library of mechanisms can only be loaded if none of its mechanisms have been loaded, and can only be skipped
+    # if all of them have been loaded
+    loaded = [name for name in mechanisms if name in _loaded_mechanisms]
+    if loaded and (len(loaded) < len(mechanisms) or any(_loaded_mechanisms[name] != mechanisms[name] for name in loaded)):
+        return None
+
+    if any(name in _loaded_templates and _loaded_templates[name] != hash for name, hash in templates.items()):
+        return None
+
+    return mechanisms, templates
+
+
+def _get_template_files(dirname):
+    """ Get the templates defined by the ``.hoc`` files in a directory
+
+    Args:
+        dirname (:obj:`str`): directory
+
+    Returns:
+        :obj:`dict`: dictionary which maps the name of each template to the path of the file which defines it
+    """
+    templates = {}
+    for filename in glob.glob(os.path.join(dirname, '*.hoc')):
+        with open(filename, 'r') as file:
+            for name in TEMPLATE_PATTERN.findall(file.read()):
+                templates[name] = filename
+    return templates
+
+
+def _clear_model(h):
+    """ Remove the sections of the model which was previously simulated by NEURON, stop the recording and playback of
+    its vectors, and reset the state of the integrator
+
+    Args:
+        h (:obj:`neuron.hoc.HocObject`): NEURON interpreter
+    """
+    for vector in h.List('Vector'):
+        vector.play_remove()
+    h('forall delete_section()')
+    h.CVode().active(0)
+    h.t = 0.
+
+
+class _VectorView(object):
+    """ Array interface to the values of a vector, which keeps the vector alive as long as arrays view its values
+
+    Attributes:
+        vector (:obj:`neuron.hoc.HocObject`): vector
+        __array_interface__ (:obj:`dict`): array interface of the values of the vector
+    """
+
+    def __init__(self, vector):
+        """
+        Args:
+            vector (:obj:`neuron.hoc.HocObject`): vector
+        """
+        self.vector = vector
+        self.__array_interface__ = vector.as_numpy().__array_interface__
+
+
+def _close_report_file(simulation):
+    """ Close the report file of a simulation, in place of saving its results
+
+    Args:
+        simulation (:obj:`object`): simulation
+    """
+    report_file = getattr(simulation, 'report_file', None)
+    if report_file is not None:
+        report_file.close()
+
+
+def _get_results(h, script, output_file_values, num_rows=None):
+    """ Get the values of the output files of a NEURON script from the vectors which recorded them
+
+    The values are views of the tails of the vectors, rather than copies, unless they are converted to other units.
+
+    Args:
+        h (:obj:`neuron.hoc.HocObject`): NEURON interpreter
+        script (:obj:`str`): code of the script
+        output_file_values (:obj:`dict`): dictionary that maps the name of each output file to a list of the expressions
+            for the values of its columns
+        num_rows (:obj:`int`, optional): number of rows which should be returned from the end of each output file.
+            Default: all rows.
+
+    Returns:
+        :obj:`dict` of :obj:`str` => :obj:`list` of :obj:`numpy.ndarray`: dictionary that maps the name of each output
+            file of the script to a list of the values of its columns
+    """
+    vectors = {}
+    for match in VECTOR_PATTERN.finditer(script):
+        vectors[match.group('name')] = match
+
+    results = {}
+    for filename, values in output_file_values.items():
+        names = sorted(set(name for value in values for name in re.findall(r'\b(\w+)\[i\]', value)))
+        if any(name not in vectors for name in names):
+            raise RuntimeError('The values of output file `{}` could not be determined.'.format(filename))
+
+        # view the tails of the vectors, and convert them to the units of the output file
+        num_points = min(len(getattr(h, vectors[name].group('vector'))) for name in names)
+        first_row = 0 if num_rows is None else max(0, num_points - num_rows)
+        arrays = {}
+        for name in names:
+            match = vectors[name]
+            array = numpy.asarray(_VectorView(getattr(h, match.group('vector'))))[first_row:num_points]
+            arrays[name] = numpy.asarray(eval(match.group('value'), {'float': _as_float_array}, {match.group('var'): array}),
+                                         dtype=numpy.float64)
+
+        results[filename] = [
+            numpy.asarray(eval(re.sub(r'\b(\w+)\[i\]', r'\1', value), {'__builtins__': {}}, arrays), dtype=numpy.float64)
+            for value in values
+        ]
+
+    return results
+
+
+def _as_float_array(value):
+    """ Vectorized replacement for :obj:`float` for evaluating the expressions which convert the units of vectors
+
+    Args:
+        value (:obj:`numpy.ndarray`): values
+
+    Returns:
+        :obj:`numpy.ndarray`: values as floats
+    """
+    return numpy.asarray(value, dtype=numpy.float64)
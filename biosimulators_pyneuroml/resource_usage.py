@@ -0,0 +1,240 @@
+""" Utilities for measuring the resources used by the child processes which execute simulations
+
+The simulators (jNeuroML, NEURON, NetPyNE, Brian 2) and the programs which prepare simulations (e.g., ``nrnivmodl``)
+are executed in child processes. :obj:`ChildProcessMonitor` measures the resources used by the child processes which
+run within a context:
+
+* CPU time and I/O are read from the resource usage of the terminated child processes
+  (:obj:`resource.getrusage` with :obj:`resource.RUSAGE_CHILDREN`), which is exact, but which is the total of all of the
+  child processes of this process. If the context overlaps with other monitored contexts (e.g., of simulations which
+  are executed concurrently by multiple threads), CPU time and I/O are instead the totals of the last samples (with
+  :obj:`psutil`) of the child processes which are attributed to the context. These totals exclude the time and I/O of
+  child processes after their last samples, including processes which terminate before they are sampled.
+* The peak memory is sampled periodically from the tree of child processes with :obj:`psutil`, so that the memory of
+  concurrent processes (e.g., MPI ranks) is summed. Because short-lived processes can be missed by sampling, the peak
+  memory is at least the largest peak memory of any individual child process reported by the operating system.
+
+The memory of a simulation is attributed to the child processes whose current directories are within the directory of
+the simulation (see :obj:`set_monitored_directory`), or to all child processes if the simulation doesn't declare a
+directory. This separates the memory of simulations which are executed concurrently by multiple threads of the same
+process. Child processes which already existed when the context started (e.g., the processes of other simulations,
+or pools of worker processes) are never attributed to it. Simulations executed within this process (see
+``SIMULATE_IN_PROCESS``) aren't measured.
+
+Optionally, :obj:`ChildProcessMonitor` can enforce a limit on the memory of the child processes by killing them once
+their memory exceeds the limit.
+"""
+
+import contextvars
+import os
+import psutil
+import resource
+import sys
+import threading
+
+__all__ = [
+    'ChildProcessMonitor',
+    'set_monitored_directory',
+]
+
+_monitor = contextvars.ContextVar('biosimulators_pyneuroml_child_process_monitor', default=None)
+
+# monitors whose contexts are active, and a lock for them
+_active_monitors = set()
+_active_monitors_lock = threading.Lock()
+
+# size of the blocks counted by :obj:`resource.getrusage` (bytes)
+IO_BLOCK_SIZE = 512
+
+
+class ChildProcessMonitor(object):
+    """ Context manager which measures the resources used by the child processes which run within the context
+
+    Attributes:
+        enabled (:obj:`bool`): whether to measure resources
+        sample_interval (:obj:`float`): interval between samples of the memory of the child processes (seconds)
+        max_memory (:obj:`int`): maximum total resident memory of the child processes (bytes); if exceeded, the child
+            processes are killed
+        dirname (:obj:`str`): directory of the simulation; if set, only the memory of the child processes whose
+            current directories are within this directory is measured
+        memory_exceeded (:obj:`bool`): whether the child processes were killed because they exceeded :obj:`max_memory`
+        usage (:obj:`dict`): resources used by the child processes, available after the context exits:
+
+            * ``peakMemory``: peak total resident memory (bytes)
+            * ``peakMemoryByProgram``: dictionary that maps the name of each program (e.g., ``java``, ``nrniv``)
+              to the peak total resident memory of its processes (bytes)
+            * ``userCpuTime``: user CPU time (seconds)
+            * ``systemCpuTime``: system CPU time (seconds)
+            * ``readBytes``: bytes read from storage
+            * ``writtenBytes``: bytes written to storage
+
+        _start_rusage (:obj:`resource.struct_rusage`): resource usage of the child processes at the start of the
+            context
+        _peak_memory (:obj:`int`): sampled peak total resident memory (bytes)
+        _peak_memory_by_program (:obj:`dict`): sampled peak resident memory of each program (bytes)
+        _excluded_pids (:obj:`set` of :obj:`int`): ids of the child processes which existed at the start of the context
+        _sampled_usage (:obj:`dict`): dictionary that maps the id and start time of each child process attributed to
+            the context to its user and system CPU time (seconds), and the bytes that it read and wrote, when it was
+            last sampled
+        _overlapped (:obj:`bool`): whether the context overlapped with the context of another monitor
+        _stop_event (:obj:`threading.Event`): event which stops sampling
+        _thread (:obj:`threading.Thread`): thread which samples the memory of the child processes
+        _token (:obj:`contextvars.Token`): token for resetting the monitor of the current context
+    """
+
+    def __init__(self, enabled=True, sample_interval=0.05, max_memory=None):
+        """
+        Args:
+            enabled (:obj:`bool`, optional): whether to measure resources
+            sample_interval (:obj:`float`, optional): interval between samples of the memory of the child processes
+                (seconds)
+            max_memory (:obj:`int`, optional): maximum total resident memory of the child processes (bytes); if
+                exceeded, the child processes are killed
+        """
+        self.enabled = enabled
+        self.sample_interval = sample_interval
+        self.max_memory = max_memory
+        self.dirname = None
+        self.memory_exceeded = False
+        self.usage = None
+        self._start_rusage = None
+        self._peak_memory = 0
+        self._peak_memory_by_program = {}
+        self._excluded_pids = set()
+        self._sampled_usage = {}
+        self._overlapped = False
+        self._stop_event = None
+        self._thread = None
+        self._token = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._token = _monitor.set(self)
+            with _active_monitors_lock:
+                _active_monitors.add(self)
+                if len(_active_monitors) > 1:
+                    for monitor in _active_monitors:
+                        monitor._overlapped = True
+            self._start_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self._excluded_pids = set(child.pid for child in psutil.Process().children(recursive=True))
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(target=self._sample_memory, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.enabled:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+        _monitor.reset(self._token)
+        end_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        with _active_monitors_lock:
+            _active_monitors.discard(self)
+            overlapped = self._overlapped
+
+        peak_memory = self._peak_memory
+        if not overlapped and end_rusage.ru_maxrss > self._start_rusage.ru_maxrss:
+            peak_memory = max(peak_memory, _get_rusage_memory(end_rusage.ru_maxrss))
+
+        if overlapped:
+            # the resource usage of the child processes of this process includes those of other contexts
+            user_cpu_time, system_cpu_time, read_bytes, written_bytes = (
+                sum(values) for values in zip((0., 0., 0, 0), *self._sampled_usage.values()))
+        else:
+            user_cpu_time = end_rusage.ru_utime - self._start_rusage.ru_utime
+            system_cpu_time = end_rusage.ru_stime - self._start_rusage.ru_stime
+            read_bytes = (end_rusage.ru_inblock - self._start_rusage.ru_inblock) * IO_BLOCK_SIZE
+            written_bytes = (end_rusage.ru_oublock - self._start_rusage.ru_oublock) * IO_BLOCK_SIZE
+
+        self.usage = {
+            'peakMemory': peak_memory,
+            'peakMemoryByProgram': dict(sorted(self._peak_memory_by_program.items())),
+            'userCpuTime': round(user_cpu_time, 6),
+            'systemCpuTime': round(system_cpu_time, 6),
+            'readBytes': read_bytes,
+            'writtenBytes': written_bytes,
+        }
+
+    def _sample_memory(self):
+        """ Periodically sample the memory, CPU time, and I/O of the child processes until the context exits """
+        process = psutil.Process()
+        while True:
+            self._sample_memory_once(process)
+            if self._stop_event.wait(self.sample_interval):
+                break
+
+    def _sample_memory_once(self, process):
+        """ Sample the memory, CPU time, and I/O of the child processes
+
+        Args:
+            process (:obj:`psutil.Process`): process whose child processes should be sampled
+        """
+        dirname = self.dirname
+        children = []
+        memory = 0
+        memory_by_program = {}
+        for child in process.children(recursive=True):
+            if child.pid in self._excluded_pids:
+                continue
+            try:
+                with child.oneshot():
+                    if dirname:
+                        cwd = child.cwd()
+                        if cwd != dirname and not cwd.startswith(dirname + os.sep):
+                            continue
+                    rss = child.memory_info().rss
+                    name = child.name()
+                    cpu_times = child.cpu_times()
+                    try:
+                        io_counters = child.io_counters()
+                        read_bytes, written_bytes = io_counters.read_bytes, io_counters.write_bytes
+                    except (AttributeError, psutil.AccessDenied):
+                        read_bytes, written_bytes = 0, 0
+                    self._sampled_usage[(child.pid, child.create_time())] = (
+                        cpu_times.user, cpu_times.system, read_bytes, written_bytes)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            children.append(child)
+            memory += rss
+            memory_by_program[name] = memory_by_program.get(name, 0) + rss
+
+        self._peak_memory = max(self._peak_memory, memory)
+        for name, rss in memory_by_program.items():
+            self._peak_memory_by_program[name] = max(self._peak_memory_by_program.get(name, 0), rss)
+
+        if self.max_memory is not None and memory > self.max_memory:
+            self.memory_exceeded = True
+            for child in children:
+                try:
+                    child.kill()
+                except psutil.NoSuchProcess:
+                    pass
+
+
+def set_monitored_directory(dirname):
+    """ Declare the directory of the simulation of the :obj:`ChildProcessMonitor` of the current context (if any), so that
+    only the child processes whose current directories are within this directory are attributed to the simulation
+
+    Args:
+        dirname (:obj:`str`): absolute path to the directory
+    """
+    monitor = _monitor.get()
+    if monitor is not None:
+        monitor.dirname = dirname
+
+
+def _get_rusage_memory(max_rss):
+    """ Convert the maximum resident memory reported by :obj:`resource.getrusage` to bytes
+
+    Args:
+        max_rss (:obj:`int`): maximum resident memory in the units of the operating system (bytes on macOS,
+            kilobytes otherwise)
+
+    Returns:
+        :obj:`int`: maximum resident memory in bytes
+    """
+    if sys.platform == 'darwin':
+        return max_rss
+    return max_rss * 1024
@@ -0,0 +1,287 @@
+""" Scheduler which partitions the processors and memory of the node among concurrent simulations
+
+Without a scheduler, each simulation is given all but one of the processors of the node, and nearly all of its available
+memory (e.g., for the heap of the JVM of jNeuroML). When multiple simulations are executed concurrently (e.g., by
+multiple threads), they overcommit the node. The scheduler instead owns a budget of processors and memory, and gives
+each simulation a slice of the budget:
+
+* The size of each slice is estimated from the simulator (see :obj:`SIMULATOR_MEMORY_ESTIMATES`), or from the peak memory
+  of previous simulations of the same model with the same simulator.
+* Simulations whose slices don't fit in the remaining budget wait in a first-in, first-out queue.
+* The memory of each slice is enforced on the child processes of the simulation, which are killed if they exceed it, when
+  the memory was requested explicitly or estimated from the peak memory of previous simulations. Memory estimated from
+  the simulator is only used for scheduling, because it isn't based on the model.
+
+The scheduler is enabled by setting the ``RESOURCE_SCHEDULER`` environment variable to ``1``. Its budget can be
+configured with the ``RESOURCE_SCHEDULER_PROCESSORS`` and ``RESOURCE_SCHEDULER_MEMORY`` (bytes) environment
+variables. The budget is shared by the simulations executed by a process. Processes which execute the tasks of SED
+documents concurrently (``TASK_WORKERS``) are each given a static share of the processors and memory of the node.
+"""
+
+from .data_model import Simulator
+from .utils import get_available_processors, get_available_memory, get_lems_num_cells
+import contextlib
+import os
+import threading
+import time
+
+__all__ = [
+    'SIMULATOR_MEMORY_ESTIMATES',
+    'Reservation',
+    'ResourceScheduler',
+    'get_resource_scheduler',
+]
+
+# estimated memory of a simulation with each simulator (bytes), including the JVM of jNeuroML
+SIMULATOR_MEMORY_ESTIMATES = {
+    Simulator.pyneuroml: 1000 * 1000000,
+    Simulator.neuron: 1000 * 1000000,
+    Simulator.netpyne: 1000 * 1000000,
+    Simulator.brian2: 1000 * 1000000,
+}
+
+# estimated additional memory of each MPI rank of NetPyNE simulations (bytes)
+NETPYNE_RANK_MEMORY_ESTIMATE = 250 * 1000000
+
+# margin for estimates of the memory of simulations from the peak memory of previous simulations
+MEASURED_MEMORY_MARGIN = 1.25
+
+# memory of the JVM of jNeuroML in addition to its heap (bytes)
+JVM_MEMORY_OVERHEAD = 250 * 1000000
+
+# memory of the node reserved for the process of the scheduler (bytes)
+RESERVED_MEMORY = 100 * 1000000
+
+_resource_schedulers = {}
+
+
+class Reservation(object):
+    """ Slice of the processors and memory of a scheduler reserved for a simulation
+
+    Attributes:
+        processors (:obj:`int`): number of processors
+        memory (:obj:`int`): memory (bytes)
+        wait_time (:obj:`float`): time that the simulation waited for the reservation (seconds)
+        memory_limit (:obj:`int`): maximum memory of the child processes of the simulation (bytes), or :obj:`None` if
+            the memory of the reservation isn't enforced
+    """
+
+    def __init__(self, processors, memory, wait_time=0., memory_limit=None):
+        """
+        Args:
+            processors (:obj:`int`): number of processors
+            memory (:obj:`int`): memory (bytes)
+            wait_time (:obj:`float`, optional): time that the simulation waited for the reservation (seconds)
+            memory_limit (:obj:`int`, optional): maximum memory of the child processes of the simulation (bytes), or
+                :obj:`None` if the memory of the reservation isn't enforced
+        """
+        self.processors = processors
+        self.memory = memory
+        self.wait_time = wait_time
+        self.memory_limit = memory_limit
+
+    def get_jvm_max_memory(self):
+        """ Get the maximum heap size for the JVM of jNeuroML, such that the JVM fits in the memory of the reservation
+
+        Returns:
+            :obj:`int`: maximum heap size (bytes)
+        """
+        return int(max(self.memory - JVM_MEMORY_OVERHEAD, self.memory / 2))
+
+    def to_dict(self):
+        """ Get a JSON-compatible representation of the reservation
+
+        Returns:
+            :obj:`dict`: JSON-compatible representation
+        """
+        return {
+            'processors': self.processors,
+            'memory': self.memory,
+            'memoryLimit': self.memory_limit,
+            'waitTime': round(self.wait_time, 6),
+        }
+
+
+class ResourceScheduler(object):
+    """ Scheduler which partitions a budget of processors and memory among concurrent simulations
+
+    Attributes:
+        processors (:obj:`int`): number of processors of the budget
+        memory (:obj:`int`): memory of the budget (bytes)
+        free_processors (:obj:`int`): number of processors which aren't reserved
+        free_memory (:obj:`int`): memory which isn't reserved (bytes)
+        _measured_memory (:obj:`dict`): dictionary that maps each simulator and model to the peak memory of its
+            previous simulations (bytes)
+        _queue (:obj:`list` of :obj:`int`): tickets of the simulations waiting for reservations, in order of arrival
+        _next_ticket (:obj:`int`): next ticket
+        _condition (:obj:`threading.Condition`): condition for waiting for resources
+    """
+
+    def __init__(self, processors, memory):
+        """
+        Args:
+            processors (:obj:`int`): number of processors of the budget
+            memory (:obj:`int`): memory of the budget (bytes)
+        """
+        self.processors = max(1, int(processors))
+        self.memory = int(memory)
+        self.free_processors = self.processors
+        self.free_memory = self.memory
+        self._measured_memory = {}
+        self._queue = []
+        self._next_ticket = 0
+        self._condition = threading.Condition()
+
+    def estimate(self, simulator, model_filename, lems_xml_root=None, working_dirname='.'):
+        """ Estimate the processors and memory needed to simulate a model
+
+        Args:
+            simulator (:obj:`Simulator`): simulator
+            model_filename (:obj:`str`): path to the model
+            lems_xml_root (:obj:`lxml.etree._Element`, optional): LEMS document of the model, used to limit the
+                number of MPI ranks of NetPyNE simulations to the number of cells of the model
+            working_dirname (:obj:`str`, optional): working directory of the LEMS document
+
+        Returns:
+            :obj:`tuple`: number of processors (:obj:`int`) and memory (bytes, :obj:`int`)
+        """
+        processors = 1
+        memory = SIMULATOR_MEMORY_ESTIMATES[simulator]
+        if simulator == Simulator.netpyne:
+            processors = self.processors
+            if lems_xml_root is not None:
+                processors = max(1, min(processors, get_lems_num_cells(lems_xml_root, working_dirname)))
+            memory += (processors - 1) * NETPYNE_RANK_MEMORY_ESTIMATE
+
+        measured_memory = self.get_measured_memory(simulator, model_filename)
+        if measured_memory:
+            memory = int(measured_memory * MEASURED_MEMORY_MARGIN)
+
+        return processors, memory
+
+    def get_measured_memory(self, simulator, model_filename):
+        """ Get the peak memory of the previous simulations of a model
+
+        Args:
+            simulator (:obj:`Simulator`): simulator
+            model_filename (:obj:`str`): path to the model
+
+        Returns:
+            :obj:`int`: peak memory (bytes), or :obj:`None` if the model hasn't been simulated
+        """
+        with self._condition:
+            return self._measured_memory.get((simulator, os.path.abspath(model_filename)), None)
+
+    def record(self, simulator, model_filename, peak_memory):
+        """ Record the peak memory of a simulation of a model, to estimate the memory of subsequent simulations of the
+        model
+
+        Args:
+            simulator (:obj:`Simulator`): simulator
+            model_filename (:obj:`str`): path to the model
+            peak_memory (:obj:`int`): peak memory of the simulation (bytes)
+        """
+        if peak_memory:
+            key = (simulator, os.path.abspath(model_filename))
+            with self._condition:
+                self._measured_memory[key] = max(self._measured_memory.get(key, 0), peak_memory)
+
+    def acquire(self, processors, memory, limit_memory=False):
+        """ Reserve processors and memory, waiting until earlier requests have been served and the request fits in the
+        unreserved budget. Requests which exceed the budget are reduced to the budget.
+
+        Args:
+            processors (:obj:`int`): number of processors
+            memory (:obj:`int`): memory (bytes)
+            limit_memory (:obj:`bool`, optional): whether the memory should be enforced on the child processes of the
+                simulation (e.g., because it was requested explicitly or estimated from previous simulations)
+
+        Returns:
+            :obj:`Reservation`: reservation
+        """
+        processors = min(max(1, int(processors)), self.processors)
+        memory = min(int(memory), self.memory)
+
+        start = time.perf_counter()
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._queue.append(ticket)
+            while self._queue[0] != ticket or processors > self.free_processors or memory > self.free_memory:
+                self._condition.wait()
+            self._queue.pop(0)
+            self.free_processors -= processors
+            self.free_memory -= memory
+            self._condition.notify_all()
+
+        return Reservation(processors, memory, wait_time=time.perf_counter() - start,
+                           memory_limit=memory if limit_memory else None)
+
+    def release(self, reservation):
+        """ Return the processors and memory of a reservation to the budget
+
+        Args:
+            reservation (:obj:`Reservation`): reservation
+        """
+        with self._condition:
+            self.free_processors += reservation.processors
+            self.free_memory += reservation.memory
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def reserve(self, processors, memory, limit_memory=False):
+        """ Reserve processors and memory within a context
+
+        Args:
+            processors (:obj:`int`): number of processors
+            memory (:obj:`int`): memory (bytes)
+            limit_memory (:obj:`bool`, optional): whether the memory should be enforced on the child processes of the
+                simulation
+
+        Yields:
+            :obj:`Reservation`: reservation
+        """
+        reservation = self.acquire(processors, memory, limit_memory=limit_memory)
+        try:
+            yield reservation
+        finally:
+            self.release(reservation)
+
+    def get_stats(self):
+        """ Get the state of the scheduler
+
+        Returns:
+            :obj:`dict`: number of free processors, free memory, and number of waiting simulations
+        """
+        with self._condition:
+            return {
+                'freeProcessors': self.free_processors,
+                'freeMemory': self.free_memory,
+                'waiting': len(self._queue),
+            }
+
+
+def get_resource_scheduler():
+    """ Get the scheduler configured by the ``RESOURCE_SCHEDULER``, ``RESOURCE_SCHEDULER_PROCESSORS``, and
+    ``RESOURCE_SCHEDULER_MEMORY`` environment variables
+
+    Returns:
+        :obj:`ResourceScheduler`: scheduler, or :obj:`None` if the scheduler is not enabled
+    """
+    if os.getenv('RESOURCE_SCHEDULER', '0').lower() not in ['1', 'true']:
+        return None
+
+    if os.getenv('RESOURCE_SCHEDULER_PROCESSORS', None):
+        processors = int(float(os.getenv('RESOURCE_SCHEDULER_PROCESSORS')))
+    else:
+        processors = get_available_processors()
+
+    if os.getenv('RESOURCE_SCHEDULER_MEMORY', None):
+        memory = int(float(os.getenv('RESOURCE_SCHEDULER_MEMORY')))
+    else:
+        memory = get_available_memory() - RESERVED_MEMORY
+
+    key = (processors, memory)
+    if key not in _resource_schedulers:
+        _resource_schedulers[key] = ResourceScheduler(processors, memory)
+    return _resource_schedulers[key]
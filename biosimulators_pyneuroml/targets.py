@@ -0,0 +1,454 @@
+""" Index of the quantities of LEMS/NeuroML models, for checking the targets of the variables of tasks before they are
+simulated
+
+The targets of variables (e.g., ``hhpop[0]/bioPhys1/membraneProperties/NaConductances/NaConductance/m/q``) are paths
+to quantities of the components of models. Invalid targets are otherwise only discovered after jNeuroML has generated
+code for the model and the model has been simulated. :obj:`LemsTargetIndex` indexes the components of a LEMS
+document and the files that it includes (populations, cells, channels, and other components), and the component types
+of the document and of the NeuroML core types which are built into jNeuroML (their exposures, state variables, and
+children), so that :obj:`biosimulators_pyneuroml.core.preprocess_sed_task` can check targets in milliseconds.
+
+Paths are resolved from the network of the model:
+
+* ``population[index]/...`` and ``population/index/component/...``: instances of populations, whose indices must be less
+  than the sizes of the populations
+* ``.../child/...``: children of components, referenced by their ids or element names, or components referenced by
+  attributes of components (e.g., the ion channels of channel densities)
+* ``.../quantity``: exposures, parameters, and state and derived variables of the types of components
+
+Paths which can't be resolved with certainty (e.g., attachments, segments of multi-compartment cells, and components of
+types which aren't defined) are accepted, and left to the simulator to check.
+"""
+
+from .utils import read_xml_file
+from pyneuroml import pynml
+import collections
+import copy
+import lxml.etree
+import os
+import re
+import threading
+import weakref
+import zipfile
+
+__all__ = [
+    'LemsTargetIndex',
+    'get_lems_target_index',
+    'validate_variable_targets',
+]
+
+# elements of the definitions of component types which define quantities which can be recorded
+QUANTITY_ELEMENTS = ['Exposure', 'Parameter', 'DerivedParameter', 'Property', 'Constant',
+                     'StateVariable', 'DerivedVariable', 'ConditionalDerivedVariable']
+
+# elements of the definitions of component types which define children
+CHILD_ELEMENTS = ['Child', 'Children', 'ComponentReference', 'Attachments']
+
+# elements of documents which aren't components
+NON_COMPONENT_ELEMENTS = ['Include', 'include', 'ComponentType', 'Simulation', 'Target', 'Dimension', 'Unit', 'Assertion',
+                          'notes', 'annotation']
+
+# attributes of components which determine the structure of models, rather than the values of their parameters
+STRUCTURAL_ATTRIBUTES = ['id', 'type', 'component', 'size', 'file', 'href', 'extends']
+
+# directory of the NeuroML core types in the jNeuroML jar
+CORE_TYPES_DIRNAME = 'NeuroML2CoreTypes/'
+
+# dictionary that maps the path to the jNeuroML jar to the NeuroML core types which are built into it
+_core_types = {}
+
+# maximum number of files of models whose indexes are cached
+TARGET_INDEX_CACHE_MAX_FILES = 100
+
+# dictionary that maps each model (:obj:`LemsModelState` or :obj:`CachedLemsModel`) to a dictionary that maps its working
+# directory and the changes which structure its document to its index
+_target_indexes = weakref.WeakKeyDictionary()
+
+# dictionary that maps the path of the file of each model, in order of use, to a dictionary that maps its working
+# directory and the changes which structure its document to its index
+_file_target_indexes = collections.OrderedDict()
+
+_target_indexes_lock = threading.Lock()
+
+
+class LemsTargetIndex(object):
+    """ Index of the components and component types of a LEMS document and the files that it includes
+
+    Attributes:
+        components (:obj:`dict`): dictionary that maps the id of each top-level component to its element
+        component_types (:obj:`dict`): dictionary that maps the name of each component type to a tuple of the name of the
+            type that it extends, the names of its quantities (:obj:`set`) and children (:obj:`set`), and whether it
+            instantiates children dynamically (:obj:`bool`)
+        included_files (:obj:`dict`): dictionary that maps the path of each included file (and of the file of the
+            document, if known) to its modification time and size
+        _resolved_paths (:obj:`dict`): dictionary that maps each component and path which have been resolved to the
+            error of the path, or :obj:`None` if the path is valid
+    """
+
+    def __init__(self, lems_xml_root, working_dirname='.'):
+        """
+        Args:
+            lems_xml_root (:obj:`lxml.etree._Element`): LEMS document. The index refers to elements of the document,
+                which shouldn't be modified after the document is indexed.
+            working_dirname (:obj:`str`, optional): working directory for the LEMS document
+        """
+        self.components = {}
+        self.component_types = dict(get_neuroml_core_types())
+        self.included_files = {}
+        self._resolved_paths = {}
+
+        xml_roots_to_visit = [(lems_xml_root, working_dirname)]
+        while xml_roots_to_visit:
+            xml_root, dirname = xml_roots_to_visit.pop(0)
+            for element in xml_root:
+                if not isinstance(element.tag, str):
+                    continue
+                tag = lxml.etree.QName(element).localname
+
+                if tag in ['Include', 'include']:
+                    rel_filename = element.get('file' if tag == 'Include' else 'href', None)
+                    filename = os.path.abspath(os.path.join(dirname, rel_filename)) if rel_filename else None
+                    if filename and filename not in self.included_files and os.path.isfile(filename):
+                        stat = os.stat(filename)
+                        self.included_files[filename] = (stat.st_mtime_ns, stat.st_size)
+                        xml_roots_to_visit.append((read_xml_file(filename), os.path.dirname(filename)))
+
+                elif tag == 'ComponentType':
+                    self.component_types[element.get('name')] = _get_component_type(element)
+
+                elif tag not in NON_COMPONENT_ELEMENTS and element.get('id', None):
+                    self.components.setdefault(element.get('id'), element)
+
+    def is_current(self):
+        """ Determine whether the files included by the document haven't changed since the document was indexed
+
+        Returns:
+            :obj:`bool`: whether the included files are unchanged
+        """
+        for filename, (mtime, size) in self.included_files.items():
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                return False
+            if stat.st_mtime_ns != mtime or stat.st_size != size:
+                return False
+        return True
+
+    def check_target(self, network_id, target):
+        """ Check that a target is the path to a quantity of a network
+
+        Args:
+            network_id (:obj:`str`): id of the network (the target of the simulation of the document)
+            target (:obj:`str`): path to a quantity
+
+        Returns:
+            :obj:`str`: description of the error of the target, or :obj:`None` if the target is valid or can't be
+                checked
+        """
+        network = self.components.get(network_id, None)
+        if network is None:
+            return None
+
+        segments = target.split('/')
+        match = re.match(r'^([^\[\]]+)\[(\d+)\]$', segments[0])
+        if match:
+            child_id, index = match.group(1), int(match.group(2))
+        else:
+            child_id, index = segments[0], None
+
+        child = None
+        for element in network:
+            if isinstance(element.tag, str) and element.get('id', None) == child_id:
+                child = element
+                break
+
+        if child is None:
+            if len(segments) == 1 and index is None:
+                return self._resolve_path(network, segments)
+            return '`{}` is not a population or other component of network `{}`'.format(child_id, network_id)
+
+        if self._get_component_type_name(child) not in ['population', 'populationList']:
+            return self._resolve_path(child, segments[1:])
+
+        # path to an instance of a population
+        rest = segments[1:]
+        if index is None and rest and rest[0].isdigit():
+            index = int(rest[0])
+            rest = rest[1:]
+            if rest and rest[0] == child.get('component', None):
+                rest = rest[1:]
+
+        size = child.get('size', None)
+        if size is None:
+            size = len(child.xpath("*[local-name()='instance']")) or None
+        elif size.isdigit():
+            size = int(size)
+        else:
+            size = None
+        if index is not None and size is not None and index >= size:
+            return 'population `{}` has {} instances, and does not have instance {}'.format(child_id, size, index)
+
+        component = self.components.get(child.get('component', None), None)
+        if component is None or not rest:
+            return None
+        return self._resolve_path(component, rest)
+
+    def _resolve_path(self, element, segments):
+        """ Resolve a path from a component
+
+        Args:
+            element (:obj:`lxml.etree._Element`): component
+            segments (:obj:`list` of :obj:`str`): segments of the path
+
+        Returns:
+            :obj:`str`: description of the error of the path, or :obj:`None` if the path is valid or can't be checked
+        """
+        key = (element, tuple(segments))
+        if key not in self._resolved_paths:
+            self._resolved_paths[key] = self._resolve_path_uncached(element, segments)
+        return self._resolved_paths[key]
+
+    def _resolve_path_uncached(self, element, segments):
+        """ Resolve a path from a component, without memoization
+
+        Args:
+            element (:obj:`lxml.etree._Element`): component
+            segments (:obj:`list` of :obj:`str`): segments of the path
+
+        Returns:
+            :obj:`str`: description of the error of the path, or :obj:`None` if the path is valid or can't be checked
+        """
+        for i_segment, segment in enumerate(segments):
+            component_type = self._get_inherited_component_type(self._get_component_type_name(element))
+            if component_type is None or re.search(r'[:\[\]*]', segment):
+                return None
+            quantities, child_names, dynamic = component_type
+
+            if i_segment == len(segments) - 1 and segment in quantities:
+                return None
+
+            # children referenced by their ids or element names
+            child = None
+            for child_element in element:
+                if isinstance(child_element.tag, str) and segment in [child_element.get('id', None),
+                                                                      lxml.etree.QName(child_element).localname]:
+                    child = child_element
+                    break
+
+            # components referenced by the attributes of the component (e.g., the ion channels of channel densities)
+            if child is None:
+                if segment in element.attrib.values() or segment in child_names:
+                    child = self.components.get(element.get(segment, segment), None)
+                    if child is None:
+                        return None
+
+            # other descendants, such as the segments of multi-compartment cells, and children which are instantiated
+            # dynamically
+            if child is None:
+                if dynamic or element.xpath('.//*[@id=$id]', id=segment):
+                    return None
+
+                element_id = element.get('id', None)
+                return '`{}` is not a quantity or child of {} `{}`'.format(
+                    segment, self._get_component_type_name(element),
+                    element_id if element_id else lxml.etree.QName(element).localname)
+
+            element = child
+
+        return None
+
+    def _get_component_type_name(self, element):
+        """ Get the name of the type of a component
+
+        Args:
+            element (:obj:`lxml.etree._Element`): component
+
+        Returns:
+            :obj:`str`: name of the type of the component
+        """
+        type_name = element.get('type', None)
+        if type_name and type_name in self.component_types:
+            return type_name
+        return lxml.etree.QName(element).localname
+
+    def _get_inherited_component_type(self, name):
+        """ Get the quantities and children of a component type, including those which it inherits
+
+        Args:
+            name (:obj:`str`): name of the component type
+
+        Returns:
+            :obj:`tuple`: names of the quantities (:obj:`set`) and children (:obj:`set`) of the type, and whether it
+                instantiates children dynamically (:obj:`bool`), or :obj:`None` if the type or a type which it extends
+                isn't defined
+        """
+        quantities = set()
+        child_names = set()
+        dynamic = False
+        names = set()
+        while name:
+            if name in names or name not in self.component_types:
+                return None
+            names.add(name)
+            name, type_quantities, type_child_names, type_dynamic = self.component_types[name]
+            quantities.update(type_quantities)
+            child_names.update(type_child_names)
+            dynamic = dynamic or type_dynamic
+        return quantities, child_names, dynamic
+
+
+def get_neuroml_core_types():
+    """ Get the NeuroML core component types which are built into jNeuroML
+
+    Returns:
+        :obj:`dict`: dictionary that maps the name of each component type to a tuple of the name of the type that it
+            extends, the names of its quantities (:obj:`set`) and children (:obj:`set`), and whether it instantiates
+            children dynamically (:obj:`bool`). The dictionary is empty if the jNeuroML jar can't be read.
+    """
+    try:
+        jar_filename = pynml.get_path_to_jnml_jar()
+    except Exception:
+        jar_filename = None
+
+    if jar_filename not in _core_types:
+        component_types = {}
+        if jar_filename and os.path.isfile(jar_filename):
+            with zipfile.ZipFile(jar_filename) as jar_file:
+                for name in jar_file.namelist():
+                    if name.startswith(CORE_TYPES_DIRNAME) and name.endswith('.xml'):
+                        xml_root = lxml.etree.fromstring(jar_file.read(name))
+                        for element in xml_root.xpath("/*[local-name()='Lems']/*[local-name()='ComponentType']"):
+                            component_types[element.get('name')] = _get_component_type(element)
+        _core_types[jar_filename] = component_types
+    return _core_types[jar_filename]
+
+
+def _get_component_type(element):
+    """ Get the name of the type extended by a component type, the names of its quantities and children, and whether it
+    instantiates children dynamically (e.g., the instances of populations)
+
+    Args:
+        element (:obj:`lxml.etree._Element`): definition of the component type
+
+    Returns:
+        :obj:`tuple`: name of the type that the type extends, the names of its quantities (:obj:`set`) and children
+            (:obj:`set`), and whether it instantiates children dynamically (:obj:`bool`)
+    """
+    quantities = set()
+    child_names = set()
+    dynamic = False
+    for child in element.iter():
+        if not isinstance(child.tag, str):
+            continue
+        tag = lxml.etree.QName(child).localname
+        if tag in QUANTITY_ELEMENTS:
+            quantities.add(child.get('name'))
+        elif tag in CHILD_ELEMENTS:
+            child_names.add(child.get('name'))
+        elif tag == 'MultiInstantiate':
+            dynamic = True
+    return element.get('extends', None), quantities, child_names, dynamic
+
+
+def get_lems_target_index(model, working_dirname, changes=None, model_filename=None):
+    """ Get the index of the quantities of a LEMS document, indexing the document if it hasn't been indexed, or if its
+    included files have changed since it was indexed
+
+    Documents are indexed with the changes which can change their structure (e.g., change the files that they include,
+    or the components that they reference). Changes to the values of parameters share the index of the document without
+    changes. Indexes are shared by the parsed views of the same file (e.g., each read by a different task), while the
+    file is unchanged, or by the same view if the path to its file isn't given.
+
+    Args:
+        model (:obj:`LemsModelState` or :obj:`CachedLemsModel`): document
+        working_dirname (:obj:`str`): working directory for the document
+        changes (:obj:`list` of :obj:`ModelAttributeChange`, optional): changes to the document
+        model_filename (:obj:`str`, optional): path to the file of the document
+
+    Returns:
+        :obj:`LemsTargetIndex`: index
+    """
+    index = _get_lems_target_index(model, working_dirname, [], model_filename=model_filename)
+
+    structural_changes = [
+        change for change in (changes or [])
+        if (
+            change.target.rpartition('/@')[2].rpartition(':')[2] in STRUCTURAL_ATTRIBUTES
+            or str(change.new_value) in index.components
+        )
+    ]
+    if structural_changes:
+        index = _get_lems_target_index(model, working_dirname, structural_changes, model_filename=model_filename)
+    return index
+
+
+def _get_lems_target_index(model, working_dirname, changes, model_filename=None):
+    """ Get the index of the quantities of a LEMS document with changes
+
+    Args:
+        model (:obj:`LemsModelState` or :obj:`CachedLemsModel`): document
+        working_dirname (:obj:`str`): working directory for the document
+        changes (:obj:`list` of :obj:`ModelAttributeChange`): changes to the document
+        model_filename (:obj:`str`, optional): path to the file of the document
+
+    Returns:
+        :obj:`LemsTargetIndex`: index
+    """
+    key = (
+        os.path.abspath(working_dirname),
+        tuple((change.target, tuple(sorted((change.target_namespaces or {}).items(), key=lambda item: (item[0] or '', item[1]))),
+               str(change.new_value)) for change in changes),
+    )
+
+    if model_filename:
+        model_filename = os.path.abspath(model_filename)
+        model_stat = os.stat(model_filename)
+
+    with _target_indexes_lock:
+        if model_filename:
+            indexes = _file_target_indexes.setdefault(model_filename, {})
+            _file_target_indexes.move_to_end(model_filename)
+            while len(_file_target_indexes) > TARGET_INDEX_CACHE_MAX_FILES:
+                _file_target_indexes.popitem(last=False)
+        else:
+            indexes = _target_indexes.setdefault(model, {})
+        index = indexes.get(key, None)
+    if index is not None and index.is_current():
+        return index
+
+    # the document is indexed from a copy, so that the index isn't affected by the executions which modify the document
+    with model.use() as model_state:
+        model_state.apply_changes(changes)
+        lems_xml_root = copy.deepcopy(model_state.root)
+    index = LemsTargetIndex(lems_xml_root, working_dirname)
+
+    # the index of a file is only current while the file is unchanged
+    if model_filename:
+        index.included_files[model_filename] = (model_stat.st_mtime_ns, model_stat.st_size)
+
+    with _target_indexes_lock:
+        indexes[key] = index
+    return index
+
+
+def validate_variable_targets(index, network_id, variables):
+    """ Check that the targets of variables are paths to quantities of a network
+
+    Args:
+        index (:obj:`LemsTargetIndex`): index of the document of the network
+        network_id (:obj:`str`): id of the network
+        variables (:obj:`list` of :obj:`Variable`): variables
+
+    Raises:
+        :obj:`ValueError`: if the target of a variable isn't a path to a quantity of the network
+    """
+    errors = []
+    for variable in variables:
+        if variable.target:
+            error = index.check_target(network_id, variable.target)
+            if error:
+                errors.append('Variable `{}` (`{}`): {}'.format(variable.id, variable.target, error))
+
+    if errors:
+        raise ValueError('The targets of {} variables are not quantities of model `{}`:\n  {}'.format(
+            len(errors), network_id, '\n  '.join(errors)))
@@ -0,0 +1,161 @@
+""" Utilities for measuring the durations of the phases of the execution of tasks
+
+The phases of the execution of a task (e.g., reading the model, generating code, simulating) are spread across several
+modules. So that their durations can be measured without threading a timer through each method, the timings of a task
+are stored in a context variable (see :obj:`record_phase_timings`), and each phase is marked with :obj:`time_phase`.
+When no timings are being recorded (e.g., when logging is disabled), :obj:`time_phase` does nothing.
+
+Phases can be nested. The duration of each phase is exclusive of the phases nested within it. Consequently, the
+durations of the phases of a task sum to its total duration, and the time of a task which isn't spent in any marked
+phase is attributed to the phase named by :obj:`record_phase_timings`.
+
+CPU times include the CPU time of this process (all of its threads) and of its child processes which have been waited
+for (e.g., jNeuroML, NEURON, and ``nrnivmodl``).
+"""
+
+import contextlib
+import contextvars
+import os
+import time
+
+__all__ = [
+    'PhaseTimings',
+    'record_phase_timings',
+    'time_phase',
+]
+
+_timings = contextvars.ContextVar('biosimulators_pyneuroml_phase_timings', default=None)
+
+
+def _get_cpu_time():
+    """ Get the CPU time of this process and its child processes
+
+    Returns:
+        :obj:`float`: CPU time in seconds
+    """
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+class PhaseTimings(object):
+    """ Wall-clock and CPU times of the phases of the execution of a task
+
+    Attributes:
+        phases (:obj:`dict`): dictionary that maps the name of each phase to its wall-clock and CPU times in seconds
+        _stack (:obj:`list` of :obj:`list`): name, start times, and durations of nested phases of each running phase
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._stack = []
+
+    def start(self, name):
+        """ Start a phase
+
+        Args:
+            name (:obj:`str`): name of the phase
+        """
+        self._stack.append([name, time.perf_counter(), _get_cpu_time(), 0., 0.])
+
+    def stop(self):
+        """ Stop the most recently started phase """
+        name, wall_start, cpu_start, nested_wall_time, nested_cpu_time = self._stack.pop()
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = _get_cpu_time() - cpu_start
+        self.add(name, wall_time - nested_wall_time, cpu_time - nested_cpu_time)
+
+        if self._stack:
+            self._stack[-1][3] += wall_time
+            self._stack[-1][4] += cpu_time
+
+    def add(self, name, wall_time, cpu_time):
+        """ Add time to a phase
+
+        Args:
+            name (:obj:`str`): name of the phase
+            wall_time (:obj:`float`): wall-clock time in seconds
+            cpu_time (:obj:`float`): CPU time in seconds
+        """
+        phase = self.phases.setdefault(name, {'wallTime': 0., 'cpuTime': 0.})
+        phase['wallTime'] += wall_time
+        phase['cpuTime'] += max(cpu_time, 0.)
+
+    def update(self, other):
+        """ Add the times of the phases of other timings
+
+        Args:
+            other (:obj:`PhaseTimings`): other timings
+        """
+        for name, phase in other.phases.items():
+            self.add(name, phase['wallTime'], phase['cpuTime'])
+
+    def to_dict(self):
+        """ Get a JSON-compatible representation of the timings, including the total time of all phases
+
+        Returns:
+            :obj:`dict`: dictionary that maps the name of each phase (and ``total``) to its wall-clock and CPU times
+                in seconds
+        """
+        value = {
+            name: {'wallTime': round(phase['wallTime'], 6), 'cpuTime': round(phase['cpuTime'], 6)}
+            for name, phase in self.phases.items()
+        }
+        value['total'] = {
+            'wallTime': round(sum(phase['wallTime'] for phase in self.phases.values()), 6),
+            'cpuTime': round(sum(phase['cpuTime'] for phase in self.phases.values()), 6),
+        }
+        return value
+
+
+@contextlib.contextmanager
+def record_phase_timings(timings, name):
+    """ Record the timings of the phases marked with :obj:`time_phase` within a context, and the time of the context
+    which isn't spent in these phases as the phase :obj:`name`
+
+    Args:
+        timings (:obj:`PhaseTimings`): timings, or :obj:`None` to not record timings
+        name (:obj:`str`): name of the phase for the time which isn't spent in other phases (e.g., ``execute``)
+
+    Yields:
+        :obj:`PhaseTimings`: timings
+    """
+    token = _timings.set(timings)
+    try:
+        if timings is None:
+            yield timings
+        else:
+            with _time_phase(timings, name):
+                yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextlib.contextmanager
+def _time_phase(timings, name):
+    """ Measure the duration of a phase
+
+    Args:
+        timings (:obj:`PhaseTimings`): timings
+        name (:obj:`str`): name of the phase
+    """
+    timings.start(name)
+    try:
+        yield
+    finally:
+        timings.stop()
+
+
+def time_phase(name):
+    """ Get a context manager which measures the duration of a phase, if timings are being recorded (see
+    :obj:`record_phase_timings`)
+
+    Args:
+        name (:obj:`str`): name of the phase (e.g., ``simulate``)
+
+    Returns:
+        :obj:`contextlib.AbstractContextManager`: context manager
+    """
+    timings = _timings.get()
+    if timings is None:
+        return contextlib.nullcontext()
+    return _time_phase(timings, name)
@@ -6,38 +6,82 @@
 :License: MIT
 """
 
+from ._version import __version__
 from .data_model import Simulator, KISAO_ALGORITHM_MAP, RunLemsOptions, SEDML_TIME_OUTPUT_COLUMN_ID, SEDML_OUTPUT_FILE_ID
+from .cgroups import get_cgroup_cpu_limit, get_cgroup_available_memory
+from .binary_outputs import (is_binary_output_enabled, get_binary_output_filename, rewrite_script_to_save_binary_outputs,
+                             read_binary_output_file)
+from .code_cache import get_code_cache, get_neuron_code_cache_key, get_lems_simulation_time_settings, set_neuron_script_time_settings
+from .jvm import (is_in_process_simulation_enabled, run_lems_with_jneuroml_in_jvm, get_jvm_cds_dirname, run_jneuroml,
+                  run_lems_with_jneuroml as run_lems_with_jneuroml_with_cds)
+from .mechanism_store import MECHANISM_SOURCE_EXTENSIONS, get_mechanism_store, get_mechanism_store_key
+from .mpi import get_mpi_hostfile, get_mpi_num_ranks, get_mpiexec_args, write_mpi_launcher
+from .neuron_parameters import set_neuron_script_runtime_parameters
+from .nrn import run_neuron_script_in_process
+from .resource_usage import set_monitored_directory
+from .timing import time_phase
 from biosimulators_utils.config import get_config
 from biosimulators_utils.log.utils import StandardOutputErrorCapturer
-from biosimulators_utils.sedml.data_model import (ModelLanguage, ModelAttributeChange, UniformTimeCourseSimulation,   # noqa: F401
+from biosimulators_utils.sedml.data_model import (Model, ModelLanguage, ModelAttributeChange, UniformTimeCourseSimulation,   # noqa: F401
                                                   Task, Variable, Symbol)
 from biosimulators_utils.sedml import validation
 from biosimulators_utils.simulator.utils import get_algorithm_substitution_policy
 from biosimulators_utils.utils.core import raise_errors_warnings
+from kisao.exceptions import AlgorithmCannotBeSubstitutedException
 from kisao.utils import get_preferred_substitute_algorithm_by_ids
-from pyneuroml import pynml
+import functools
+import hashlib
+import json
 import lxml.etree
+import math
+import mmap
+import numpy
 import os
 import pandas
 import psutil
+import shutil
+import subprocess
 import sys
 import tempfile
+import warnings
 
 __all__ = [
     'validate_task',
+    'get_sedml_object_fingerprint',
+    'get_substitute_algorithm',
     'validate_lems_document',
     'set_sim_in_lems_xml',
     'run_lems_xml',
+    'run_lems_with_jneuroml_neuron',
+    'run_lems_with_jneuroml_neuron_in_process',
+    'run_lems_with_jneuroml_netpyne',
+    'run_lems_with_jneuroml_brian2',
     'get_simulator_run_lems_method',
     'get_run_lems_options',
     'get_available_processors',
     'get_available_memory',
+    'get_num_task_workers',
     'read_xml_file',
     'write_xml_file',
+    'get_lems_included_files',
+    'hash_file',
+    'get_cache_key',
+    'get_lems_num_cells',
     'read_lems_output_files_configuration',
     'write_lems_output_files_configuration',
+    'read_lems_output_files',
+    'read_lems_output_file',
+    'get_offset_of_last_lines',
 ]
 
+# dictionary that maps each requested algorithm, simulator, and substitution policy to the algorithm which should be
+# executed, the warnings issued by the substitution, and the exception raised if the algorithm can't be substituted
+_algorithm_substitutions = {}
+
+# dictionary that maps each kind of validation and fingerprint of the validated SED objects to the errors and warnings of
+# the validation
+_validation_results = {}
+
 
 def validate_task(task, variables, simulator, config=None):
     """ Validate a task
@@ -57,19 +101,36 @@ def validate_task(task, variables, simulator, config=None):
     sim = task.simulation
 
     if config.VALIDATE_SEDML:
+        # the results of the validation of models, simulations, and variables are memoized by their fingerprints, so that
+        # tasks which share models and simulations (e.g., the tasks of large SED documents) validate them once
         raise_errors_warnings(validation.validate_task(task),
                               error_summary='Task `{}` is invalid.'.format(task.id))
-        raise_errors_warnings(validation.validate_model_language(task.model.language, ModelLanguage.LEMS),
+
+        model_fingerprint = get_sedml_object_fingerprint(model)
+        raise_errors_warnings(*_get_validation_result(('modelLanguage', model_fingerprint), validation.validate_model_language,
+                                                      model.language, ModelLanguage.LEMS),
                               error_summary='Language for model `{}` is not supported.'.format(model.id))
-        raise_errors_warnings(validation.validate_model_change_types(task.model.changes, (ModelAttributeChange,)),
+        raise_errors_warnings(*_get_validation_result(('modelChangeTypes', model_fingerprint), validation.validate_model_change_types,
+                                                      model.changes, (ModelAttributeChange,)),
                               error_summary='Changes for model `{}` are not supported.'.format(model.id))
-        raise_errors_warnings(*validation.validate_model_changes(task.model),
+        raise_errors_warnings(*_get_validation_result(('modelChanges', model_fingerprint), validation.validate_model_changes,
+                                                      model),
                               error_summary='Changes for model `{}` are invalid.'.format(model.id))
-        raise_errors_warnings(validation.validate_simulation_type(sim, (UniformTimeCourseSimulation, )),
+
+        sim_fingerprint = get_sedml_object_fingerprint(sim)
+        raise_errors_warnings(*_get_validation_result(('simulationType', sim_fingerprint), validation.validate_simulation_type,
+                                                      sim, (UniformTimeCourseSimulation, )),
                               error_summary='{} `{}` is not supported.'.format(sim.__class__.__name__, sim.id))
-        raise_errors_warnings(*validation.validate_simulation(sim),
+        raise_errors_warnings(*_get_validation_result(('simulation', sim_fingerprint), validation.validate_simulation,
+                                                      sim),
                               error_summary='Simulation `{}` is invalid.'.format(sim.id))
-        raise_errors_warnings(*validation.validate_data_generator_variables(variables),
+
+        variables_fingerprint = (task.__class__, model_fingerprint) + tuple(
+            get_sedml_object_fingerprint(variable) for variable in variables)
+        if None in variables_fingerprint:
+            variables_fingerprint = None
+        raise_errors_warnings(*_get_validation_result(('variables', variables_fingerprint),
+                                                      validation.validate_data_generator_variables, variables),
                               error_summary='Data generator variables for task `{}` are invalid.'.format(task.id))
 
     if sim.initial_time != 0:
@@ -90,13 +151,8 @@ def validate_task(task, variables, simulator, config=None):
         ).format(number_of_steps, sim.initial_time, sim.output_start_time, sim.output_end_time, sim.number_of_steps)
         raise NotImplementedError(msg)
 
-    simulator_kisao_alg_map = {kisao_id: alg_props for kisao_id,
-                               alg_props in KISAO_ALGORITHM_MAP.items() if simulator in alg_props['simulators']}
-
     algorithm_substitution_policy = get_algorithm_substitution_policy(config=config)
-    exec_kisao_id = get_preferred_substitute_algorithm_by_ids(
-        sim.algorithm.kisao_id, simulator_kisao_alg_map.keys(),
-        substitution_policy=algorithm_substitution_policy)
+    exec_kisao_id = get_substitute_algorithm(sim.algorithm.kisao_id, simulator, algorithm_substitution_policy)
 
     if sim.algorithm.changes:
         raise NotImplementedError('Algorithm parameters are not supported.')
@@ -110,6 +166,124 @@ def validate_task(task, variables, simulator, config=None):
     return exec_kisao_id
 
 
+def get_sedml_object_fingerprint(obj):
+    """ Get a fingerprint of the structure of a SED object (e.g., a model and its changes, a simulation and its algorithm,
+    or a variable), which can be used to memoize the validation of the object
+
+    Args:
+        obj (:obj:`SedBase`): SED object
+
+    Returns:
+        :obj:`tuple`: fingerprint, or :obj:`None` if the object can't be fingerprinted
+    """
+    if obj is None:
+        return None
+
+    fingerprint = (obj.__class__, _freeze_sedml_tuple(obj.to_tuple()))
+    if isinstance(obj, Model):
+        fingerprint += (tuple(change.__class__ for change in obj.changes),)
+
+    try:
+        hash(fingerprint)
+    except TypeError:
+        return None
+    return fingerprint
+
+
+def _freeze_sedml_tuple(value):
+    """ Convert the tuple representation of a SED object to a hashable value
+
+    Args:
+        value (:obj:`object`): tuple representation of a SED object, or an element of a representation
+
+    Returns:
+        :obj:`object`: hashable value
+    """
+    if isinstance(value, dict):
+        return tuple(sorted(((key, _freeze_sedml_tuple(val)) for key, val in value.items()), key=lambda item: str(item[0])))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_sedml_tuple(val) for val in value)
+    return value
+
+
+def _get_validation_result(key, validate, *args):
+    """ Get the errors and warnings of a validation of a SED object, memoized by the fingerprint of the object
+
+    Args:
+        key (:obj:`tuple`): kind of validation and fingerprint of the validated object(s). Results aren't memoized
+            if the fingerprint is :obj:`None`.
+        validate (:obj:`types.FunctionType`): validation function
+        *args (:obj:`list`): arguments to the validation function
+
+    Returns:
+        :obj:`tuple`:
+
+            * nested :obj:`list` of :obj:`str`: nested list of errors
+            * nested :obj:`list` of :obj:`str`: nested list of warnings
+    """
+    memoize = key[1] is not None
+
+    result = _validation_results.get(key, None) if memoize else None
+    if result is None:
+        result = validate(*args)
+        if not isinstance(result, tuple):
+            result = (result, [])
+
+        if memoize:
+            _validation_results[key] = result
+    return result
+
+
+def get_substitute_algorithm(kisao_id, simulator, substitution_policy):
+    """ Get the algorithm of a simulator which should be executed for a requested algorithm
+
+    Substitutions are memoized for the process, so that the KiSAO ontology is only loaded (by
+    :obj:`get_preferred_substitute_algorithm_by_ids`) for requested algorithms which the simulator doesn't implement, and
+    only once for each requested algorithm, simulator, and substitution policy. The warnings of substitutions are issued
+    each time that they are requested.
+
+    Args:
+        kisao_id (:obj:`str`): KiSAO id of the requested algorithm
+        simulator (:obj:`Simulator`): simulator
+        substitution_policy (:obj:`AlgorithmSubstitutionPolicy`): algorithm substitution policy
+
+    Returns:
+        :obj:`str`: KiSAO id of the algorithm to execute
+
+    Raises:
+        :obj:`AlgorithmCannotBeSubstitutedException`: if no algorithm of the simulator can be substituted for the
+            requested algorithm at the substitution policy
+    """
+    key = (kisao_id, simulator, substitution_policy)
+    substitution = _algorithm_substitutions.get(key, None)
+    if substitution is None:
+        simulator_kisao_ids = [alg_kisao_id for alg_kisao_id, alg_props in KISAO_ALGORITHM_MAP.items()
+                               if simulator in alg_props['simulators']]
+        if kisao_id in simulator_kisao_ids:
+            substitution = (kisao_id, [], None)
+
+        else:
+            exec_kisao_id = None
+            exception = None
+            with warnings.catch_warnings(record=True) as caught_warnings:
+                warnings.simplefilter('always')
+                try:
+                    exec_kisao_id = get_preferred_substitute_algorithm_by_ids(kisao_id, simulator_kisao_ids,
+                                                                              substitution_policy=substitution_policy)
+                except AlgorithmCannotBeSubstitutedException as caught_exception:
+                    exception = caught_exception
+            substitution = (exec_kisao_id, [(warning.message, warning.category) for warning in caught_warnings], exception)
+
+        _algorithm_substitutions[key] = substitution
+
+    exec_kisao_id, substitution_warnings, exception = substitution
+    for message, category in substitution_warnings:
+        warnings.warn(message, category)
+    if exception is not None:
+        raise exception.__class__(*exception.args)
+    return exec_kisao_id
+
+
 def validate_lems_document(lems_xml_root):
     """ Validate LEMS document
 
@@ -177,9 +351,13 @@ def set_sim_in_lems_xml(simulation_xml, task, variables, simulator=Simulator.pyn
 
 def run_lems_xml(lems_xml_root, working_dirname='.', lems_filename=None,
                  simulator=Simulator.pyneuroml, num_processors=None, max_memory=None, verbose=False,
-                 config=None):
+                 in_process=None, binary_outputs=None, num_output_rows=None, config=None, model_written=None):
     """Run a LEMS document with a simulator
 
+    Each simulation is executed in its own temporary directory. Files included by the LEMS document are resolved
+    relative to :obj:`working_dirname`, which is only read. Consequently, multiple simulations can safely be executed
+    concurrently against the same working directory.
+
     Args:
         lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
         working_dirname (:obj:`str`, optional): working directory for the LEMS document
@@ -188,109 +366,582 @@ def run_lems_xml(lems_xml_root, working_dirname='.', lems_filename=None,
         num_processors (:obj:`int`, optional): number of processors to use (only used with NetPyNe)
         max_memory (:obj:`int`, optional): maximum memory to use in bytes
         verbose (:obj:`bool`, optional): whether to display extra information about simulation runs
+        in_process (:obj:`bool`, optional): whether to execute the simulation in the current process (only used with
+            jNeuroML/pyNeuroML and NEURON). Default: value of the ``SIMULATE_IN_PROCESS`` environment variable.
+        binary_outputs (:obj:`bool`, optional): whether to save the outputs of the simulation as binary files, rather
+            than as text (only used with NEURON, NetPyNE, and Brian 2). Default: value of the ``BINARY_OUTPUTS``
+            environment variable.
+        num_output_rows (:obj:`int`, optional): number of rows which should be read from the end of each output file.
+            Default: all rows.
         config (:obj:`Config`, optional): BioSimulators common configuration
+        model_written (:obj:`types.FunctionType`, optional): function which is called once the LEMS document has been
+            written to the temporary directory of the simulation, after which the document isn't read or changed (e.g.,
+            to allow other executions to use the document during the simulation)
 
     Returns:
         :obj:`dict` of :obj:`str` => :obj:`pandas.DataFrame`: dictionary that maps the id of each output file
             to a Pandas data frame with its value
     """
     config = config or get_config()
-    run_lems_method = get_simulator_run_lems_method(simulator)
-    options = get_run_lems_options(num_processors=num_processors, max_memory=max_memory, verbose=verbose)
-
-    # get outputs of LEMS document
-    output_file_configs = read_lems_output_files_configuration(lems_xml_root)
-
-    # config locations for outputs
-    for i_output_file, output_file_config in enumerate(output_file_configs):
-        output_file_config['file_name'] = str(i_output_file) + '.tsv'
-
-    # create a new LEMS document with outputs directed to temporary files
-    write_lems_output_files_configuration(lems_xml_root, output_file_configs)
-
-    fid, temp_lems_filename = tempfile.mkstemp(dir=working_dirname, suffix='.xml')
-    os.close(fid)
-    write_xml_file(lems_xml_root, temp_lems_filename)
-
-    if simulator == Simulator.pyneuroml:
-        temp_lems_filename_for_simulation = os.path.relpath(temp_lems_filename, working_dirname)
-        results_dirname = working_dirname
-        options.exec_in_dir = working_dirname
-    elif simulator in [Simulator.neuron, Simulator.netpyne]:
-        temp_lems_filename_for_simulation = os.path.relpath(temp_lems_filename, os.getcwd())
-        results_dirname = working_dirname
-    elif simulator == Simulator.brian2:
-        results_dirname = working_dirname
-        cwd = os.getcwd()
-        os.chdir(working_dirname)
-        sys.path.insert(0, working_dirname)
-        temp_lems_filename_for_simulation = os.path.relpath(temp_lems_filename, os.getcwd())
-
-    with StandardOutputErrorCapturer(relay=options.verbose, disabled=not config.LOG) as captured:
-        result = run_lems_method(temp_lems_filename_for_simulation, **options.to_kw_args(simulator))
-        if not result:
-            if simulator == Simulator.brian2:
-                os.chdir(cwd)
-
-            os.remove(temp_lems_filename)
-
-            msg = '`{}` was not able to execute {}'.format(
-                simulator.value,
-                '`{}`'.format(lems_filename) if lems_filename else 'the LEMS document')
-
-            if config.LOG:
-                std_out_err = captured.get_text()
-                if std_out_err:
-                    msg += '\n\n  ' + std_out_err.replace('\n', '\n  ')
-            raise RuntimeError(msg)
-
-    # restore working directory
-    if simulator == Simulator.brian2:
-        os.chdir(cwd)
-        sys.path.pop(0)
-
-    # read results
-    results = read_lems_output_files(output_file_configs, results_dirname, simulator=simulator)
-
-    # cleanup temporary files
-    os.remove(temp_lems_filename)
+    options = get_run_lems_options(num_processors=num_processors, max_memory=max_memory, verbose=verbose, in_process=in_process,
+                                   binary_outputs=binary_outputs)
+    run_lems_method = get_simulator_run_lems_method(simulator, in_process=options.in_process, binary_outputs=options.binary_outputs,
+                                                    num_processors=options.num_processors)
+
+    # execute the simulation in a private scratch directory so that concurrent simulations of the same document, or of
+    # documents in the same directory, don't overwrite each other's files (LEMS documents, generated scripts, compiled
+    # mechanisms, outputs)
+    scratch_dirname = os.path.abspath(tempfile.mkdtemp(prefix='biosimulators-pyneuroml-'))
+    set_monitored_directory(scratch_dirname)
+    try:
+        # get outputs of LEMS document
+        output_file_configs = read_lems_output_files_configuration(lems_xml_root)
+
+        # config locations for outputs. In-process simulations resolve output paths relative to the current directory
+        # of the process, rather than the directory of the LEMS document.
+        for i_output_file, output_file_config in enumerate(output_file_configs):
+            output_file_config['file_name'] = '{}.tsv'.format(i_output_file)
+            if options.in_process and simulator == Simulator.pyneuroml:
+                output_file_config['file_name'] = os.path.join(scratch_dirname, output_file_config['file_name'])
+
+        # create a new LEMS document with outputs directed to the scratch directory, and with the files that it includes
+        # resolved relative to its working directory
+        write_lems_output_files_configuration(lems_xml_root, output_file_configs)
+
+        include_attrs = []
+        for include_xml in lems_xml_root.xpath("/Lems/Include[@file] | /Lems/*[local-name()='include'][@href]"):
+            attr_name = 'file' if 'file' in include_xml.attrib else 'href'
+            rel_filename = include_xml.attrib[attr_name]
+            filename = os.path.abspath(os.path.join(working_dirname, rel_filename))
+            if not os.path.isabs(rel_filename) and os.path.isfile(filename):
+                include_attrs.append((include_xml, attr_name, rel_filename))
+                include_xml.attrib[attr_name] = filename
+
+        temp_lems_filename = os.path.join(scratch_dirname, 'simulation.xml')
+        try:
+            with time_phase('writeModel'):
+                write_xml_file(lems_xml_root, temp_lems_filename)
+        finally:
+            for include_xml, attr_name, rel_filename in include_attrs:
+                include_xml.attrib[attr_name] = rel_filename
+
+        if model_written:
+            model_written()
+
+        options.exec_in_dir = scratch_dirname
+
+        run_lems_kw_args = options.to_kw_args(simulator)
+        if run_lems_method == run_lems_with_jneuroml_neuron_in_process:
+            run_lems_kw_args['num_rows'] = num_output_rows
+
+        with StandardOutputErrorCapturer(relay=options.verbose, disabled=not config.LOG) as captured:
+            with time_phase('simulate'):
+                result = run_lems_method(os.path.basename(temp_lems_filename), **run_lems_kw_args)
+            if not result:
+                msg = '`{}` was not able to execute {}'.format(
+                    simulator.value,
+                    '`{}`'.format(lems_filename) if lems_filename else 'the LEMS document')
+
+                if config.LOG:
+                    std_out_err = captured.get_text()
+                    if std_out_err:
+                        msg += '\n\n  ' + std_out_err.replace('\n', '\n  ')
+                raise RuntimeError(msg)
+
+        # read results, unless the simulation returned them directly
+        with time_phase('readOutputs'):
+            if isinstance(result, dict):
+                results = {}
+                for output_file_config in output_file_configs:
+                    column_ids = [SEDML_TIME_OUTPUT_COLUMN_ID] + [column['id'] for column in output_file_config['columns']]
+                    results[output_file_config['id']] = pandas.DataFrame(
+                        dict(zip(column_ids, result[output_file_config['file_name']])), copy=False)
+            else:
+                results = read_lems_output_files(output_file_configs, scratch_dirname, simulator=simulator, num_rows=num_output_rows)
+
+    finally:
+        # cleanup temporary files
+        shutil.rmtree(scratch_dirname, ignore_errors=True)
 
     # return results
     return results
 
 
-def get_simulator_run_lems_method(simulator):
+def run_lems_with_jneuroml_neuron(lems_file_name, paths_to_include=None, max_memory=None, skip_run=False, nogui=True,
+                                  exec_in_dir='.', only_generate_scripts=False, compile_mods=True, verbose=False,
+                                  exit_on_fail=False, binary_outputs=False, **kwargs):
+    """ Execute a LEMS document with NEURON
+
+    This method mirrors the signature of :obj:`pyneuroml.pynml.run_lems_with_jneuroml_neuron`. Rather than having
+    jNeuroML both generate and execute a NEURON script, this method uses jNeuroML to generate the script (or copies it
+    from the code cache), compiles its mechanisms, optionally rewrites the script to save its outputs as binary files,
+    and then executes the script in a child Python process whose current directory is :obj:`exec_in_dir`.
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM which generates the script (e.g., ``1000M``)
+        skip_run (:obj:`bool`, optional): if :obj:`True`, only generate the NEURON script
+        nogui (:obj:`bool`, optional): whether to suppress the display of the results of the simulation
+        exec_in_dir (:obj:`str`, optional): directory in which the NEURON script should be generated and executed
+        only_generate_scripts (:obj:`bool`, optional): if :obj:`True`, only generate the NEURON script
+        compile_mods (:obj:`bool`, optional): whether to compile the mechanisms of the model
+        verbose (:obj:`bool`, optional): whether to display extra information about the simulation
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the simulation fails
+        binary_outputs (:obj:`bool`, optional): whether to save the outputs of the simulation as binary files
+        **kwargs: additional options for :obj:`pyneuroml.pynml.run_lems_with_jneuroml_neuron` which don't apply
+            (e.g., ``plot``)
+
+    Returns:
+        :obj:`bool`: whether the simulation succeeded
+    """
+    if not _generate_neuron_script(lems_file_name, paths_to_include=paths_to_include, max_memory=max_memory,
+                                   exec_in_dir=exec_in_dir, compile_mods=compile_mods, verbose=verbose, exit_on_fail=exit_on_fail):
+        return False
+
+    script_filename = os.path.splitext(lems_file_name)[0] + '_nrn.py'
+    if binary_outputs:
+        rewrite_script_to_save_binary_outputs(os.path.join(exec_in_dir, script_filename))
+
+    if skip_run or only_generate_scripts:
+        return True
+
+    args = [sys.executable, script_filename]
+    if nogui:
+        args.append('-nogui')
+    return _run_script(args, exec_in_dir, 'NEURON', verbose=verbose, exit_on_fail=exit_on_fail)
+
+
+def run_lems_with_jneuroml_neuron_in_process(lems_file_name, paths_to_include=None, max_memory=None, skip_run=False, nogui=True,
+                                             exec_in_dir='.', only_generate_scripts=False, verbose=False, exit_on_fail=False,
+                                             binary_outputs=False, num_rows=None, **kwargs):
+    """ Execute a LEMS document with NEURON in the current process
+
+    This method uses jNeuroML to generate a NEURON script (or copies it from the code cache), compiles its mechanisms,
+    and then executes the script in the current process with :obj:`run_neuron_script_in_process`. Rather than saving the results of the simulation to
+    files, this method returns them directly from the vectors which recorded them. If the mechanisms or cell templates
+    of the model conflict with those which have already been loaded into the current process, the script is instead
+    executed in a child process, as with :obj:`run_lems_with_jneuroml_neuron`.
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM which generates the script (e.g., ``1000M``)
+        skip_run (:obj:`bool`, optional): if :obj:`True`, only generate the NEURON script
+        nogui (:obj:`bool`, optional): whether to suppress the display of the results of the simulation
+        exec_in_dir (:obj:`str`, optional): directory in which the NEURON script should be generated
+        only_generate_scripts (:obj:`bool`, optional): if :obj:`True`, only generate the NEURON script
+        verbose (:obj:`bool`, optional): whether to display extra information about the simulation
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the simulation fails
+        binary_outputs (:obj:`bool`, optional): whether to save the outputs of the simulation as binary files, if the
+            simulation must be executed in a child process
+        num_rows (:obj:`int`, optional): number of rows which should be returned from the end of each output file.
+            Default: all rows.
+        **kwargs: additional options for :obj:`pyneuroml.pynml.run_lems_with_jneuroml_neuron` which don't apply
+            (e.g., ``plot``)
+
+    Returns:
+        :obj:`dict` of :obj:`str` => :obj:`list` of :obj:`numpy.ndarray` or :obj:`bool`: dictionary that maps the name
+            of each output file to a list of the values of its columns if the simulation was executed in the current
+            process; otherwise, whether the simulation succeeded
+    """
+    if not _generate_neuron_script(lems_file_name, paths_to_include=paths_to_include, max_memory=max_memory,
+                                   exec_in_dir=exec_in_dir, compile_mods=True, verbose=verbose, exit_on_fail=exit_on_fail):
+        return False
+
+    if skip_run or only_generate_scripts:
+        return True
+
+    script_filename = os.path.join(exec_in_dir, os.path.splitext(lems_file_name)[0] + '_nrn.py')
+    try:
+        results = run_neuron_script_in_process(script_filename, num_rows=num_rows)
+    except RuntimeError as exception:
+        print(str(exception), file=sys.stderr)
+        if exit_on_fail:
+            sys.exit(-1)
+        return False
+
+    if results is not None:
+        return results
+
+    # execute the simulation in a child process because it conflicts with models which have already been loaded
+    if binary_outputs:
+        rewrite_script_to_save_binary_outputs(script_filename)
+    args = [sys.executable, os.path.basename(script_filename)]
+    if nogui:
+        args.append('-nogui')
+    return _run_script(args, exec_in_dir, 'NEURON', verbose=verbose, exit_on_fail=exit_on_fail)
+
+
+def run_lems_with_jneuroml_netpyne(lems_file_name, paths_to_include=None, max_memory=None, skip_run=False, nogui=True,
+                                   num_processors=1, exec_in_dir='.', only_generate_scripts=False, verbose=False,
+                                   exit_on_fail=False, binary_outputs=False, **kwargs):
+    """ Execute a LEMS document with NetPyNE
+
+    This method mirrors the signature of :obj:`pyneuroml.pynml.run_lems_with_jneuroml_netpyne`. Rather than having
+    jNeuroML both generate and execute a NetPyNE script, this method uses jNeuroML to generate the script, compiles
+    its mechanisms, optionally rewrites the script to save its outputs as binary files, and then executes the script
+    in a child process whose current directory is :obj:`exec_in_dir`. If multiple processors are requested, or an MPI
+    hostfile is configured (see :obj:`get_mpi_hostfile`), the script is executed with MPI, with one rank per processor
+    (or slot of the hostfile), up to the number of cells of the network.
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM which generates the script (e.g., ``1000M``)
+        skip_run (:obj:`bool`, optional): if :obj:`True`, only generate the NetPyNE script
+        nogui (:obj:`bool`, optional): whether to suppress the display of the results of the simulation
+        num_processors (:obj:`int`, optional): number of processors to use
+        exec_in_dir (:obj:`str`, optional): directory in which the NetPyNE script should be generated and executed
+        only_generate_scripts (:obj:`bool`, optional): if :obj:`True`, only generate the NetPyNE script
+        verbose (:obj:`bool`, optional): whether to display extra information about the simulation
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the simulation fails
+        binary_outputs (:obj:`bool`, optional): whether to save the outputs of the simulation as binary files
+        **kwargs: additional options for :obj:`pyneuroml.pynml.run_lems_with_jneuroml_netpyne` which don't apply
+            (e.g., ``plot``)
+
+    Returns:
+        :obj:`bool`: whether the simulation succeeded
+    """
+    post_args = ' -netpyne -nogui' + _get_jneuroml_include_args(paths_to_include)
+    if not _generate_script_with_jneuroml(lems_file_name, post_args, Simulator.netpyne, max_memory=max_memory, exec_in_dir=exec_in_dir,
+                                          verbose=verbose, exit_on_fail=exit_on_fail):
+        return False
+
+    script_filename = os.path.splitext(lems_file_name)[0] + '_netpyne.py'
+    if binary_outputs:
+        rewrite_script_to_save_binary_outputs(os.path.join(exec_in_dir, script_filename))
+
+    if skip_run or only_generate_scripts:
+        return True
+
+    if not _compile_mod_files(exec_in_dir, verbose=verbose, exit_on_fail=exit_on_fail):
+        return False
+
+    hostfile = get_mpi_hostfile()
+    if (num_processors and num_processors > 1) or hostfile:
+        num_cells = get_lems_num_cells(read_xml_file(os.path.join(exec_in_dir, lems_file_name)), exec_in_dir)
+        num_ranks = get_mpi_num_ranks(num_processors, num_cells=num_cells, hostfile=hostfile)
+    else:
+        num_ranks = 1
+
+    if num_ranks > 1:
+        launcher_filename = write_mpi_launcher(exec_in_dir, script_filename, num_ranks)
+        args = get_mpiexec_args(num_ranks, hostfile=hostfile) + [_get_neuron_executable('nrniv'), '-mpi', '-python', launcher_filename]
+    else:
+        args = [sys.executable, script_filename]
+    if nogui:
+        args.append('-nogui')
+    return _run_script(args, exec_in_dir, 'NetPyNE', verbose=verbose, exit_on_fail=exit_on_fail)
+
+
+def run_lems_with_jneuroml_brian2(lems_file_name, paths_to_include=None, max_memory=None, skip_run=False, nogui=True,
+                                  exec_in_dir='.', verbose=False, exit_on_fail=False, binary_outputs=False, **kwargs):
+    """ Execute a LEMS document with Brian 2
+
+    This method mirrors the signature of :obj:`pyneuroml.pynml.run_lems_with_jneuroml_brian2`. Rather than importing the
+    Brian 2 script generated by jNeuroML into the current process (which requires changing the current directory and
+    the module search path of the process), this method executes the script in a child Python process whose current
+    directory is :obj:`exec_in_dir`. This enables multiple Brian 2 simulations to be executed concurrently, including by
+    multiple threads.
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files;
+            like :obj:`pyneuroml.pynml.run_lems_with_jneuroml_brian2`, this is ignored
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM which generates the script (e.g., ``1000M``)
+        skip_run (:obj:`bool`, optional): if :obj:`True`, only generate the Brian 2 script
+        nogui (:obj:`bool`, optional): whether to suppress the display of the results of the simulation
+        exec_in_dir (:obj:`str`, optional): directory in which the Brian 2 script should be generated and executed
+        verbose (:obj:`bool`, optional): whether to display extra information about the simulation
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the simulation fails
+        binary_outputs (:obj:`bool`, optional): whether to save the outputs of the simulation as binary files
+        **kwargs: additional options for :obj:`pyneuroml.pynml.run_lems_with_jneuroml_brian2` which don't apply
+            (e.g., ``plot``)
+
+    Returns:
+        :obj:`bool`: whether the simulation succeeded
+    """
+    if not _generate_script_with_jneuroml(lems_file_name, ' -brian2', Simulator.brian2, max_memory=max_memory, exec_in_dir=exec_in_dir,
+                                          verbose=verbose, exit_on_fail=exit_on_fail):
+        return False
+
+    script_filename = os.path.splitext(lems_file_name)[0] + '_brian2.py'
+    if binary_outputs:
+        rewrite_script_to_save_binary_outputs(os.path.join(exec_in_dir, script_filename))
+
+    if skip_run:
+        return True
+
+    args = [sys.executable, script_filename]
+    if nogui:
+        args.append('-nogui')
+    return _run_script(args, exec_in_dir, 'Brian 2', verbose=verbose, exit_on_fail=exit_on_fail)
+
+
+def _get_jneuroml_include_args(paths_to_include):
+    """ Get the arguments for jNeuroML for additional directories to search for included files
+
+    Args:
+        paths_to_include (:obj:`list` of :obj:`str`): directories
+
+    Returns:
+        :obj:`str`: arguments for jNeuroML
+    """
+    if not paths_to_include:
+        return ''
+    return " -I '{}'".format(':'.join(paths_to_include))
+
+
+def _generate_script_with_jneuroml(lems_file_name, post_args, simulator, max_memory=None, exec_in_dir='.', verbose=False,
+                                   exit_on_fail=False):
+    """ Use jNeuroML to generate a script for a LEMS document, with the class-data sharing archive of jNeuroML for the
+    simulator (see :obj:`use_jvm_cds_archive`)
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        post_args (:obj:`str`): arguments for jNeuroML (e.g., `` -neuron``)
+        simulator (:obj:`Simulator`): simulator of the script
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM (e.g., ``1000M``)
+        exec_in_dir (:obj:`str`, optional): directory in which the script should be generated
+        verbose (:obj:`bool`, optional): whether to display extra information
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the script can't be generated
+
+    Returns:
+        :obj:`bool`: whether the script was generated
+    """
+    with time_phase('generateCode'):
+        return run_jneuroml('', lems_file_name, post_args, max_memory=max_memory, exec_in_dir=exec_in_dir, verbose=verbose,
+                            exit_on_fail=exit_on_fail, cds_name=simulator.name)
+
+
+def _generate_neuron_script(lems_file_name, paths_to_include=None, max_memory=None, exec_in_dir='.', compile_mods=True,
+                            verbose=False, exit_on_fail=False):
+    """ Generate a NEURON script for a LEMS document with jNeuroML, or copy the code previously generated for the same
+    model from the code cache (see :obj:`get_code_cache`), and compile its mechanisms
+
+    Because the code cache is shared by variants of models which only differ in the values of parameters which can be set
+    at runtime, the script generated with the code cache sets the values of these parameters (see
+    :obj:`set_neuron_script_runtime_parameters`).
+
+    Args:
+        lems_file_name (:obj:`str`): path to the LEMS document, relative to :obj:`exec_in_dir`
+        paths_to_include (:obj:`list` of :obj:`str`, optional): additional directories to search for included files
+        max_memory (:obj:`str`, optional): maximum heap size of the JVM (e.g., ``1000M``)
+        exec_in_dir (:obj:`str`, optional): directory in which the script should be generated
+        compile_mods (:obj:`bool`, optional): whether to compile the mechanisms of the model
+        verbose (:obj:`bool`, optional): whether to display extra information
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the script can't be generated
+
+    Returns:
+        :obj:`bool`: whether the script was generated
+    """
+    post_args = ' -neuron -nogui' + _get_jneuroml_include_args(paths_to_include)
+    script_filename = os.path.join(exec_in_dir, os.path.splitext(lems_file_name)[0] + '_nrn.py')
+
+    with time_phase('generateCode'):
+        code_cache = get_code_cache()
+        if code_cache:
+            lems_xml_root = read_xml_file(os.path.join(exec_in_dir, lems_file_name))
+            time_settings = get_lems_simulation_time_settings(lems_xml_root)
+            if time_settings is None:
+                code_cache = None
+
+        if code_cache:
+            key = get_neuron_code_cache_key(lems_xml_root, get_lems_included_files(lems_xml_root, exec_in_dir),
+                                            jneuroml_args=os.path.basename(lems_file_name) + post_args)
+            if code_cache.get(key, exec_in_dir):
+                set_neuron_script_time_settings(script_filename, *time_settings)
+                generated = True
+            else:
+                filenames = set(os.listdir(exec_in_dir))
+                generated = _generate_script_with_jneuroml(lems_file_name, post_args, Simulator.neuron, max_memory=max_memory,
+                                                           exec_in_dir=exec_in_dir, verbose=verbose, exit_on_fail=exit_on_fail)
+                if generated:
+                    code_cache.set(key, exec_in_dir, sorted(
+                        filename for filename in set(os.listdir(exec_in_dir)).difference(filenames)
+                        if os.path.isfile(os.path.join(exec_in_dir, filename))
+                    ))
+            if generated:
+                set_neuron_script_runtime_parameters(script_filename, lems_xml_root)
+
+        else:
+            generated = _generate_script_with_jneuroml(lems_file_name, post_args, Simulator.neuron, max_memory=max_memory, exec_in_dir=exec_in_dir,
+                                                       verbose=verbose, exit_on_fail=exit_on_fail)
+
+    if not generated:
+        return False
+
+    if compile_mods:
+        return _compile_mod_files(exec_in_dir, verbose=verbose, exit_on_fail=exit_on_fail)
+    return True
+
+
+def _get_neuron_executable(name):
+    """ Get the path to a NEURON executable (e.g., ``nrniv``), preferring the installation of NEURON configured by
+    the ``NEURON_HOME`` environment variable
+
+    Args:
+        name (:obj:`str`): name of the executable
+
+    Returns:
+        :obj:`str`: path to the executable
+    """
+    if os.getenv('NEURON_HOME', None):
+        filename = os.path.join(os.getenv('NEURON_HOME'), 'bin', name)
+        if os.path.isfile(filename):
+            return filename
+    return name
+
+
+def _get_neuron_version():
+    """ Get the version of the installation of NEURON which compiles mechanisms
+
+    Returns:
+        :obj:`str`: version (e.g., ``NEURON -- VERSION 8.2.7 HEAD (34cf696c4) 2025-05-21``)
+    """
+    return _get_neuron_executable_version(_get_neuron_executable('nrniv'))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_neuron_executable_version(executable):
+    """ Get the version of a NEURON executable
+
+    Args:
+        executable (:obj:`str`): path to the executable
+
+    Returns:
+        :obj:`str`: version
+    """
+    process = subprocess.run([executable, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+    return executable + '\n' + process.stdout.decode(errors='replace').strip()
+
+
+def _compile_mod_files(dirname, verbose=False, exit_on_fail=False):
+    """ Compile the NEURON mechanisms (``.mod`` files) in a directory
+
+    If the mechanism store is enabled (see :obj:`get_mechanism_store`), the mechanisms are only compiled if the store
+    doesn't already contain them, and the compiled mechanisms are linked into the directory from the store.
+
+    Args:
+        dirname (:obj:`str`): directory
+        verbose (:obj:`bool`, optional): whether to display extra information
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the mechanisms can't be compiled
+
+    Returns:
+        :obj:`bool`: whether the mechanisms were compiled
+    """
+    with time_phase('compileMechanisms'):
+        if not any(filename.endswith('.mod') for filename in os.listdir(dirname)):
+            return True
+
+        def compile_mechanisms(dirname):
+            return _run_script([_get_neuron_executable('nrnivmodl')], dirname, 'nrnivmodl', verbose=verbose, exit_on_fail=exit_on_fail)
+
+        mechanism_store = get_mechanism_store()
+        if not mechanism_store:
+            return compile_mechanisms(dirname)
+
+        filenames = [
+            os.path.join(dirname, filename)
+            for filename in os.listdir(dirname)
+            if os.path.splitext(filename)[1] in MECHANISM_SOURCE_EXTENSIONS
+        ]
+        key = get_mechanism_store_key(filenames, _get_neuron_version())
+        if mechanism_store.get(key, dirname):
+            return True
+        return mechanism_store.add(key, filenames, compile_mechanisms) and mechanism_store.get(key, dirname)
+
+
+def _run_script(args, exec_in_dir, program_name, verbose=False, exit_on_fail=False):
+    """ Execute a program in a child process
+
+    Args:
+        args (:obj:`list` of :obj:`str`): program and its arguments
+        exec_in_dir (:obj:`str`): current directory for the program
+        program_name (:obj:`str`): name of the program for messages (e.g., ``NEURON``)
+        verbose (:obj:`bool`, optional): whether to display extra information
+        exit_on_fail (:obj:`bool`, optional): whether to exit if the program fails
+
+    Returns:
+        :obj:`bool`: whether the program succeeded
+    """
+    if verbose:
+        print('Executing `{}` in {}'.format(' '.join(args), exec_in_dir))
+
+    # flush the output of this process so that it isn't interleaved with that of the child process
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    process = subprocess.run(args, cwd=exec_in_dir)
+    if process.returncode != 0:
+        print('{} was not able to execute `{}`'.format(program_name, ' '.join(args)), file=sys.stderr)
+        if exit_on_fail:
+            sys.exit(-1)
+        return False
+
+    return True
+
+
+def get_simulator_run_lems_method(simulator, in_process=False, binary_outputs=False, num_processors=None):
     """Get the LEMS run method for a simulator
 
     Args:
         simulator (:obj:`Simulator`): simulator to run the LEMS document
+        in_process (:obj:`bool`, optional): whether to get a method which executes simulations in the current
+            process (only used with jNeuroML/pyNeuroML and NEURON)
+        binary_outputs (:obj:`bool`, optional): whether to get a method which can save the outputs of simulations as
+            binary files (only used with NEURON and NetPyNE). Simulations are also executed with such a method when
+            the code cache (NEURON), the mechanism store (NEURON and NetPyNE), an MPI hostfile (NetPyNE), or
+            class-data sharing archives of jNeuroML are configured (see :obj:`get_code_cache`,
+            :obj:`get_mechanism_store`, :obj:`get_mpi_hostfile`, and :obj:`get_jvm_cds_dirname`).
+        num_processors (:obj:`int`, optional): number of processors of the simulations (only used with NetPyNE).
+            Simulations with multiple processors are executed with MPI by :obj:`run_lems_with_jneuroml_netpyne`,
+            which limits the number of ranks to the number of cells of the network.
 
     Returns:
         :obj:`types.FunctionType`: run LEMS method
     """
+    from pyneuroml import pynml
+
     if simulator == Simulator.brian2:
-        return pynml.run_lems_with_jneuroml_brian2
+        return run_lems_with_jneuroml_brian2
 
     elif simulator == Simulator.pyneuroml:
+        if in_process:
+            return run_lems_with_jneuroml_in_jvm
+        if get_jvm_cds_dirname():
+            return run_lems_with_jneuroml_with_cds
         return pynml.run_lems_with_jneuroml
 
     elif simulator == Simulator.netpyne:
+        if (binary_outputs or (num_processors and num_processors > 1) or get_mechanism_store() or get_mpi_hostfile()
+                or get_jvm_cds_dirname()):
+            return run_lems_with_jneuroml_netpyne
         return pynml.run_lems_with_jneuroml_netpyne
 
     elif simulator == Simulator.neuron:
+        if in_process:
+            return run_lems_with_jneuroml_neuron_in_process
+        if binary_outputs or get_code_cache() or get_mechanism_store() or get_jvm_cds_dirname():
+            return run_lems_with_jneuroml_neuron
         return pynml.run_lems_with_jneuroml_neuron
 
     else:
         raise NotImplementedError('`{}` is not a supported simulator.'.format(simulator))
 
 
-def get_run_lems_options(num_processors=None, max_memory=None, verbose=False):
+def get_run_lems_options(num_processors=None, max_memory=None, verbose=False, in_process=None, binary_outputs=None):
     """ Get options for running a LEMS document
 
     Args:
         num_processors (:obj:`int`, optional): number of processors to use (only used with NetPyNe)
         max_memory (:obj:`int`, optional): maximum memory to use in bytes
         verbose (:obj:`bool`, optional): whether to display extra information about simulation runs
+        in_process (:obj:`bool`, optional): whether to execute simulations in the current process. Default: value
+            of the ``SIMULATE_IN_PROCESS`` environment variable.
+        binary_outputs (:obj:`bool`, optional): whether to save the outputs of simulations as binary files. Default:
+            value of the ``BINARY_OUTPUTS`` environment variable.
 
     Returns:
         :obj:`RunLemsOptions`: options
@@ -301,31 +952,64 @@ def get_run_lems_options(num_processors=None, max_memory=None, verbose=False):
     if max_memory is None:
         max_memory = get_available_memory() - 100 * 1000000
 
-    options = RunLemsOptions(num_processors=num_processors, max_memory=max_memory, verbose=verbose)
+    if in_process is None:
+        in_process = is_in_process_simulation_enabled()
+
+    if binary_outputs is None:
+        binary_outputs = is_binary_output_enabled()
+
+    options = RunLemsOptions(num_processors=num_processors, max_memory=max_memory, verbose=verbose, in_process=in_process,
+                             binary_outputs=binary_outputs)
 
     return options
 
 
 def get_available_processors():
-    """ Get the amount of processors available
+    """ Get the amount of processors available, as configured by the ``CPUS`` environment variable, or as limited by
+    the CPU affinity and the control groups (e.g., of a container) of this process
 
     Returns:
         :obj:`int`: amount of processors available
     """
     if os.getenv('CPUS', None):
         return int(float(os.getenv('CPUS', None)))
+
+    if hasattr(os, 'sched_getaffinity'):
+        processors = len(os.sched_getaffinity(0))
     else:
-        return os.cpu_count()
+        processors = os.cpu_count()
+
+    cpu_limit = get_cgroup_cpu_limit()
+    if cpu_limit is not None:
+        processors = min(processors, max(1, math.ceil(cpu_limit)))
+
+    return processors
 
 
 def get_available_memory():
-    """ Get the amount of memory available
+    """ Get the amount of memory available, as limited by the control groups (e.g., of a container) of this process
 
     Returns:
         :obj:`int`: amount of memory available in bytes
     """
     vmem = psutil.virtual_memory()
-    return vmem.available
+    available = vmem.available
+
+    cgroup_available = get_cgroup_available_memory()
+    if cgroup_available is not None:
+        available = min(available, cgroup_available)
+
+    return available
+
+
+def get_num_task_workers():
+    """ Get the number of processes which should be used to execute the tasks of SED documents concurrently, as
+    configured by the ``TASK_WORKERS`` environment variable
+
+    Returns:
+        :obj:`int`: number of processes
+    """
+    return max(1, int(float(os.getenv('TASK_WORKERS', '1'))))
 
 
 def read_xml_file(filename, remove_blank_text=True):
@@ -355,6 +1039,100 @@ def write_xml_file(root, filename, pretty_print=True):
     etree.write(filename, pretty_print=pretty_print)
 
 
+def get_lems_included_files(lems_xml_root, working_dirname='.'):
+    """ Get the files which are included, directly or indirectly, by a LEMS document
+
+    Inclusions of files which don't exist (e.g., the NeuroML core component types which are built
+    into jNeuroML, such as ``Cells.xml``) are ignored.
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+        working_dirname (:obj:`str`, optional): working directory for the LEMS document
+
+    Returns:
+        :obj:`list` of :obj:`str`: absolute paths to the included files, in order of their first inclusion
+    """
+    filenames = []
+    xml_roots_to_visit = [(lems_xml_root, working_dirname)]
+    while xml_roots_to_visit:
+        xml_root, dirname = xml_roots_to_visit.pop(0)
+        for rel_filename in xml_root.xpath("//*[local-name()='Include']/@file | //*[local-name()='include']/@href"):
+            filename = os.path.abspath(os.path.join(dirname, rel_filename))
+            if filename not in filenames and os.path.isfile(filename):
+                filenames.append(filename)
+                xml_roots_to_visit.append((read_xml_file(filename), os.path.dirname(filename)))
+    return filenames
+
+
+def hash_file(filename, content=None):
+    """ Get the SHA-256 hash of the contents of a file
+
+    Args:
+        filename (:obj:`str`): path to the file
+        content (:obj:`bytes`, optional): contents of the file, if they have already been read
+
+    Returns:
+        :obj:`str`: hexadecimal hash
+    """
+    if content is not None:
+        return hashlib.sha256(content).hexdigest()
+
+    hasher = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def get_cache_key(values, lems_xml_root=None, filenames=None, dirname=None):
+    """ Get a key for a cache (e.g., of the results of tasks, of the code generated by jNeuroML, or of compiled
+    mechanisms)
+
+    The key is a hash of the canonicalized LEMS document, the names and contents of the files (e.g., the files that the
+    document includes), the values (e.g., the versions of the simulators and the parameters of the simulation), and the
+    version of this package, so that all caches are invalidated by the same changes.
+
+    Args:
+        values (:obj:`dict`): values which can be serialized to JSON
+        lems_xml_root (:obj:`lxml.etree._Element`, optional): LEMS document
+        filenames (:obj:`list` of :obj:`str` or :obj:`dict`, optional): paths to the files, or a dictionary which maps
+            the paths to the hashes of the contents of the files (see :obj:`hash_file`)
+        dirname (:obj:`str`, optional): directory which the files are named relative to; if :obj:`None`, the files are
+            named by their base names
+
+    Returns:
+        :obj:`str`: key
+    """
+    hasher = hashlib.sha256()
+    if lems_xml_root is not None:
+        hasher.update(lxml.etree.tostring(lxml.etree.ElementTree(lems_xml_root), method='c14n', with_comments=False))
+    for filename in (filenames or []):
+        hasher.update((os.path.relpath(filename, dirname) if dirname else os.path.basename(filename)).encode())
+        hasher.update(((filenames[filename] if isinstance(filenames, dict) else None) or hash_file(filename)).encode())
+    hasher.update(json.dumps(dict(values, version=__version__), sort_keys=True).encode())
+    return hasher.hexdigest()
+
+
+def get_lems_num_cells(lems_xml_root, working_dirname='.'):
+    """ Get the number of cells of the populations of the NeuroML networks included by a LEMS document
+
+    Args:
+        lems_xml_root (:obj:`lxml.etree._Element`): LEMS document
+        working_dirname (:obj:`str`, optional): working directory for the LEMS document
+
+    Returns:
+        :obj:`int`: number of cells
+    """
+    num_cells = 0
+    for filename in get_lems_included_files(lems_xml_root, working_dirname):
+        for population_xml in read_xml_file(filename).xpath("//*[local-name()='network']/*[local-name()='population']"):
+            if 'size' in population_xml.attrib:
+                num_cells += int(population_xml.attrib['size'])
+            else:
+                num_cells += len(population_xml.xpath("*[local-name()='instance']"))
+    return num_cells
+
+
 def read_lems_output_files_configuration(xml_root):
     """ Read the configuration of the output files of a LEMS document
 
@@ -409,28 +1187,129 @@ def write_lems_output_files_configuration(xml_root, output_file_configs):
                     output_file_xml.append(column_xml)
 
 
-def read_lems_output_files(output_file_configs, output_files_dirname='.', simulator=Simulator.pyneuroml):
+def read_lems_output_files(output_file_configs, output_files_dirname='.', simulator=Simulator.pyneuroml,
+                           columns=None, num_rows=None, memory_map=False):
     """ Read the output files of the execution of a LEMS document
 
+    Output files which were saved as binary files (see :obj:`biosimulators_pyneuroml.binary_outputs`) are read from
+    their binary versions; other output files are read as tab-separated text.
+
     Args:
         output_file_configs (:obj:`list` of :obj:`dict`): configuration of the output files of a LEMS document
         output_files_dirname (:obj:`str`, optional): base directory for output files
         simulator (:obj:`Simulator`, optional): simulator to run the LEMS document
+        columns (:obj:`list` of :obj:`str`, optional): ids of the columns which should be read (e.g.,
+            :obj:`SEDML_TIME_OUTPUT_COLUMN_ID`). Default: all columns.
+        num_rows (:obj:`int`, optional): number of rows which should be read from the end of each file. Default: all rows.
+        memory_map (:obj:`bool`, optional): whether to memory-map the output files, rather than read them
 
     Returns:
         :obj:`dict` of :obj:`str` => :obj:`pandas.DataFrame`: dictionary that maps the id of each output file
             to a Pandas data frame with its value
     """
-    sep = '\t'
-
     results = {}
     for output_file_config in output_file_configs:
         output_filename = os.path.join(output_files_dirname, output_file_config['file_name'])
-        if not os.path.isfile(output_filename):
+        binary_output_filename = get_binary_output_filename(output_filename)
+        if not os.path.isfile(output_filename) and not os.path.isfile(binary_output_filename):
             raise FileExistsError('Output file {} does not exist'.format(output_filename))
 
-        column_ids = [SEDML_TIME_OUTPUT_COLUMN_ID] + [column['id'] for column in output_file_config['columns']] + ['__extra__']
-        results[output_file_config['id']] = pandas.read_csv(
-            output_filename,
-            sep=sep, names=column_ids).drop(columns=['__extra__'])
+        column_ids = [SEDML_TIME_OUTPUT_COLUMN_ID] + [column['id'] for column in output_file_config['columns']]
+        if columns is None:
+            column_indices = list(range(len(column_ids)))
+        else:
+            column_indices = [i_column for i_column, column_id in enumerate(column_ids) if column_id in columns]
+
+        if os.path.isfile(binary_output_filename):
+            values = read_binary_output_file(binary_output_filename, len(column_ids), column_indices,
+                                             num_rows=num_rows, memory_map=memory_map)
+        else:
+            values = read_lems_output_file(output_filename, column_indices, num_rows=num_rows, memory_map=memory_map)
+        results[output_file_config['id']] = pandas.DataFrame(values, columns=[column_ids[i_column] for i_column in column_indices])
     return results
+
+
+def read_lems_output_file(filename, column_indices, num_rows=None, memory_map=False):
+    """ Read columns of the tail of a tab-separated output file of the execution of a LEMS document
+
+    Only the requested rows are read from the file, and only the requested columns are converted to floats.
+    This keeps the memory required to read the outputs of long simulations proportional to the size of the result,
+    rather than to the size of the file.
+
+    Args:
+        filename (:obj:`str`): path to the output file
+        column_indices (:obj:`list` of :obj:`int`): indices of the columns which should be read
+        num_rows (:obj:`int`, optional): number of rows which should be read from the end of the file.
+            Default: all rows.
+        memory_map (:obj:`bool`, optional): whether to memory-map the file, rather than read it
+
+    Returns:
+        :obj:`numpy.ndarray`: values of the columns, with one row per row of the file and one column per
+            element of :obj:`column_indices`
+    """
+    with open(filename, 'rb') as file:
+        if memory_map and os.fstat(file.fileno()).st_size:
+            file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if num_rows is None:
+                offset = 0
+            else:
+                offset = get_offset_of_last_lines(file, num_rows)
+
+            file.seek(0, os.SEEK_END)
+            if offset == file.tell() or not column_indices:
+                return numpy.zeros((0, len(column_indices)))
+
+            file.seek(offset)
+            if isinstance(file, mmap.mmap):
+                # iterating over a memory map yields bytes rather than lines
+                lines = iter(file.readline, b'')
+            else:
+                lines = file
+            return numpy.loadtxt(lines, delimiter='\t', usecols=column_indices, dtype=numpy.float64, ndmin=2)
+
+        finally:
+            if isinstance(file, mmap.mmap):
+                file.close()
+
+
+def get_offset_of_last_lines(file, num_lines, block_size=1024 * 1024):
+    """ Get the position of the start of the last lines of a file, by scanning the file backwards from its end
+
+    Args:
+        file (:obj:`io.BufferedReader` or :obj:`mmap.mmap`): file opened in binary mode
+        num_lines (:obj:`int`): number of lines
+        block_size (:obj:`int`, optional): number of bytes to read at a time
+
+    Returns:
+        :obj:`int`: position of the start of the first of the last :obj:`num_lines` lines of the file, or 0 if the file has
+            no more than :obj:`num_lines` lines
+    """
+    file.seek(0, os.SEEK_END)
+    end = file.tell()
+    if end == 0 or num_lines <= 0:
+        return end
+
+    # the final line may or may not be terminated by a newline
+    file.seek(end - 1)
+    if file.read(1) == b'\n':
+        end -= 1
+
+    num_newlines = 0
+    while end > 0:
+        start = max(0, end - block_size)
+        file.seek(start)
+        block = file.read(end - start)
+
+        block_num_newlines = block.count(b'\n')
+        if num_newlines + block_num_newlines >= num_lines:
+            pos = len(block)
+            for _ in range(num_lines - num_newlines):
+                pos = block.rfind(b'\n', 0, pos)
+            return start + pos + 1
+
+        num_newlines += block_num_newlines
+        end = start
+
+    return 0
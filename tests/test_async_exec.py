@@ -0,0 +1,72 @@
+""" Tests of the execution of SED tasks from asyncio event loops """
+
+from biosimulators_pyneuroml import async_exec
+from biosimulators_utils.config import get_config
+from biosimulators_utils.sedml import data_model as sedml_data_model
+import asyncio
+import os
+import psutil
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+
+class AsyncExecTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_exec_sed_task_async_streams_output(self):
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        task = sedml_data_model.Task(
+            model=sedml_data_model.Model(id='net1', source=os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml'),
+                                         language=sedml_data_model.ModelLanguage.LEMS.value),
+            simulation=sedml_data_model.UniformTimeCourseSimulation(
+                initial_time=0.,
+                output_start_time=0.,
+                output_end_time=300e-3,
+                number_of_steps=int(300 / 0.01),
+                algorithm=sedml_data_model.Algorithm(kisao_id='KISAO_0000030'),
+            ),
+        )
+        variables = [sedml_data_model.Variable(id='time', symbol=sedml_data_model.Symbol.time.value, task=task)]
+
+        # the output which is captured for the log of the task is streamed, even if the task isn't verbose
+        config = get_config()
+        config.LOG = True
+        config.VERBOSE = False
+        worker_running = []
+
+        def handle_output(text):
+            worker_running.append(any(
+                'biosimulators_pyneuroml.async_exec' in ' '.join(process.cmdline()) and process.status() != psutil.STATUS_ZOMBIE
+                for process in psutil.Process().children()
+            ))
+
+        results, log = asyncio.run(async_exec.exec_sed_task_async(task, variables, config=config, output_handler=handle_output))
+        self.assertEqual(results['time'].shape, (task.simulation.number_of_steps + 1,))
+        self.assertNotEqual(log.output, '')
+        self.assertTrue(worker_running)
+        self.assertTrue(worker_running[0])
+    def test_kill_process_tree(self):
+        process = subprocess.Popen(['sh', '-c', 'sleep 60 & sleep 60 & wait'], start_new_session=True)
+        for _ in range(100):
+            children = psutil.Process(process.pid).children(recursive=True)
+            if len(children) == 2:
+                break
+            time.sleep(0.05)
+        self.assertEqual(len(children), 2)
+
+        async_exec.kill_process_tree(process.pid)
+        process.wait(timeout=10)
+        _, alive = psutil.wait_procs(children, timeout=10)
+        self.assertEqual(alive, [])
+
+        # processes which have already exited are ignored
+        async_exec.kill_process_tree(process.pid)
@@ -0,0 +1,162 @@
+""" Tests of saving the outputs of simulations as binary files """
+
+from biosimulators_pyneuroml import binary_outputs
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from unittest import mock
+import numpy
+import numpy.testing
+import os
+import runpy
+import shutil
+import tempfile
+import unittest
+
+NEURON_SCRIPT = '''
+class NeuronSimulation():
+    def save_results(self):
+        py_v_time = [t / 1000 for t in range(5)]
+        py_v_v_of0 = [float(x / 1000.0) for x in range(10, 15)]
+
+        f_time_f2 = open('time.dat', 'w')
+        num_points = len(py_v_time)  # Simulation may have been stopped before tstop...
+
+        for i in range(num_points):
+            f_time_f2.write('%f'% py_v_time[i])  # Save in SI units...
+        f_time_f2.close()
+
+        f_of0_f2 = open('0.tsv', 'w')
+        num_points = len(py_v_time)  # Simulation may have been stopped before tstop...
+
+        for i in range(num_points):
+            f_of0_f2.write('%e\\t%e\\t\\n' % (py_v_time[i], py_v_v_of0[i], ))
+        f_of0_f2.close()
+        print("Saved data to: 0.tsv")
+
+
+NeuronSimulation().save_results()
+'''
+
+NETPYNE_SCRIPT = '''
+class NetPyNESimulation():
+    def save_results(self):
+        if True:
+            col_of0_t = [i * 0.01 for i in range(5)]
+            col_of0_v = [i * 2. for i in range(6)]
+
+            dat_file_of0 = open('0.tsv', 'w')
+            for i in range(len(col_of0_t)):
+                dat_file_of0.write( '%s\\t'%(col_of0_t[i]/1000.0) +  '%s\\t'%(col_of0_v[i]/1000.0) +  '\\n')
+            dat_file_of0.close()
+
+
+NetPyNESimulation().save_results()
+'''
+
+BRIAN2_SCRIPT = '''
+import numpy as np
+
+all_of0 = np.array( [ np.arange(5.), np.arange(5.) * 3.  ] )
+all_of0 = all_of0.transpose()
+file_of0 = open("0.tsv", 'w')
+for l in all_of0:
+    line = ''
+    for c in l:
+        line = line + ('\\t%s'%c if len(line)>0 else '%s'%c)
+    file_of0.write(line+'\\n')
+file_of0.close()
+'''
+
+
+class BinaryOutputsTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dirname)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dirname)
+
+    def test_is_binary_output_enabled(self):
+        with mock.patch.dict('os.environ', {}):
+            os.environ.pop('BINARY_OUTPUTS', None)
+            self.assertFalse(binary_outputs.is_binary_output_enabled())
+            self.assertFalse(utils.get_run_lems_options().binary_outputs)
+        with mock.patch.dict('os.environ', {'BINARY_OUTPUTS': '0'}):
+            self.assertFalse(binary_outputs.is_binary_output_enabled())
+        with mock.patch.dict('os.environ', {'BINARY_OUTPUTS': '1'}):
+            self.assertTrue(binary_outputs.is_binary_output_enabled())
+
+    def _rewrite_and_run_script(self, script):
+        filename = os.path.join(self.dirname, 'script.py')
+        with open(filename, 'w') as file:
+            file.write(script)
+        output_filenames = binary_outputs.rewrite_script_to_save_binary_outputs(filename)
+        runpy.run_path(filename)
+        return output_filenames
+
+    def _read_output_file(self, num_columns):
+        return binary_outputs.read_binary_output_file(binary_outputs.get_binary_output_filename('0.tsv'),
+                                                      num_columns, list(range(num_columns)))
+
+    def test_rewrite_script_to_save_binary_outputs(self):
+        self.assertEqual(self._rewrite_and_run_script(NEURON_SCRIPT), ['0.tsv'])
+        numpy.testing.assert_allclose(self._read_output_file(2), numpy.array([
+            numpy.arange(5) / 1000.,
+            numpy.arange(10, 15) / 1000.,
+        ]).transpose())
+        self.assertFalse(os.path.isfile('0.tsv'))
+        self.assertTrue(os.path.isfile('time.dat'))
+
+        self.assertEqual(self._rewrite_and_run_script(NETPYNE_SCRIPT), ['0.tsv'])
+        numpy.testing.assert_allclose(self._read_output_file(2), numpy.array([
+            numpy.arange(5) * 0.01 / 1000.,
+            numpy.arange(5) * 2. / 1000.,
+        ]).transpose())
+
+        self.assertEqual(self._rewrite_and_run_script(BRIAN2_SCRIPT), ['0.tsv'])
+        numpy.testing.assert_allclose(self._read_output_file(2), numpy.array([
+            numpy.arange(5.),
+            numpy.arange(5.) * 3.,
+        ]).transpose())
+
+        # unrecognized code is left unchanged
+        script = NEURON_SCRIPT.replace('py_v_v_of0[i], ', 'py_v_v_of0[0], ')
+        os.remove(binary_outputs.get_binary_output_filename('0.tsv'))
+        self.assertEqual(self._rewrite_and_run_script(script), [])
+        self.assertTrue(os.path.isfile('0.tsv'))
+        self.assertFalse(os.path.isfile(binary_outputs.get_binary_output_filename('0.tsv')))
+
+    def test_read_binary_output_file(self):
+        values = numpy.arange(100 * 4, dtype=numpy.float64).reshape((100, 4))
+        filename = os.path.join(self.dirname, 'output.f64')
+        values.astype('<f8').tofile(filename)
+
+        for memory_map in [False, True]:
+            numpy.testing.assert_equal(binary_outputs.read_binary_output_file(filename, 4, [0, 1, 2, 3], memory_map=memory_map), values)
+            numpy.testing.assert_equal(binary_outputs.read_binary_output_file(filename, 4, [0, 2], num_rows=10, memory_map=memory_map),
+                                       values[-10:, [0, 2]])
+            numpy.testing.assert_equal(binary_outputs.read_binary_output_file(filename, 4, [3], num_rows=1000, memory_map=memory_map),
+                                       values[:, [3]])
+            self.assertEqual(binary_outputs.read_binary_output_file(filename, 4, [0, 1], num_rows=0, memory_map=memory_map).shape,
+                             (0, 2))
+
+    def test_run_lems_xml(self):
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+        with mock.patch.object(utils, 'read_binary_output_file', wraps=binary_outputs.read_binary_output_file) as read_binary_output_file:
+            results = utils.run_lems_xml(utils.read_xml_file(filename), os.path.dirname(filename),
+                                         simulator=Simulator.neuron, binary_outputs=True)
+        self.assertEqual(read_binary_output_file.call_count, 2)
+
+        text_results = utils.run_lems_xml(utils.read_xml_file(filename), os.path.dirname(filename),
+                                          simulator=Simulator.neuron, binary_outputs=False)
+
+        self.assertEqual(set(results.keys()), set(['of0', 'of1']))
+        for output_id, result in results.items():
+            self.assertEqual(result.columns.values.tolist(), text_results[output_id].columns.values.tolist())
+            numpy.testing.assert_allclose(result.to_numpy(), text_results[output_id].to_numpy(), rtol=1e-6, atol=1e-12)
@@ -0,0 +1,136 @@
+""" Tests of the cache of the results of tasks """
+
+from biosimulators_pyneuroml import cache
+from biosimulators_pyneuroml import core
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from biosimulators_utils.log.data_model import TaskLog
+from biosimulators_utils.report.data_model import VariableResults
+from biosimulators_utils.sedml.data_model import (
+    Model, ModelLanguage, UniformTimeCourseSimulation, Algorithm, Task, Variable, Symbol)
+from unittest import mock
+import copy
+import importlib
+import numpy
+import numpy.testing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def _get_task(self):
+        task = Task(
+            model=Model(id='net1', source=self.filename, language=ModelLanguage.LEMS.value),
+            simulation=UniformTimeCourseSimulation(
+                initial_time=0.,
+                output_start_time=0.,
+                output_end_time=100e-3,
+                number_of_steps=int(100 / 0.01),
+                algorithm=Algorithm(kisao_id='KISAO_0000030'),
+            ),
+        )
+        variables = [
+            Variable(id='time', symbol=Symbol.time.value, task=task),
+            Variable(id='v', target='hhpop[0]/v', task=task),
+        ]
+        return task, variables
+
+    def test_get_set_evict(self):
+        result_cache = cache.ResultCache(os.path.join(self.dirname, 'cache'), max_size=10000)
+        self.assertEqual(result_cache.get('a'), None)
+
+        results = VariableResults({'time': numpy.linspace(0., 1., 11), 'v': numpy.ones(11)})
+        result_cache.set('a', results)
+        results2 = result_cache.get('a')
+        self.assertEqual(list(results2.keys()), ['time', 'v'])
+        numpy.testing.assert_allclose(results2['time'], results['time'])
+        numpy.testing.assert_allclose(results2['v'], results['v'])
+        self.assertEqual(result_cache.get_stats(), {'hits': 1, 'misses': 1, 'evictions': 0})
+
+        # least recently used entries are evicted first
+        entry_size = result_cache.get_size()
+        result_cache.max_size = 2 * entry_size
+        result_cache.set('b', results)
+        os.utime(result_cache._get_filename('a'), (time.time() - 20, time.time() - 20))
+        os.utime(result_cache._get_filename('b'), (time.time() - 10, time.time() - 10))
+        self.assertNotEqual(result_cache.get('a'), None)
+        result_cache.set('c', results)
+        self.assertNotEqual(result_cache.get('a'), None)
+        self.assertEqual(result_cache.get('b'), None)
+        self.assertNotEqual(result_cache.get('c'), None)
+        self.assertEqual(result_cache.evictions, 1)
+        self.assertLessEqual(result_cache.get_size(), result_cache.max_size)
+
+        result_cache.clear()
+        self.assertEqual(result_cache.get_size(), 0)
+
+    def test_get_result_cache(self):
+        with mock.patch.dict('os.environ', {'RESULT_CACHE_DIR': ''}):
+            self.assertEqual(cache.get_result_cache(), None)
+
+        with mock.patch.dict('os.environ', {'RESULT_CACHE_DIR': os.path.join(self.dirname, 'cache'), 'RESULT_CACHE_MAX_SIZE': '1e6'}):
+            result_cache = cache.get_result_cache()
+            self.assertEqual(result_cache.max_size, 1000000)
+            self.assertIs(cache.get_result_cache(), result_cache)
+
+    def test_get_task_result_cache_key(self):
+        task, variables = self._get_task()
+        working_dirname = os.path.dirname(self.filename)
+        lems_xml_root = utils.read_xml_file(self.filename)
+        key = cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.pyneuroml)
+        self.assertEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.pyneuroml), key)
+
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.neuron), key)
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables[0:1], Simulator.pyneuroml),
+                            key)
+
+        # the mode and version of the simulator change the key
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.pyneuroml,
+                                                            in_process=True), key)
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.pyneuroml,
+                                                            binary_outputs=True), key)
+        with mock.patch.object(cache, 'get_simulator_version', return_value='0.0.0'):
+            self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.pyneuroml),
+                                key)
+        self.assertEqual(cache.get_simulator_version(Simulator.pyneuroml),
+                         importlib.import_module('biosimulators_pyneuroml.api.pyneuroml').get_simulator_version())
+
+        task2 = copy.deepcopy(task)
+        task2.simulation.output_start_time = 50e-3
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task2, variables, Simulator.pyneuroml), key)
+
+        lems_xml_root2 = copy.deepcopy(lems_xml_root)
+        lems_xml_root2.xpath('/Lems/Simulation')[0].attrib['length'] = '10ms'
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root2, working_dirname, task, variables, Simulator.pyneuroml), key)
+
+        # changes to included files change the key
+        with open(os.path.join(working_dirname, 'KConductance.channel.nml'), 'a') as file:
+            file.write('\n')
+        self.assertNotEqual(cache.get_task_result_cache_key(lems_xml_root, working_dirname, task, variables, Simulator.pyneuroml), key)
+
+    def test_exec_sed_task(self):
+        task, variables = self._get_task()
+        with mock.patch.dict('os.environ', {'RESULT_CACHE_DIR': os.path.join(self.dirname, 'cache')}):
+            results, log = core.exec_sed_task(task, variables, log=TaskLog())
+            self.assertEqual(log.simulator_details['resultCache'], 'miss')
+
+            with mock.patch.object(core, 'run_lems_xml', side_effect=Exception('Simulation should not be executed')):
+                results2, log2 = core.exec_sed_task(task, variables, log=TaskLog())
+            self.assertEqual(log2.simulator_details['resultCache'], 'hit')
+
+        self.assertEqual(set(results2.keys()), set(['time', 'v']))
+        numpy.testing.assert_allclose(results2['time'], results['time'])
+        numpy.testing.assert_allclose(results2['v'], results['v'])
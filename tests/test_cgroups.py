@@ -0,0 +1,79 @@
+""" Tests of the determination of the processors and memory available to containers from their control groups """
+
+from biosimulators_pyneuroml import cgroups
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class CgroupsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.proc_dirname = os.path.join(self.dirname, 'proc')
+        os.makedirs(self.proc_dirname)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def _write_files(self, files):
+        for filename, content in files.items():
+            filename = os.path.join(self.dirname, filename)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, 'w') as file:
+                file.write(content)
+
+    def test_cgroups_v1(self):
+        mount_dirname = os.path.join(self.dirname, 'sys', 'fs', 'cgroup')
+        self._write_files({
+            'proc/cgroup': '4:memory:/kubepods/pod1/container1\n3:cpu,cpuacct:/kubepods/pod1/container1\n0::/\n',
+            'proc/mountinfo': (
+                '32 24 0:28 / /sys/fs/cgroup rw,relatime - tmpfs tmpfs rw,mode=755\n'
+                '33 32 0:29 /kubepods/pod1 {0}/cpu,cpuacct rw,relatime - cgroup cgroup rw,cpu,cpuacct\n'
+                '36 32 0:32 /kubepods/pod1 {0}/memory rw,relatime - cgroup cgroup rw,memory\n'
+            ).format(mount_dirname),
+            # container without limits within a pod with limits
+            'sys/fs/cgroup/cpu,cpuacct/container1/cpu.cfs_quota_us': '-1\n',
+            'sys/fs/cgroup/cpu,cpuacct/container1/cpu.cfs_period_us': '100000\n',
+            'sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us': '250000\n',
+            'sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us': '100000\n',
+            'sys/fs/cgroup/memory/container1/memory.limit_in_bytes': '9223372036854771712\n',
+            'sys/fs/cgroup/memory/container1/memory.usage_in_bytes': '1000\n',
+            'sys/fs/cgroup/memory/memory.limit_in_bytes': '8000000000\n',
+            'sys/fs/cgroup/memory/memory.usage_in_bytes': '3000000000\n',
+            'sys/fs/cgroup/memory/memory.stat': 'cache 10\ntotal_inactive_file 1000000000\n',
+        })
+
+        version, dirnames = cgroups.get_cgroup_dirnames('memory', proc_dirname=self.proc_dirname)
+        self.assertEqual(version, 1)
+        self.assertEqual(dirnames, [os.path.join(mount_dirname, 'memory', 'container1'), os.path.join(mount_dirname, 'memory')])
+
+        self.assertEqual(cgroups.get_cgroup_cpu_limit(proc_dirname=self.proc_dirname), 2.5)
+        self.assertEqual(cgroups.get_cgroup_available_memory(proc_dirname=self.proc_dirname), 6000000000)
+
+    def test_cgroups_v2(self):
+        mount_dirname = os.path.join(self.dirname, 'sys', 'fs', 'cgroup')
+        self._write_files({
+            'proc/cgroup': '0::/\n',
+            'proc/mountinfo': '30 24 0:27 / {} rw,nosuid - cgroup2 cgroup2 rw,nsdelegate\n'.format(mount_dirname),
+            'sys/fs/cgroup/cpu.max': '400000 100000\n',
+            'sys/fs/cgroup/memory.max': '8000000000\n',
+            'sys/fs/cgroup/memory.current': '2000000000\n',
+            'sys/fs/cgroup/memory.stat': 'anon 1000\ninactive_file 500000000\n',
+        })
+
+        self.assertEqual(cgroups.get_cgroup_dirnames('cpu', proc_dirname=self.proc_dirname), (2, [mount_dirname]))
+        self.assertEqual(cgroups.get_cgroup_cpu_limit(proc_dirname=self.proc_dirname), 4.)
+        self.assertEqual(cgroups.get_cgroup_available_memory(proc_dirname=self.proc_dirname), 6500000000)
+
+        self._write_files({
+            'sys/fs/cgroup/cpu.max': 'max 100000\n',
+            'sys/fs/cgroup/memory.max': 'max\n',
+        })
+        self.assertEqual(cgroups.get_cgroup_cpu_limit(proc_dirname=self.proc_dirname), None)
+        self.assertEqual(cgroups.get_cgroup_available_memory(proc_dirname=self.proc_dirname), None)
+
+    def test_no_cgroups(self):
+        self.assertEqual(cgroups.get_cgroup_dirnames('cpu', proc_dirname=self.proc_dirname), (None, []))
+        self.assertEqual(cgroups.get_cgroup_cpu_limit(proc_dirname=self.proc_dirname), None)
+        self.assertEqual(cgroups.get_cgroup_available_memory(proc_dirname=self.proc_dirname), None)
@@ -0,0 +1,74 @@
+""" Tests of coalescing tasks which share models and simulations """
+
+from biosimulators_pyneuroml import coalescing
+from biosimulators_utils.report.data_model import VariableResults
+from biosimulators_utils.sedml.data_model import (Algorithm, Model, ModelAttributeChange, ModelLanguage, Symbol, Task,
+                                                  UniformTimeCourseSimulation, Variable)
+from unittest import mock
+import copy
+import numpy
+import os
+import unittest
+
+
+class CoalescingTestCase(unittest.TestCase):
+    def _get_task(self, id, model, simulation):
+        task = Task(id=id, model=model, simulation=simulation)
+        variables = [
+            Variable(id='time', symbol=Symbol.time.value, task=task),
+            Variable(id='v', target='hhpop[0]/v', task=task),
+        ]
+        return task, variables
+
+    def test_get_coalesced_sed_tasks(self):
+        model = Model(id='net1', source='model.xml', language=ModelLanguage.LEMS.value,
+                      changes=[ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen1']/@amplitude", new_value='0.2nA')])
+        simulation = UniformTimeCourseSimulation(id='sim', initial_time=0., output_start_time=0., output_end_time=0.1,
+                                                 number_of_steps=10, algorithm=Algorithm(kisao_id='KISAO_0000030'))
+
+        task1, variables1 = self._get_task('task1', model, simulation)
+        task2, variables2 = self._get_task('task2', copy.deepcopy(model), copy.deepcopy(simulation))
+        variables2[1].id = 'v2'
+        variables2.append(Variable(id='m', target='hhpop[0]/m', task=task2))
+
+        model3 = copy.deepcopy(model)
+        model3.changes[0].new_value = '0.3nA'
+        task3, variables3 = self._get_task('task3', model3, simulation)
+
+        coalesced_tasks = coalescing.get_coalesced_sed_tasks([(task1, variables1), (task3, variables3), (task2, variables2)])
+        self.assertEqual([[task.id for task in coalesced_task.tasks] for coalesced_task in coalesced_tasks],
+                         [['task1', 'task2'], ['task3']])
+
+        # variables which record the same symbols or targets share merged variables
+        coalesced_task = coalesced_tasks[0]
+        self.assertIs(coalesced_task.task, task1)
+        self.assertEqual([(variable.symbol, variable.target) for variable in coalesced_task.merged_variables], [
+            (Symbol.time.value, None),
+            (None, 'hhpop[0]/v'),
+            (None, 'hhpop[0]/m'),
+        ])
+        self.assertEqual(len(set(variable.id for variable in coalesced_task.merged_variables)), 3)
+        self.assertTrue(all(variable.task is task1 for variable in coalesced_task.merged_variables))
+
+        results = VariableResults()
+        for i_variable, variable in enumerate(coalesced_task.merged_variables):
+            results[variable.id] = numpy.full((3,), i_variable)
+        task1_results, task2_results = coalesced_task.split_results(results)
+        self.assertEqual(set(task1_results.keys()), set(['time', 'v']))
+        self.assertEqual(set(task2_results.keys()), set(['time', 'v2', 'm']))
+        numpy.testing.assert_equal(task2_results['v2'], numpy.full((3,), 1))
+        numpy.testing.assert_equal(task2_results['m'], numpy.full((3,), 2))
+
+        # the variables of tasks which aren't coalesced are unchanged
+        self.assertIs(coalesced_tasks[1].merged_variables, variables3)
+        results3 = VariableResults({'time': numpy.zeros((3,)), 'v': numpy.ones((3,))})
+        self.assertEqual(coalesced_tasks[1].split_results(results3), [results3])
+
+    def test_is_task_coalescing_enabled(self):
+        with mock.patch.dict('os.environ', {}):
+            os.environ.pop('COALESCE_TASKS', None)
+            self.assertFalse(coalescing.is_task_coalescing_enabled())
+        with mock.patch.dict('os.environ', {'COALESCE_TASKS': '0'}):
+            self.assertFalse(coalescing.is_task_coalescing_enabled())
+        with mock.patch.dict('os.environ', {'COALESCE_TASKS': '1'}):
+            self.assertTrue(coalescing.is_task_coalescing_enabled())
@@ -0,0 +1,133 @@
+""" Tests of the cache of the NEURON code generated by jNeuroML """
+
+from biosimulators_pyneuroml import code_cache
+from biosimulators_pyneuroml import nrn
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from unittest import mock
+import numpy.testing
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class CodeCacheTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_get_set(self):
+        cache = code_cache.CodeCache(os.path.join(self.dirname, 'cache'))
+        os.mkdir(os.path.join(self.dirname, 'a'))
+        os.mkdir(os.path.join(self.dirname, 'b'))
+        with open(os.path.join(self.dirname, 'a', 'model_nrn.py'), 'w') as file:
+            file.write('code')
+
+        self.assertFalse(cache.get('key', os.path.join(self.dirname, 'b')))
+        cache.set('key', os.path.join(self.dirname, 'a'), ['model_nrn.py'])
+        cache.set('key', os.path.join(self.dirname, 'a'), ['model_nrn.py'])
+        self.assertTrue(cache.get('key', os.path.join(self.dirname, 'b')))
+        with open(os.path.join(self.dirname, 'b', 'model_nrn.py'), 'r') as file:
+            self.assertEqual(file.read(), 'code')
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 1})
+        self.assertEqual(os.listdir(cache.dirname), ['key'])
+
+        cache.clear()
+        self.assertEqual(os.listdir(cache.dirname), [])
+
+    def test_get_code_cache(self):
+        with mock.patch.dict('os.environ', {'NEURON_CODE_CACHE_DIR': ''}):
+            self.assertEqual(code_cache.get_code_cache(), None)
+
+        with mock.patch.dict('os.environ', {'NEURON_CODE_CACHE_DIR': os.path.join(self.dirname, 'cache')}):
+            cache = code_cache.get_code_cache()
+            self.assertEqual(cache.dirname, os.path.join(self.dirname, 'cache'))
+            self.assertIs(code_cache.get_code_cache(), cache)
+
+    def test_get_neuron_code_cache_key(self):
+        working_dirname = os.path.dirname(self.filename)
+        lems_xml_root = utils.read_xml_file(self.filename)
+        key = code_cache.get_neuron_code_cache_key(lems_xml_root, utils.get_lems_included_files(lems_xml_root, working_dirname))
+
+        # the key doesn't depend on the duration or time step of the simulation
+        lems_xml_root2 = utils.read_xml_file(self.filename)
+        lems_xml_root2.xpath('/Lems/Simulation')[0].attrib['length'] = '10ms'
+        lems_xml_root2.xpath('/Lems/Simulation')[0].attrib['step'] = '0.1ms'
+        self.assertEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root2, utils.get_lems_included_files(lems_xml_root2, working_dirname)), key)
+
+        # the key doesn't depend on the location of the model
+        shutil.copytree(working_dirname, os.path.join(self.dirname, 'fixtures2'))
+        lems_xml_root2 = utils.read_xml_file(os.path.join(self.dirname, 'fixtures2', os.path.basename(self.filename)))
+        self.assertEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root2, utils.get_lems_included_files(lems_xml_root2, os.path.join(self.dirname, 'fixtures2'))), key)
+
+        # the key depends on the outputs of the simulation
+        lems_xml_root2 = utils.read_xml_file(self.filename)
+        output_file_xml = lems_xml_root2.xpath('/Lems/Simulation/OutputFile')[0]
+        output_file_xml.remove(output_file_xml[0])
+        self.assertNotEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root2, utils.get_lems_included_files(lems_xml_root2, working_dirname)), key)
+
+        # the key depends on the included files
+        with open(os.path.join(working_dirname, 'KConductance.channel.nml'), 'a') as file:
+            file.write('\n')
+        self.assertNotEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root, utils.get_lems_included_files(lems_xml_root, working_dirname)), key)
+
+        self.assertNotEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root, utils.get_lems_included_files(lems_xml_root, working_dirname), jneuroml_args=' -neuron'), key)
+
+    def test_get_lems_simulation_time_settings(self):
+        lems_xml_root = utils.read_xml_file(self.filename)
+        self.assertEqual(code_cache.get_lems_simulation_time_settings(lems_xml_root), (300., 0.01))
+
+        lems_xml_root.xpath('/Lems/Simulation')[0].attrib['length'] = '0.3s'
+        lems_xml_root.xpath('/Lems/Simulation')[0].attrib['step'] = '1e-05s'
+        self.assertEqual(code_cache.get_lems_simulation_time_settings(lems_xml_root), (300., 0.01))
+
+        lems_xml_root.xpath('/Lems/Simulation')[0].attrib['step'] = '1 min'
+        self.assertEqual(code_cache.get_lems_simulation_time_settings(lems_xml_root), None)
+
+    def test_set_neuron_script_time_settings(self):
+        filename = os.path.join(self.dirname, 'model_nrn.py')
+        with open(filename, 'w') as file:
+            file.write("if __name__ == '__main__':\n\n    ns = NeuronSimulation(tstop=10, dt=0.01, seed=123456789, abs_tol=None, rel_tol=None)\n")
+
+        code_cache.set_neuron_script_time_settings(filename, 300., 0.025)
+
+        with open(filename, 'r') as file:
+            script = file.read()
+        self.assertIn('    ns = NeuronSimulation(tstop=300.0, dt=0.025, seed=123456789, abs_tol=None, rel_tol=None)\n', script)
+        self.assertEqual(nrn.get_neuron_simulation_arguments(script),
+                         {'tstop': 300., 'dt': 0.025, 'seed': 123456789, 'abs_tol': None, 'rel_tol': None})
+
+    def test_run_lems_xml(self):
+        working_dirname = os.path.dirname(self.filename)
+
+        with mock.patch.dict('os.environ', {'NEURON_CODE_CACHE_DIR': os.path.join(self.dirname, 'cache')}):
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.neuron), utils.run_lems_with_jneuroml_neuron)
+
+            utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron)
+
+            # a simulation of the same model with a different duration reuses the generated code
+            lems_xml_root = utils.read_xml_file(self.filename)
+            lems_xml_root.xpath('/Lems/Simulation')[0].attrib['length'] = '100ms'
+            with mock.patch.object(utils, '_generate_script_with_jneuroml', side_effect=Exception('jNeuroML should not be executed')):
+                results = utils.run_lems_xml(lems_xml_root, working_dirname, simulator=Simulator.neuron)
+
+        lems_xml_root = utils.read_xml_file(self.filename)
+        lems_xml_root.xpath('/Lems/Simulation')[0].attrib['length'] = '100ms'
+        expected_results = utils.run_lems_xml(lems_xml_root, working_dirname, simulator=Simulator.neuron)
+
+        self.assertEqual(set(results.keys()), set(['of0', 'of1']))
+        for output_id, result in results.items():
+            self.assertEqual(result.shape, (10000 + 1, expected_results[output_id].shape[1]))
+            numpy.testing.assert_allclose(result.to_numpy(), expected_results[output_id].to_numpy())
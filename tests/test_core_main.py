@@ -6,7 +6,9 @@
 :License: MIT
 """
 
+from biosimulators_pyneuroml import async_exec
 from biosimulators_pyneuroml import core
+from biosimulators_pyneuroml import scheduler
 from biosimulators_pyneuroml.data_model import Simulator, SIMULATOR_ENABLED, KISAO_ALGORITHM_MAP
 from biosimulators_utils.combine import data_model as combine_data_model
 from biosimulators_utils.combine.io import CombineArchiveWriter
@@ -18,7 +20,10 @@ from biosimulators_utils.simulator.exec import exec_sedml_docs_in_archive_with_c
 from biosimulators_utils.simulator.specs import gen_algorithms_from_specs
 from biosimulators_utils.sedml import data_model as sedml_data_model
 from biosimulators_utils.sedml.io import SedmlSimulationWriter
+from biosimulators_utils.warnings import BioSimulatorsWarning
+from concurrent.futures.process import BrokenProcessPool
 from unittest import mock
+import asyncio
 import datetime
 import dateutil.tz
 import importlib
@@ -26,8 +31,13 @@ import numpy
 import numpy.testing
 import os
 import parameterized
+import psutil
 import shutil
+import signal
+import subprocess
+import sys
 import tempfile
+import threading
 import unittest
 
 
@@ -70,6 +80,95 @@ class CoreCliTestCase(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             core.exec_sed_task(task, variables, preprocessed_task=preprocessed_task)
 
+        # the changes of previous executions are reverted from the preprocessed model
+        self.assertEqual(preprocessed_task['model'].xpath("/Lems/Include[@file='Cells.xml']/@file"), ['Cells.xml'])
+        self.assertEqual(preprocessed_task['simulation'].attrib['length'], '300ms')
+
+        task.model.changes.pop()
+        results, _ = core.exec_sed_task(task, variables, preprocessed_task=preprocessed_task)
+        self._assert_variable_results(task, variables, results)
+
+    def test_exec_sed_task_timings(self):
+        task, variables = self._get_simulation()
+        config = get_config()
+        config.LOG = True
+        _, log = core.exec_sed_task(task, variables, config=config)
+        self.assertIn('readModel', log.simulator_details['timings'])
+        self.assertIn('simulate', log.simulator_details['timings'])
+
+        # the timings of tasks which were preprocessed by the caller don't include the preprocessing
+        preprocessed_task = core.preprocess_sed_task(task, variables, config=config)
+        _, log = core.exec_sed_task(task, variables, preprocessed_task=preprocessed_task, config=config)
+        self.assertNotIn('readModel', log.simulator_details['timings'])
+        self.assertNotIn('preprocess', log.simulator_details['timings'])
+        self.assertIn('simulate', log.simulator_details['timings'])
+
+    def test_preprocess_sed_task_with_model_cache(self):
+        task, variables = self._get_simulation()
+
+        # the model cache is disabled by default
+        self.assertIn('model', dict(core.preprocess_sed_task(task, variables)))
+        self.assertIsNot(core.preprocess_sed_task(task, variables)['model_state'],
+                         core.preprocess_sed_task(task, variables)['model_state'])
+
+        with mock.patch.dict('os.environ', {'MODEL_CACHE_MAX_SIZE': '1e8'}):
+            self._test_preprocess_sed_task_with_model_cache(task, variables)
+
+    def _test_preprocess_sed_task_with_model_cache(self, task, variables):
+        preprocessed_task = core.preprocess_sed_task(task, variables)
+        self.assertIs(core.preprocess_sed_task(task, variables)['model_state'], preprocessed_task['model_state'])
+
+        with mock.patch.dict('os.environ', {'MODEL_CACHE_MAX_SIZE': '0'}):
+            self.assertIsNot(core.preprocess_sed_task(task, variables)['model_state'], preprocessed_task['model_state'])
+
+        # the models of preprocessed tasks are private copies of the cached models, and modifications of them are executed
+        model = preprocessed_task['model']
+        self.assertIsNot(model, preprocessed_task['model_state'].root)
+        model.xpath("/Lems/Include[@file='NML2_SingleCompHHCell.nml']")[0].set('file', 'Undefined.nml')
+        preprocessed_task2 = core.preprocess_sed_task(task, variables)
+        self.assertEqual(preprocessed_task2['model'].xpath("/Lems/Include[@file='Undefined.nml']"), [])
+        with self.assertRaises(RuntimeError):
+            core.exec_sed_task(task, variables, preprocessed_task=preprocessed_task)
+        results, _ = core.exec_sed_task(task, variables, preprocessed_task=preprocessed_task2)
+        self._assert_variable_results(task, variables, results)
+
+    def test_exec_sed_task_releases_model_during_simulation(self):
+        task, variables = self._get_simulation()
+        preprocessed_task = core.preprocess_sed_task(task, variables)
+        model_state = preprocessed_task['model_state']
+        run_lems_xml = core.run_lems_xml
+        model_locked = []
+
+        def lock_model():
+            locked = model_state._lock.acquire(blocking=False)
+            if locked:
+                model_state._lock.release()
+            model_locked.append(locked)
+
+        def run_lems_xml_with_other_executions(*args, model_written=None, **kwargs):
+            def release_model():
+                model_written()
+                thread = threading.Thread(target=lock_model)
+                thread.start()
+                thread.join()
+            return run_lems_xml(*args, model_written=release_model, **kwargs)
+
+        # other executions can use the model once it has been written for the simulation
+        with mock.patch.object(core, 'run_lems_xml', side_effect=run_lems_xml_with_other_executions):
+            results, _ = core.exec_sed_task(task, variables, preprocessed_task=preprocessed_task)
+        self._assert_variable_results(task, variables, results)
+        self.assertEqual(model_locked, [True])
+
+    def test_exec_sed_task_with_invalid_targets(self):
+        task, variables = self._get_simulation()
+        variables[1].target = 'hhpop[0]/V'
+        variables[2].target = 'hhpop[1]/bioPhys1/membraneProperties/NaConductances/NaConductance/m/q'
+
+        # invalid targets are reported before the model is simulated
+        with mock.patch.object(core, 'run_lems_xml', side_effect=Exception('The model should not be simulated')):
+            with self.assertRaisesRegex(ValueError, r'(?s)`v`.*`V` is not a quantity.*`m`.*does not have instance 1'):
+                core.exec_sed_task(task, variables)
+
     @parameterized.parameterized.expand([
         (name,) 
         for name, simulator in Simulator.__members__.items()
@@ -81,6 +180,67 @@ class CoreCliTestCase(unittest.TestCase):
         results, log = core.exec_sed_task(task, variables, log=log, simulator=Simulator[simulator_name])
         self._assert_variable_results(task, variables, results)
 
+    def test_exec_sed_task_with_resource_scheduler(self):
+        task, variables = self._get_simulation()
+        config = get_config()
+        config.LOG = True
+        env = {
+            'RESOURCE_SCHEDULER': '1',
+            'RESOURCE_SCHEDULER_PROCESSORS': '2',
+            'RESOURCE_SCHEDULER_MEMORY': '4e9',
+        }
+        with mock.patch.dict('os.environ', env):
+            results, log = core.exec_sed_task(task, variables, config=config)
+            self._assert_variable_results(task, variables, results)
+            self.assertEqual(log.simulator_details['resources']['processors'], 1)
+            self.assertEqual(log.simulator_details['resources']['memory'],
+                             scheduler.SIMULATOR_MEMORY_ESTIMATES[Simulator.pyneuroml])
+            self.assertEqual(log.simulator_details['resources']['memoryLimit'], None)
+            peak_memory = log.simulator_details['childProcesses']['peakMemory']
+
+            # the memory of subsequent simulations is estimated from the previous simulation
+            results, log = core.exec_sed_task(task, variables, config=config)
+            self.assertEqual(log.simulator_details['resources']['memory'], int(peak_memory * scheduler.MEASURED_MEMORY_MARGIN))
+            self.assertEqual(log.simulator_details['resources']['memoryLimit'], log.simulator_details['resources']['memory'])
+
+    def test_exec_sed_task_sweep(self):
+        task, variables = self._get_simulation()
+        filename = os.path.join(self.dirname, 'fixtures', 'NML2_SingleCompHHCell.nml')
+        with open(filename, 'r') as file:
+            model = file.read()
+        with open(os.path.join(self.dirname, 'fixtures', 'NML2_SingleCompHHCell_2.nml'), 'w') as file:
+            file.write(model.replace('amplitude="0.08nA"', 'amplitude="0.2nA"'))
+
+        change_sets = [
+            [],
+            [sedml_data_model.ModelAttributeChange(target="/Lems/Include[@file='NML2_SingleCompHHCell.nml']/@file",
+                                                   new_value='NML2_SingleCompHHCell_2.nml')],
+            [],
+        ]
+        config = get_config()
+        config.LOG = True
+        results, logs = core.exec_sed_task_sweep(task, variables, change_sets, config=config)
+        self.assertEqual(results['v'].shape, (3, int(300 / 0.01) + 1))
+        self.assertEqual(len(logs), 3)
+        self.assertEqual(logs[1].simulator_details['lemsSimulation']['length'], '0.3s')
+        numpy.testing.assert_allclose(results['time'][1], numpy.linspace(0., 300e-3, int(300 / 0.01) + 1))
+        self.assertFalse(numpy.allclose(results['v'][1], results['v'][0]))
+
+        # the changes of each variant don't affect the other variants
+        numpy.testing.assert_allclose(results['v'][2], results['v'][0])
+        task_results, _ = core.exec_sed_task(task, variables)
+        numpy.testing.assert_allclose(results['v'][0], task_results['v'])
+
+        # variants can be executed by a pool of processes
+        parallel_results, logs = core.exec_sed_task_sweep(task, variables, change_sets[0:2], config=config, num_workers=2)
+        numpy.testing.assert_allclose(parallel_results['v'], results['v'][0:2])
+        self.assertGreater(logs[1].simulator_details['timings']['simulate']['wallTime'], 0.)
+
+        # failures of variants are raised
+        with self.assertRaises(RuntimeError):
+            core.exec_sed_task_sweep(task, variables, [[sedml_data_model.ModelAttributeChange(
+                target="/Lems/Include[@file='Cells.xml']/@file", new_value='Undefined.xml')]])
+
     def test_exec_sed_task_non_zero_output_start_time(self):
         task, variables = self._get_simulation()
         task.simulation.output_start_time = 100e-3
@@ -105,6 +265,81 @@ class CoreCliTestCase(unittest.TestCase):
 
         self._assert_combine_archive_outputs(doc, out_dir)
 
+    def test_exec_sed_task_async(self):
+        task, variables = self._get_simulation()
+        config = get_config()
+        config.LOG = True
+        output = []
+        results, log = asyncio.run(async_exec.exec_sed_task_async(task, variables, config=config, output_handler=output.append))
+        self._assert_variable_results(task, variables, results)
+        self.assertEqual(log.algorithm, 'KISAO_0000030')
+        self.assertIn('timings', log.simulator_details)
+        self.assertNotEqual(log.output, '')
+        self.assertEqual(log.output, ''.join(output))
+
+        # exceptions of tasks are raised by the event loop
+        variables[1].target = 'hhpop[0]/V'
+        with self.assertRaisesRegex(ValueError, '`V` is not a quantity'):
+            asyncio.run(async_exec.exec_sed_task_async(task, variables, config=config))
+
+    def test_exec_sed_task_async_cancel(self):
+        task, variables = self._get_simulation()
+        task.simulation.output_end_time = 1000.
+        task.simulation.number_of_steps = 1000
+
+        temp_dirname = os.path.join(self.dirname, 'tmp')
+        os.mkdir(temp_dirname)
+        processes = []
+        create_subprocess_exec = asyncio.create_subprocess_exec
+
+        async def create_subprocess_exec_and_save(*args, **kwargs):
+            process = await create_subprocess_exec(*args, **kwargs)
+            processes.append(process)
+            return process
+
+        async def exec_and_cancel():
+            output = []
+            future = asyncio.ensure_future(async_exec.exec_sed_task_async(task, variables, output_handler=output.append))
+            while not output:
+                await asyncio.sleep(0.1)
+            self.assertTrue(psutil.Process(processes[0].pid).children(recursive=True))
+            future.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await future
+
+        with mock.patch.object(tempfile, 'tempdir', temp_dirname):
+            with mock.patch('asyncio.create_subprocess_exec', side_effect=create_subprocess_exec_and_save):
+                asyncio.run(exec_and_cancel())
+
+        # the worker and the simulator have been killed, and their temporary files have been removed
+        self.assertEqual(processes[0].returncode, -signal.SIGKILL)
+        for process in psutil.process_iter():
+            try:
+                if process.status() != psutil.STATUS_ZOMBIE:
+                    self.assertNotEqual(os.getsid(process.pid), processes[0].pid)
+            except (psutil.NoSuchProcess, ProcessLookupError):
+                pass
+        self.assertEqual(os.listdir(temp_dirname), [])
+
+    def test_exec_sedml_docs_in_combine_archive_async(self):
+        doc, archive_filename = self._build_combine_archive()
+
+        out_dir = os.path.join(self.dirname, 'out')
+
+        config = get_config()
+        config.REPORT_FORMATS = [report_data_model.ReportFormat.h5]
+        config.BUNDLE_OUTPUTS = True
+        config.KEEP_INDIVIDUAL_OUTPUTS = True
+
+        output = []
+        _, log = asyncio.run(async_exec.exec_sedml_docs_in_combine_archive_async(
+            archive_filename, out_dir, config=config, output_handler=output.append))
+        if log.exception:
+            raise log.exception
+        self.assertNotEqual(''.join(output), '')
+
+        self._assert_combine_archive_outputs(doc, out_dir)
+
     def test_exec_sedml_docs_in_combine_archive_with_all_algorithms(self):
         for simulator in [Simulator.pyneuroml]:
             specs_filename = os.path.join(os.path.dirname(__file__), '..', 'biosimulators-{}.json'.format(simulator.name))
@@ -125,6 +360,100 @@ class CoreCliTestCase(unittest.TestCase):
 
                 self._assert_combine_archive_outputs(doc, out_dir)
 
+    def test_exec_sed_doc_in_parallel(self):
+        doc = self._build_sed_doc()
+        task = doc.tasks[0]
+        task2 = sedml_data_model.Task(id='task2', model=task.model, simulation=sedml_data_model.UniformTimeCourseSimulation(
+            id='simulation2',
+            initial_time=0.,
+            output_start_time=0.,
+            output_end_time=100e-3,
+            number_of_steps=int(100 / 0.01),
+            algorithm=sedml_data_model.Algorithm(kisao_id='KISAO_0000030'),
+        ))
+        doc.simulations.append(task2.simulation)
+        doc.tasks.append(task2)
+        report2 = sedml_data_model.Report(id='report2')
+        doc.outputs.append(report2)
+        for variable in [
+            sedml_data_model.Variable(id='time2', symbol=sedml_data_model.Symbol.time.value, task=task2),
+            sedml_data_model.Variable(id='v2', target="hhpop[0]/v", task=task2),
+        ]:
+            data_gen = sedml_data_model.DataGenerator(id='data_generator_' + variable.id, variables=[variable], math=variable.id)
+            doc.data_generators.append(data_gen)
+            report2.data_sets.append(sedml_data_model.DataSet(id='data_set_' + variable.id, label=variable.id, data_generator=data_gen))
+
+        config = get_config()
+        config.COLLECT_SED_DOCUMENT_RESULTS = True
+
+        with mock.patch.object(core, 'exec_sed_task', side_effect=Exception('Tasks should be executed by the worker processes')):
+            results, log = core.exec_sed_doc(doc, self.dirname, os.path.join(self.dirname, 'out'), config=config, num_workers=2)
+
+        self.assertEqual(log.tasks['task'].status.value, 'SUCCEEDED')
+        self.assertEqual(log.tasks['task2'].status.value, 'SUCCEEDED')
+        self.assertEqual(log.tasks['task2'].simulator_details['lemsSimulation']['length'], '0.1s')
+        self.assertGreater(log.tasks['task2'].simulator_details['timings']['simulate']['wallTime'], 0.)
+        self.assertGreater(log.tasks['task2'].simulator_details['childProcesses']['peakMemory'], 0)
+        numpy.testing.assert_allclose(results['report1']['data_set_time'], numpy.linspace(0., 300e-3, int(300 / 0.01) + 1))
+        numpy.testing.assert_allclose(results['report2']['data_set_time2'], numpy.linspace(0., 100e-3, int(100 / 0.01) + 1))
+        numpy.testing.assert_allclose(results['report2']['data_set_v2'], results['report1']['data_set_v'][0:int(100 / 0.01) + 1])
+
+    def test_exec_sed_doc_in_parallel_with_broken_workers(self):
+        doc = self._build_sed_doc()
+        config = get_config()
+        config.COLLECT_SED_DOCUMENT_RESULTS = True
+
+        # tasks whose workers fail are executed serially
+        with mock.patch.object(core, '_split_coalesced_task_result', side_effect=BrokenProcessPool('Worker died')):
+            with self.assertWarnsRegex(BioSimulatorsWarning, r'1 tasks could not be executed.*\n  `task`: Worker died'):
+                results, log = core.exec_sed_doc(doc, self.dirname, os.path.join(self.dirname, 'out'), config=config, num_workers=2)
+        self.assertEqual(log.tasks['task'].status.value, 'SUCCEEDED')
+        numpy.testing.assert_allclose(results['report1']['data_set_time'], numpy.linspace(0., 300e-3, int(300 / 0.01) + 1))
+
+        # other errors are raised
+        with mock.patch.object(core, '_split_coalesced_task_result', side_effect=ValueError('Other error')):
+            with self.assertRaisesRegex(ValueError, 'Other error'):
+                core.exec_sed_doc(doc, self.dirname, os.path.join(self.dirname, 'out'), config=config, num_workers=2)
+
+    def test_exec_sed_doc_with_coalesced_tasks(self):
+        doc = self._build_sed_doc()
+        task = doc.tasks[0]
+        task2 = sedml_data_model.Task(id='task2', model=task.model, simulation=task.simulation)
+        doc.tasks.append(task2)
+        report2 = sedml_data_model.Report(id='report2')
+        doc.outputs.append(report2)
+        for variable in [
+            sedml_data_model.Variable(id='time2', symbol=sedml_data_model.Symbol.time.value, task=task2),
+            sedml_data_model.Variable(id='v2', target="hhpop[0]/v", task=task2),
+        ]:
+            data_gen = sedml_data_model.DataGenerator(id='data_generator_' + variable.id, variables=[variable], math=variable.id)
+            doc.data_generators.append(data_gen)
+            report2.data_sets.append(sedml_data_model.DataSet(id='data_set_' + variable.id, label=variable.id, data_generator=data_gen))
+
+        config = get_config()
+        config.COLLECT_SED_DOCUMENT_RESULTS = True
+
+        # the tasks are executed with a single simulation
+        with mock.patch.dict('os.environ', {'COALESCE_TASKS': '1'}):
+            with mock.patch.object(core, 'run_lems_xml', wraps=core.run_lems_xml) as run_lems_xml:
+                results, log = core.exec_sed_doc(doc, self.dirname, os.path.join(self.dirname, 'out'), config=config, num_workers=1)
+        self.assertEqual(run_lems_xml.call_count, 1)
+
+        self.assertEqual(log.tasks['task'].status.value, 'SUCCEEDED')
+        self.assertEqual(log.tasks['task2'].status.value, 'SUCCEEDED')
+        self.assertEqual(log.tasks['task2'].simulator_details['coalescedTasks'], ['task', 'task2'])
+        self.assertEqual(set(results['report1'].keys()), set(['data_set_time', 'data_set_v', 'data_set_m', 'data_set_h', 'data_set_n']))
+        numpy.testing.assert_allclose(results['report2']['data_set_time2'], results['report1']['data_set_time'])
+        numpy.testing.assert_allclose(results['report2']['data_set_v2'], results['report1']['data_set_v'])
+
+        # the tasks are executed separately if coalescing is disabled
+        with mock.patch.dict('os.environ', {'COALESCE_TASKS': '0'}):
+            with mock.patch.object(core, 'run_lems_xml', wraps=core.run_lems_xml) as run_lems_xml:
+                results2, log = core.exec_sed_doc(doc, self.dirname, os.path.join(self.dirname, 'out'), config=config, num_workers=1)
+        self.assertEqual(run_lems_xml.call_count, 2)
+        self.assertNotIn('coalescedTasks', log.tasks['task2'].simulator_details)
+        numpy.testing.assert_allclose(results2['report2']['data_set_v2'], results['report2']['data_set_v2'])
+
     def _get_simulation(self, algorithm=None):
         if os.path.isdir(os.path.join(self.dirname, 'fixtures')):
             shutil.rmtree(os.path.join(self.dirname, 'fixtures'))
@@ -289,6 +618,22 @@ class CoreCliTestCase(unittest.TestCase):
                     cli.main()
                     self.assertRegex(context.Exception, 'usage: ')
 
+    def test_cli_imports_simulators_lazily(self):
+        for simulator in Simulator.__members__.values():
+            code = (
+                'import importlib, sys\n'
+                'cli = importlib.import_module("biosimulators_pyneuroml.cli.{}")\n'
+                'print(sorted(set(["neuron", "netpyne", "brian2", "pyneuroml", "biosimulators_pyneuroml.core"]).intersection(sys.modules)))\n'
+            ).format(simulator.name)
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(__file__)))
+            output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True, env=env).stdout.decode()
+            self.assertEqual(output.strip().split('\n')[-1], '[]')
+
+            api = importlib.import_module('biosimulators_pyneuroml.api.{}'.format(simulator.name))
+            module = importlib.import_module(simulator.name)
+            self.assertEqual(api.get_simulator_version(), module.__version__)
+            self.assertEqual(api.exec_sed_task.__name__, 'exec_sed_task')
+
     def test_exec_sedml_docs_in_combine_archive_with_cli(self):
         doc, archive_filename = self._build_combine_archive()
         env = self._get_combine_archive_exec_env()
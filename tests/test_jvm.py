@@ -0,0 +1,134 @@
+""" Tests of the in-process execution of LEMS documents with jLEMS """
+
+from biosimulators_pyneuroml import core
+from biosimulators_pyneuroml import jvm
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from biosimulators_utils.log.data_model import TaskLog
+from biosimulators_utils.sedml.data_model import (
+    Model, ModelLanguage, UniformTimeCourseSimulation, Algorithm, Task, Variable, Symbol)
+from unittest import mock
+import numpy.testing
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class JvmTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_is_in_process_simulation_enabled(self):
+        with mock.patch.dict('os.environ', {'SIMULATE_IN_PROCESS': '1'}):
+            self.assertTrue(jvm.is_in_process_simulation_enabled())
+        with mock.patch.dict('os.environ', {'SIMULATE_IN_PROCESS': '0'}):
+            self.assertFalse(jvm.is_in_process_simulation_enabled())
+
+    def test_run_lems_xml(self):
+        lems_xml_root = utils.read_xml_file(self.filename)
+        results = utils.run_lems_xml(lems_xml_root, os.path.dirname(self.filename), in_process=True)
+        self.assertTrue(jvm.is_jvm_started())
+        self.assertEqual(set(results.keys()), set(['of0', 'of1']))
+        self.assertEqual(results['of1'].columns.values.tolist(), ['__time__', 'm', 'h', 'n'])
+        numpy.testing.assert_allclose(results['of1'].loc[:, '__time__'], numpy.linspace(0., 300e-3, 30000 + 1))
+
+        # the same JVM is reused for subsequent simulations
+        lems_xml_root = utils.read_xml_file(self.filename)
+        results2 = utils.run_lems_xml(lems_xml_root, os.path.dirname(self.filename), in_process=True)
+        numpy.testing.assert_allclose(results2['of0'].to_numpy(), results['of0'].to_numpy())
+
+        lems_xml_root = utils.read_xml_file(self.filename)
+        lems_xml_root.xpath('/Lems/Include')[-1].attrib['file'] = 'undefined.nml'
+        with self.assertRaisesRegex(RuntimeError, 'not able to execute'):
+            utils.run_lems_xml(lems_xml_root, os.path.dirname(self.filename), in_process=True)
+
+    def test_run_lems_with_jneuroml_in_jvm_with_paths_to_include(self):
+        from pyneuroml import pynml
+
+        # documents with additional include paths are executed in a new process
+        fixtures_dirname = os.path.dirname(self.filename)
+        with mock.patch.object(pynml, 'run_lems_with_jneuroml', return_value=True) as run_lems:
+            self.assertTrue(jvm.run_lems_with_jneuroml_in_jvm(os.path.basename(self.filename), paths_to_include=[fixtures_dirname],
+                                                              max_memory='1000M', exec_in_dir=fixtures_dirname, nogui=True))
+        run_lems.assert_called_once_with(os.path.basename(self.filename), paths_to_include=[fixtures_dirname], skip_run=False,
+                                         exec_in_dir=fixtures_dirname, verbose=False, exit_on_fail=False, max_memory='1000M',
+                                         nogui=True)
+
+    def test_exec_sed_task(self):
+        task = Task(
+            model=Model(id='net1', source=self.filename, language=ModelLanguage.LEMS.value),
+            simulation=UniformTimeCourseSimulation(
+                initial_time=0.,
+                output_start_time=0.,
+                output_end_time=300e-3,
+                number_of_steps=int(300 / 0.01),
+                algorithm=Algorithm(kisao_id='KISAO_0000030'),
+            ),
+        )
+        variables = [
+            Variable(id='time', symbol=Symbol.time.value, task=task),
+            Variable(id='v', target='hhpop[0]/v', task=task),
+        ]
+
+        with mock.patch.dict('os.environ', {'SIMULATE_IN_PROCESS': '1'}):
+            results, log = core.exec_sed_task(task, variables, log=TaskLog(), simulator=Simulator.pyneuroml)
+
+        numpy.testing.assert_allclose(results['time'], numpy.linspace(0., 300e-3, 30000 + 1))
+        self.assertEqual(results['v'].shape, (30000 + 1,))
+        self.assertEqual(log.simulator_details['method'], 'biosimulators_pyneuroml.jvm.run_lems_with_jneuroml_in_jvm')
+        self.assertEqual(log.simulator_details['lemsSimulation']['method'], 'eulerTree')
+
+    def test_use_jvm_cds_archive(self):
+        from pyneuroml import pynml
+
+        cds_dirname = os.path.join(self.dirname, 'cds')
+        with mock.patch.dict('os.environ', {'JVM_CDS_DIR': cds_dirname}):
+            self.assertEqual(jvm.get_jvm_cds_dirname(), cds_dirname)
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.pyneuroml), jvm.run_lems_with_jneuroml)
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.neuron), utils.run_lems_with_jneuroml_neuron)
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.netpyne), utils.run_lems_with_jneuroml_netpyne)
+
+            # the first execution records the classes that jNeuroML loads, and then generates an archive. The options for
+            # the archive are only passed to the command of jNeuroML.
+            with mock.patch.object(pynml, 'execute_command_in_dir', wraps=pynml.execute_command_in_dir) as execute_command:
+                results = utils.run_lems_xml(utils.read_xml_file(self.filename), os.path.dirname(self.filename), in_process=False)
+            self.assertIn('-XX:DumpLoadedClassList=', execute_command.call_args[0][0])
+            self.assertNotIn('JAVA_TOOL_OPTIONS', os.environ)
+            self.assertEqual([os.path.splitext(filename)[1] for filename in os.listdir(cds_dirname)], ['.jsa'])
+
+            # subsequent executions use the archive
+            with mock.patch.object(pynml, 'execute_command_in_dir', wraps=pynml.execute_command_in_dir) as execute_command:
+                results2 = utils.run_lems_xml(utils.read_xml_file(self.filename), os.path.dirname(self.filename), in_process=False)
+            self.assertIn('-XX:SharedArchiveFile=' + cds_dirname, execute_command.call_args[0][0])
+            numpy.testing.assert_allclose(results2['of0'].to_numpy(), results['of0'].to_numpy())
+
+        with mock.patch.dict('os.environ', {'JVM_CDS_DIR': ''}):
+            with jvm.use_jvm_cds_archive('pyneuroml') as jvm_options:
+                self.assertEqual(jvm_options, [])
+
+    def test_run_jneuroml(self):
+        from pyneuroml import pynml
+
+        fixtures_dirname = os.path.dirname(self.filename)
+        with mock.patch.object(pynml, 'execute_command_in_dir', return_value=(0, '')) as execute_command:
+            self.assertTrue(jvm.run_lems_with_jneuroml(os.path.basename(self.filename), paths_to_include=['/a b'],
+                                                       max_memory='1000M', exec_in_dir=fixtures_dirname))
+        command = execute_command.call_args[0][0]
+        self.assertTrue(command.startswith('java -Xmx1000M -Djava.awt.headless=true -jar '))
+        self.assertTrue(command.endswith(" {} -nogui -I '/a b'".format(os.path.basename(self.filename))))
+        self.assertEqual(execute_command.call_args[0][1], fixtures_dirname)
+
+        with mock.patch.object(pynml, 'execute_command_in_dir', return_value=(1, '')):
+            self.assertFalse(jvm.run_jneuroml('', os.path.basename(self.filename), ' -neuron', exec_in_dir=fixtures_dirname))
+
+        self.assertEqual(jvm._get_java_major_version('1.8.0_292'), 8)
+        self.assertEqual(jvm._get_java_major_version('17.0.2'), 17)
+        self.assertEqual(jvm._get_java_major_version('21'), 21)
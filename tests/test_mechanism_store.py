@@ -0,0 +1,108 @@
+""" Tests of the store of compiled NEURON mechanisms """
+
+from biosimulators_pyneuroml import mechanism_store
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from unittest import mock
+import concurrent.futures
+import numpy.testing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class MechanismStoreTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def _write_mod_file(self, name, content):
+        filename = os.path.join(self.dirname, name)
+        with open(filename, 'w') as file:
+            file.write(content)
+        return filename
+
+    def test_get_mechanism_store_key(self):
+        filename = self._write_mod_file('a.mod', 'NEURON { SUFFIX a }')
+        key = mechanism_store.get_mechanism_store_key([filename], '8.2.7')
+        self.assertEqual(mechanism_store.get_mechanism_store_key([filename], '8.2.7'), key)
+        self.assertNotEqual(mechanism_store.get_mechanism_store_key([filename], '9.0.0'), key)
+
+        with mock.patch.dict('os.environ', {'CFLAGS': '-O3'}):
+            self.assertNotEqual(mechanism_store.get_mechanism_store_key([filename], '8.2.7'), key)
+
+        self._write_mod_file('a.mod', 'NEURON { SUFFIX b }')
+        self.assertNotEqual(mechanism_store.get_mechanism_store_key([filename], '8.2.7'), key)
+
+    def test_get_add(self):
+        store = mechanism_store.MechanismStore(os.path.join(self.dirname, 'store'))
+        filename = self._write_mod_file('a.mod', 'NEURON { SUFFIX a }')
+        os.mkdir(os.path.join(self.dirname, 'sim'))
+
+        num_compilations = []
+
+        def compile(dirname):
+            self.assertTrue(os.path.isfile(os.path.join(dirname, 'a.mod')))
+            num_compilations.append(None)
+            time.sleep(0.1)
+            os.makedirs(os.path.join(dirname, 'x86_64', '.libs'))
+            with open(os.path.join(dirname, 'x86_64', '.libs', 'libnrnmech.so'), 'w') as file:
+                file.write('library')
+            return True
+
+        self.assertFalse(store.get('key', os.path.join(self.dirname, 'sim')))
+
+        # mechanisms are only compiled once, even when they are requested concurrently
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: store.add('key', [filename], compile), range(4)))
+        self.assertEqual(results, [True] * 4)
+        self.assertEqual(len(num_compilations), 1)
+
+        self.assertTrue(store.get('key', os.path.join(self.dirname, 'sim')))
+        self.assertTrue(store.get('key', os.path.join(self.dirname, 'sim')))
+        self.assertTrue(os.path.islink(os.path.join(self.dirname, 'sim', 'x86_64')))
+        with open(os.path.join(self.dirname, 'sim', 'x86_64', '.libs', 'libnrnmech.so'), 'r') as file:
+            self.assertEqual(file.read(), 'library')
+        self.assertEqual(store.get_stats(), {'hits': 2, 'misses': 1})
+
+        # failed compilations aren't stored
+        self.assertFalse(store.add('key2', [filename], lambda dirname: False))
+        self.assertFalse(store.get('key2', os.path.join(self.dirname, 'sim')))
+        self.assertEqual(sorted(name for name in os.listdir(store.dirname) if not name.endswith('.lock')), ['key'])
+
+        store.clear()
+        self.assertEqual(os.listdir(store.dirname), [])
+
+    def test_get_mechanism_store(self):
+        with mock.patch.dict('os.environ', {'MECHANISM_STORE_DIR': ''}):
+            self.assertEqual(mechanism_store.get_mechanism_store(), None)
+
+        with mock.patch.dict('os.environ', {'MECHANISM_STORE_DIR': os.path.join(self.dirname, 'store')}):
+            store = mechanism_store.get_mechanism_store()
+            self.assertEqual(store.dirname, os.path.join(self.dirname, 'store'))
+            self.assertIs(mechanism_store.get_mechanism_store(), store)
+
+    def test_run_lems_xml(self):
+        working_dirname = os.path.dirname(self.filename)
+
+        with mock.patch.dict('os.environ', {'MECHANISM_STORE_DIR': os.path.join(self.dirname, 'store')}):
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.neuron), utils.run_lems_with_jneuroml_neuron)
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.netpyne), utils.run_lems_with_jneuroml_netpyne)
+
+            with mock.patch.object(utils, '_run_script', wraps=utils._run_script) as run_script:
+                results = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron)
+                results2 = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron)
+
+        program_names = [call[0][2] for call in run_script.call_args_list]
+        self.assertEqual(program_names, ['nrnivmodl', 'NEURON', 'NEURON'])
+
+        for output_id, result in results.items():
+            numpy.testing.assert_allclose(results2[output_id].to_numpy(), result.to_numpy())
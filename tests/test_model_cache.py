@@ -0,0 +1,103 @@
+""" Tests of the cache of parsed LEMS documents """
+
+from biosimulators_pyneuroml import model_cache
+from biosimulators_utils.sedml.data_model import ModelAttributeChange
+from unittest import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class ModelCacheTestCase(unittest.TestCase):
+    LEMS = (
+        '<Lems>\n'
+        '  <pulseGenerator id="pulseGen1" delay="100ms" duration="100ms" amplitude="0.08nA"/>\n'
+        '  <Simulation id="sim1" length="300ms" step="0.01ms"/>\n'
+        '</Lems>\n'
+    )
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'model.xml')
+        with open(self.filename, 'w') as file:
+            file.write(self.LEMS)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_get(self):
+        cache = model_cache.ModelCache(1e6)
+        model = cache.get(self.filename)
+        self.assertEqual(model.root.xpath('/Lems/pulseGenerator/@amplitude'), ['0.08nA'])
+        self.assertEqual(model.simulation.attrib['id'], 'sim1')
+        self.assertIs(cache.get(os.path.relpath(self.filename)), model)
+
+        # files whose modification times change, but whose contents don't change, are not parsed again
+        os.utime(self.filename, ns=(0, 0))
+        self.assertIs(cache.get(self.filename), model)
+        self.assertEqual(model.mtime, 0)
+
+        # modified files are parsed again
+        with open(self.filename, 'w') as file:
+            file.write(self.LEMS.replace('0.08nA', '0.2nA'))
+        model2 = cache.get(self.filename)
+        self.assertIsNot(model2, model)
+        self.assertEqual(model2.root.xpath('/Lems/pulseGenerator/@amplitude'), ['0.2nA'])
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['models'], 1)
+        self.assertEqual(stats['memory'], len(model2.content) * (1 + model_cache.PARSED_MODEL_SIZE_FACTOR))
+
+        cache.clear()
+        self.assertEqual(cache.get_stats()['models'], 0)
+
+    def test_get_invalid(self):
+        with open(self.filename, 'w') as file:
+            file.write('<Lems/>')
+        cache = model_cache.ModelCache(1e6)
+        with self.assertRaisesRegex(ValueError, 'must have a `Simulation` element'):
+            cache.get(self.filename)
+        self.assertEqual(cache.get_stats()['models'], 0)
+
+    def test_evict(self):
+        filename2 = os.path.join(self.dirname, 'model2.xml')
+        shutil.copyfile(self.filename, filename2)
+        cache = model_cache.ModelCache(len(self.LEMS) * (1 + model_cache.PARSED_MODEL_SIZE_FACTOR) * 1.5)
+        model = cache.get(self.filename)
+        cache.get(filename2)
+        self.assertEqual(cache.get_stats()['models'], 1)
+        self.assertIsNot(cache.get(self.filename), model)
+
+    def test_use(self):
+        model = model_cache.ModelCache(1e6).get(self.filename)
+        change = ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen1']/@amplitude", new_value='0.2nA')
+
+        with model.use() as view:
+            self.assertIs(view.root, model.root)
+            view.apply_changes([change])
+
+            # concurrent uses of the document use other views, parsed from the original file
+            with model.use() as view2:
+                self.assertIsNot(view2.root, model.root)
+                self.assertEqual(view2.root.xpath('/Lems/pulseGenerator/@amplitude'), ['0.08nA'])
+
+        self.assertEqual(model.root.xpath('/Lems/pulseGenerator/@amplitude'), ['0.08nA'])
+        with model.use() as view3:
+            self.assertIn(view3, [view, view2])
+        self.assertEqual(len(model._views), 2)
+
+    def test_get_model_cache(self):
+        with mock.patch.dict('os.environ', {}):
+            os.environ.pop('MODEL_CACHE_MAX_SIZE', None)
+            self.assertEqual(model_cache.get_model_cache(), None)
+
+        with mock.patch.dict('os.environ', {'MODEL_CACHE_MAX_SIZE': '0'}):
+            self.assertEqual(model_cache.get_model_cache(), None)
+
+        with mock.patch.dict('os.environ', {'MODEL_CACHE_MAX_SIZE': '1e6'}):
+            cache = model_cache.get_model_cache()
+            self.assertEqual(cache.max_size, 1000000)
+            self.assertIs(model_cache.get_model_cache(), cache)
@@ -0,0 +1,60 @@
+""" Tests of applying changes to and reverting changes from the LEMS documents of preprocessed tasks """
+
+from biosimulators_pyneuroml import model_state
+from biosimulators_utils.sedml.data_model import ModelAttributeChange
+import lxml.etree
+import unittest
+
+
+class ModelStateTestCase(unittest.TestCase):
+    LEMS = (
+        '<Lems xmlns:x="http://example.com/x">'
+        '<pulseGenerator id="pulseGen1" delay="100ms" amplitude="0.08nA"/>'
+        '<pulseGenerator id="pulseGen2" delay="100ms" amplitude="0.08nA"/>'
+        '<Simulation id="sim1" length="300ms" step="0.01ms"><OutputFile id="of0" fileName="v.dat"/></Simulation>'
+        '</Lems>'
+    )
+
+    def test_apply_revert_changes(self):
+        root = lxml.etree.fromstring(self.LEMS)
+        original = lxml.etree.tostring(root)
+        state = model_state.LemsModelState(root)
+        self.assertIs(state.simulation, root.xpath('/Lems/Simulation')[0])
+
+        changes = [
+            ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen1']/@amplitude", new_value=0.2),
+            ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen1']/@amplitude", new_value='0.3nA'),
+            ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen2']/@duration", new_value='50ms'),
+            ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen2']/@x:note", new_value='changed',
+                                 target_namespaces={'x': 'http://example.com/x'}),
+        ]
+        with state.use():
+            state.apply_changes(changes)
+            self.assertEqual(root.xpath("/Lems/pulseGenerator[@id='pulseGen1']/@amplitude"), ['0.3nA'])
+            self.assertEqual(root.xpath("/Lems/pulseGenerator[@id='pulseGen2']/@duration"), ['50ms'])
+            self.assertEqual(root[1].get('{http://example.com/x}note'), 'changed')
+
+            state.simulation.attrib['length'] = '1s'
+            state.simulation.remove(state.simulation[0])
+            state.simulation.append(lxml.etree.Element('OutputFile', id='sedml'))
+        self.assertEqual(lxml.etree.tostring(root), original)
+
+        # the targets of changes are cached
+        self.assertEqual(len(state._targets), 3)
+        with state.use():
+            state.apply_changes(changes[0:1])
+            self.assertEqual(root.xpath("/Lems/pulseGenerator[@id='pulseGen1']/@amplitude"), ['0.2'])
+        self.assertEqual(len(state._targets), 3)
+        self.assertEqual(lxml.etree.tostring(root), original)
+
+    def test_apply_changes_errors(self):
+        state = model_state.LemsModelState(lxml.etree.fromstring(self.LEMS))
+
+        with self.assertRaisesRegex(NotImplementedError, 'not an attribute'):
+            state.apply_changes([ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen1']", new_value='1')])
+
+        with self.assertRaisesRegex(ValueError, 'must match a single object'):
+            state.apply_changes([ModelAttributeChange(target='/Lems/pulseGenerator/@amplitude', new_value='1nA')])
+
+        with self.assertRaisesRegex(ValueError, 'No namespace'):
+            state.apply_changes([ModelAttributeChange(target="/Lems/pulseGenerator[@id='pulseGen1']/@y:note", new_value='1')])
@@ -0,0 +1,102 @@
+""" Tests of the execution of NetPyNE simulations with MPI """
+
+from biosimulators_pyneuroml import mpi
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from unittest import mock
+import numpy.testing
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class MpiTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def _add_cell(self):
+        """ Add a second, stimulated cell to the network of the model """
+        filename = os.path.join(self.dirname, 'fixtures', 'NML2_SingleCompHHCell.nml')
+        with open(filename, 'r') as file:
+            model = file.read()
+        model = model.replace(
+            '<explicitInput target="hhpop[0]" input="pulseGen1"/>',
+            ('<population id="hhpop1" component="hhcell" size="1"/>\n'
+             '        <explicitInput target="hhpop[0]" input="pulseGen1"/>\n'
+             '        <explicitInput target="hhpop1[0]" input="pulseGen1"/>'))
+        with open(filename, 'w') as file:
+            file.write(model)
+
+    def test_get_mpi_hostfile_slots(self):
+        filename = os.path.join(self.dirname, 'hostfile')
+        with open(filename, 'w') as file:
+            file.write('# nodes\nnode1 slots=4\nnode2 slots=2 max_slots=8\n\nnode3\nnode4:3\n')
+        self.assertEqual(mpi.get_mpi_hostfile_slots(filename), 10)
+
+        with mock.patch.dict('os.environ', {'MPI_HOSTFILE': filename}):
+            self.assertEqual(mpi.get_mpi_hostfile(), filename)
+            self.assertEqual(utils.get_simulator_run_lems_method(Simulator.netpyne), utils.run_lems_with_jneuroml_netpyne)
+        with mock.patch.dict('os.environ', {'MPI_HOSTFILE': ''}):
+            self.assertEqual(mpi.get_mpi_hostfile(), None)
+
+    def test_get_mpi_num_ranks(self):
+        self.assertEqual(mpi.get_mpi_num_ranks(4), 4)
+        self.assertEqual(mpi.get_mpi_num_ranks(None), 1)
+        self.assertEqual(mpi.get_mpi_num_ranks(4, num_cells=2), 2)
+        self.assertEqual(mpi.get_mpi_num_ranks(4, num_cells=0), 1)
+
+        filename = os.path.join(self.dirname, 'hostfile')
+        with open(filename, 'w') as file:
+            file.write('node1 slots=8\nnode2 slots=8\n')
+        self.assertEqual(mpi.get_mpi_num_ranks(4, num_cells=100, hostfile=filename), 16)
+
+    def test_get_mpiexec_args(self):
+        with mock.patch.object(mpi, '_is_open_mpi', return_value=False):
+            with mock.patch.dict('os.environ', {'MPIEXEC_ARGS': '--bind-to core'}):
+                self.assertEqual(mpi.get_mpiexec_args(2, hostfile='hosts'),
+                                 ['mpiexec', '-n', '2', '--hostfile', 'hosts', '--bind-to', 'core'])
+
+        with mock.patch.object(mpi, '_is_open_mpi', return_value=True):
+            with mock.patch.object(os, 'geteuid', return_value=0):
+                self.assertEqual(mpi.get_mpiexec_args(2), ['mpiexec', '-n', '2', '--oversubscribe', '--allow-run-as-root'])
+            with mock.patch.object(os, 'geteuid', return_value=1000):
+                self.assertEqual(mpi.get_mpiexec_args(2, hostfile='hosts'), ['mpiexec', '-n', '2', '--hostfile', 'hosts'])
+
+    def test_get_lems_num_cells(self):
+        self.assertEqual(utils.get_lems_num_cells(utils.read_xml_file(self.filename), os.path.dirname(self.filename)), 1)
+        self._add_cell()
+        self.assertEqual(utils.get_lems_num_cells(utils.read_xml_file(self.filename), os.path.dirname(self.filename)), 2)
+
+    @unittest.skipIf(shutil.which('mpiexec') is None, 'MPI is not installed')
+    def test_run_lems_xml(self):
+        self._add_cell()
+        working_dirname = os.path.dirname(self.filename)
+        lems_xml_root = utils.read_xml_file(self.filename)
+        simulation_xml = lems_xml_root.xpath('/Lems/Simulation')[0]
+        for output_file_xml in simulation_xml.xpath('OutputFile'):
+            for column_xml in output_file_xml.xpath('OutputColumn'):
+                column_xml.attrib['quantity'] = column_xml.attrib['quantity'].replace('hhpop[0]', 'hhpop1[0]')
+        utils.write_xml_file(lems_xml_root, self.filename)
+
+        # simulations with multiple processors are executed with MPI, with at most one rank per cell
+        with mock.patch.object(utils, '_run_script', wraps=utils._run_script) as run_script:
+            results = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.netpyne,
+                                         num_processors=4)
+        args = run_script.call_args_list[-1][0][0]
+        self.assertEqual(args[0:3], ['mpiexec', '-n', '2'])
+        self.assertIn(mpi.MPI_LAUNCHER_FILENAME, args)
+
+        # the outputs of the cell simulated by the second rank are gathered
+        results2 = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.netpyne,
+                                      num_processors=1)
+        self.assertEqual(set(results.keys()), set(results2.keys()))
+        for output_id, result in results.items():
+            numpy.testing.assert_allclose(result.to_numpy(), results2[output_id].to_numpy())
@@ -0,0 +1,124 @@
+""" Tests of setting the values of parameters in the NEURON code generated by jNeuroML at runtime """
+
+from biosimulators_pyneuroml import code_cache
+from biosimulators_pyneuroml import neuron_parameters
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from unittest import mock
+import numpy.testing
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class NeuronParametersTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell_inline.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def _set_parameters(self, lems_xml_root):
+        lems_xml_root.xpath('/Lems/pulseGenerator')[0].attrib['amplitude'] = '0.2nA'
+        lems_xml_root.xpath('/Lems/expTwoSynapse')[0].attrib['gbase'] = '2nS'
+        lems_xml_root.xpath("/Lems/cell//channelDensity[@id='KConductances']")[0].attrib['condDensity'] = '30 mS_per_cm2'
+        lems_xml_root.xpath('/Lems/network/projection/connectionWD')[0].attrib['weight'] = '1.5'
+        lems_xml_root.xpath('/Lems/network')[0].attrib['temperature'] = '279.45 K'
+
+    def test_get_neuron_runtime_parameters(self):
+        lems_xml_root = utils.read_xml_file(self.filename)
+        parameters = neuron_parameters.get_neuron_runtime_parameters(lems_xml_root)
+        self.assertEqual(
+            [(parameter.xml_element.attrib.get('id', None), parameter.attr_name, parameter.value) for parameter in parameters],
+            [
+                ('pulseGen1', 'delay', 100.),
+                ('pulseGen1', 'duration', 100.),
+                ('pulseGen1', 'amplitude', 0.08),
+                ('syn1', 'gbase', 0.0005),
+                ('syn1', 'erev', 0.),
+                ('leak', 'condDensity', 0.0003),
+                ('NaConductances', 'condDensity', 0.12),
+                ('KConductances', 'condDensity', 0.036),
+                ('0', 'weight', 2.),
+                ('net1', 'temperature', 6.3),
+            ])
+
+        # parameters whose values can't be interpreted, and densities of channels with multiple densities, can't be set at
+        # runtime
+        lems_xml_root.xpath('/Lems/pulseGenerator')[0].attrib['amplitude'] = '0.2 ampere'
+        density_xml = lems_xml_root.xpath("/Lems/cell//channelDensity[@id='KConductances']")[0]
+        density_xml.addnext(density_xml.makeelement('channelDensity', {
+            'id': 'KConductances2', 'ionChannel': 'KConductance', 'condDensity': '1 S_per_m2', 'segmentGroup': 'dendrites'}))
+        lems_xml_root.xpath('/Lems/network/projection/connectionWD')[0].attrib['id'] = '1'
+        attrs = [
+            (parameter.xml_element.attrib.get('id', None), parameter.attr_name)
+            for parameter in neuron_parameters.get_neuron_runtime_parameters(lems_xml_root)
+        ]
+        self.assertNotIn(('pulseGen1', 'amplitude'), attrs)
+        self.assertNotIn(('KConductances', 'condDensity'), attrs)
+        self.assertNotIn(('KConductances2', 'condDensity'), attrs)
+        self.assertNotIn(('1', 'weight'), attrs)
+        self.assertIn(('NaConductances', 'condDensity'), attrs)
+
+    def test_get_neuron_code_cache_key(self):
+        working_dirname = os.path.dirname(self.filename)
+        lems_xml_root = utils.read_xml_file(self.filename)
+        key = code_cache.get_neuron_code_cache_key(lems_xml_root, utils.get_lems_included_files(lems_xml_root, working_dirname))
+
+        # the key doesn't depend on the values of the parameters which can be set at runtime
+        lems_xml_root2 = utils.read_xml_file(self.filename)
+        self._set_parameters(lems_xml_root2)
+        self.assertEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root2, utils.get_lems_included_files(lems_xml_root2, working_dirname)), key)
+        self.assertEqual(lems_xml_root2.xpath('/Lems/pulseGenerator')[0].attrib['amplitude'], '0.2nA')
+
+        # the key depends on the values of other parameters
+        lems_xml_root2.xpath('/Lems/expTwoSynapse')[0].attrib['tauRise'] = '2ms'
+        self.assertNotEqual(code_cache.get_neuron_code_cache_key(
+            lems_xml_root2, utils.get_lems_included_files(lems_xml_root2, working_dirname)), key)
+
+    def test_set_neuron_script_runtime_parameters(self):
+        filename = os.path.join(self.dirname, 'model_nrn.py')
+        with open(filename, 'w') as file:
+            file.write('class NeuronSimulation():\n\n    def __init__(self):\n        pass\n\n    def run(self):\n        pass\n')
+
+        neuron_parameters.set_neuron_script_runtime_parameters(filename, utils.read_xml_file(self.filename))
+
+        with open(filename, 'r') as file:
+            script = file.read()
+        compile(script, filename, 'exec')
+        self.assertIn("        for _point_process in h.List('pulseGen1'):\n            _point_process.amplitude = 0.08\n", script)
+        self.assertIn("        h.celsius = 6.3\n\n    def run(self):\n", script)
+        self.assertIn("        _netcons[h.syn_proj_syn1[0].hname()].weight[0] = 2.0\n", script)
+
+        with open(filename, 'w') as file:
+            file.write('print("simulation")\n')
+        with self.assertRaisesRegex(ValueError, 'does not define a simulation'):
+            neuron_parameters.set_neuron_script_runtime_parameters(filename, utils.read_xml_file(self.filename))
+
+    def test_run_lems_xml(self):
+        working_dirname = os.path.dirname(self.filename)
+        lems_xml_root = utils.read_xml_file(self.filename)
+        lems_xml_root.xpath('/Lems/Simulation')[0].attrib['length'] = '250ms'
+
+        with mock.patch.dict('os.environ', {'NEURON_CODE_CACHE_DIR': os.path.join(self.dirname, 'cache')}):
+            base_results = utils.run_lems_xml(lems_xml_root, working_dirname, simulator=Simulator.neuron)
+
+            # a variant of the model with other values of the parameters reuses the generated code
+            self._set_parameters(lems_xml_root)
+            with mock.patch.object(utils, '_generate_script_with_jneuroml', side_effect=Exception('jNeuroML should not be executed')):
+                results = utils.run_lems_xml(lems_xml_root, working_dirname, simulator=Simulator.neuron)
+
+        expected_results = utils.run_lems_xml(lems_xml_root, working_dirname, simulator=Simulator.neuron)
+
+        self.assertEqual(set(results.keys()), set(['of0']))
+        self.assertEqual(results['of0'].shape, expected_results['of0'].shape)
+        self.assertGreater(numpy.abs(results['of0'].to_numpy() - base_results['of0'].to_numpy()).max(), 1e-3)
+
+        # jNeuroML rounds some values to single precision (e.g., 3.0 S_per_m2 to 2.9999999E-4 S/cm2)
+        numpy.testing.assert_allclose(results['of0'].to_numpy(), expected_results['of0'].to_numpy(), rtol=0., atol=1e-6)
@@ -0,0 +1,96 @@
+""" Tests of the in-process execution of NEURON simulations """
+
+from biosimulators_pyneuroml import core
+from biosimulators_pyneuroml import nrn
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.data_model import Simulator
+from biosimulators_utils.log.data_model import TaskLog
+from biosimulators_utils.sedml.data_model import (
+    Model, ModelLanguage, UniformTimeCourseSimulation, Algorithm, Task, Variable, Symbol)
+from unittest import mock
+import numpy.testing
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class NeuronInProcessTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.filename = os.path.join(self.dirname, 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_get_neuron_simulation_arguments(self):
+        script = '\nif __name__ == \'__main__\':\n\n    ns = NeuronSimulation(tstop=10, dt=0.01, seed=123456789, abs_tol=None, rel_tol=None)\n'
+        self.assertEqual(nrn.get_neuron_simulation_arguments(script),
+                         {'tstop': 10, 'dt': 0.01, 'seed': 123456789, 'abs_tol': None, 'rel_tol': None})
+
+        with self.assertRaisesRegex(ValueError, 'does not instantiate'):
+            nrn.get_neuron_simulation_arguments('')
+
+    def test_run_lems_xml(self):
+        working_dirname = os.path.dirname(self.filename)
+
+        with mock.patch.object(utils, 'read_lems_output_files', side_effect=Exception('Outputs should not be read from files')):
+            results = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron,
+                                         in_process=True)
+        subprocess_results = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron,
+                                                in_process=False)
+
+        self.assertEqual(set(results.keys()), set(['of0', 'of1']))
+        for output_id, result in results.items():
+            self.assertEqual(result.columns.values.tolist(), subprocess_results[output_id].columns.values.tolist())
+            numpy.testing.assert_allclose(result.to_numpy(), subprocess_results[output_id].to_numpy(), rtol=1e-6, atol=1e-12)
+
+        # the values which aren't converted to other units are views of the vectors which recorded them
+        self.assertIsInstance(results['of1']['m'].to_numpy().base.base, nrn._VectorView)
+        values = results['of1'].to_numpy().copy()
+
+        # the mechanisms and templates of the model are reused by subsequent simulations, and the previous model is removed
+        results2 = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron,
+                                      in_process=True, num_output_rows=10)
+        numpy.testing.assert_allclose(results2['of1'].to_numpy(), results['of1'].to_numpy()[-10:, :])
+        numpy.testing.assert_equal(results['of1'].to_numpy(), values)
+
+        from neuron import h
+        self.assertEqual(len(list(h.allsec())), 1)
+
+        # models whose mechanisms conflict with those which have been loaded are simulated in child processes
+        with mock.patch.dict(nrn._loaded_mechanisms, {'KConductance': 'a different hash'}):
+            self.assertFalse(nrn.can_run_neuron_script_in_process(working_dirname))
+            with mock.patch.object(nrn, 'exec', create=True, side_effect=Exception('Script should not be executed in process')):
+                results3 = utils.run_lems_xml(utils.read_xml_file(self.filename), working_dirname, simulator=Simulator.neuron,
+                                              in_process=True)
+        numpy.testing.assert_allclose(results3['of0'].to_numpy(), results['of0'].to_numpy(), rtol=1e-6, atol=1e-12)
+
+    def test_exec_sed_task(self):
+        task = Task(
+            model=Model(id='net1', source=self.filename, language=ModelLanguage.LEMS.value),
+            simulation=UniformTimeCourseSimulation(
+                initial_time=0.,
+                output_start_time=0.,
+                output_end_time=100e-3,
+                number_of_steps=int(100 / 0.01),
+                algorithm=Algorithm(kisao_id='KISAO_0000030'),
+            ),
+        )
+        variables = [
+            Variable(id='time', symbol=Symbol.time.value, task=task),
+            Variable(id='v', target='hhpop[0]/v', task=task),
+        ]
+
+        with mock.patch.dict('os.environ', {'SIMULATE_IN_PROCESS': '1'}):
+            results, log = core.exec_sed_task(task, variables, log=TaskLog(), simulator=Simulator.neuron)
+
+        numpy.testing.assert_allclose(results['time'], numpy.linspace(0., 100e-3, 10000 + 1))
+        self.assertEqual(results['v'].shape, (10000 + 1,))
+        self.assertEqual(log.simulator_details['method'], 'biosimulators_pyneuroml.utils.run_lems_with_jneuroml_neuron_in_process')
+        self.assertTrue(set(['validateTask', 'readModel', 'writeModel', 'generateCode', 'compileMechanisms', 'simulate', 'readOutputs',
+                             'total']).issubset(log.simulator_details['timings'].keys()))
+        self.assertGreater(log.simulator_details['timings']['simulate']['wallTime'], 0.)
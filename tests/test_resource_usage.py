@@ -0,0 +1,108 @@
+""" Tests of the measurement of the resources used by child processes """
+
+from biosimulators_pyneuroml.resource_usage import ChildProcessMonitor, set_monitored_directory
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+
+class ResourceUsageTestCase(unittest.TestCase):
+    def test_child_process_monitor(self):
+        code = (
+            'import time\n'
+            'data = bytearray(200 * 1000 * 1000)\n'
+            'for i in range(0, len(data), 4096):\n'
+            '    data[i] = 1\n'
+            'time.sleep(0.5)\n'
+        )
+        with ChildProcessMonitor(sample_interval=0.01) as monitor:
+            subprocess.run([sys.executable, '-c', code], check=True)
+
+        usage = monitor.usage
+        self.assertGreater(usage['peakMemory'], 200 * 1000 * 1000)
+        self.assertEqual(len(usage['peakMemoryByProgram']), 1)
+        self.assertGreater(list(usage['peakMemoryByProgram'].values())[0], 200 * 1000 * 1000)
+        self.assertGreater(usage['userCpuTime'] + usage['systemCpuTime'], 0.)
+        self.assertGreaterEqual(usage['readBytes'], 0)
+        self.assertGreaterEqual(usage['writtenBytes'], 0)
+
+        # CPU time is only attributed to the child processes which terminate within the context
+        with ChildProcessMonitor(sample_interval=0.01) as monitor:
+            pass
+        self.assertLess(monitor.usage['userCpuTime'], usage['userCpuTime'])
+
+    def test_concurrent_child_process_monitors(self):
+        busy_code = (
+            'import time\n'
+            'end = time.process_time() + 1.\n'
+            'while time.process_time() < end:\n'
+            '    pass\n'
+        )
+        idle_code = 'import time; time.sleep(1.)'
+        monitors = {}
+
+        def run(name, code):
+            dirname = tempfile.mkdtemp()
+            with ChildProcessMonitor(sample_interval=0.01) as monitor:
+                set_monitored_directory(dirname)
+                subprocess.run([sys.executable, '-c', code], check=True, cwd=dirname)
+            monitors[name] = monitor
+            shutil.rmtree(dirname)
+
+        threads = [threading.Thread(target=run, args=args) for args in [('busy', busy_code), ('idle', idle_code)]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # CPU time is only attributed to the child processes in the directory of each context
+        self.assertGreater(monitors['busy'].usage['userCpuTime'], 0.5)
+        self.assertLess(monitors['idle'].usage['userCpuTime'], 0.5)
+
+    def test_disabled_child_process_monitor(self):
+        with ChildProcessMonitor(enabled=False) as monitor:
+            subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        self.assertEqual(monitor.usage, None)
+
+    def test_child_process_monitor_max_memory(self):
+        code = (
+            'import time\n'
+            'data = bytearray(300 * 1000 * 1000)\n'
+            'for i in range(0, len(data), 4096):\n'
+            '    data[i] = 1\n'
+            'time.sleep(10.)\n'
+        )
+        with ChildProcessMonitor(sample_interval=0.01, max_memory=100 * 1000 * 1000) as monitor:
+            process = subprocess.run([sys.executable, '-c', code], check=False)
+        self.assertNotEqual(process.returncode, 0)
+        self.assertTrue(monitor.memory_exceeded)
+
+    def test_child_process_monitor_directory(self):
+        dirname = tempfile.mkdtemp()
+        code = 'import time; time.sleep(0.3)'
+        with ChildProcessMonitor(sample_interval=0.01) as monitor:
+            set_monitored_directory(dirname)
+            subprocess.run([sys.executable, '-c', code], check=True)
+        self.assertEqual(monitor.usage['peakMemoryByProgram'], {})
+
+        with ChildProcessMonitor(sample_interval=0.01) as monitor:
+            set_monitored_directory(dirname)
+            subprocess.run([sys.executable, '-c', code], check=True, cwd=dirname)
+        self.assertEqual(len(monitor.usage['peakMemoryByProgram']), 1)
+        shutil.rmtree(dirname)
+
+    def test_child_process_monitor_excludes_existing_processes(self):
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(10.)'])
+        try:
+            with ChildProcessMonitor(sample_interval=0.01, max_memory=1) as monitor:
+                time.sleep(0.1)
+            self.assertEqual(monitor.usage['peakMemoryByProgram'], {})
+            self.assertFalse(monitor.memory_exceeded)
+            self.assertEqual(process.poll(), None)
+        finally:
+            process.kill()
+            process.wait()
@@ -0,0 +1,112 @@
+""" Tests of the scheduler of the processors and memory of concurrent simulations """
+
+from biosimulators_pyneuroml import scheduler
+from biosimulators_pyneuroml.data_model import Simulator
+from biosimulators_pyneuroml.utils import read_xml_file
+from unittest import mock
+import os
+import threading
+import time
+import unittest
+
+
+class ResourceSchedulerTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def test_reserve(self):
+        resource_scheduler = scheduler.ResourceScheduler(4, 1000)
+
+        with resource_scheduler.reserve(2, 600) as reservation:
+            self.assertEqual(reservation.processors, 2)
+            self.assertEqual(reservation.memory, 600)
+            self.assertEqual(reservation.memory_limit, None)
+            self.assertEqual(resource_scheduler.get_stats(), {'freeProcessors': 2, 'freeMemory': 400, 'waiting': 0})
+        self.assertEqual(resource_scheduler.get_stats(), {'freeProcessors': 4, 'freeMemory': 1000, 'waiting': 0})
+
+        # requests which exceed the budget are reduced to the budget
+        with resource_scheduler.reserve(8, 2000) as reservation:
+            self.assertEqual(reservation.processors, 4)
+            self.assertEqual(reservation.memory, 1000)
+
+        with resource_scheduler.reserve(0, 0) as reservation:
+            self.assertEqual(reservation.processors, 1)
+
+        # the memory of reservations is only enforced if requested
+        with resource_scheduler.reserve(1, 2000, limit_memory=True) as reservation:
+            self.assertEqual(reservation.memory_limit, 1000)
+            self.assertEqual(reservation.to_dict()['memoryLimit'], 1000)
+
+    def test_reserve_queue(self):
+        resource_scheduler = scheduler.ResourceScheduler(4, 1000)
+        order = []
+
+        def simulate(name, processors, memory):
+            with resource_scheduler.reserve(processors, memory) as reservation:
+                order.append(name)
+                time.sleep(0.1)
+            return reservation
+
+        first = resource_scheduler.acquire(1, 800)
+
+        # the second request doesn't fit in the remaining memory and waits; the third request waits for the second
+        threads = []
+        for name, processors, memory in [('second', 1, 500), ('third', 1, 100)]:
+            thread = threading.Thread(target=simulate, args=(name, processors, memory))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.1)
+
+        self.assertEqual(order, [])
+        self.assertEqual(resource_scheduler.get_stats()['waiting'], 2)
+
+        resource_scheduler.release(first)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['second', 'third'])
+        self.assertEqual(resource_scheduler.get_stats(), {'freeProcessors': 4, 'freeMemory': 1000, 'waiting': 0})
+
+    def test_estimate(self):
+        resource_scheduler = scheduler.ResourceScheduler(4, 10 * 1000 * 1000 * 1000)
+        filename = os.path.join(self.FIXTURES_DIRNAME, 'LEMS_NML2_Ex5_DetCell.xml')
+
+        processors, memory = resource_scheduler.estimate(Simulator.neuron, filename)
+        self.assertEqual(processors, 1)
+        self.assertEqual(memory, scheduler.SIMULATOR_MEMORY_ESTIMATES[Simulator.neuron])
+
+        processors, memory = resource_scheduler.estimate(Simulator.netpyne, filename)
+        self.assertEqual(processors, 4)
+        self.assertEqual(memory, scheduler.SIMULATOR_MEMORY_ESTIMATES[Simulator.netpyne] + 3 * scheduler.NETPYNE_RANK_MEMORY_ESTIMATE)
+
+        # the number of ranks is limited to the number of cells
+        processors, memory = resource_scheduler.estimate(Simulator.netpyne, filename, lems_xml_root=read_xml_file(filename),
+                                                         working_dirname=self.FIXTURES_DIRNAME)
+        self.assertEqual(processors, 1)
+
+        # estimates are based on previous simulations
+        self.assertEqual(resource_scheduler.get_measured_memory(Simulator.neuron, filename), None)
+        resource_scheduler.record(Simulator.neuron, filename, 200 * 1000 * 1000)
+        resource_scheduler.record(Simulator.neuron, filename, 100 * 1000 * 1000)
+        self.assertEqual(resource_scheduler.estimate(Simulator.neuron, filename), (1, 250 * 1000 * 1000))
+        self.assertEqual(resource_scheduler.get_measured_memory(Simulator.neuron, filename), 200 * 1000 * 1000)
+        self.assertEqual(resource_scheduler.estimate(Simulator.brian2, filename)[1],
+                         scheduler.SIMULATOR_MEMORY_ESTIMATES[Simulator.brian2])
+
+    def test_get_jvm_max_memory(self):
+        self.assertEqual(scheduler.Reservation(1, 2000 * 1000 * 1000).get_jvm_max_memory(),
+                         2000 * 1000 * 1000 - scheduler.JVM_MEMORY_OVERHEAD)
+        self.assertEqual(scheduler.Reservation(1, 200 * 1000 * 1000).get_jvm_max_memory(), 100 * 1000 * 1000)
+
+    def test_get_resource_scheduler(self):
+        with mock.patch.dict('os.environ', {'RESOURCE_SCHEDULER': '0'}):
+            self.assertEqual(scheduler.get_resource_scheduler(), None)
+
+        env = {
+            'RESOURCE_SCHEDULER': '1',
+            'RESOURCE_SCHEDULER_PROCESSORS': '3',
+            'RESOURCE_SCHEDULER_MEMORY': '2e9',
+        }
+        with mock.patch.dict('os.environ', env):
+            resource_scheduler = scheduler.get_resource_scheduler()
+            self.assertEqual(resource_scheduler.processors, 3)
+            self.assertEqual(resource_scheduler.memory, 2 * 1000 * 1000 * 1000)
+            self.assertIs(scheduler.get_resource_scheduler(), resource_scheduler)
@@ -0,0 +1,132 @@
+""" Tests of the index of the quantities of LEMS/NeuroML models """
+
+from biosimulators_pyneuroml import targets
+from biosimulators_pyneuroml import utils
+from biosimulators_pyneuroml.model_state import LemsModelState
+from biosimulators_utils.sedml.data_model import ModelAttributeChange, Variable
+import lxml.etree
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TargetsTestCase(unittest.TestCase):
+    FIXTURES_DIRNAME = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        shutil.copytree(self.FIXTURES_DIRNAME, os.path.join(self.dirname, 'fixtures'))
+        self.working_dirname = os.path.join(self.dirname, 'fixtures')
+        self.filename = os.path.join(self.working_dirname, 'LEMS_NML2_Ex5_DetCell.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_check_target(self):
+        for filename in ['LEMS_NML2_Ex5_DetCell.xml', 'LEMS_NML2_Ex5_DetCell_inline.xml']:
+            lems_xml_root = utils.read_xml_file(os.path.join(self.working_dirname, filename))
+            index = targets.LemsTargetIndex(lems_xml_root, self.working_dirname)
+
+            # the quantities recorded by the document are valid
+            for target in lems_xml_root.xpath('//@quantity'):
+                self.assertEqual(index.check_target('net1', target), None, target)
+
+        index = targets.LemsTargetIndex(utils.read_xml_file(self.filename), self.working_dirname)
+        self.assertIn('cell', index.component_types)
+        self.assertIn('hhcell', index.components)
+        self.assertEqual(sorted(index.included_files.keys()), sorted(utils.get_lems_included_files(
+            utils.read_xml_file(self.filename), self.working_dirname)))
+
+        self.assertEqual(index.check_target('net1', 'hhpop[0]/iSyn'), None)
+        self.assertEqual(index.check_target('net1', 'hhpop/0/hhcell/v'), None)
+        self.assertEqual(index.check_target('net1', 'hhpop[0]/bioPhys1/membraneProperties/NaConductances/NaConductance/m/forwardRate/r'),
+                         None)
+
+        # paths which can't be resolved with certainty are accepted
+        self.assertEqual(index.check_target('net1', 'hhpop[0]/synapses:pulseGen1:0/i'), None)
+        self.assertEqual(index.check_target('net1', 'hhpop[0]/0/v'), None)
+        self.assertEqual(index.check_target('undefined', 'hhpop[0]/V'), None)
+
+        # invalid paths
+        self.assertRegex(index.check_target('net1', 'hpop[0]/v'), '`hpop` is not a population')
+        self.assertRegex(index.check_target('net1', 'hhpop[1]/v'), 'has 1 instances')
+        self.assertRegex(index.check_target('net1', 'hhpop[0]/V'), '`V` is not a quantity or child of cell `hhcell`')
+        self.assertRegex(index.check_target('net1', 'hhpop[0]/bioPhys1/membraneProperties/NaConductances/NaConductanc/m/q'),
+                         '`NaConductanc` is not a quantity or child of channelDensity `NaConductances`')
+        self.assertRegex(index.check_target('net1', 'hhpop[0]/bioPhys1/membraneProperties/NaConductances/NaConductance/m/qq'),
+                         '`qq` is not a quantity or child of gateHHrates `m`')
+
+    def test_check_target_with_lems_component_types(self):
+        lems_xml_root = lxml.etree.fromstring(
+            '<Lems>'
+            '<ComponentType name="point"><Exposure name="x" dimension="none"/></ComponentType>'
+            '<ComponentType name="points"><Parameter name="n" dimension="none"/>'
+            '<Structure><MultiInstantiate number="n" component="point"/></Structure></ComponentType>'
+            '<ComponentType name="group"><Children name="children" type="points"/></ComponentType>'
+            '<Component id="net" type="group"><Component id="pts" type="points" n="2"/><Component id="pt" type="point"/>'
+            '<Component id="other" type="undefined"/></Component>'
+            '<Simulation id="sim" target="net"/>'
+            '</Lems>')
+        index = targets.LemsTargetIndex(lems_xml_root)
+        self.assertEqual(index.check_target('net', 'pts/n'), None)
+        self.assertEqual(index.check_target('net', 'pts[1]/x'), None)
+        self.assertEqual(index.check_target('net', 'other/y'), None)
+        self.assertEqual(index.check_target('net', 'pts/m/x'), None)
+        self.assertEqual(index.check_target('net', 'pt/x'), None)
+        self.assertRegex(index.check_target('net', 'pt/y'), '`y` is not a quantity or child of point `pt`')
+        self.assertRegex(index.check_target('net', 'pt2/x'), '`pt2` is not a population or other component of network `net`')
+
+    def test_get_lems_target_index(self):
+        model = LemsModelState(utils.read_xml_file(self.filename))
+        index = targets.get_lems_target_index(model, self.working_dirname)
+        self.assertIs(targets.get_lems_target_index(model, self.working_dirname), index)
+
+        # changes to the values of parameters share the index of the document
+        change = ModelAttributeChange(target="/Lems/Simulation/@length", new_value='1s')
+        self.assertIs(targets.get_lems_target_index(model, self.working_dirname, [change]), index)
+
+        # changes to the structure of the document are indexed separately
+        shutil.copyfile(os.path.join(self.working_dirname, 'NML2_SingleCompHHCell.nml'),
+                        os.path.join(self.working_dirname, 'cell2.nml'))
+        with open(os.path.join(self.working_dirname, 'cell2.nml'), 'r') as file:
+            cell = file.read()
+        with open(os.path.join(self.working_dirname, 'cell2.nml'), 'w') as file:
+            file.write(cell.replace('size="1"', 'size="2"'))
+        change = ModelAttributeChange(target="/Lems/Include[@file='NML2_SingleCompHHCell.nml']/@file", new_value='cell2.nml')
+        index2 = targets.get_lems_target_index(model, self.working_dirname, [change])
+        self.assertIsNot(index2, index)
+        self.assertEqual(index2.check_target('net1', 'hhpop[1]/v'), None)
+        self.assertEqual(model.root.xpath("/Lems/Include[@file='cell2.nml']"), [])
+
+        # documents whose included files change are indexed again
+        os.utime(os.path.join(self.working_dirname, 'NML2_SingleCompHHCell.nml'), ns=(0, 0))
+        self.assertFalse(index.is_current())
+        self.assertIsNot(targets.get_lems_target_index(model, self.working_dirname), index)
+
+    def test_get_lems_target_index_of_file(self):
+        # the parsed views of the same file share its index
+        model = LemsModelState(utils.read_xml_file(self.filename))
+        index = targets.get_lems_target_index(model, self.working_dirname, model_filename=self.filename)
+        model2 = LemsModelState(utils.read_xml_file(self.filename))
+        self.assertIs(targets.get_lems_target_index(model2, self.working_dirname, model_filename=self.filename), index)
+
+        # files which change are indexed again
+        os.utime(self.filename, ns=(0, 0))
+        self.assertFalse(index.is_current())
+        model3 = LemsModelState(utils.read_xml_file(self.filename))
+        self.assertIsNot(targets.get_lems_target_index(model3, self.working_dirname, model_filename=self.filename), index)
+
+    def test_validate_variable_targets(self):
+        index = targets.LemsTargetIndex(utils.read_xml_file(self.filename), self.working_dirname)
+        targets.validate_variable_targets(index, 'net1', [
+            Variable(id='time', symbol='urn:sedml:symbol:time'),
+            Variable(id='v', target='hhpop[0]/v'),
+        ])
+
+        with self.assertRaisesRegex(ValueError, 'The targets of 2 variables are not quantities of model `net1`'):
+            targets.validate_variable_targets(index, 'net1', [
+                Variable(id='v', target='hhpop[0]/v'),
+                Variable(id='v2', target='hhpop[0]/v2'),
+                Variable(id='v3', target='hhpop[2]/v'),
+            ])
@@ -0,0 +1,43 @@
+""" Tests of the measurement of the durations of the phases of the execution of tasks """
+
+from biosimulators_pyneuroml import timing
+import time
+import unittest
+
+
+class TimingTestCase(unittest.TestCase):
+    def test_time_phase(self):
+        timings = timing.PhaseTimings()
+        with timing.record_phase_timings(timings, 'execute'):
+            with timing.time_phase('simulate'):
+                time.sleep(0.05)
+                with timing.time_phase('compileMechanisms'):
+                    time.sleep(0.05)
+            with timing.time_phase('simulate'):
+                time.sleep(0.05)
+
+        self.assertEqual(set(timings.phases.keys()), set(['execute', 'simulate', 'compileMechanisms']))
+        self.assertGreaterEqual(timings.phases['simulate']['wallTime'], 0.1)
+        self.assertLess(timings.phases['simulate']['wallTime'], 0.15)
+        self.assertGreaterEqual(timings.phases['compileMechanisms']['wallTime'], 0.05)
+        self.assertLess(timings.phases['execute']['wallTime'], 0.05)
+
+        value = timings.to_dict()
+        self.assertEqual(set(value.keys()), set(['execute', 'simulate', 'compileMechanisms', 'total']))
+        self.assertAlmostEqual(value['total']['wallTime'], sum(
+            phase['wallTime'] for name, phase in value.items() if name != 'total'), places=5)
+        self.assertGreaterEqual(value['total']['cpuTime'], 0.)
+
+        timings2 = timing.PhaseTimings()
+        timings2.add('readModel', 1., 0.5)
+        timings2.update(timings)
+        self.assertEqual(timings2.phases['readModel'], {'wallTime': 1., 'cpuTime': 0.5})
+        self.assertEqual(timings2.phases['simulate'], timings.phases['simulate'])
+
+    def test_time_phase_without_recording(self):
+        with timing.time_phase('simulate'):
+            pass
+
+        with timing.record_phase_timings(None, 'execute'):
+            with timing.time_phase('simulate'):
+                pass
@@ -8,12 +8,16 @@
 
 from biosimulators_pyneuroml import data_model
 from biosimulators_pyneuroml import utils
+from biosimulators_utils.config import get_config
 from biosimulators_utils.sedml.data_model import (
-    Model, ModelLanguage, UniformTimeCourseSimulation, Algorithm, AlgorithmParameterChange, Task, Variable, Symbol)
+    Model, ModelAttributeChange, ModelLanguage, UniformTimeCourseSimulation, Algorithm, AlgorithmParameterChange, Task, Variable, Symbol)
+from biosimulators_utils.warnings import BioSimulatorsWarning
+from kisao import AlgorithmSubstitutionPolicy
 from kisao.exceptions import AlgorithmCannotBeSubstitutedException
 from kisao.warnings import AlgorithmSubstitutedWarning
 from pyneuroml import pynml
 from unittest import mock
+import concurrent.futures
 import copy
 import lxml.etree
 import numpy.testing
@@ -80,6 +84,82 @@ class UtilsTestCase(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             utils.validate_task(task, variables2, simulator=data_model.Simulator.pyneuroml)
 
+    def test_validate_task_memoized(self):
+        task = Task(
+            id='task1',
+            model=Model(
+                id='net1',
+                source=os.path.join(os.path.dirname(__file__), 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml'),
+                language=ModelLanguage.LEMS.value,
+            ),
+            simulation=UniformTimeCourseSimulation(
+                id='sim',
+                initial_time=0.,
+                output_start_time=0.,
+                output_end_time=10.,
+                number_of_steps=10,
+                algorithm=Algorithm(kisao_id='KISAO_0000030'),
+            ),
+        )
+        task2 = Task(id='task2', model=task.model, simulation=task.simulation)
+        variables = [Variable(id='v', target='hhpop[0]/v', task=task)]
+        variables2 = [Variable(id='v', target='hhpop[0]/v', task=task2)]
+
+        # tasks which share models and simulations validate them once, and the warnings of the validation are replayed
+        with mock.patch.dict(utils._validation_results, clear=True):
+            with mock.patch.object(utils.validation, 'validate_simulation', return_value=([], [['Simulation warning.']])) as validate_sim:
+                for task_, variables_ in [(task, variables), (task2, variables2), (task, variables)]:
+                    with self.assertWarnsRegex(BioSimulatorsWarning, 'Simulation warning'):
+                        self.assertEqual(utils.validate_task(task_, variables_, simulator=data_model.Simulator.pyneuroml),
+                                         'KISAO_0000030')
+                self.assertEqual(validate_sim.call_count, 1)
+
+                # changes to the structure of the objects are validated again
+                task3 = copy.deepcopy(task)
+                task3.simulation.output_end_time = 20.
+                task3.simulation.number_of_steps = 20
+                with self.assertWarnsRegex(BioSimulatorsWarning, 'Simulation warning'):
+                    utils.validate_task(task3, variables, simulator=data_model.Simulator.pyneuroml)
+                self.assertEqual(validate_sim.call_count, 2)
+
+            # errors are raised each time that they are requested
+            task3.model.language = 'urn:sedml:language:sbml'
+            for _ in range(2):
+                with self.assertRaisesRegex(ValueError, 'Language for model `net1` is not supported'):
+                    utils.validate_task(task3, variables, simulator=data_model.Simulator.pyneuroml)
+
+    def test_get_sedml_object_fingerprint(self):
+        change = ModelAttributeChange(target='/Lems/a/@b', target_namespaces={None: 'ns', 'x': 'ns2'}, new_value='1')
+        model = Model(id='model', language=ModelLanguage.LEMS.value, changes=[change])
+        fingerprint = utils.get_sedml_object_fingerprint(model)
+        self.assertEqual(utils.get_sedml_object_fingerprint(copy.deepcopy(model)), fingerprint)
+
+        model2 = copy.deepcopy(model)
+        model2.changes[0].new_value = '2'
+        self.assertNotEqual(utils.get_sedml_object_fingerprint(model2), fingerprint)
+
+        self.assertEqual(utils.get_sedml_object_fingerprint(None), None)
+
+    def test_get_substitute_algorithm(self):
+        simulator = data_model.Simulator.pyneuroml
+
+        # algorithms which the simulator implements are returned without consulting KiSAO
+        with mock.patch.object(utils, 'get_preferred_substitute_algorithm_by_ids', side_effect=Exception('KiSAO should not be used')):
+            self.assertEqual(utils.get_substitute_algorithm('KISAO_0000030', simulator, AlgorithmSubstitutionPolicy.NONE),
+                             'KISAO_0000030')
+
+        # substitutions are memoized, and their warnings and exceptions are issued each time they're requested
+        with mock.patch.dict(utils._algorithm_substitutions, clear=True):
+            with mock.patch.object(utils, 'get_preferred_substitute_algorithm_by_ids',
+                                   wraps=utils.get_preferred_substitute_algorithm_by_ids) as get_substitute:
+                for _ in range(2):
+                    with self.assertWarns(AlgorithmSubstitutedWarning):
+                        self.assertEqual(utils.get_substitute_algorithm(
+                            'KISAO_0000019', simulator, AlgorithmSubstitutionPolicy.SIMILAR_VARIABLES), 'KISAO_0000030')
+                    with self.assertRaises(AlgorithmCannotBeSubstitutedException):
+                        utils.get_substitute_algorithm('KISAO_0000019', simulator, AlgorithmSubstitutionPolicy.NONE)
+                self.assertEqual(get_substitute.call_count, 2)
+
     def test_set_sim_in_lems_xml(self):
         filename = os.path.join(os.path.dirname(__file__), 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
         task = Task(
@@ -125,15 +205,35 @@ class UtilsTestCase(unittest.TestCase):
         processors = utils.get_available_processors()
         self.assertGreaterEqual(processors, 1)
 
+        with mock.patch.dict('os.environ', {'CPUS': ''}), mock.patch.object(utils, 'get_cgroup_cpu_limit', return_value=0.5):
+            self.assertEqual(utils.get_available_processors(), 1)
+        with mock.patch.dict('os.environ', {'CPUS': '3'}):
+            self.assertEqual(utils.get_available_processors(), 3)
+
     def test_get_available_memory(self):
         memory = utils.get_available_memory()
         self.assertGreater(memory, 100 * 1e6)
 
+        with mock.patch.object(utils, 'get_cgroup_available_memory', return_value=200 * 1000000):
+            self.assertEqual(utils.get_available_memory(), 200 * 1000000)
+
     def test_get_simulator_run_lems_method(self):
-        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.brian2), pynml.run_lems_with_jneuroml_brian2)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.brian2), utils.run_lems_with_jneuroml_brian2)
         self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.pyneuroml), pynml.run_lems_with_jneuroml)
         self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.netpyne), pynml.run_lems_with_jneuroml_netpyne)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.netpyne, num_processors=1),
+                         pynml.run_lems_with_jneuroml_netpyne)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.netpyne, num_processors=2),
+                         utils.run_lems_with_jneuroml_netpyne)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.neuron, num_processors=2),
+                         pynml.run_lems_with_jneuroml_neuron)
         self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.neuron), pynml.run_lems_with_jneuroml_neuron)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.neuron, in_process=True),
+                         utils.run_lems_with_jneuroml_neuron_in_process)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.netpyne, binary_outputs=True),
+                         utils.run_lems_with_jneuroml_netpyne)
+        self.assertEqual(utils.get_simulator_run_lems_method(data_model.Simulator.neuron, binary_outputs=True),
+                         utils.run_lems_with_jneuroml_neuron)
         with self.assertRaises(NotImplementedError):
             utils.get_simulator_run_lems_method(None)
 
@@ -142,6 +242,36 @@ class UtilsTestCase(unittest.TestCase):
         self.assertGreaterEqual(options.num_processors, 1)
         self.assertGreaterEqual(options.max_memory, 100e6)
 
+    def test_get_lems_included_files(self):
+        filename = os.path.join(os.path.dirname(__file__), 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+        lems_xml_root = utils.read_xml_file(filename)
+        included_filenames = utils.get_lems_included_files(lems_xml_root, os.path.dirname(filename))
+        self.assertEqual([os.path.relpath(included_filename, os.path.dirname(filename)) for included_filename in included_filenames], [
+            'NaConductance.channel.nml',
+            'KConductance.channel.nml',
+            'LeakConductance.channel.nml',
+            'NML2_SingleCompHHCell.nml',
+        ])
+
+    def test_get_cache_key(self):
+        filename = os.path.join(os.path.dirname(__file__), 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
+        lems_xml_root = utils.read_xml_file(filename)
+        included_filenames = utils.get_lems_included_files(lems_xml_root, os.path.dirname(filename))
+
+        with open(included_filenames[0], 'rb') as file:
+            self.assertEqual(utils.hash_file(included_filenames[0], content=file.read()), utils.hash_file(included_filenames[0]))
+
+        key = utils.get_cache_key({'a': 1}, lems_xml_root=lems_xml_root, filenames=included_filenames)
+        self.assertEqual(utils.get_cache_key({'a': 1}, lems_xml_root=copy.deepcopy(lems_xml_root), filenames=included_filenames), key)
+        self.assertEqual(utils.get_cache_key({'a': 1}, lems_xml_root=lems_xml_root, filenames={
+            included_filename: utils.hash_file(included_filename) for included_filename in included_filenames}), key)
+        self.assertNotEqual(utils.get_cache_key({'a': 2}, lems_xml_root=lems_xml_root, filenames=included_filenames), key)
+        self.assertNotEqual(utils.get_cache_key({'a': 1}, lems_xml_root=lems_xml_root, filenames=included_filenames[1:]), key)
+        self.assertNotEqual(utils.get_cache_key({'a': 1}, filenames=included_filenames), key)
+
+        with mock.patch.object(utils, '__version__', '0.0.0'):
+            self.assertNotEqual(utils.get_cache_key({'a': 1}, lems_xml_root=lems_xml_root, filenames=included_filenames), key)
+
     def test_read_lems_output_files_configuration(self):
         filename = os.path.join(os.path.dirname(__file__), 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
         root = lxml.etree.parse(filename).getroot()
@@ -220,9 +350,44 @@ class UtilsTestCase(unittest.TestCase):
         self.assertEqual(set(results.keys()), set(['of0', 'of1']))
         self.assertEqual(results['of1'].columns.values.tolist(), ['__time__', 'm', 'h', 'n'])
         numpy.testing.assert_allclose(results['of1'].loc[:, '__time__'], numpy.linspace(0., 300e-3, 30000 + 1))
+
+        results = utils.read_lems_output_files(config, columns=['__time__', 'n'], num_rows=101, memory_map=True)
+        self.assertEqual(results['of1'].columns.values.tolist(), ['__time__', 'n'])
+        numpy.testing.assert_allclose(results['of1'].loc[:, '__time__'], numpy.linspace(299e-3, 300e-3, 100 + 1))
+
         os.chdir(cur_dirname)
         shutil.rmtree(temp_dirname)
 
+    def test_read_lems_output_file(self):
+        fid, filename = tempfile.mkstemp(suffix='.tsv')
+        os.close(fid)
+        values = numpy.arange(100 * 4, dtype=numpy.float64).reshape((100, 4))
+
+        for trailing_sep, trailing_newline in [(True, True), (False, True), (False, False)]:
+            with open(filename, 'w') as file:
+                lines = ['\t'.join(str(value) for value in row) + ('\t' if trailing_sep else '') for row in values]
+                file.write('\n'.join(lines) + ('\n' if trailing_newline else ''))
+
+            for memory_map in [False, True]:
+                numpy.testing.assert_equal(utils.read_lems_output_file(filename, [0, 1, 2, 3], memory_map=memory_map), values)
+                numpy.testing.assert_equal(utils.read_lems_output_file(filename, [0, 2], num_rows=10, memory_map=memory_map),
+                                           values[-10:, [0, 2]])
+                numpy.testing.assert_equal(utils.read_lems_output_file(filename, [3], num_rows=1000, memory_map=memory_map),
+                                           values[:, [3]])
+                self.assertEqual(utils.read_lems_output_file(filename, [0, 1], num_rows=0, memory_map=memory_map).shape, (0, 2))
+
+            with open(filename, 'rb') as file:
+                offset = utils.get_offset_of_last_lines(file, 10, block_size=7)
+                self.assertEqual(offset, utils.get_offset_of_last_lines(file, 10))
+                file.seek(offset)
+                self.assertEqual(len(file.read().decode().strip().split('\n')), 10)
+
+        with open(filename, 'w') as file:
+            pass
+        self.assertEqual(utils.read_lems_output_file(filename, [0, 1], num_rows=10, memory_map=True).shape, (0, 2))
+
+        os.remove(filename)
+
     def test_run_lems_xml(self):
         filename = os.path.join(os.path.dirname(__file__), 'fixtures', 'LEMS_NML2_Ex5_DetCell.xml')
         for simulator in [data_model.Simulator.pyneuroml]:
@@ -235,3 +400,42 @@ class UtilsTestCase(unittest.TestCase):
         with mock.patch('pyneuroml.pynml.run_lems_with_jneuroml', return_value=False):
             with self.assertRaises(RuntimeError):
                 utils.run_lems_xml(lems_xml_root, os.path.dirname(filename))
+
+    def test_run_lems_xml_concurrently(self):
+        temp_dirname = tempfile.mkdtemp()
+        working_dirname = os.path.join(temp_dirname, 'fixtures')
+        shutil.copytree(os.path.join(os.path.dirname(__file__), 'fixtures'), working_dirname)
+        filename = os.path.join(working_dirname, 'LEMS_NML2_Ex5_DetCell.xml')
+        filenames = sorted(os.listdir(working_dirname))
+
+        # standard output/error can't be captured by multiple threads at once
+        config = get_config()
+        config.LOG = False
+
+        def run(length):
+            lems_xml_root = utils.read_xml_file(filename)
+            lems_xml_root.xpath('/Lems/Simulation')[0].attrib['length'] = length
+            return utils.run_lems_xml(lems_xml_root, working_dirname, config=config)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(run, ['100ms', '200ms']))
+
+        numpy.testing.assert_allclose(results[0]['of1'].loc[:, '__time__'], numpy.linspace(0., 100e-3, 10000 + 1))
+        numpy.testing.assert_allclose(results[1]['of1'].loc[:, '__time__'], numpy.linspace(0., 200e-3, 20000 + 1))
+
+        # the working directory isn't modified
+        self.assertEqual(sorted(os.listdir(working_dirname)), filenames)
+
+        # included files are resolved relative to the working directory, rather than the current directory
+        lems_xml_root = utils.read_xml_file(filename)
+        for simulator in [data_model.Simulator.brian2, data_model.Simulator.neuron]:
+            cwd = os.getcwd()
+            results = utils.run_lems_xml(lems_xml_root, working_dirname, simulator=simulator)
+            self.assertEqual(os.getcwd(), cwd)
+            self.assertEqual(set(results.keys()), set(['of0', 'of1']))
+            self.assertEqual(results['of1'].columns.values.tolist(), ['__time__', 'm', 'h', 'n'])
+            self.assertEqual(results['of1'].shape[0], 30000 + 1)
+        self.assertEqual(lems_xml_root.xpath('/Lems/Include')[-1].attrib['file'], 'NML2_SingleCompHHCell.nml')
+        self.assertEqual(sorted(os.listdir(working_dirname)), filenames)
+
+        shutil.rmtree(temp_dirname)